@@ -0,0 +1,111 @@
+"""
+Benchmark de conversión de gráficos a textura
+Compara el camino PNG (savefig a PNG y decodificación con CoreImage) con el
+directo (buffer RGBA de Agg copiado a la textura con blit_buffer) sobre los
+mismos gráficos de las pantallas. Necesita una ventana de Kivy (contexto
+OpenGL), que se abre oculta.
+
+    python bench_graficos.py --repeticiones 30
+"""
+
+import argparse
+import os
+import statistics
+import sys
+from time import perf_counter
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+
+from kivy.config import Config  # noqa: E402
+
+Config.set('graphics', 'window_state', 'hidden')
+
+from kivy.core.window import Window  # noqa: E402, F401  (crea el contexto OpenGL)
+
+import matplotlib_wrapper  # noqa: E402
+from gastos import GastosScreen  # noqa: E402
+from ingresos import IngresosScreen  # noqa: E402
+from matplotlib_wrapper import plt  # noqa: E402
+from tambo import TamboScreen  # noqa: E402
+
+# Gráficos de ejemplo: (nombre, dibujar, datos, figsize)
+GRAFICOS = (
+    (
+        'Torta de gastos', GastosScreen.draw_graph,
+        (['Insumos', 'Combustible', 'Sueldos', 'Veterinaria', 'Otros'], [520000, 310000, 900000, 120000, 45000]),
+        (6, 4),
+    ),
+    (
+        'Barras de ingresos', IngresosScreen.draw_comparison_graph,
+        (1800000, 1370000),
+        (6, 4),
+    ),
+    (
+        'Evolución del tambo', TamboScreen.draw_evolution_graph,
+        ([f'{dia:02d}/10' for dia in range(1, 31)], [4800 + (dia * 37) % 400 for dia in range(30)], 4990),
+        (8, 5),
+    ),
+)
+
+
+def _figura(dibujar, datos, figsize):
+    fig = plt.figure(figsize=figsize, dpi=matplotlib_wrapper.DPI, facecolor='white')
+    dibujar(fig, datos)
+    return fig
+
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = perf_counter()
+        funcion()
+        tiempos.append((perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparar PNG contra blit_buffer al crear texturas de gráficos")
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'Gráfico':<22} {'PNG':>10} {'Directo':>10} {'Reuso':>10} {'Mejora':>8}")
+    print("-" * 64)
+    mejoras = []
+    for nombre, dibujar, datos, figsize in GRAFICOS:
+        fig = _figura(dibujar, datos, figsize)
+
+        def camino_png():
+            matplotlib_wrapper.textura_png(matplotlib_wrapper.figura_a_png(fig))
+
+        def camino_directo():
+            matplotlib_wrapper.textura_rgba(*matplotlib_wrapper.rasterizar(fig))
+
+        # Redibujo sobre la textura ya creada (MatplotlibWidget.mostrar con el mismo tamaño)
+        ancho, alto, pixeles = matplotlib_wrapper.rasterizar(fig)
+        textura = matplotlib_wrapper.textura_rgba(ancho, alto, pixeles)
+
+        def reuso():
+            _, _, pixeles = matplotlib_wrapper.rasterizar(fig)
+            matplotlib_wrapper.cargar_pixeles(textura, pixeles)
+
+        # Una pasada previa para calentar fuentes y cachés de matplotlib
+        camino_png()
+        camino_directo()
+
+        png = medir(camino_png, args.repeticiones)
+        directo = medir(camino_directo, args.repeticiones)
+        reusado = medir(reuso, args.repeticiones)
+        mejoras.append(png / directo)
+        print(f"{nombre:<22} {png:>8.1f}ms {directo:>8.1f}ms {reusado:>8.1f}ms {png / directo:>7.1f}x")
+        plt.close(fig)
+
+    print(f"\n   Mejora mediana: {statistics.median(mejoras):.1f}x")
+    if min(mejoras) < 1:
+        print("❌ El camino directo es más lento que el PNG en algún gráfico")
+        sys.exit(1)
+    print("✅ El camino directo es más rápido en todos los gráficos")
+
+
+if __name__ == '__main__':
+    main()
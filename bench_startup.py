@@ -0,0 +1,103 @@
+"""
+Benchmark de arranque
+Mide con `python -X importtime` cuánto cuesta importar main y falla si supera
+el presupuesto o si al arrancar se cargan módulos que deben ser diferidos
+(matplotlib, numpy, requests).
+
+    python bench_startup.py --presupuesto 900 --repeticiones 5
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Presupuesto de importación de main en milisegundos (mediana de las corridas)
+PRESUPUESTO_MS = float(os.environ.get('AGROMANAGER_PRESUPUESTO_ARRANQUE_MS', 900))
+
+# Módulos que no deben importarse antes de mostrar la ventana
+DIFERIDOS = ('matplotlib', 'numpy', 'requests')
+
+
+def medir(modulo='main'):
+    """Importar el módulo en un proceso nuevo y devolver {paquete: (propio_us, acumulado_us)}"""
+    entorno = {
+        **os.environ,
+        # Evitar que Kivy interprete argumentos o llene la salida de logs
+        'KIVY_NO_ARGS': '1',
+        'KIVY_NO_CONSOLELOG': '1',
+        'AGROMANAGER_SQL_STATS': '0',
+    }
+    proceso = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=entorno,
+        capture_output=True,
+        text=True,
+    )
+    if proceso.returncode != 0:
+        ultima = proceso.stderr.strip().splitlines()[-1:] or ['sin detalle']
+        raise RuntimeError(f"No se pudo importar {modulo}: {ultima[0]}")
+
+    tiempos = {}
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith('import time:') or 'self [us]' in linea:
+            continue
+        propio, acumulado, paquete = linea[len('import time:'):].split('|')
+        tiempos[paquete.strip()] = (int(propio), int(acumulado))
+    return tiempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Medir el costo de importación al arrancar")
+    parser.add_argument('--modulo', default='main', help="Módulo a importar")
+    parser.add_argument('--presupuesto', type=float, default=PRESUPUESTO_MS,
+                        help="Máximo permitido en milisegundos")
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--detalle', type=int, default=15,
+                        help="Cantidad de módulos más costosos a mostrar")
+    args = parser.parse_args()
+
+    print(f"⏱️  Importando {args.modulo} ({args.repeticiones} corridas)...")
+    corridas = []
+    try:
+        for _ in range(args.repeticiones):
+            corridas.append(medir(args.modulo))
+    except RuntimeError as error:
+        print(f"❌ {error}")
+        sys.exit(2)
+
+    totales = [corrida[args.modulo][1] / 1000 for corrida in corridas]
+    mediana = statistics.median(totales)
+    # La última corrida ya tiene la caché de bytecode y del sistema de archivos caliente
+    ultima = corridas[-1]
+
+    print(f"\n{'Módulo':<50} {'Propio':>10} {'Acumulado':>10}")
+    print("-" * 72)
+    mas_costosos = sorted(ultima.items(), key=lambda item: item[1][0], reverse=True)
+    for paquete, (propio, acumulado) in mas_costosos[:args.detalle]:
+        print(f"{paquete[:50]:<50} {propio / 1000:>8.1f}ms {acumulado / 1000:>8.1f}ms")
+
+    print(f"\n   Mediana: {mediana:.1f} ms (mín {min(totales):.1f}, máx {max(totales):.1f})")
+    print(f"   Presupuesto: {args.presupuesto:.0f} ms")
+
+    fallas = []
+    if mediana > args.presupuesto:
+        fallas.append(f"la importación tarda {mediana:.1f} ms y el presupuesto es {args.presupuesto:.0f} ms")
+    cargados = sorted({
+        paquete.split('.')[0] for paquete in ultima
+        if paquete.split('.')[0] in DIFERIDOS
+    })
+    if cargados:
+        fallas.append(f"se importan al arrancar: {', '.join(cargados)}")
+
+    if fallas:
+        for falla in fallas:
+            print(f"❌ {falla}")
+        sys.exit(1)
+    print("✅ Arranque dentro del presupuesto")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Módulo de búsqueda global
+Busca por prefijo en gastos, ingresos, proveedores, facturas y tambo
+"""
+
+from kivy.clock import Clock
+from kivy.metrics import dp
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.scrollview import ScrollView
+from kivy.utils import escape_markup
+from kivymd.uix.list import MDList, OneLineListItem, TwoLineListItem
+from kivymd.uix.screen import MDScreen
+from kivymd.uix.textfield import MDTextField
+from kivymd.uix.toolbar import MDTopAppBar
+
+import database
+import db_worker
+
+# Espera desde la última tecla antes de consultar
+DEMORA_BUSQUEDA = 0.25
+
+# Etiqueta de cada tabla y pantalla que se abre al tocar un resultado
+TABLAS = {
+    'gastos': ("Gasto", 'gastos'),
+    'ingresos': ("Ingreso", 'ingresos'),
+    'proveedores': ("Proveedor", 'proveedores'),
+    'facturas': ("Factura", 'proveedores'),
+    'tambo': ("Tambo", 'tambo'),
+}
+
+
+def resaltar(texto):
+    """Escapar el texto y convertir las marcas de coincidencia en negrita"""
+    return (
+        escape_markup(texto or '')
+        .replace(database.MARCA_INICIO, '[b]')
+        .replace(database.MARCA_FIN, '[/b]')
+    )
+
+
+class BusquedaScreen(MDScreen):
+    """Pantalla de búsqueda global"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.name = 'busqueda'
+        self._buscar_trigger = Clock.create_trigger(self.search, DEMORA_BUSQUEDA)
+
+        layout = BoxLayout(orientation='vertical')
+
+        # Toolbar
+        toolbar = MDTopAppBar(
+            title="Buscar",
+            elevation=3,
+            md_bg_color=(0.2, 0.6, 0.8, 1),
+            left_action_items=[["arrow-left", lambda x: self.go_back()]]
+        )
+        layout.add_widget(toolbar)
+
+        content = BoxLayout(orientation='vertical', padding=dp(10), spacing=dp(10))
+
+        self.search_field = MDTextField(
+            hint_text="Gastos, ingresos, proveedores, observaciones...",
+            size_hint_y=None,
+            height=dp(50)
+        )
+        self.search_field.bind(text=lambda *args: self._buscar_trigger())
+        content.add_widget(self.search_field)
+
+        # Resultados
+        self.resultados_list = MDList()
+        scroll = ScrollView()
+        scroll.add_widget(self.resultados_list)
+        content.add_widget(scroll)
+
+        layout.add_widget(content)
+        self.add_widget(layout)
+
+    def go_back(self):
+        self.manager.current = 'dashboard'
+
+    def on_enter(self, *args):
+        self.search_field.focus = True
+
+    def search(self, *args):
+        """Buscar en segundo plano lo escrito en el campo"""
+        texto = self.search_field.text.strip()
+        if not texto:
+            # Invalidar una búsqueda en curso y vaciar la lista
+            db_worker.run_async(lambda: [], on_result=self.show_resultados, clave='busqueda')
+            return
+
+        db_worker.run_async(
+            database.get_db().buscar, texto,
+            on_result=self.show_resultados,
+            clave='busqueda'
+        )
+
+    def show_resultados(self, resultados):
+        """Mostrar los resultados ordenados por relevancia"""
+        self.resultados_list.clear_widgets()
+
+        for resultado in resultados:
+            etiqueta, pantalla = TABLAS[resultado['tabla']]
+            titulo = resaltar(resultado['titulo']) or etiqueta
+            item = TwoLineListItem(
+                text=f"{etiqueta}: {titulo}",
+                secondary_text=resaltar(resultado['detalle']),
+                on_press=lambda x, p=pantalla: self.open_result(p)
+            )
+            self.resultados_list.add_widget(item)
+
+        if not resultados and self.search_field.text.strip():
+            self.resultados_list.add_widget(OneLineListItem(text="Sin resultados"))
+
+    def open_result(self, pantalla):
+        """Abrir la pantalla donde se gestiona el registro"""
+        self.manager.current = pantalla
@@ -3,22 +3,21 @@ Módulo de gestión de cheques
 Permite cargar, visualizar y gestionar vencimientos de cheques
 """
 
-from datetime import datetime
+from datetime import date, datetime, time, timedelta
 
+from kivy.clock import Clock
 from kivy.metrics import dp
 from kivy.uix.boxlayout import BoxLayout
-from kivy.uix.scrollview import ScrollView
-from kivy.uix.widget import Widget
-from kivymd.uix.button import MDFlatButton, MDRaisedButton
-from kivymd.uix.dialog import MDDialog
-from kivymd.uix.list import MDList, OneLineListItem, TwoLineListItem
+from kivymd.uix.button import MDRaisedButton
 from kivymd.uix.menu import MDDropdownMenu
-from kivymd.uix.pickers import MDDatePicker
 from kivymd.uix.screen import MDScreen
-from kivymd.uix.textfield import MDTextField
 from kivymd.uix.toolbar import MDTopAppBar
 
 import database
+import db_worker
+import formularios
+import listas
+import vencimientos
 
 
 class ChequesScreen(MDScreen):
@@ -27,9 +26,6 @@ class ChequesScreen(MDScreen):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.name = 'cheques'
-        self.dialog = None
-        self.date_picker = None
-        self.selected_date = None
         
         layout = BoxLayout(orientation='vertical')
         
@@ -55,174 +51,117 @@ class ChequesScreen(MDScreen):
         )
         content.add_widget(btn_add)
         
-        # Lista de cheques
-        self.cheques_list = MDList()
-        scroll = ScrollView()
-        scroll.add_widget(self.cheques_list)
-        content.add_widget(scroll)
+        # Lista de cheques: solo se crean los widgets de las filas visibles
+        self.cheques_list = listas.ListaVirtual()
+        content.add_widget(self.cheques_list)
+        
+        # Scroll infinito: las páginas se piden al acercarse al final de la lista
+        self.paginador = listas.ListaPaginada(
+            self.cheques_list, self.load_page, self.row_data,
+            clave='cheques',
+            texto_vacio="No hay cheques pendientes",
+            texto_cargando="Cargando cheques...",
+            tabla='cheques'
+        )
         
         layout.add_widget(content)
         self.add_widget(layout)
         
+        # El formulario de alta se arma una vez, en un momento ocioso
+        self.formulario = formularios.Formulario(
+            "Agregar Cheque",
+            [
+                formularios.Texto('numero', "Número de cheque", obligatorio=True),
+                formularios.Texto('banco', "Banco", obligatorio=True),
+                formularios.Texto('monto', "Monto", filtro='float', obligatorio=True),
+                formularios.Fecha('fecha_vencimiento', "Seleccionar fecha de vencimiento", obligatorio=True),
+            ],
+            self.save_cheque
+        )
+        self.formulario.preparar()
+        
         # Cargar cheques al iniciar
         self.load_cheques()
+        
+        # Al cruzar un umbral de vencimiento cambian el color y el estado de las filas
+        vencimientos.get_programador().bind(on_aviso=lambda *args: self.paginador.refrescar())
+        
+        # Los "N días" de las filas cambian a medianoche aunque ningún cheque cruce un umbral
+        self.dia = date.today()
+        self._medianoche = None
+        self._programar_medianoche()
+    
+    def on_enter(self, *args):
+        self.revisar_dia()
+    
+    def _programar_medianoche(self):
+        """Despertar al empezar el día siguiente"""
+        if self._medianoche is not None:
+            self._medianoche.cancel()
+        manana = datetime.combine(date.today() + timedelta(days=1), time())
+        self._medianoche = Clock.schedule_once(self.revisar_dia, (manana - datetime.now()).total_seconds())
+    
+    def revisar_dia(self, *args):
+        """Refrescar los días restantes si cambió la fecha (también al volver de una pausa)"""
+        if self.dia != date.today():
+            self.dia = date.today()
+            self.paginador.refrescar()
+        self._programar_medianoche()
     
     def go_back(self):
         """Volver al dashboard"""
         self.manager.current = 'dashboard'
     
     def load_cheques(self):
-        """Cargar y mostrar lista de cheques"""
-        self.cheques_list.clear_widgets()
-        
-        db = database.DatabaseManager()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM cheques 
-            WHERE estado = 'pendiente'
-            ORDER BY fecha_vencimiento
-        ''')
-        
-        cheques = cursor.fetchall()
-        hoy = datetime.now()
-        
-        for cheque in cheques:
-            fecha_venc = datetime.strptime(cheque['fecha_vencimiento'], '%Y-%m-%d')
-            dias_restantes = (fecha_venc - hoy).days
-            
-            # Determinar color según proximidad
-            if dias_restantes < 0:
-                color = (0.9, 0.2, 0.2, 1)  # Rojo - vencido
-                estado_texto = "VENCIDO"
-            elif dias_restantes <= 7:
-                color = (0.9, 0.6, 0.2, 1)  # Naranja - próximo
-                estado_texto = f"{dias_restantes} días"
-            else:
-                color = (0.2, 0.7, 0.2, 1)  # Verde - tranquilo
-                estado_texto = f"{dias_restantes} días"
-            
-            item = TwoLineListItem(
-                text=f"Ch. {cheque['numero']} - {cheque['banco']} - ${cheque['monto']:,.0f}",
-                secondary_text=f"Vence: {fecha_venc.strftime('%d/%m/%Y')} - {estado_texto}",
-                theme_text_color="Custom",
-                text_color=color,
-                on_press=lambda x, c=cheque: self.show_cheque_options(c)
-            )
-            self.cheques_list.add_widget(item)
-        
-        if not cheques:
-            self.cheques_list.add_widget(
-                OneLineListItem(text="No hay cheques pendientes")
-            )
+        """Cargar la lista de cheques desde la primera página"""
+        self.paginador.recargar()
     
-    def show_add_dialog(self, *args):
-        """Mostrar diálogo para agregar cheque"""
-        if not self.dialog:
-            content = BoxLayout(orientation='vertical', spacing=dp(10), size_hint_y=None)
-            content.bind(minimum_height=content.setter('height'))
-
-            # Espaciador arriba
-            content.add_widget(Widget(size_hint_y=None, height=dp(20)))
-            
-            self.numero_field = MDTextField(
-                hint_text="Número de cheque",
-                size_hint_y=None,
-                height=dp(50)
-            )
-            
-            self.banco_field = MDTextField(
-                hint_text="Banco",
-                size_hint_y=None,
-                height=dp(50)
-            )
-            
-            self.monto_field = MDTextField(
-                hint_text="Monto",
-                input_filter='float',
-                size_hint_y=None,
-                height=dp(50)
-            )
-            
-            self.fecha_button = MDRaisedButton(
-                text="Seleccionar fecha de vencimiento",
-                size_hint=(1, None),
-                height=dp(50),
-                on_press=self.show_date_picker
-            )
-            
-            content.add_widget(self.numero_field)
-            content.add_widget(self.banco_field)
-            content.add_widget(self.monto_field)
-            content.add_widget(self.fecha_button)
-            
-            self.dialog = MDDialog(
-                title="Agregar Cheque",
-                type="custom",
-                content_cls=content,
-                buttons=[
-                    MDFlatButton(
-                        text="CANCELAR",
-                        on_press=lambda x: self.dialog.dismiss()
-                    ),
-                    MDRaisedButton(
-                        text="GUARDAR",
-                        on_press=self.save_cheque
-                    ),
-                ],
-            )
-        
-        self.dialog.open()
+    def load_page(self, despues_de=None, antes_de=None, limite=database.TAMANO_PAGINA, ids=None):
+        """Página de cheques pendientes (se ejecuta en segundo plano)"""
+        return database.get_db().get_cheques_pendientes_pagina(
+            despues_de=despues_de, antes_de=antes_de, limite=limite, ids=ids
+        )
     
-    def show_date_picker(self, *args):
-        """Mostrar selector de fecha"""
-        if not self.date_picker:
-            self.date_picker = MDDatePicker()
-            self.date_picker.bind(on_save=self.on_date_selected)
-        
-        self.date_picker.open()
+    def row_data(self, cheque):
+        """Datos de la fila de un cheque en la lista"""
+        fecha_venc = datetime.strptime(cheque['fecha_vencimiento'], '%Y-%m-%d')
+        dias_restantes = vencimientos.dias_restantes(fecha_venc.date())
+        
+        # Determinar color según proximidad (las mismas etapas que los avisos)
+        etapa = vencimientos.etapa(fecha_venc.date())
+        if etapa == vencimientos.VENCIDO:
+            color = (0.9, 0.2, 0.2, 1)  # Rojo - vencido
+            estado_texto = "VENCIDO"
+        elif etapa == vencimientos.PROXIMO:
+            color = (0.9, 0.6, 0.2, 1)  # Naranja - próximo
+            estado_texto = f"{dias_restantes} días"
+        else:
+            color = (0.2, 0.7, 0.2, 1)  # Verde - tranquilo
+            estado_texto = f"{dias_restantes} días"
+        
+        return listas.fila(
+            'TwoLineListItem',
+            text=f"Ch. {cheque['numero']} - {cheque['banco']} - ${cheque['monto']:,.0f}",
+            secondary_text=f"Vence: {fecha_venc.strftime('%d/%m/%Y')} - {estado_texto}",
+            theme_text_color="Custom",
+            text_color=color,
+            on_release=lambda c=cheque: self.show_cheque_options(c)
+        )
     
-    def on_date_selected(self, instance, value, date_range):
-        """Callback cuando se selecciona una fecha"""
-        self.selected_date = value.strftime('%Y-%m-%d')
-        self.fecha_button.text = f"Fecha: {value.strftime('%d/%m/%Y')}"
+    def show_add_dialog(self, *args):
+        """Mostrar diálogo para agregar cheque"""
+        self.formulario.abrir()
     
-    def save_cheque(self, *args):
+    def save_cheque(self, valores):
         """Guardar cheque en la base de datos"""
-        if not all([
-            self.numero_field.text,
-            self.banco_field.text,
-            self.monto_field.text,
-            self.selected_date
-        ]):
-            return
-        
-        db = database.DatabaseManager()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO cheques (numero, banco, monto, fecha_vencimiento)
-            VALUES (?, ?, ?, ?)
-        ''', (
-            self.numero_field.text,
-            self.banco_field.text,
-            float(self.monto_field.text),
-            self.selected_date
-        ))
-        
-        conn.commit()
-        
-        # Limpiar campos
-        self.numero_field.text = ''
-        self.banco_field.text = ''
-        self.monto_field.text = ''
-        self.selected_date = None
-        self.fecha_button.text = "Seleccionar fecha de vencimiento"
-        
-        self.dialog.dismiss()
-        self.load_cheques()
+        db = database.get_db()
+        db.encolar(
+            db.insertar_cheque,
+            valores['numero'],
+            valores['banco'],
+            valores['monto'],
+            valores['fecha_vencimiento']
+        )
     
     def show_cheque_options(self, cheque):
         """Mostrar opciones para un cheque (marcar como cobrado, eliminar)"""
@@ -245,25 +184,14 @@ class ChequesScreen(MDScreen):
     
     def mark_as_paid(self, cheque_id):
         """Marcar cheque como cobrado"""
-        db = database.DatabaseManager()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE cheques SET estado = 'cobrado' WHERE id = ?
-        ''', (cheque_id,))
-        
-        conn.commit()
+        db = database.get_db()
+        # El cobro tiene que quedar en disco aunque Android cierre la app
+        # enseguida: se espera el commit durable fuera del hilo de la interfaz
+        db_worker.run_async(db.encolar, db.actualizar_estado_cheque, cheque_id, 'cobrado', durable=True)
         self.menu.dismiss()
-        self.load_cheques()
     
     def delete_cheque(self, cheque_id):
         """Eliminar cheque"""
-        db = database.DatabaseManager()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM cheques WHERE id = ?', (cheque_id,))
-        conn.commit()
-        self.menu.dismiss()
-        self.load_cheques()
\ No newline at end of file
+        db = database.get_db()
+        db.encolar(db.eliminar_cheque, cheque_id)
+        self.menu.dismiss()
\ No newline at end of file
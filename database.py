@@ -3,274 +3,1251 @@ Módulo de gestión de base de datos SQLite
 Maneja todas las operaciones CRUD de la aplicación
 """
 
+import atexit
+import logging
+import queue
+import re
 import sqlite3
-from datetime import datetime, timedelta
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import eventos
+import instrumentacion
+import migrations
+import series
+
+DB_NAME = 'agromanager.db'
+
+# Cantidad máxima de conexiones de solo lectura por base de datos
+LECTORES_POR_DEFECTO = 3
+
+# Filas por página en los listados con paginación por cursor
+TAMANO_PAGINA = 20
+
+# Marcas de coincidencia en los fragmentos de búsqueda (la pantalla las
+# reemplaza por markup de Kivy después de escapar el texto)
+MARCA_INICIO = '\x02'
+MARCA_FIN = '\x03'
+
+# Coincidencias más recientes que se ordenan por relevancia en cada búsqueda
+CANDIDATOS_BUSQUEDA = 500
+
+# Las escrituras encoladas dentro de esta ventana (segundos) comparten un commit
+VENTANA_ESCRITURA = 0.02
+MAX_LOTE_ESCRITURA = 200
+
+logger = logging.getLogger(__name__)
+
+# PRAGMAs aplicados una única vez al abrir cada conexión
+PRAGMAS_CONEXION = (
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA busy_timeout=5000',
+    'PRAGMA cache_size=-8000',  # 8 MB de caché de páginas
+    'PRAGMA temp_store=MEMORY',
+)
+
+
+class _Escritura:
+    """Trabajo de escritura encolado"""
+    __slots__ = ('funcion', 'args', 'kwargs', 'durable', 'future')
+
+    def __init__(self, funcion, args, kwargs, durable):
+        self.funcion = funcion
+        self.args = args
+        self.kwargs = kwargs
+        self.durable = durable
+        self.future = Future()
+
+
+class ColaEscritura:
+    """Escritura diferida con commit agrupado.
+
+    Un hilo dedicado junta las escrituras que llegan dentro de
+    VENTANA_ESCRITURA y las ejecuta en una sola transacción, cada una en su
+    SAVEPOINT: si una falla se deshace solo esa. Las lecturas del pool
+    esperan a que se confirme lo ya encolado, así cada pantalla ve sus
+    propias escrituras.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._pendientes = deque()
+        self._cond = threading.Condition()
+        self._encoladas = 0
+        self._confirmadas = 0
+        self._hilo = None
+        self._cerrando = False
+
+    def encolar(self, funcion, args=(), kwargs=None, durable=False):
+        """Agregar una escritura y devolver su Future"""
+        if durable and threading.current_thread() is self._hilo:
+            # Quien la encola esperaría un commit que solo este hilo puede hacer
+            raise RuntimeError("No se puede esperar una escritura durable desde la cola de escritura")
+        trabajo = _Escritura(funcion, args, kwargs or {}, durable)
+        with self._cond:
+            if self._cerrando:
+                raise RuntimeError("La cola de escritura está cerrada")
+            if self._hilo is None:
+                self._hilo = threading.Thread(
+                    target=self._procesar, name='agromanager-escritura', daemon=True
+                )
+                self._hilo.start()
+            self._pendientes.append(trabajo)
+            self._encoladas += 1
+            self._cond.notify_all()
+        return trabajo.future
+
+    def esperar(self):
+        """Bloquear hasta que se confirme todo lo encolado hasta ahora"""
+        if threading.current_thread() is self._hilo:
+            return
+        with self._cond:
+            objetivo = self._encoladas
+            while self._confirmadas < objetivo:
+                self._cond.wait()
+
+    def cerrar(self):
+        """Confirmar lo pendiente y detener el hilo"""
+        with self._cond:
+            self._cerrando = True
+            hilo = self._hilo
+            self._cond.notify_all()
+        if hilo is not None:
+            hilo.join()
+
+    def _procesar(self):
+        while True:
+            with self._cond:
+                while not self._pendientes and not self._cerrando:
+                    self._cond.wait()
+                if not self._pendientes:
+                    return
+                # Dar tiempo a que lleguen más escrituras para el mismo commit
+                limite = time.monotonic() + VENTANA_ESCRITURA
+                while len(self._pendientes) < MAX_LOTE_ESCRITURA and not self._cerrando:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        break
+                    self._cond.wait(restante)
+                lote = [
+                    self._pendientes.popleft()
+                    for _ in range(min(len(self._pendientes), MAX_LOTE_ESCRITURA))
+                ]
+
+            try:
+                self._ejecutar(lote)
+            except Exception as error:
+                # El hilo sigue vivo: si se detuviera, esperar() no volvería nunca
+                logger.exception('Falló un lote de escrituras')
+                for trabajo in lote:
+                    if not trabajo.future.done():
+                        trabajo.future.set_exception(error)
+            finally:
+                with self._cond:
+                    self._confirmadas += len(lote)
+                    self._cond.notify_all()
+
+    def _ejecutar(self, lote):
+        """Ejecutar un lote en una transacción y resolver sus Futures"""
+        durable = any(trabajo.durable for trabajo in lote)
+        resultados = []
+        cambios = []
+        with self.pool._write_lock:
+            conn = None
+            self.pool._cambios = []
+            try:
+                conn = self.pool.writer()
+                # En WAL con synchronous=NORMAL el commit no hace fsync; FULL sí
+                if durable:
+                    conn.execute('PRAGMA synchronous=FULL')
+                conn.execute('BEGIN IMMEDIATE')
+                for trabajo in lote:
+                    conn.execute('SAVEPOINT escritura')
+                    marca = len(self.pool._cambios)
+                    try:
+                        resultado = trabajo.funcion(*trabajo.args, **trabajo.kwargs)
+                    except Exception as error:
+                        conn.execute('ROLLBACK TO escritura')
+                        conn.execute('RELEASE escritura')
+                        # Los cambios de una escritura deshecha no se publican
+                        del self.pool._cambios[marca:]
+                        resultados.append((trabajo, None, error))
+                    else:
+                        conn.execute('RELEASE escritura')
+                        resultados.append((trabajo, resultado, None))
+                conn.execute('COMMIT')
+                cambios = self.pool._cambios
+            except Exception as error:
+                if conn is not None and conn.in_transaction:
+                    conn.rollback()
+                resultados = [(trabajo, None, error) for trabajo in lote]
+            finally:
+                self.pool._cambios = []
+                if durable and conn is not None:
+                    try:
+                        conn.execute('PRAGMA synchronous=NORMAL')
+                    except sqlite3.Error:
+                        logger.exception('No se pudo volver a synchronous=NORMAL')
+
+        for trabajo, resultado, error in resultados:
+            if trabajo.future.cancelled():
+                continue
+            if error is None:
+                trabajo.future.set_result(resultado)
+            else:
+                trabajo.future.set_exception(error)
+        eventos.publicar(cambios)
+
+
+class ConnectionPool:
+    """Conexión de escritura persistente más un pool de conexiones de lectura"""
+
+    def __init__(self, db_name=DB_NAME, lectores=LECTORES_POR_DEFECTO):
+        self.db_name = db_name
+        self.max_lectores = lectores
+        self._en_memoria = db_name == ':memory:'
+        self._writer = None
+        self._write_lock = threading.RLock()
+        self._lectores = queue.LifoQueue()
+        self._todos_lectores = []
+        self._lock = threading.Lock()
+        # Formato de almacenamiento, leído de la base la primera vez que se usa
+        self.formato = None
+        self.cola = ColaEscritura(self)
+        # Marca los hilos que tienen abierta una transacción de escritura
+        self._local = threading.local()
+        # Conexión que solo consulta PRAGMA data_version para detectar commits
+        self._monitor = None
+        self._monitor_lock = threading.Lock()
+        self.instantaneas = {}
+        # Cambios de la transacción en curso, se publican después del commit
+        self._cambios = []
+
+    def _connect(self):
+        """Abrir una conexión configurada (sin transacciones implícitas)"""
+        if instrumentacion.ACTIVA:
+            conn = sqlite3.connect(
+                self.db_name, check_same_thread=False, isolation_level=None,
+                factory=instrumentacion.ConexionInstrumentada
+            )
+            conn.ruta = self.db_name
+        else:
+            conn = sqlite3.connect(self.db_name, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS_CONEXION:
+            conn.execute(pragma)
+        return conn
+
+    def writer(self):
+        """Conexión de escritura compartida (se crea la primera vez)"""
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._connect()
+                # WAL es persistente en el archivo: alcanza con fijarlo desde el escritor
+                self._writer.execute('PRAGMA journal_mode=WAL')
+            return self._writer
+
+    @contextmanager
+    def transaction(self):
+        """Transacción de escritura: commit al salir, rollback ante errores"""
+        with self._write_lock:
+            conn = self.writer()
+            if conn.in_transaction:
+                # Transacción anidada: la maneja el bloque externo
+                yield conn
+                return
+            conn.execute('BEGIN IMMEDIATE')
+            self._local.escribiendo = True
+            self._cambios = []
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                self._cambios = []
+                raise
+            finally:
+                self._local.escribiendo = False
+            conn.commit()
+            cambios, self._cambios = self._cambios, []
+        eventos.publicar(cambios)
+
+    def registrar_cambio(self, tabla, op, id=None):
+        """Anotar un cambio para publicarlo cuando se confirme la transacción"""
+        cambio = eventos.Cambio(tabla, op, id)
+        with self._write_lock:
+            if self._writer is not None and self._writer.in_transaction:
+                self._cambios.append(cambio)
+                return
+        eventos.publicar([cambio])
+
+    @contextmanager
+    def reader(self):
+        """Tomar prestada una conexión de lectura del pool"""
+        # Leer lo propio: primero se confirman las escrituras encoladas, salvo
+        # que este hilo tenga la escritura tomada (la cola no podría avanzar)
+        if not getattr(self._local, 'escribiendo', False):
+            self.cola.esperar()
+
+        if self._en_memoria:
+            # Una base en memoria no se comparte entre conexiones
+            with self._write_lock:
+                yield self.writer()
+            return
+
+        self.writer()
+        try:
+            conn = self._lectores.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                crear = len(self._todos_lectores) < self.max_lectores
+                if crear:
+                    conn = self._connect()
+                    self._todos_lectores.append(conn)
+            if not crear:
+                conn = self._lectores.get()
+
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._lectores.put(conn)
+
+    def version_datos(self):
+        """Valor que cambia cada vez que se confirma una escritura en la base,
+        desde este proceso o desde otro (PRAGMA data_version)"""
+        if not getattr(self._local, 'escribiendo', False):
+            self.cola.esperar()
+
+        if self._en_memoria:
+            # Un solo escritor: alcanza con contar sus cambios
+            with self._write_lock:
+                return self.writer().total_changes
+
+        # data_version no cambia con los commits de la propia conexión, por eso
+        # se consulta desde una que nunca escribe
+        with self._monitor_lock:
+            if self._monitor is None:
+                self.writer()
+                self._monitor = self._connect()
+            return self._monitor.execute('PRAGMA data_version').fetchone()[0]
+
+    def close(self):
+        """Confirmar las escrituras pendientes y cerrar todas las conexiones"""
+        self.cola.cerrar()
+        self.instantaneas.clear()
+        with self._monitor_lock:
+            if self._monitor is not None:
+                self._monitor.close()
+                self._monitor = None
+        with self._lock:
+            for conn in self._todos_lectores:
+                conn.close()
+            self._todos_lectores = []
+            self._lectores = queue.LifoQueue()
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+
+_pools = {}
+_managers = {}
+_registry_lock = threading.RLock()
+
+
+def get_pool(db_name=DB_NAME):
+    """Pool de conexiones compartido por proceso para una base de datos"""
+    with _registry_lock:
+        pool = _pools.get(db_name)
+        if pool is None:
+            pool = _pools[db_name] = ConnectionPool(db_name)
+        return pool
+
+
+def get_db(db_name=DB_NAME):
+    """DatabaseManager compartido por proceso"""
+    with _registry_lock:
+        manager = _managers.get(db_name)
+        if manager is None:
+            manager = _managers[db_name] = DatabaseManager(db_name)
+        return manager
+
+
+def close_all():
+    """Cerrar todos los pools abiertos (se llama también al salir)"""
+    with _registry_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+        _managers.clear()
+    for pool in pools:
+        pool.close()
+    # Acumular en disco las estadísticas de consultas de esta sesión
+    if instrumentacion.ACTIVA:
+        instrumentacion.guardar()
+
+
+atexit.register(close_all)
+
+
+def _a_fecha(valor):
+    """Normalizar date, datetime o 'YYYY-MM-DD' a date"""
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return datetime.strptime(valor, '%Y-%m-%d').date()
+
+
+class FormatoTexto:
+    """Montos REAL en pesos y fechas 'YYYY-MM-DD' (formato original)"""
+    nombre = 'texto'
+    
+    def monto_a_db(self, monto):
+        return float(monto)
+    
+    def monto_desde_db(self, valor):
+        return valor
+    
+    def fecha_a_db(self, fecha):
+        return _a_fecha(fecha).strftime('%Y-%m-%d')
+    
+    def fecha_desde_db(self, valor):
+        return valor
+    
+    def decodificar(self, filas, montos=(), fechas=()):
+        """Las filas ya están en el formato que esperan las pantallas"""
+        return filas
+
+
+class FormatoCompacto:
+    """Montos INTEGER en centavos y fechas INTEGER en días desde 1970-01-01"""
+    nombre = 'compacto'
+    EPOCA = date(1970, 1, 1)
+    
+    def monto_a_db(self, monto):
+        return int(round(float(monto) * 100))
+    
+    def monto_desde_db(self, valor):
+        return valor / 100
+    
+    def fecha_a_db(self, fecha):
+        return (_a_fecha(fecha) - self.EPOCA).days
+    
+    def fecha_desde_db(self, valor):
+        return (self.EPOCA + timedelta(days=valor)).strftime('%Y-%m-%d')
+    
+    def decodificar(self, filas, montos=(), fechas=()):
+        """Convertir filas a dicts con montos en pesos y fechas 'YYYY-MM-DD'"""
+        resultado = []
+        for fila in filas:
+            registro = dict(fila)
+            for columna in montos:
+                if registro[columna] is not None:
+                    registro[columna] = registro[columna] / 100
+            for columna in fechas:
+                if registro[columna] is not None:
+                    registro[columna] = self.fecha_desde_db(registro[columna])
+            resultado.append(registro)
+        return resultado
+
+
+FORMATOS = {
+    FormatoTexto.nombre: FormatoTexto(),
+    FormatoCompacto.nombre: FormatoCompacto(),
+}
 
 
 class DatabaseManager:
     """Gestor centralizado de la base de datos"""
     
-    def __init__(self, db_name='agromanager.db'):
+    def __init__(self, db_name=DB_NAME):
         self.db_name = db_name
-        self.conn = None
+        self.pool = get_pool(db_name)
     
     def get_connection(self):
-        """Obtener conexión a la base de datos"""
-        if self.conn is None:
-            self.conn = sqlite3.connect(self.db_name)
-            self.conn.row_factory = sqlite3.Row
-        return self.conn
+        """Obtener la conexión de escritura compartida"""
+        return self.pool.writer()
+    
+    def transaction(self):
+        """Context manager de transacción de escritura"""
+        return self.pool.transaction()
+    
+    def reader(self):
+        """Context manager con una conexión de lectura del pool"""
+        return self.pool.reader()
+    
+    def notificar(self, tabla, op, id=None):
+        """Avisar a los suscriptores de eventos de un cambio (tras el commit)"""
+        self.pool.registrar_cambio(tabla, op, id)
+    
+    def encolar(self, funcion, *args, durable=False, **kwargs):
+        """Ejecutar funcion(*args, **kwargs) en la cola de escritura.
+        
+        La función corre dentro de la transacción del lote, así que puede
+        usar self.transaction() normalmente. Sin durable devuelve un Future
+        enseguida; con durable=True espera al commit (con fsync) y devuelve
+        el resultado o lanza el error, así que no se usa desde el hilo de la
+        interfaz ni desde otra escritura encolada (ahí lanza RuntimeError).
+        """
+        future = self.pool.cola.encolar(funcion, args, kwargs, durable)
+        if durable:
+            return future.result()
+        future.add_done_callback(_registrar_error_escritura)
+        return future
     
     def close(self):
-        """Cerrar conexión"""
-        if self.conn:
-            self.conn.close()
-            self.conn = None
+        """Cerrar las conexiones compartidas de esta base de datos"""
+        with _registry_lock:
+            if _pools.get(self.db_name) is self.pool:
+                del _pools[self.db_name]
+                _managers.pop(self.db_name, None)
+        self.pool.close()
+    
+    @property
+    def formato(self):
+        """Formato de almacenamiento de montos y fechas de esta base"""
+        if self.pool.formato is None:
+            try:
+                with self.reader() as conn:
+                    nombre = migrations.get_formato(conn)
+            except sqlite3.OperationalError:
+                # Esquema todavía sin migrar: formato original
+                return FORMATOS['texto']
+            self.pool.formato = FORMATOS[nombre]
+        return self.pool.formato
+    
+    def convertir_a_compacto(self):
+        """Pasar la base al formato compacto (centavos y números de día)"""
+        convertida = migrations.convertir_a_compacto(self)
+        self.pool.formato = None
+        return convertida
+    
+    def get_tablas_exportables(self):
+        """Tablas con datos del usuario, sin el resumen, la configuración ni la búsqueda"""
+        with self.reader() as conn:
+            cursor = conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY rowid"
+            )
+            return [fila[0] for fila in cursor.fetchall() if not migrations.es_tabla_interna(fila[0])]
+    
+    def get_filas_exportables(self, tabla):
+        """Todas las filas de una tabla con montos en pesos y fechas 'YYYY-MM-DD'"""
+        if tabla not in self.get_tablas_exportables():
+            raise ValueError(f'Tabla no exportable: {tabla}')
+        montos, fechas = migrations.COLUMNAS_COMPACTAS.get(tabla, ((), ()))
+        with self.reader() as conn:
+            filas = conn.execute(f'SELECT * FROM {tabla}').fetchall()
+        return self.formato.decodificar(filas, montos=montos, fechas=fechas)
     
     def init_db(self):
         """Inicializar todas las tablas"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        self.ensure_schema()
         
-        # Tabla de cheques
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS cheques (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                numero TEXT NOT NULL,
-                banco TEXT NOT NULL,
-                monto REAL NOT NULL,
-                fecha_vencimiento TEXT NOT NULL,
-                estado TEXT DEFAULT 'pendiente',
-                fecha_creacion TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        # Cargar datos de ejemplo si es la primera vez
+        self.load_sample_data()
+    
+    def ensure_schema(self):
+        """Crear las tablas base y aplicar las migraciones pendientes"""
+        with self.transaction() as conn:
+            cursor = conn.cursor()
         
-        # Tabla de proveedores
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS proveedores (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nombre TEXT NOT NULL,
-                rubro TEXT,
-                cuit TEXT,
-                telefono TEXT,
-                email TEXT,
-                direccion TEXT,
-                fecha_creacion TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+            # Tabla de cheques
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS cheques (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    numero TEXT NOT NULL,
+                    banco TEXT NOT NULL,
+                    monto REAL NOT NULL,
+                    fecha_vencimiento TEXT NOT NULL,
+                    estado TEXT DEFAULT 'pendiente',
+                    fecha_creacion TEXT DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
         
-        # Tabla de facturas
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS facturas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                proveedor_id INTEGER,
-                numero TEXT NOT NULL,
-                monto REAL NOT NULL,
-                fecha TEXT NOT NULL,
-                descripcion TEXT,
-                FOREIGN KEY (proveedor_id) REFERENCES proveedores(id)
-            )
-        ''')
+            # Tabla de proveedores
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS proveedores (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    nombre TEXT NOT NULL,
+                    rubro TEXT,
+                    cuit TEXT,
+                    telefono TEXT,
+                    email TEXT,
+                    direccion TEXT,
+                    fecha_creacion TEXT DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
         
-        # Tabla de gastos
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS gastos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                categoria TEXT NOT NULL,
-                concepto TEXT NOT NULL,
-                monto REAL NOT NULL,
-                fecha TEXT NOT NULL,
-                descripcion TEXT
-            )
-        ''')
+            # Tabla de facturas
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS facturas (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    proveedor_id INTEGER,
+                    numero TEXT NOT NULL,
+                    monto REAL NOT NULL,
+                    fecha TEXT NOT NULL,
+                    descripcion TEXT,
+                    FOREIGN KEY (proveedor_id) REFERENCES proveedores(id)
+                )
+            ''')
         
-        # Tabla de ingresos
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ingresos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                categoria TEXT NOT NULL,
-                concepto TEXT NOT NULL,
-                monto REAL NOT NULL,
-                fecha TEXT NOT NULL,
-                descripcion TEXT
-            )
-        ''')
+            # Tabla de gastos
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS gastos (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    categoria TEXT NOT NULL,
+                    concepto TEXT NOT NULL,
+                    monto REAL NOT NULL,
+                    fecha TEXT NOT NULL,
+                    descripcion TEXT
+                )
+            ''')
         
-        # Tabla de superficie
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS superficie (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                cultivo TEXT NOT NULL,
-                hectareas REAL NOT NULL,
-                fecha_siembra TEXT,
-                fecha_cosecha TEXT
-            )
-        ''')
+            # Tabla de ingresos
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS ingresos (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    categoria TEXT NOT NULL,
+                    concepto TEXT NOT NULL,
+                    monto REAL NOT NULL,
+                    fecha TEXT NOT NULL,
+                    descripcion TEXT
+                )
+            ''')
         
-        # Tabla de ganado
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ganado (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                tipo TEXT NOT NULL,
-                cantidad INTEGER NOT NULL,
-                categoria TEXT,
-                fecha_registro TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+            # Tabla de superficie
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS superficie (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    cultivo TEXT NOT NULL,
+                    hectareas REAL NOT NULL,
+                    fecha_siembra TEXT,
+                    fecha_cosecha TEXT
+                )
+            ''')
         
-        # Tabla de tambo
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tambo (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                fecha TEXT NOT NULL,
-                litros_producidos REAL,
-                porcentaje_prenez REAL,
-                porcentaje_paricion REAL,
-                porcentaje_destete REAL,
-                vacas_lactancia INTEGER,
-                observaciones TEXT
-            )
-        ''')
+            # Tabla de ganado
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS ganado (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    tipo TEXT NOT NULL,
+                    cantidad INTEGER NOT NULL,
+                    categoria TEXT,
+                    fecha_registro TEXT DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
         
-        # Tabla de márgenes
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS margenes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                tipo TEXT NOT NULL,
-                cultivo_producto TEXT NOT NULL,
-                hectareas_cantidad REAL,
-                costo_total REAL,
-                ingreso_total REAL,
-                margen REAL,
-                fecha TEXT NOT NULL
-            )
-        ''')
+            # Tabla de tambo
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS tambo (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    fecha TEXT NOT NULL,
+                    litros_producidos REAL,
+                    porcentaje_prenez REAL,
+                    porcentaje_paricion REAL,
+                    porcentaje_destete REAL,
+                    vacas_lactancia INTEGER,
+                    observaciones TEXT
+                )
+            ''')
         
-        conn.commit()
+            # Tabla de márgenes
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS margenes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    tipo TEXT NOT NULL,
+                    cultivo_producto TEXT NOT NULL,
+                    hectareas_cantidad REAL,
+                    costo_total REAL,
+                    ingreso_total REAL,
+                    margen REAL,
+                    fecha TEXT NOT NULL
+                )
+            ''')
         
-        # Cargar datos de ejemplo si es la primera vez
-        self.load_sample_data()
+        # Evolucionar el esquema (índices, tablas nuevas, etc.)
+        migrations.aplicar_migraciones(self)
     
     def load_sample_data(self):
         """Cargar datos de ejemplo para testing"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        formato = self.formato
+        with self.transaction() as conn:
+            cursor = conn.cursor()
         
-        # Verificar si ya hay datos
-        cursor.execute("SELECT COUNT(*) FROM cheques")
-        if cursor.fetchone()[0] == 0:
-            # Insertar cheques de ejemplo
-            hoy = datetime.now()
-            cheques_ejemplo = [
-                ('001234', 'Banco Nación', 500000, (hoy + timedelta(days=5)).strftime('%Y-%m-%d')),
-                ('002345', 'Banco Provincia', 750000, (hoy + timedelta(days=15)).strftime('%Y-%m-%d')),
-                ('003456', 'Banco Galicia', 300000, (hoy + timedelta(days=30)).strftime('%Y-%m-%d')),
-            ]
-            cursor.executemany(
-                'INSERT INTO cheques (numero, banco, monto, fecha_vencimiento) VALUES (?, ?, ?, ?)',
-                cheques_ejemplo
-            )
+            # Verificar si ya hay datos
+            cursor.execute("SELECT COUNT(*) FROM cheques")
+            if cursor.fetchone()[0] == 0:
+                # Insertar cheques de ejemplo
+                hoy = datetime.now()
+                cheques_ejemplo = [
+                    ('001234', 'Banco Nación', formato.monto_a_db(500000), formato.fecha_a_db(hoy + timedelta(days=5))),
+                    ('002345', 'Banco Provincia', formato.monto_a_db(750000), formato.fecha_a_db(hoy + timedelta(days=15))),
+                    ('003456', 'Banco Galicia', formato.monto_a_db(300000), formato.fecha_a_db(hoy + timedelta(days=30))),
+                ]
+                cursor.executemany(
+                    'INSERT INTO cheques (numero, banco, monto, fecha_vencimiento) VALUES (?, ?, ?, ?)',
+                    cheques_ejemplo
+                )
             
-            # Insertar proveedores de ejemplo
-            proveedores_ejemplo = [
-                ('Semillas del Campo S.A.', 'Insumos Agrícolas', '20-12345678-9', '11-4444-5555', 'ventas@semillas.com', 'Av. Rural 123'),
-                ('Agroquímicos del Sur', 'Agroquímicos', '30-87654321-2', '11-5555-6666', 'info@agrosur.com', 'Ruta 9 Km 45'),
-                ('Ferretería Rural', 'Herramientas', '27-11223344-5', '11-6666-7777', 'ferreteria@rural.com', 'Calle Principal 567'),
-            ]
-            cursor.executemany(
-                'INSERT INTO proveedores (nombre, rubro, cuit, telefono, email, direccion) VALUES (?, ?, ?, ?, ?, ?)',
-                proveedores_ejemplo
-            )
+                # Insertar proveedores de ejemplo
+                proveedores_ejemplo = [
+                    ('Semillas del Campo S.A.', 'Insumos Agrícolas', '20-12345678-9', '11-4444-5555', 'ventas@semillas.com', 'Av. Rural 123'),
+                    ('Agroquímicos del Sur', 'Agroquímicos', '30-87654321-2', '11-5555-6666', 'info@agrosur.com', 'Ruta 9 Km 45'),
+                    ('Ferretería Rural', 'Herramientas', '27-11223344-5', '11-6666-7777', 'ferreteria@rural.com', 'Calle Principal 567'),
+                ]
+                cursor.executemany(
+                    'INSERT INTO proveedores (nombre, rubro, cuit, telefono, email, direccion) VALUES (?, ?, ?, ?, ?, ?)',
+                    proveedores_ejemplo
+                )
             
-            # Insertar gastos de ejemplo
-            gastos_ejemplo = [
-                ('agro', 'Semillas de soja', 800000, (hoy - timedelta(days=10)).strftime('%Y-%m-%d'), 'Compra de semillas'),
-                ('ganadería', 'Alimento balanceado', 450000, (hoy - timedelta(days=5)).strftime('%Y-%m-%d'), 'Para ganado'),
-                ('otros', 'Combustible', 120000, (hoy - timedelta(days=2)).strftime('%Y-%m-%d'), 'Gasoil para maquinaria'),
-            ]
-            cursor.executemany(
-                'INSERT INTO gastos (categoria, concepto, monto, fecha, descripcion) VALUES (?, ?, ?, ?, ?)',
-                gastos_ejemplo
-            )
-            
-            # Insertar ingresos de ejemplo
-            ingresos_ejemplo = [
-                ('agro', 'Venta de trigo', 2500000, (hoy - timedelta(days=20)).strftime('%Y-%m-%d'), 'Cosecha 2024'),
-                ('ganadería', 'Venta de novillos', 1800000, (hoy - timedelta(days=15)).strftime('%Y-%m-%d'), '50 cabezas'),
-                ('otros', 'Arriendo', 300000, (hoy - timedelta(days=30)).strftime('%Y-%m-%d'), 'Lote 5'),
-            ]
-            cursor.executemany(
-                'INSERT INTO ingresos (categoria, concepto, monto, fecha, descripcion) VALUES (?, ?, ?, ?, ?)',
-                ingresos_ejemplo
-            )
+                # Insertar gastos de ejemplo
+                gastos_ejemplo = [
+                    ('agro', 'Semillas de soja', formato.monto_a_db(800000), formato.fecha_a_db(hoy - timedelta(days=10)), 'Compra de semillas'),
+                    ('ganadería', 'Alimento balanceado', formato.monto_a_db(450000), formato.fecha_a_db(hoy - timedelta(days=5)), 'Para ganado'),
+                    ('otros', 'Combustible', formato.monto_a_db(120000), formato.fecha_a_db(hoy - timedelta(days=2)), 'Gasoil para maquinaria'),
+                ]
+                cursor.executemany(
+                    'INSERT INTO gastos (categoria, concepto, monto, fecha, descripcion) VALUES (?, ?, ?, ?, ?)',
+                    gastos_ejemplo
+                )
             
-            # Insertar superficie de ejemplo
-            superficie_ejemplo = [
-                ('Soja', 150, '2024-10-15', '2025-04-15'),
-                ('Trigo', 100, '2024-06-01', '2024-12-01'),
-                ('Maíz', 80, '2024-09-01', '2025-03-01'),
-            ]
-            cursor.executemany(
-                'INSERT INTO superficie (cultivo, hectareas, fecha_siembra, fecha_cosecha) VALUES (?, ?, ?, ?)',
-                superficie_ejemplo
-            )
+                # Insertar ingresos de ejemplo
+                ingresos_ejemplo = [
+                    ('agro', 'Venta de trigo', formato.monto_a_db(2500000), formato.fecha_a_db(hoy - timedelta(days=20)), 'Cosecha 2024'),
+                    ('ganadería', 'Venta de novillos', formato.monto_a_db(1800000), formato.fecha_a_db(hoy - timedelta(days=15)), '50 cabezas'),
+                    ('otros', 'Arriendo', formato.monto_a_db(300000), formato.fecha_a_db(hoy - timedelta(days=30)), 'Lote 5'),
+                ]
+                cursor.executemany(
+                    'INSERT INTO ingresos (categoria, concepto, monto, fecha, descripcion) VALUES (?, ?, ?, ?, ?)',
+                    ingresos_ejemplo
+                )
             
-            # Insertar datos de tambo
-            tambo_ejemplo = [
-                (hoy.strftime('%Y-%m-%d'), 5000, 85, 90, 88, 250, 'Producción normal'),
-            ]
-            cursor.executemany(
-                'INSERT INTO tambo (fecha, litros_producidos, porcentaje_prenez, porcentaje_paricion, porcentaje_destete, vacas_lactancia, observaciones) VALUES (?, ?, ?, ?, ?, ?, ?)',
-                tambo_ejemplo
-            )
+                # Insertar superficie de ejemplo
+                superficie_ejemplo = [
+                    ('Soja', 150, '2024-10-15', '2025-04-15'),
+                    ('Trigo', 100, '2024-06-01', '2024-12-01'),
+                    ('Maíz', 80, '2024-09-01', '2025-03-01'),
+                ]
+                cursor.executemany(
+                    'INSERT INTO superficie (cultivo, hectareas, fecha_siembra, fecha_cosecha) VALUES (?, ?, ?, ?)',
+                    superficie_ejemplo
+                )
             
-            conn.commit()
+                # Insertar datos de tambo
+                tambo_ejemplo = [
+                    (formato.fecha_a_db(hoy), 5000, 85, 90, 88, 250, 'Producción normal'),
+                ]
+                cursor.executemany(
+                    'INSERT INTO tambo (fecha, litros_producidos, porcentaje_prenez, porcentaje_paricion, porcentaje_destete, vacas_lactancia, observaciones) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    tambo_ejemplo
+                )
     
     # Métodos para el Dashboard
+    def get_dashboard_kpis(self, dias_cheques=7):
+        """Valores de las tarjetas del dashboard en una sola consulta.
+        
+        El resultado se reutiliza mientras no se confirme ninguna escritura
+        (PRAGMA data_version) ni cambie el día. Devuelve siempre el mismo
+        dict para la misma instantánea, así la pantalla puede saltear el
+        redibujado si no cambió.
+        """
+        hoy = date.today()
+        clave = (self.pool.version_datos(), hoy, dias_cheques)
+        cache = self.pool.instantaneas.get('dashboard')
+        if cache is not None and cache[0] == clave:
+            return cache[1]
+        
+        formato = self.formato
+        mes = hoy.strftime('%Y-%m')
+        fecha_limite = formato.fecha_a_db(datetime.now() + timedelta(days=dias_cheques))
+        with self.reader() as conn:
+            fila = conn.execute('''
+                SELECT
+                    (SELECT COUNT(*) FROM cheques
+                     WHERE estado = 'pendiente' AND fecha_vencimiento <= ?) AS cheques_proximos,
+                    (SELECT COALESCE(SUM(total), 0) FROM resumen_mensual
+                     WHERE tabla = 'gastos' AND mes = ?) AS gastos_mes,
+                    (SELECT COALESCE(SUM(total), 0) FROM resumen_mensual
+                     WHERE tabla = 'ingresos' AND mes = ?) AS ingresos_mes,
+                    (SELECT COUNT(*) FROM proveedores) AS proveedores,
+                    (SELECT COALESCE(SUM(hectareas), 0) FROM superficie) AS superficie
+            ''', (fecha_limite, mes, mes)).fetchone()
+        
+        kpis = {
+            'cheques_proximos': fila['cheques_proximos'],
+            'gastos_mes': formato.monto_desde_db(fila['gastos_mes']),
+            'ingresos_mes': formato.monto_desde_db(fila['ingresos_mes']),
+            'proveedores': fila['proveedores'],
+            'superficie': fila['superficie'],
+        }
+        self.pool.instantaneas['dashboard'] = (clave, kpis)
+        return kpis
+    
     def get_cheques_proximos(self, dias=7):
         """Obtener cheques que vencen en los próximos X días"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        fecha_limite = (datetime.now() + timedelta(days=dias)).strftime('%Y-%m-%d')
-        cursor.execute('''
-            SELECT * FROM cheques 
-            WHERE fecha_vencimiento <= ? AND estado = 'pendiente'
-            ORDER BY fecha_vencimiento
-        ''', (fecha_limite,))
-        return cursor.fetchall()
+        formato = self.formato
+        fecha_limite = formato.fecha_a_db(datetime.now() + timedelta(days=dias))
+        with self.reader() as conn:
+            cursor = conn.execute('''
+                SELECT * FROM cheques 
+                WHERE fecha_vencimiento <= ? AND estado = 'pendiente'
+                ORDER BY fecha_vencimiento
+            ''', (fecha_limite,))
+            filas = cursor.fetchall()
+        return formato.decodificar(filas, montos=('monto',), fechas=('fecha_vencimiento',))
+    
+    def get_cheques_pendientes(self, ids=None):
+        """Cheques pendientes por vencimiento, para los avisos (ver vencimientos.py).
+        
+        Con ids se leen solo esos cheques, si siguen pendientes.
+        """
+        sql = "SELECT id, numero, banco, monto, fecha_vencimiento FROM cheques WHERE estado = 'pendiente'"
+        params = ()
+        if ids is not None:
+            ids = tuple(ids)
+            sql += f" AND id IN ({', '.join('?' * len(ids))})"
+            params = ids
+        sql += ' ORDER BY fecha_vencimiento'
+        with self.reader() as conn:
+            filas = conn.execute(sql, params).fetchall()
+        return self.formato.decodificar(filas, montos=('monto',), fechas=('fecha_vencimiento',))
     
     def get_total_gastos_mes(self):
         """Obtener total de gastos del mes actual"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        mes_actual = datetime.now().strftime('%Y-%m')
-        cursor.execute('''
-            SELECT COALESCE(SUM(monto), 0) FROM gastos 
-            WHERE fecha LIKE ?
-        ''', (mes_actual + '%',))
-        return cursor.fetchone()[0]
+        return self.get_total_mes('gastos')
     
     def get_total_ingresos_mes(self):
         """Obtener total de ingresos del mes actual"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        mes_actual = datetime.now().strftime('%Y-%m')
-        cursor.execute('''
-            SELECT COALESCE(SUM(monto), 0) FROM ingresos 
-            WHERE fecha LIKE ?
-        ''', (mes_actual + '%',))
-        return cursor.fetchone()[0]
+        return self.get_total_mes('ingresos')
     
     def get_total_proveedores(self):
         """Obtener número total de proveedores"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT COUNT(*) FROM proveedores')
-        return cursor.fetchone()[0]
+        with self.reader() as conn:
+            return conn.execute('SELECT COUNT(*) FROM proveedores').fetchone()[0]
     
     def get_superficie_total(self):
         """Obtener superficie total en hectáreas"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT COALESCE(SUM(hectareas), 0) FROM superficie')
-        return cursor.fetchone()[0]
\ No newline at end of file
+        with self.reader() as conn:
+            return conn.execute('SELECT COALESCE(SUM(hectareas), 0) FROM superficie').fetchone()[0]
+    
+    # Listados de las pantallas, paginados por cursor (keyset): cada página
+    # continúa desde la clave (orden, id) de la última fila vista, sin OFFSET
+    def get_movimientos_pagina(self, tabla, despues_de=None, antes_de=None, limite=TAMANO_PAGINA, ids=None):
+        """Página de gastos o ingresos, del más reciente al más antiguo"""
+        _check_tabla_movimientos(tabla)
+        pagina = self._paginar(
+            tabla, 'fecha', descendente=True,
+            despues_de=despues_de, antes_de=antes_de, limite=limite, ids=ids
+        )
+        pagina['filas'] = self.formato.decodificar(pagina['filas'], montos=('monto',), fechas=('fecha',))
+        return pagina
+    
+    def get_cheques_pendientes_pagina(self, despues_de=None, antes_de=None, limite=TAMANO_PAGINA, ids=None):
+        """Página de cheques pendientes ordenados por vencimiento"""
+        pagina = self._paginar(
+            'cheques', 'fecha_vencimiento', where="estado = 'pendiente'",
+            despues_de=despues_de, antes_de=antes_de, limite=limite, ids=ids
+        )
+        pagina['filas'] = self.formato.decodificar(
+            pagina['filas'], montos=('monto',), fechas=('fecha_vencimiento',)
+        )
+        return pagina
+    
+    def get_cheques_por_id(self, ids):
+        """Monto, vencimiento y estado de esos cheques (los eliminados no vuelven)"""
+        ids = tuple(ids)
+        with self.reader() as conn:
+            filas = conn.execute(
+                f"SELECT id, monto, fecha_vencimiento, estado FROM cheques WHERE id IN ({', '.join('?' * len(ids))})",
+                ids
+            ).fetchall()
+        return self.formato.decodificar(filas, montos=('monto',), fechas=('fecha_vencimiento',))
+    
+    def get_proveedores_pagina(self, despues_de=None, antes_de=None, limite=TAMANO_PAGINA, ids=None):
+        """Página de proveedores ordenados por nombre"""
+        return self._paginar(
+            'proveedores', 'nombre',
+            despues_de=despues_de, antes_de=antes_de, limite=limite, ids=ids
+        )
+    
+    def _paginar(self, tabla, columna, where='', params=(), descendente=False,
+                 despues_de=None, antes_de=None, limite=TAMANO_PAGINA, ids=None):
+        """Leer una página ordenada por (columna, id).
+        
+        despues_de continúa hacia adelante desde un cursor y antes_de trae la
+        página previa. Devuelve las filas junto con los cursores 'anterior' y
+        'siguiente' (None si no hay más filas en esa dirección), el cursor de
+        cada fila en 'cursores' y el sentido del orden en 'descendente'. Los
+        cursores guardan los valores tal como están almacenados. Con ids se
+        leen solo esas filas (las que cumplan where), en el mismo orden.
+        """
+        # La página previa se lee en orden inverso y se da vuelta al final
+        hacia_atras = antes_de is not None
+        desc = descendente != hacia_atras
+        cursor_inicio = antes_de if hacia_atras else despues_de
+        
+        condiciones = [where] if where else []
+        params = tuple(params)
+        if cursor_inicio is not None:
+            condiciones.append(f"({columna}, id) {'<' if desc else '>'} (?, ?)")
+            params += tuple(cursor_inicio)
+        if ids is not None:
+            ids = tuple(ids)
+            condiciones.append(f"id IN ({', '.join('?' * len(ids))})")
+            params += ids
+            limite = len(ids)
+        
+        orden = 'DESC' if desc else 'ASC'
+        sql = f'SELECT * FROM {tabla}'
+        if condiciones:
+            sql += ' WHERE ' + ' AND '.join(condiciones)
+        sql += f' ORDER BY {columna} {orden}, id {orden} LIMIT ?'
+        
+        # Se pide una fila extra para saber si quedan más
+        with self.reader() as conn:
+            filas = conn.execute(sql, params + (limite + 1,)).fetchall()
+        hay_mas = len(filas) > limite
+        filas = filas[:limite]
+        if hacia_atras:
+            filas.reverse()
+        
+        cursores = [(fila[columna], fila['id']) for fila in filas]
+        primera = cursores[0] if filas else None
+        ultima = cursores[-1] if filas else None
+        if ids is not None:
+            anterior = siguiente = None
+        elif hacia_atras:
+            anterior, siguiente = (primera if hay_mas else None), ultima
+        else:
+            anterior, siguiente = (primera if despues_de is not None else None), (ultima if hay_mas else None)
+        return {
+            'filas': filas,
+            'anterior': anterior,
+            'siguiente': siguiente,
+            'cursores': cursores,
+            'descendente': descendente,
+        }
+    
+    def get_superficie(self):
+        """Total de hectáreas, cultivos y stock ganadero"""
+        with self.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT COALESCE(SUM(hectareas), 0) FROM superficie')
+            total = cursor.fetchone()[0]
+            cursor.execute('SELECT * FROM superficie ORDER BY hectareas DESC')
+            cultivos = cursor.fetchall()
+            cursor.execute('SELECT * FROM ganado')
+            ganado = cursor.fetchall()
+        return {'total': total, 'cultivos': cultivos, 'ganado': ganado}
+    
+    def get_registros_tambo(self, limite=10):
+        """Últimos registros de tambo (el primero es el más reciente)"""
+        with self.reader() as conn:
+            cursor = conn.execute(
+                'SELECT * FROM tambo ORDER BY fecha DESC LIMIT ?',
+                (limite,)
+            )
+            filas = cursor.fetchall()
+        return self.formato.decodificar(filas, fechas=('fecha',))
+    
+    def get_serie_tambo(self, desde=None, hasta=None, puntos=None):
+        """Producción entre dos fechas (inclusive y opcionales) para graficar.
+
+        Devuelve {'filas', 'registros', 'promedio'}: filas tiene fecha y
+        litros sumados por día en orden cronológico (sin los registros sin
+        litros); con puntos, una serie más larga se reduce con LTTB (ver
+        series.py) a esa cantidad, conservando picos y caídas. registros
+        (días con producción) y promedio corresponden a la serie completa.
+        """
+        condiciones = ['litros_producidos IS NOT NULL']
+        params = []
+        if desde is not None:
+            condiciones.append('fecha >= ?')
+            params.append(self.formato.fecha_a_db(desde))
+        if hasta is not None:
+            condiciones.append('fecha <= ?')
+            params.append(self.formato.fecha_a_db(hasta))
+        with self.reader() as conn:
+            cursor = conn.execute(f'''
+                SELECT fecha, SUM(litros_producidos) AS litros_producidos
+                FROM tambo
+                WHERE {' AND '.join(condiciones)}
+                GROUP BY fecha
+                ORDER BY fecha
+            ''', params)
+            filas = self.formato.decodificar(cursor.fetchall(), fechas=('fecha',))
+
+        litros = [fila['litros_producidos'] for fila in filas]
+        serie = {
+            'filas': filas,
+            'registros': len(filas),
+            'promedio': sum(litros) / len(litros) if litros else 0,
+        }
+        if puntos is not None and len(filas) > puntos:
+            dias = [date.fromisoformat(fila['fecha']).toordinal() for fila in filas]
+            serie['filas'] = [filas[i] for i in series.lttb(dias, litros, puntos)]
+        return serie
+
+    def get_datos_proyeccion(self, hoy=None, dias=180, dias_historia=180):
+        """Datos para proyectar el saldo de los próximos días (ver proyeccion.py).
+
+        Devuelve {'saldo', 'cheques', 'ingresos', 'gastos', 'historial'}:
+        saldo son los ingresos menos los gastos hasta hoy más los cheques ya
+        cobrados; cheques, los pendientes que vencen dentro del horizonte o
+        después; ingresos y gastos, los totales por día con fecha futura
+        dentro del horizonte; historial, los gastos por día de los últimos
+        dias_historia días.
+        """
+        hoy = hoy or date.today()
+        formato = self.formato
+        hoy_db = formato.fecha_a_db(hoy)
+        # El último día del horizonte es hoy + dias - 1
+        hasta = formato.fecha_a_db(hoy + timedelta(days=dias - 1))
+        desde = formato.fecha_a_db(hoy - timedelta(days=dias_historia))
+        por_dia = '''
+            SELECT fecha, SUM(monto) AS monto
+            FROM {tabla}
+            WHERE fecha > ? AND fecha <= ?
+            GROUP BY fecha
+            ORDER BY fecha
+        '''
+        with self.reader() as conn:
+            # Cobrar un cheque solo cambia su estado, no registra un ingreso:
+            # su monto se suma aparte y no queda contado dos veces. Así, al
+            # cobrarlo pasa de los cheques pendientes al saldo sin mover la
+            # proyección.
+            fila = conn.execute('''
+                SELECT
+                    (SELECT COALESCE(SUM(monto), 0) FROM ingresos WHERE fecha <= ?) AS ingresos,
+                    (SELECT COALESCE(SUM(monto), 0) FROM gastos WHERE fecha <= ?) AS gastos,
+                    (SELECT COALESCE(SUM(monto), 0) FROM cheques WHERE estado = 'cobrado') AS cobrados
+            ''', (hoy_db, hoy_db)).fetchone()
+            cheques = conn.execute(
+                "SELECT id, monto, fecha_vencimiento FROM cheques WHERE estado = 'pendiente'"
+            ).fetchall()
+            ingresos = conn.execute(por_dia.format(tabla='ingresos'), (hoy_db, hasta)).fetchall()
+            gastos = conn.execute(por_dia.format(tabla='gastos'), (hoy_db, hasta)).fetchall()
+            historial = conn.execute(por_dia.format(tabla='gastos'), (desde, hoy_db)).fetchall()
+
+        return {
+            'saldo': formato.monto_desde_db(fila['ingresos'] - fila['gastos'] + fila['cobrados']),
+            'cheques': formato.decodificar(cheques, montos=('monto',), fechas=('fecha_vencimiento',)),
+            'ingresos': formato.decodificar(ingresos, montos=('monto',), fechas=('fecha',)),
+            'gastos': formato.decodificar(gastos, montos=('monto',), fechas=('fecha',)),
+            'historial': formato.decodificar(historial, montos=('monto',), fechas=('fecha',)),
+        }
+
+    # Altas con conversión al formato de almacenamiento
+    def insertar_movimiento(self, tabla, categoria, concepto, monto, fecha, descripcion=''):
+        """Registrar un gasto o ingreso"""
+        _check_tabla_movimientos(tabla)
+        formato = self.formato
+        with self.transaction() as conn:
+            cursor = conn.execute(f'''
+                INSERT INTO {tabla} (categoria, concepto, monto, fecha, descripcion)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (categoria, concepto, formato.monto_a_db(monto), formato.fecha_a_db(fecha), descripcion))
+            self.notificar(tabla, eventos.INSERTAR, cursor.lastrowid)
+            return cursor.lastrowid
+    
+    def insertar_cheque(self, numero, banco, monto, fecha_vencimiento):
+        """Registrar un cheque pendiente"""
+        formato = self.formato
+        with self.transaction() as conn:
+            cursor = conn.execute('''
+                INSERT INTO cheques (numero, banco, monto, fecha_vencimiento)
+                VALUES (?, ?, ?, ?)
+            ''', (numero, banco, formato.monto_a_db(monto), formato.fecha_a_db(fecha_vencimiento)))
+            self.notificar('cheques', eventos.INSERTAR, cursor.lastrowid)
+            return cursor.lastrowid
+    
+    def insertar_registro_tambo(self, fecha, litros_producidos, porcentaje_prenez=0,
+                                porcentaje_paricion=0, porcentaje_destete=0,
+                                vacas_lactancia=0, observaciones=''):
+        """Registrar la producción diaria del tambo"""
+        with self.transaction() as conn:
+            cursor = conn.execute('''
+                INSERT INTO tambo (fecha, litros_producidos, porcentaje_prenez, 
+                                 porcentaje_paricion, porcentaje_destete, 
+                                 vacas_lactancia, observaciones)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                self.formato.fecha_a_db(fecha),
+                litros_producidos,
+                porcentaje_prenez,
+                porcentaje_paricion,
+                porcentaje_destete,
+                vacas_lactancia,
+                observaciones
+            ))
+            self.notificar('tambo', eventos.INSERTAR, cursor.lastrowid)
+            return cursor.lastrowid
+    
+    # Búsqueda global (índice FTS5 mantenido por triggers, ver migrations.py)
+    def buscar(self, texto, limite=50):
+        """Registros con palabras que empiezan con lo buscado, por relevancia.
+        
+        Solo se ordenan por bm25 los CANDIDATOS_BUSQUEDA registros más nuevos
+        que coinciden: con términos muy frecuentes puntuar todas las filas de
+        una base grande lleva cientos de milisegundos. El título pesa más que
+        el detalle.
+        """
+        consulta = _consulta_fts(texto)
+        if not consulta:
+            return []
+        with self.reader() as conn:
+            cursor = conn.execute(f'''
+                SELECT tabla, id, titulo, detalle FROM (
+                    SELECT tabla,
+                           rowid / {migrations.FACTOR_BUSQUEDA} AS id,
+                           highlight(busqueda, 0, ?, ?) AS titulo,
+                           snippet(busqueda, 1, ?, ?, '…', 12) AS detalle,
+                           bm25(busqueda, 4.0, 1.0) AS rango
+                    FROM busqueda
+                    WHERE busqueda MATCH ?
+                    ORDER BY rowid DESC
+                    LIMIT ?
+                )
+                ORDER BY rango
+                LIMIT ?
+            ''', (MARCA_INICIO, MARCA_FIN, MARCA_INICIO, MARCA_FIN, consulta,
+                  CANDIDATOS_BUSQUEDA, limite))
+            return [dict(fila) for fila in cursor.fetchall()]
+    
+    def insertar_proveedor(self, nombre, rubro='', cuit='', telefono='', email='', direccion=''):
+        """Registrar un proveedor"""
+        with self.transaction() as conn:
+            cursor = conn.execute('''
+                INSERT INTO proveedores (nombre, rubro, cuit, telefono, email, direccion)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (nombre, rubro, cuit, telefono, email, direccion))
+            self.notificar('proveedores', eventos.INSERTAR, cursor.lastrowid)
+            return cursor.lastrowid
+    
+    def insertar_cultivo(self, cultivo, hectareas, fecha_siembra=None, fecha_cosecha=None):
+        """Registrar hectáreas de un cultivo"""
+        with self.transaction() as conn:
+            cursor = conn.execute('''
+                INSERT INTO superficie (cultivo, hectareas, fecha_siembra, fecha_cosecha)
+                VALUES (?, ?, ?, ?)
+            ''', (cultivo, hectareas, fecha_siembra, fecha_cosecha))
+            self.notificar('superficie', eventos.INSERTAR, cursor.lastrowid)
+            return cursor.lastrowid
+    
+    def insertar_margen(self, tipo, cultivo_producto, hectareas_cantidad,
+                        costo_total, ingreso_total, fecha):
+        """Registrar un cálculo de margen"""
+        with self.transaction() as conn:
+            cursor = conn.execute('''
+                INSERT INTO margenes (tipo, cultivo_producto, hectareas_cantidad, costo_total, ingreso_total, margen, fecha)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                tipo,
+                cultivo_producto,
+                hectareas_cantidad,
+                costo_total,
+                ingreso_total,
+                ingreso_total - costo_total,
+                _a_fecha(fecha).strftime('%Y-%m-%d')
+            ))
+            self.notificar('margenes', eventos.INSERTAR, cursor.lastrowid)
+            return cursor.lastrowid
+    
+    def actualizar_estado_cheque(self, cheque_id, estado):
+        """Cambiar el estado de un cheque (pendiente/cobrado)"""
+        with self.transaction() as conn:
+            conn.execute('UPDATE cheques SET estado = ? WHERE id = ?', (estado, cheque_id))
+            self.notificar('cheques', eventos.ACTUALIZAR, cheque_id)
+    
+    def eliminar_cheque(self, cheque_id):
+        """Eliminar un cheque"""
+        with self.transaction() as conn:
+            conn.execute('DELETE FROM cheques WHERE id = ?', (cheque_id,))
+            self.notificar('cheques', eventos.ELIMINAR, cheque_id)
+    
+    # Resumen mensual (mantenido por triggers, ver migrations.py)
+    def get_total_mes(self, tabla, fecha=None):
+        """Total de gastos o ingresos de un mes (por defecto el actual)"""
+        _check_tabla_movimientos(tabla)
+        mes = (fecha or datetime.now()).strftime('%Y-%m')
+        with self.reader() as conn:
+            cursor = conn.execute('''
+                SELECT COALESCE(SUM(total), 0) FROM resumen_mensual
+                WHERE tabla = ? AND mes = ?
+            ''', (tabla, mes))
+            total = cursor.fetchone()[0]
+        return self.formato.monto_desde_db(total)
+    
+    def get_total(self, tabla):
+        """Total histórico de gastos o ingresos"""
+        _check_tabla_movimientos(tabla)
+        with self.reader() as conn:
+            cursor = conn.execute(
+                'SELECT COALESCE(SUM(total), 0) FROM resumen_mensual WHERE tabla = ?',
+                (tabla,)
+            )
+            total = cursor.fetchone()[0]
+        return self.formato.monto_desde_db(total)
+    
+    def get_resumen_por_categoria(self, tabla):
+        """Cantidad, total, promedio y desvío por categoría de gastos o ingresos"""
+        _check_tabla_movimientos(tabla)
+        with self.reader() as conn:
+            cursor = conn.execute('''
+                SELECT categoria, cantidad, total, total_cuadrados
+                FROM resumen_mensual
+                WHERE tabla = ?
+                ORDER BY categoria
+            ''', (tabla,))
+            filas = cursor.fetchall()
+        
+        # Los meses se suman en Python: con centavos las sumas son enteros
+        # exactos (sin el límite de 64 bits de SUM) y la varianza no pierde
+        # precisión al restar dos cantidades grandes y parecidas
+        por_categoria = {}
+        for fila in filas:
+            cantidad, total, cuadrados = por_categoria.get(fila['categoria'], (0, 0, 0))
+            por_categoria[fila['categoria']] = (
+                cantidad + fila['cantidad'],
+                total + fila['total'],
+                cuadrados + fila['total_cuadrados'],
+            )
+        
+        # Los agregados se calculan en la unidad almacenada y se convierten al final
+        formato = self.formato
+        resumen = []
+        for categoria, (cantidad, total, cuadrados) in por_categoria.items():
+            promedio = total / cantidad if cantidad else 0
+            varianza = (cantidad * cuadrados - total * total) / (cantidad * cantidad) if cantidad else 0
+            resumen.append({
+                'categoria': categoria,
+                'cantidad': cantidad,
+                'total': formato.monto_desde_db(total),
+                'promedio': formato.monto_desde_db(promedio),
+                'desvio': formato.monto_desde_db(max(varianza, 0) ** 0.5),
+            })
+        return resumen
+
+
+def _registrar_error_escritura(future):
+    """Dejar constancia de los errores de escrituras que nadie espera"""
+    error = future.exception()
+    if error is not None:
+        logger.error('Error en escritura diferida: %s', error, exc_info=error)
+
+
+def _consulta_fts(texto):
+    """Convertir lo que escribe el usuario en una consulta FTS5 por prefijos"""
+    palabras = re.findall(r'\w+', texto)
+    return ' '.join(f'"{palabra}"*' for palabra in palabras)
+
+
+def _check_tabla_movimientos(tabla):
+    """Validar que la tabla sea de movimientos (gastos o ingresos)"""
+    if tabla not in migrations.TABLAS_RESUMEN:
+        raise ValueError(f"La tabla '{tabla}' no es una tabla de movimientos")
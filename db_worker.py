@@ -0,0 +1,87 @@
+"""
+Ejecución de consultas fuera del hilo de la interfaz
+Los trabajos corren en un pool de hilos y los resultados vuelven a Kivy
+mediante Clock.schedule_once
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from kivy.clock import Clock
+from kivy.logger import Logger
+
+import database
+
+_executor = None
+_lock = threading.Lock()
+
+# Último trabajo enviado por clave: los resultados de trabajos reemplazados se descartan
+_ultimos = {}
+
+
+def get_executor():
+    """Pool de hilos compartido (uno por conexión de lectura)"""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=database.LECTORES_POR_DEFECTO,
+                thread_name_prefix='agromanager-db'
+            )
+        return _executor
+
+
+def submit(funcion, *args, **kwargs):
+    """Encolar un trabajo y devolver su Future"""
+    return get_executor().submit(funcion, *args, **kwargs)
+
+
+def run_async(funcion, *args, on_result=None, on_error=None, clave=None, executor=None, **kwargs):
+    """Ejecutar funcion(*args, **kwargs) en segundo plano y entregar el
+    resultado a on_result en el hilo principal.
+
+    Si se indica una clave, un trabajo nuevo con la misma clave reemplaza al
+    anterior: se cancela si todavía no empezó y su resultado no se entrega.
+    Con executor el trabajo corre en ese pool en lugar del de consultas.
+    """
+    future = (executor or get_executor()).submit(funcion, *args, **kwargs)
+
+    if clave is not None:
+        with _lock:
+            anterior = _ultimos.get(clave)
+            _ultimos[clave] = future
+        if anterior is not None:
+            anterior.cancel()
+
+    def entregar(dt):
+        if clave is not None:
+            with _lock:
+                if _ultimos.get(clave) is not future:
+                    return
+                del _ultimos[clave]
+
+        error = future.exception()
+        if error is not None:
+            if on_error:
+                on_error(error)
+            else:
+                Logger.exception('AgroManager: error en consulta de fondo', exc_info=error)
+        elif on_result:
+            on_result(future.result())
+
+    def al_terminar(fut):
+        if not fut.cancelled():
+            Clock.schedule_once(entregar)
+
+    future.add_done_callback(al_terminar)
+    return future
+
+
+def shutdown():
+    """Detener el pool descartando los trabajos pendientes"""
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+        _ultimos.clear()
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
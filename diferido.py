@@ -0,0 +1,62 @@
+"""
+Importación diferida de módulos pesados
+Matplotlib y requests tardan en importarse y solo hacen falta al dibujar un
+gráfico o consultar precios. importar() devuelve un sustituto que importa el
+módulo real la primera vez que se usa uno de sus atributos.
+"""
+
+import importlib
+import sys
+import threading
+
+_lock = threading.RLock()
+
+
+class ModuloDiferido:
+    """Sustituto de un módulo que se importa en el primer acceso"""
+
+    def __init__(self, nombre, antes=None):
+        self.__dict__['_nombre'] = nombre
+        self.__dict__['_antes'] = antes
+        self.__dict__['_modulo'] = None
+
+    def _cargar(self):
+        modulo = self.__dict__['_modulo']
+        if modulo is None:
+            # Los gráficos se pueden dibujar desde otro hilo: una sola importación
+            with _lock:
+                modulo = self.__dict__['_modulo']
+                if modulo is None:
+                    antes = self.__dict__['_antes']
+                    if antes is not None:
+                        antes()
+                    modulo = importlib.import_module(self.__dict__['_nombre'])
+                    self.__dict__['_modulo'] = modulo
+        return modulo
+
+    def __getattr__(self, atributo):
+        return getattr(self._cargar(), atributo)
+
+    def __setattr__(self, atributo, valor):
+        setattr(self._cargar(), atributo, valor)
+
+    def __dir__(self):
+        return dir(self._cargar())
+
+    def __repr__(self):
+        estado = 'cargado' if self.__dict__['_modulo'] is not None else 'sin cargar'
+        return f"<módulo diferido '{self.__dict__['_nombre']}' ({estado})>"
+
+
+def importar(nombre, antes=None):
+    """Módulo diferido; antes() se ejecuta justo antes de la importación real"""
+    if nombre in sys.modules and antes is None:
+        return sys.modules[nombre]
+    return ModuloDiferido(nombre, antes)
+
+
+def cargado(modulo):
+    """Indica si el módulo (diferido o no) ya fue importado"""
+    if isinstance(modulo, ModuloDiferido):
+        return modulo.__dict__['_modulo'] is not None
+    return True
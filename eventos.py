@@ -0,0 +1,122 @@
+"""
+Avisos de cambios en los datos
+Cada escritura de DatabaseManager registra (tabla, operación, id) y los
+cambios se publican recién después del commit. Las pantallas se suscriben a
+las tablas que muestran y actualizan solo los widgets afectados.
+
+    eventos.suscribir(('gastos', 'ingresos'), self.on_cambios)
+"""
+
+import logging
+import threading
+import weakref
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Operaciones; MASIVA indica muchas filas sin detalle (importaciones)
+INSERTAR = 'insertar'
+ACTUALIZAR = 'actualizar'
+ELIMINAR = 'eliminar'
+MASIVA = 'masiva'
+
+Cambio = namedtuple('Cambio', 'tabla op id')
+
+
+class _Suscripcion:
+    def __init__(self, tablas, callback, principal):
+        self.tablas = frozenset(tablas)
+        self.principal = principal
+        # Los métodos se guardan como referencia débil: una pantalla
+        # descartada no queda viva por estar suscrita (los métodos de tipos
+        # nativos, como list.append, no admiten referencia débil)
+        if hasattr(callback, '__func__'):
+            self._callback = weakref.WeakMethod(callback)
+        else:
+            self._callback = lambda: callback
+        self.pendientes = []
+
+    @property
+    def callback(self):
+        return self._callback()
+
+
+class Bus:
+    """Distribución de cambios confirmados a los suscriptores"""
+
+    def __init__(self):
+        self._suscripciones = []
+        self._lock = threading.Lock()
+
+    def suscribir(self, tablas, callback, principal=True):
+        """Llamar callback(cambios) con la lista de cambios de esas tablas.
+
+        Con principal=True la entrega es en el hilo de Kivy y los cambios
+        que llegan antes del próximo frame se juntan en una sola llamada.
+        Devuelve la suscripción, para desuscribir.
+        """
+        if isinstance(tablas, str):
+            tablas = (tablas,)
+        suscripcion = _Suscripcion(tablas, callback, principal)
+        with self._lock:
+            self._suscripciones.append(suscripcion)
+        return suscripcion
+
+    def desuscribir(self, suscripcion):
+        with self._lock:
+            if suscripcion in self._suscripciones:
+                self._suscripciones.remove(suscripcion)
+
+    def publicar(self, cambios):
+        """Entregar cambios ya confirmados a quien corresponda"""
+        if not cambios:
+            return
+        with self._lock:
+            suscripciones = list(self._suscripciones)
+
+        for suscripcion in suscripciones:
+            if suscripcion.callback is None:
+                self.desuscribir(suscripcion)
+                continue
+            propios = [cambio for cambio in cambios if cambio.tabla in suscripcion.tablas]
+            if not propios:
+                continue
+            if suscripcion.principal:
+                self._programar(suscripcion, propios)
+            else:
+                self._entregar(suscripcion, propios)
+
+    def _programar(self, suscripcion, cambios):
+        from kivy.clock import Clock
+
+        with self._lock:
+            programada = bool(suscripcion.pendientes)
+            suscripcion.pendientes.extend(cambios)
+        if not programada:
+            Clock.schedule_once(lambda dt: self._entregar_pendientes(suscripcion))
+
+    def _entregar_pendientes(self, suscripcion):
+        with self._lock:
+            cambios, suscripcion.pendientes = suscripcion.pendientes, []
+        self._entregar(suscripcion, cambios)
+
+    def _entregar(self, suscripcion, cambios):
+        callback = suscripcion.callback
+        if callback is None:
+            return
+        try:
+            callback(cambios)
+        except Exception:
+            # Un suscriptor con errores no debe afectar a la escritura ni a los demás
+            logger.exception('Error al entregar cambios de %s', sorted(suscripcion.tablas))
+
+
+bus = Bus()
+suscribir = bus.suscribir
+desuscribir = bus.desuscribir
+publicar = bus.publicar
+
+
+def ids(cambios, op=None):
+    """Ids de los cambios (de una operación dada), sin repetir"""
+    return {cambio.id for cambio in cambios if cambio.id is not None and (op is None or cambio.op == op)}
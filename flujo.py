@@ -0,0 +1,171 @@
+"""
+Módulo de flujo de fondos: saldo proyectado de los próximos días
+"""
+
+from kivy.metrics import dp
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.scrollview import ScrollView
+from kivymd.uix.card import MDCard
+from kivymd.uix.label import MDLabel
+from kivymd.uix.screen import MDScreen
+from kivymd.uix.toolbar import MDTopAppBar
+
+import graficos
+import proyeccion
+from matplotlib_wrapper import crear_grafico
+
+
+class FlujoScreen(MDScreen):
+    """Pantalla con la proyección del saldo"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.name = 'flujo'
+        self.graph_canvas = None
+
+        layout = BoxLayout(orientation='vertical')
+
+        # Toolbar
+        toolbar = MDTopAppBar(
+            title="Flujo de Fondos",
+            elevation=3,
+            md_bg_color=(0.2, 0.6, 0.8, 1),
+            left_action_items=[["arrow-left", lambda x: self.go_back()]]
+        )
+        layout.add_widget(toolbar)
+
+        scroll = ScrollView()
+        content = BoxLayout(
+            orientation='vertical',
+            padding=dp(10),
+            spacing=dp(10),
+            size_hint_y=None
+        )
+        content.bind(minimum_height=content.setter('height'))
+
+        # Resumen: saldo actual, mínimo y al final del horizonte
+        resumen_card = MDCard(
+            orientation='vertical',
+            size_hint=(1, None),
+            height=dp(130),
+            padding=dp(15),
+            spacing=dp(5),
+            elevation=2
+        )
+        self.resumen = {}
+        for clave in ('actual', 'minimo', 'final'):
+            label = MDLabel(text="Calculando...", font_style='Body1', size_hint_y=None, height=dp(30))
+            self.resumen[clave] = label
+            resumen_card.add_widget(label)
+        content.add_widget(resumen_card)
+
+        # Card para el gráfico del saldo
+        self.graph_card = MDCard(
+            orientation='vertical',
+            size_hint=(1, None),
+            height=dp(350),
+            padding=dp(10),
+            elevation=2
+        )
+        content.add_widget(self.graph_card)
+
+        nota = MDLabel(
+            text="Incluye cheques pendientes, ingresos y gastos con fecha futura "
+                 "y el gasto habitual de cada día del mes.",
+            theme_text_color='Secondary',
+            font_style='Caption',
+            size_hint_y=None,
+            height=dp(40)
+        )
+        content.add_widget(nota)
+
+        scroll.add_widget(content)
+        layout.add_widget(scroll)
+        self.add_widget(layout)
+
+        # La proyección la mantiene el proyectador: acá solo se muestra
+        self.grafico_desactualizado = False
+        self.proyectador = proyeccion.get_proyectador()
+        self.proyectador.bind(version=self.on_proyeccion)
+        self.show_proyeccion()
+
+    def go_back(self):
+        self.manager.current = 'dashboard'
+
+    def on_proyeccion(self, *args):
+        """Redibujar; si la pantalla no está visible, al volver"""
+        if self.manager is not None and self.manager.current == self.name:
+            self.show_proyeccion()
+        else:
+            self.grafico_desactualizado = True
+
+    def on_enter(self, *args):
+        self.proyectador.revisar()
+        if self.grafico_desactualizado:
+            self.grafico_desactualizado = False
+            self.show_proyeccion()
+
+    def show_proyeccion(self):
+        """Mostrar el resumen y el gráfico de la última proyección"""
+        datos = self.proyectador.proyeccion
+        if datos is None:
+            return
+
+        fecha_minimo, minimo = datos.minimo()
+        fecha_final, final = datos.final()
+        self.resumen['actual'].text = f"Saldo actual: ${datos.saldo_inicial:,.0f}"
+        self.resumen['minimo'].text = f"Saldo mínimo: ${minimo:,.0f} el {fecha_minimo.strftime('%d/%m/%Y')}"
+        self.resumen['final'].text = f"Saldo al {fecha_final.strftime('%d/%m/%Y')}: ${final:,.0f}"
+
+        fechas = [datos.fecha(dia).strftime('%d/%m') for dia in range(datos.horizonte)]
+        saldos = datos.saldos.tolist()
+        color = '#2196F3' if minimo >= 0 else '#F44336'
+        if graficos.reutilizable(self.graph_canvas, graficos.GraficoLineas, self.graph_card):
+            # Se redibuja la línea existente, sin crear widgets
+            self.graph_canvas.color_linea = color
+            self.graph_canvas.actualizar(fechas, saldos)
+            return
+
+        self.graph_card.clear_widgets()
+        if graficos.NATIVOS:
+            self.graph_canvas = graficos.GraficoLineas(
+                titulo='Saldo Proyectado',
+                titulo_x='Fecha',
+                titulo_y='Saldo ($)',
+                etiquetas=fechas,
+                valores=saldos,
+                color_linea=color,
+                promedio=False,
+                formato=graficos.pesos
+            )
+        else:
+            # Con la misma proyección se reutiliza la imagen ya dibujada
+            self.graph_canvas = crear_grafico(
+                'flujo_fondos', (fechas, saldos), self.draw_flujo_graph,
+                clave='grafico_flujo'
+            )
+        self.graph_card.add_widget(self.graph_canvas)
+
+    @staticmethod
+    def draw_flujo_graph(fig, datos):
+        """Saldo proyectado por día con la línea de cero"""
+        from matplotlib.ticker import MaxNLocator
+
+        fechas, saldos = datos
+        ax = fig.add_subplot(111)
+        ax.plot(fechas, saldos, linewidth=2, color='#2196F3')
+        ax.fill_between(range(len(saldos)), saldos, 0, where=[saldo < 0 for saldo in saldos],
+                        color='#F44336', alpha=0.3)
+        ax.axhline(y=0, color='black', linestyle='-', linewidth=0.8)
+        ax.xaxis.set_major_locator(MaxNLocator(12))
+        ax.set_title('Saldo Proyectado', fontsize=12, fontweight='bold')
+        ax.set_xlabel('Fecha', fontsize=10)
+        ax.set_ylabel('Saldo ($)', fontsize=10)
+        ax.grid(True, alpha=0.3)
+
+        # Rotar etiquetas de fecha
+        for etiqueta in ax.xaxis.get_majorticklabels():
+            etiqueta.set_rotation(45)
+            etiqueta.set_ha('right')
+
+        fig.tight_layout()
@@ -0,0 +1,258 @@
+"""
+Formularios de alta reutilizables
+Un formulario se describe con la lista de sus campos (Texto, Opciones,
+Fecha) y su MDDialog se arma una sola vez: al volver a abrirlo se reinician
+los campos en lugar de crear otro árbol de widgets. preparar() lo arma en
+frames ociosos, así el primer toque ya lo encuentra listo.
+
+    self.formulario = formularios.Formulario(
+        "Agregar Gasto",
+        [
+            formularios.Texto('concepto', "Concepto", obligatorio=True),
+            formularios.Texto('monto', "Monto", filtro='float', obligatorio=True),
+        ],
+        self.save_gasto
+    )
+    self.formulario.preparar()
+    ...
+    self.formulario.abrir()
+"""
+
+from datetime import datetime
+
+from kivy.clock import Clock
+from kivy.metrics import dp
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.widget import Widget
+from kivymd.uix.button import MDFlatButton, MDRaisedButton
+from kivymd.uix.dialog import MDDialog
+from kivymd.uix.menu import MDDropdownMenu
+from kivymd.uix.textfield import MDTextField
+
+# Alto de cada campo del formulario
+ALTO_CAMPO = dp(50)
+
+# Un frame que tardó más que esto se considera ocupado y se posterga el armado
+FRAME_OCIOSO = 1 / 30
+
+# Espera entre formularios armados de antemano (segundos)
+INTERVALO_PREPARADO = 0.1
+
+# Formularios esperando un frame ocioso para armarse
+_pendientes = []
+
+
+class Campo:
+    """Base de los campos: crear el widget, leer su valor y reiniciarlo"""
+
+    def __init__(self, nombre, texto, obligatorio=False, inicial=None):
+        self.nombre = nombre
+        self.texto = texto
+        self.obligatorio = obligatorio
+        self.inicial = inicial
+
+    def crear(self):
+        raise NotImplementedError
+
+    def valor(self, widget):
+        return widget.valor
+
+    def poner(self, widget, valor):
+        raise NotImplementedError
+
+    def marcar(self, widget):
+        """Señalar que el campo falta o es inválido"""
+
+
+class Texto(Campo):
+    """Campo de texto; con filtro 'float' o 'int' el valor es un número (None si está vacío)"""
+
+    def __init__(self, nombre, texto, filtro=None, obligatorio=False, inicial=None):
+        super().__init__(nombre, texto, obligatorio, inicial)
+        self.filtro = filtro
+
+    def crear(self):
+        return MDTextField(
+            hint_text=self.texto,
+            input_filter=self.filtro,
+            size_hint_y=None,
+            height=ALTO_CAMPO
+        )
+
+    def valor(self, widget):
+        texto = widget.text.strip()
+        if self.filtro is None:
+            return texto
+        if not texto:
+            return None
+        return float(texto) if self.filtro == 'float' else int(texto)
+
+    def poner(self, widget, valor):
+        widget.text = '' if valor is None else str(valor)
+        widget.error = False
+
+    def marcar(self, widget):
+        widget.error = True
+
+
+class Opciones(Campo):
+    """Botón con menú para elegir entre pares (valor, etiqueta)"""
+
+    def __init__(self, nombre, texto, opciones, inicial=None):
+        super().__init__(nombre, texto, inicial=opciones[0][0] if inicial is None else inicial)
+        self.opciones = opciones
+        self.etiquetas = dict(opciones)
+
+    def crear(self):
+        boton = MDRaisedButton(size_hint=(1, None), height=ALTO_CAMPO)
+        boton.valor = self.inicial
+
+        def elegir(valor):
+            self.poner(boton, valor)
+            menu.dismiss()
+
+        # El menú también se arma una sola vez
+        menu = MDDropdownMenu(
+            caller=boton,
+            items=[
+                {
+                    "text": etiqueta,
+                    "viewclass": "OneLineListItem",
+                    "on_release": lambda x=valor: elegir(x)
+                }
+                for valor, etiqueta in self.opciones
+            ],
+            width_mult=4,
+        )
+        boton.bind(on_press=lambda x: menu.open())
+        return boton
+
+    def poner(self, widget, valor):
+        widget.valor = valor
+        widget.text = f"{self.texto}: {self.etiquetas[valor]}"
+
+
+class Fecha(Campo):
+    """Botón que abre un selector de fecha; el valor es 'YYYY-MM-DD' o None"""
+
+    def crear(self):
+        from kivymd.uix.pickers import MDDatePicker
+
+        boton = MDRaisedButton(size_hint=(1, None), height=ALTO_CAMPO)
+        boton.valor = self.inicial
+        boton.selector = None
+
+        def abrir(*args):
+            if boton.selector is None:
+                boton.selector = MDDatePicker()
+                boton.selector.bind(
+                    on_save=lambda instancia, valor, rango: self.poner(boton, valor.strftime('%Y-%m-%d'))
+                )
+            boton.selector.open()
+
+        boton.bind(on_press=abrir)
+        return boton
+
+    def poner(self, widget, valor):
+        widget.valor = valor
+        if valor is None:
+            widget.text = self.texto
+        else:
+            widget.text = f"Fecha: {datetime.strptime(valor, '%Y-%m-%d').strftime('%d/%m/%Y')}"
+
+
+class Formulario:
+    """MDDialog con los campos dados, armado una vez y reutilizado.
+
+    Al aceptar, si todos los campos obligatorios están completos y los
+    números son válidos, se cierra el diálogo y se llama
+    al_aceptar(valores) con un dict nombre -> valor.
+    """
+
+    def __init__(self, titulo, campos, al_aceptar, texto_aceptar="GUARDAR", espacio=dp(20)):
+        self.titulo = titulo
+        self.campos = campos
+        self.al_aceptar = al_aceptar
+        self.texto_aceptar = texto_aceptar
+        self.espacio = espacio
+        self.dialog = None
+        self.widgets = {}
+
+    def preparar(self):
+        """Armar el diálogo en un frame ocioso, si todavía no se armó"""
+        if self.dialog is not None or self in _pendientes:
+            return
+        _pendientes.append(self)
+        if len(_pendientes) == 1:
+            Clock.schedule_once(_preparar_siguiente, INTERVALO_PREPARADO)
+
+    def armar(self):
+        """Crear el diálogo y sus campos (una sola vez)"""
+        if self.dialog is not None:
+            return
+        content = BoxLayout(orientation='vertical', spacing=dp(10), size_hint_y=None)
+        content.bind(minimum_height=content.setter('height'))
+        content.add_widget(Widget(size_hint_y=None, height=self.espacio))
+
+        for campo in self.campos:
+            widget = self.widgets[campo.nombre] = campo.crear()
+            content.add_widget(widget)
+
+        self.dialog = MDDialog(
+            title=self.titulo,
+            type="custom",
+            content_cls=content,
+            buttons=[
+                MDFlatButton(text="CANCELAR", on_press=lambda x: self.dialog.dismiss()),
+                MDRaisedButton(text=self.texto_aceptar, on_press=self.aceptar),
+            ],
+        )
+
+    def abrir(self, **valores):
+        """Abrir con los campos en su valor inicial (o en los valores dados)"""
+        self.armar()
+        self.reiniciar(**valores)
+        self.dialog.open()
+
+    def reiniciar(self, **valores):
+        for campo in self.campos:
+            campo.poner(self.widgets[campo.nombre], valores.get(campo.nombre, campo.inicial))
+
+    def valores(self):
+        """Valores de los campos, o None si falta un obligatorio o hay un número inválido"""
+        valores = {}
+        completo = True
+        for campo in self.campos:
+            widget = self.widgets[campo.nombre]
+            try:
+                valor = campo.valor(widget)
+            except ValueError:
+                valor = None
+                valido = False
+            else:
+                valido = not (campo.obligatorio and valor in (None, ''))
+            if not valido:
+                campo.marcar(widget)
+                completo = False
+            valores[campo.nombre] = valor
+        return valores if completo else None
+
+    def aceptar(self, *args):
+        valores = self.valores()
+        if valores is None:
+            return
+        self.dialog.dismiss()
+        self.al_aceptar(valores)
+
+
+def _preparar_siguiente(dt):
+    """Armar el próximo formulario pendiente si la interfaz está ociosa"""
+    while _pendientes and _pendientes[0].dialog is not None:
+        _pendientes.pop(0)
+    if not _pendientes:
+        return
+    # Con la interfaz ocupada (animación, scroll) se vuelve a intentar después
+    if Clock.frametime <= FRAME_OCIOSO:
+        _pendientes.pop(0).armar()
+    if _pendientes:
+        Clock.schedule_once(_preparar_siguiente, INTERVALO_PREPARADO)
@@ -2,29 +2,33 @@
 Módulo de gestión de gastos con gráficos
 """
 
-import matplotlib
+import os
+from datetime import datetime
+
+from kivy.clock import Clock
 from kivy.metrics import dp
 from kivy.uix.boxlayout import BoxLayout
-from kivy.uix.scrollview import ScrollView
-from kivy.uix.widget import Widget
 from kivymd.uix.button import MDFlatButton, MDRaisedButton
 from kivymd.uix.card import MDCard
 from kivymd.uix.dialog import MDDialog
+from kivymd.uix.filemanager import MDFileManager
 from kivymd.uix.label import MDLabel
-from kivymd.uix.list import MDList, TwoLineListItem
-from kivymd.uix.menu import MDDropdownMenu
 from kivymd.uix.screen import MDScreen
-from kivymd.uix.textfield import MDTextField
 from kivymd.uix.toolbar import MDTopAppBar
 
-matplotlib.use('Agg')
-from datetime import datetime
+import database
+import db_worker
+import eventos
+import formularios
+import graficos
+import importador
+import listas
+from matplotlib_wrapper import crear_grafico
 
-import matplotlib.pyplot as plt
-from kivy.clock import Clock
+COLORES_CATEGORIAS = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#95E1D3', '#F38181']
 
-import database
-from matplotlib_wrapper import MatplotlibWidget
+# Categorías de los movimientos: valor guardado y texto del menú
+CATEGORIAS = [('agro', "Agro"), ('ganadería', "Ganadería"), ('otros', "Otros")]
 
 
 class GastosScreen(MDScreen):
@@ -34,9 +38,9 @@ class GastosScreen(MDScreen):
         super().__init__(**kwargs)
         self.name = 'gastos'
         self.dialog = None
-        self.categoria_menu = None
-        self.selected_categoria = 'agro'
         self.graph_canvas = None
+        self.file_manager = None
+        self.import_path = None
         
         layout = BoxLayout(orientation='vertical')
         
@@ -49,8 +53,7 @@ class GastosScreen(MDScreen):
         )
         layout.add_widget(toolbar)
         
-        # ScrollView principal
-        scroll = ScrollView()
+        # Encabezado que se desplaza junto con la lista
         self.main_content = BoxLayout(
             orientation='vertical', 
             padding=dp(10), 
@@ -68,6 +71,15 @@ class GastosScreen(MDScreen):
         )
         self.main_content.add_widget(btn_add)
         
+        # Botón importar CSV
+        btn_import = MDFlatButton(
+            text="Importar CSV",
+            size_hint=(1, None),
+            height=dp(40),
+            on_press=self.show_import_dialog
+        )
+        self.main_content.add_widget(btn_import)
+        
         # Card para el gráfico
         self.graph_card = MDCard(
             orientation='vertical',
@@ -80,7 +92,7 @@ class GastosScreen(MDScreen):
         
         # Título de la lista
         titulo_lista = MDLabel(
-            text="Últimos Gastos Registrados",
+            text="Gastos Registrados",
             halign='left',
             font_style='H6',
             size_hint_y=None,
@@ -88,71 +100,92 @@ class GastosScreen(MDScreen):
         )
         self.main_content.add_widget(titulo_lista)
         
-        # Lista de gastos
-        self.gastos_list = MDList()
-        self.main_content.add_widget(self.gastos_list)
+        # Lista de gastos: solo se crean los widgets de las filas visibles
+        self.gastos_list = listas.ListaVirtual(encabezado=self.main_content)
         
-        scroll.add_widget(self.main_content)
-        layout.add_widget(scroll)
+        # Scroll infinito: las páginas se piden al acercarse al final de la lista
+        self.paginador = listas.ListaPaginada(
+            self.gastos_list, self.load_page, self.row_data,
+            clave='gastos',
+            texto_vacio="No hay gastos registrados",
+            texto_cargando="Cargando gastos...",
+            tabla='gastos'
+        )
+        layout.add_widget(self.gastos_list)
         self.add_widget(layout)
         
         # Cargar datos al iniciar
         Clock.schedule_once(lambda dt: self.load_data(), 0.5)
+        
+        # La lista se actualiza sola; el gráfico, al confirmarse cambios
+        self.grafico_desactualizado = False
+        eventos.suscribir('gastos', self.on_cambios)
+        
+        # El formulario de alta se arma una vez, en un momento ocioso
+        self.formulario = formularios.Formulario(
+            "Agregar Gasto",
+            [
+                formularios.Texto('concepto', "Concepto", obligatorio=True),
+                formularios.Texto('monto', "Monto", filtro='float', obligatorio=True),
+                formularios.Opciones('categoria', "Categoría", CATEGORIAS),
+                formularios.Texto('descripcion', "Descripción"),
+            ],
+            self.save_gasto
+        )
+        self.formulario.preparar()
     
     def go_back(self):
         self.manager.current = 'dashboard'
     
+    def on_cambios(self, cambios):
+        """Redibujar el gráfico; si la pantalla no está visible, al volver"""
+        if self.manager is not None and self.manager.current == self.name:
+            self.load_graph()
+        else:
+            self.grafico_desactualizado = True
+    
+    def on_enter(self, *args):
+        if self.grafico_desactualizado:
+            self.grafico_desactualizado = False
+            self.load_graph()
+    
     def load_data(self):
         """Cargar gastos y gráfico"""
         self.load_gastos()
         self.load_graph()
     
     def load_gastos(self):
-        """Cargar lista de gastos"""
-        self.gastos_list.clear_widgets()
-        
-        db = database.DatabaseManager()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM gastos 
-            ORDER BY fecha DESC
-            LIMIT 20
-        ''')
-        
-        gastos = cursor.fetchall()
-        
-        for gasto in gastos:
-            fecha_obj = datetime.strptime(gasto['fecha'], '%Y-%m-%d')
-            item = TwoLineListItem(
-                text=f"{gasto['concepto']} - ${gasto['monto']:,.0f}",
-                secondary_text=f"{gasto['categoria'].title()} | {fecha_obj.strftime('%d/%m/%Y')}"
-            )
-            self.gastos_list.add_widget(item)
-        
-        if not gastos:
-            self.gastos_list.add_widget(TwoLineListItem(text="No hay gastos registrados"))
+        """Cargar la lista de gastos desde la primera página"""
+        self.paginador.recargar()
+    
+    def load_page(self, despues_de=None, antes_de=None, limite=database.TAMANO_PAGINA, ids=None):
+        """Página de gastos (se ejecuta en segundo plano)"""
+        return database.get_db().get_movimientos_pagina(
+            'gastos', despues_de=despues_de, antes_de=antes_de, limite=limite, ids=ids
+        )
+    
+    def row_data(self, gasto):
+        """Datos de la fila de un gasto en la lista"""
+        fecha_obj = datetime.strptime(gasto['fecha'], '%Y-%m-%d')
+        return listas.fila(
+            'TwoLineListItem',
+            text=f"{gasto['concepto']} - ${gasto['monto']:,.0f}",
+            secondary_text=f"{gasto['categoria'].title()} | {fecha_obj.strftime('%d/%m/%Y')}"
+        )
     
     def load_graph(self):
-        """Cargar gráfico de gastos"""
-        db = database.DatabaseManager()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        # Obtener gastos por categoría
-        cursor.execute('''
-            SELECT categoria, SUM(monto) as total
-            FROM gastos
-            GROUP BY categoria
-        ''')
-        
-        datos = cursor.fetchall()
-        
-        # Limpiar card anterior
-        self.graph_card.clear_widgets()
-        
+        """Leer los gastos por categoría en segundo plano"""
+        if not self.graph_card.children:
+            self.graph_card.add_widget(MDLabel(text="Cargando gráfico...", halign='center'))
+        db_worker.run_async(
+            database.get_db().get_resumen_por_categoria, 'gastos',
+            on_result=self.show_graph, clave='resumen_gastos'
+        )
+    
+    def show_graph(self, datos):
+        """Dibujar (o actualizar) la torta de gastos por categoría"""
         if not datos:
+            self.graph_card.clear_widgets()
             label = MDLabel(
                 text="No hay datos de gastos para mostrar",
                 halign='center',
@@ -164,13 +197,35 @@ class GastosScreen(MDScreen):
         categorias = [d['categoria'].title() for d in datos]
         montos = [d['total'] for d in datos]
         
-        # Crear gráfico
-        plt.close('all')
-        fig = plt.figure(figsize=(6, 4), facecolor='white')
+        if graficos.reutilizable(self.graph_canvas, graficos.GraficoTorta, self.graph_card):
+            # Se redibuja la torta existente, sin crear widgets
+            self.graph_canvas.actualizar(categorias, montos)
+            return
+        
+        # Limpiar card anterior
+        self.graph_card.clear_widgets()
+        if graficos.NATIVOS:
+            self.graph_canvas = graficos.GraficoTorta(
+                titulo='Distribución de Gastos por Categoría',
+                etiquetas=categorias,
+                valores=montos,
+                colores=COLORES_CATEGORIAS,
+                formato=graficos.pesos
+            )
+        else:
+            # Con los mismos montos se reutiliza la imagen ya dibujada
+            self.graph_canvas = crear_grafico(
+                'gastos_por_categoria', (categorias, montos), self.draw_graph, clave='grafico_gastos'
+            )
+        self.graph_card.add_widget(self.graph_canvas)
+    
+    @staticmethod
+    def draw_graph(fig, datos):
+        """Torta de gastos por categoría"""
+        categorias, montos = datos
         ax = fig.add_subplot(111)
-        colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#95E1D3', '#F38181']
         wedges, texts, autotexts = ax.pie(montos, labels=categorias, autopct='%1.1f%%', 
-                                           startangle=90, colors=colors[:len(categorias)])
+                                           startangle=90, colors=COLORES_CATEGORIAS[:len(categorias)])
         ax.set_title('Distribución de Gastos por Categoría', fontsize=12, fontweight='bold', pad=10)
         
         # Hacer el texto más legible
@@ -182,90 +237,88 @@ class GastosScreen(MDScreen):
             autotext.set_fontweight('bold')
         
         fig.tight_layout()
-        
-        # Agregar widget al card
-        self.graph_canvas = MatplotlibWidget(fig)
-        self.graph_card.add_widget(self.graph_canvas)
     
     def show_add_dialog(self, *args):
         """Mostrar diálogo para agregar gasto"""
-        content = BoxLayout(orientation='vertical', spacing=dp(10), size_hint_y=None)
-        content.bind(minimum_height=content.setter('height'))
-
-        content.add_widget(Widget(size_hint_y=None, height=dp(20)))
-
-        
-        self.concepto_field = MDTextField(hint_text="Concepto", size_hint_y=None, height=dp(50))
-        self.monto_field = MDTextField(hint_text="Monto", input_filter='float', size_hint_y=None, height=dp(50))
-        self.descripcion_field = MDTextField(hint_text="Descripción", size_hint_y=None, height=dp(50))
-        
-        # Botón de categoría
-        self.categoria_button = MDRaisedButton(
-            text="Categoría: Agro",
-            size_hint=(1, None),
-            height=dp(50),
-            on_press=self.show_categoria_menu
+        self.formulario.abrir()
+    
+    def save_gasto(self, valores):
+        """Guardar gasto"""
+        db = database.get_db()
+        db.encolar(
+            db.insertar_movimiento,
+            'gastos',
+            valores['categoria'],
+            valores['concepto'],
+            valores['monto'],
+            datetime.now(),
+            valores['descripcion']
         )
-        
-        content.add_widget(self.concepto_field)
-        content.add_widget(self.monto_field)
-        content.add_widget(self.categoria_button)
-        content.add_widget(self.descripcion_field)
+    
+    def show_import_dialog(self, *args):
+        """Elegir un CSV de gastos para importar"""
+        if not self.file_manager:
+            self.file_manager = MDFileManager(
+                exit_manager=lambda *args: self.file_manager.close(),
+                select_path=self.select_import_file,
+                ext=['.csv']
+            )
+        self.file_manager.show(os.path.expanduser('~'))
+    
+    def select_import_file(self, ruta):
+        """Elegir el perfil de columnas del archivo seleccionado"""
+        self.file_manager.close()
+        self.import_path = ruta
+        
+        botones = [MDFlatButton(text="CANCELAR", on_press=lambda x: self.dialog.dismiss())]
+        for perfil in importador.PERFILES:
+            botones.append(MDRaisedButton(
+                text=perfil.upper(),
+                on_press=lambda x, p=perfil: self.start_import(p)
+            ))
         
         self.dialog = MDDialog(
-            title="Agregar Gasto",
-            type="custom",
-            content_cls=content,
-            buttons=[
-                MDFlatButton(text="CANCELAR", on_press=lambda x: self.dialog.dismiss()),
-                MDRaisedButton(text="GUARDAR", on_press=self.save_gasto),
-            ],
+            title="Importar Gastos",
+            text=f"{os.path.basename(ruta)}\nPerfil de columnas:",
+            buttons=botones,
         )
         self.dialog.open()
     
-    def show_categoria_menu(self, button):
-        """Mostrar menú de categorías"""
-        menu_items = [
-            {"text": "Agro", "on_release": lambda x="agro": self.select_categoria(x)},
-            {"text": "Ganadería", "on_release": lambda x="ganadería": self.select_categoria(x)},
-            {"text": "Otros", "on_release": lambda x="otros": self.select_categoria(x)},
-        ]
+    def start_import(self, perfil):
+        """Importar en segundo plano mostrando el avance"""
+        self.dialog.dismiss()
+        self.dialog = MDDialog(title="Importando gastos...", text="Leyendo archivo...", auto_dismiss=False)
+        self.dialog.open()
         
-        self.categoria_menu = MDDropdownMenu(
-            caller=button,
-            items=menu_items,
-            width_mult=4,
+        def progreso(lineas, fraccion):
+            texto = f"{lineas:,} líneas ({fraccion:.0%})"
+            Clock.schedule_once(lambda dt: setattr(self.dialog, 'text', texto))
+        
+        db_worker.run_async(
+            importador.importar_csv, self.import_path, perfil, 'gastos',
+            on_progress=progreso,
+            on_result=self.import_finished,
+            on_error=self.import_failed
         )
-        self.categoria_menu.open()
     
-    def select_categoria(self, categoria):
-        """Seleccionar categoría"""
-        self.selected_categoria = categoria
-        self.categoria_button.text = f"Categoría: {categoria.title()}"
-        self.categoria_menu.dismiss()
+    def import_finished(self, resultado):
+        """Informar el resultado de la importación"""
+        self.dialog.dismiss()
+        texto = f"{resultado['gastos']:,} gastos importados"
+        if resultado['cantidad_errores']:
+            texto += f"\n{resultado['cantidad_errores']:,} filas con errores"
+            for linea, error in resultado['errores'][:5]:
+                texto += f"\n  línea {linea}: {error}"
+        self.show_import_message("Importación terminada", texto)
     
-    def save_gasto(self, *args):
-        """Guardar gasto"""
-        if not self.concepto_field.text or not self.monto_field.text:
-            return
-        
-        db = database.DatabaseManager()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO gastos (categoria, concepto, monto, fecha, descripcion)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (
-            self.selected_categoria,
-            self.concepto_field.text,
-            float(self.monto_field.text),
-            datetime.now().strftime('%Y-%m-%d'),
-            self.descripcion_field.text
-        ))
-        
-        conn.commit()
+    def import_failed(self, error):
         self.dialog.dismiss()
-        
-        # Recargar datos y gráfico
-        self.load_data()
\ No newline at end of file
+        self.show_import_message("No se pudo importar", str(error))
+    
+    def show_import_message(self, titulo, texto):
+        self.dialog = MDDialog(
+            title=titulo,
+            text=texto,
+            buttons=[MDFlatButton(text="ACEPTAR", on_press=lambda x: self.dialog.dismiss())],
+        )
+        self.dialog.open()
@@ -0,0 +1,525 @@
+"""
+Gráficos dibujados con instrucciones de Kivy
+Torta, barras y líneas sin matplotlib: se arman con Ellipse, Rectangle y Line,
+se vuelven a dibujar al cambiar de tamaño (siempre a la resolución de la
+pantalla) y al tocar un sector, barra o punto se muestra su valor.
+matplotlib_wrapper queda para los gráficos que no se pueden armar con estos.
+
+    graficos.GraficoTorta(titulo="Gastos", etiquetas=['Agro', 'Sueldos'], valores=[1200, 800])
+"""
+
+import math
+import os
+from bisect import bisect_left
+
+from kivy.clock import Clock
+from kivy.core.text import Label as CoreLabel
+from kivy.graphics import Color, Ellipse, Line, PopMatrix, PushMatrix, Rectangle, Rotate, RoundedRectangle
+from kivy.metrics import dp, sp
+from kivy.properties import BooleanProperty, ListProperty, NumericProperty, ObjectProperty, StringProperty
+from kivy.uix.widget import Widget
+from kivy.utils import get_color_from_hex
+
+# Con AGROMANAGER_GRAFICOS=matplotlib las pantallas usan los gráficos de matplotlib_wrapper
+NATIVOS = os.environ.get('AGROMANAGER_GRAFICOS', 'kivy') != 'matplotlib'
+
+COLORES = ['#2196F3', '#F44336', '#4CAF50', '#FF9800', '#9C27B0', '#00BCD4', '#795548', '#607D8B']
+COLOR_TEXTO = (0.13, 0.13, 0.13, 1)
+COLOR_SECUNDARIO = (0.4, 0.4, 0.4, 1)
+COLOR_GRILLA = (0, 0, 0, 0.12)
+COLOR_AVISO = (0.15, 0.15, 0.15, 0.9)
+COLOR_PROMEDIO = (0.9, 0.2, 0.2, 1)
+
+# Sectores más chicos que esto (en grados) no llevan el porcentaje adentro
+SECTOR_MINIMO = 18
+
+# Con puntos más juntos que esto (en dp) la serie se dibuja sin marcadores
+SEPARACION_MARCADORES = 6
+
+
+def numero(valor):
+    return f"{valor:,.0f}"
+
+
+def pesos(valor):
+    return f"${valor:,.0f}"
+
+
+def abreviado(valor):
+    """Etiqueta corta para los ejes: 1.5M, 250k"""
+    for limite, sufijo in ((1e6, 'M'), (1e3, 'k')):
+        if abs(valor) >= limite:
+            return f"{valor / limite:.3g}{sufijo}"
+    return f"{valor:.3g}"
+
+
+def marcas(minimo, maximo, cantidad=5):
+    """Valores redondos para un eje que cubra [minimo, maximo]"""
+    if maximo <= minimo:
+        maximo = minimo + 1
+    bruto = (maximo - minimo) / cantidad
+    magnitud = 10 ** math.floor(math.log10(bruto))
+    for factor in (1, 2, 2.5, 5, 10):
+        paso = factor * magnitud
+        if paso >= bruto:
+            break
+    inicio = math.floor(minimo / paso) * paso
+    fin = math.ceil(maximo / paso) * paso
+    return [round(inicio + i * paso, 10) for i in range(round((fin - inicio) / paso) + 1)]
+
+
+def reutilizable(grafico, clase, contenedor):
+    """True si grafico es un clase que sigue en contenedor: basta con actualizar sus datos"""
+    return isinstance(grafico, clase) and grafico.parent is contenedor
+
+
+def _textura(texto, tamano=12, color=COLOR_TEXTO, negrita=False):
+    # Sin texto CoreLabel no genera textura
+    etiqueta = CoreLabel(text=texto or ' ', font_size=sp(tamano), color=color, bold=negrita)
+    etiqueta.refresh()
+    return etiqueta.texture
+
+
+def _poner(textura, x, y, horizontal='center', vertical='middle'):
+    """Dibujar un texto ya rasterizado anclado en (x, y)"""
+    ancho, alto = textura.size
+    if horizontal == 'center':
+        x -= ancho / 2
+    elif horizontal == 'right':
+        x -= ancho
+    if vertical == 'middle':
+        y -= alto / 2
+    elif vertical == 'top':
+        y -= alto
+    # Blanco para no teñir la textura, que ya tiene su color
+    Color(1, 1, 1, 1)
+    Rectangle(texture=textura, pos=(x, y), size=(ancho, alto))
+
+
+def _linea_punteada(x0, x1, y, ancho, trazo=dp(8), hueco=dp(5)):
+    # Line solo hace guiones con ancho 1: se dibujan tramos sueltos
+    x = x0
+    while x < x1:
+        Line(points=[x, y, min(x + trazo, x1), y], width=ancho)
+        x += trazo + hueco
+
+
+class Grafico(Widget):
+    """Base de los gráficos: título, redibujo y selección táctil.
+
+    Las subclases redefinen dibujar(x, y, ancho, alto), que se llama
+    dentro del canvas con el área libre debajo del título, y
+    elemento_en(x, y), que devuelve el índice del elemento tocado. La base
+    solo dibuja el título y no tiene elementos para tocar.
+    """
+
+    titulo = StringProperty('')
+    etiquetas = ListProperty()
+    valores = ListProperty()
+    colores = ListProperty(COLORES)
+    formato = ObjectProperty(numero)
+    # Índice del elemento tocado; -1 sin selección
+    seleccion = NumericProperty(-1)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Varios cambios en el mismo frame (tamaño y posición al acomodar) se dibujan una vez
+        self._redibujar = Clock.create_trigger(self._dibujar, -1)
+        self.bind(
+            pos=self._redibujar, size=self._redibujar, titulo=self._redibujar,
+            colores=self._redibujar, formato=self._redibujar, seleccion=self._redibujar,
+            etiquetas=self._datos_cambiados, valores=self._datos_cambiados
+        )
+        self._redibujar()
+
+    def actualizar(self, etiquetas, valores):
+        """Reemplazar los datos; el gráfico se redibuja una sola vez"""
+        self.etiquetas = etiquetas
+        self.valores = valores
+
+    def etiqueta(self, indice):
+        return str(self.etiquetas[indice]) if indice < len(self.etiquetas) else ''
+
+    def color(self, indice):
+        return get_color_from_hex(self.colores[indice % len(self.colores)])
+
+    def _datos_cambiados(self, *args):
+        self.seleccion = -1
+        self._redibujar()
+
+    def _dibujar(self, *args):
+        self.canvas.clear()
+        if self.width < dp(40) or self.height < dp(40):
+            return
+        x, y = self.x + dp(8), self.y + dp(8)
+        ancho, alto = self.width - dp(16), self.height - dp(16)
+        with self.canvas:
+            if self.titulo:
+                textura = _textura(self.titulo, 14, negrita=True)
+                _poner(textura, x + ancho / 2, y + alto, vertical='top')
+                alto -= textura.height + dp(8)
+            if self.valores:
+                self.dibujar(x, y, ancho, alto)
+
+    def dibujar(self, x, y, ancho, alto):
+        pass
+
+    def elemento_en(self, x, y):
+        return None
+
+    def _aviso(self, texto, x, y):
+        """Cartel con el valor seleccionado arriba de (x, y), sin salirse del widget"""
+        textura = _textura(texto, 12, (1, 1, 1, 1), negrita=True)
+        relleno = dp(6)
+        ancho, alto = textura.width + 2 * relleno, textura.height + 2 * relleno
+        izquierda = min(max(x - ancho / 2, self.x), self.right - ancho)
+        abajo = max(min(y + dp(8), self.top - alto), self.y)
+        Color(*COLOR_AVISO)
+        RoundedRectangle(pos=(izquierda, abajo), size=(ancho, alto), radius=[dp(4)])
+        _poner(textura, izquierda + relleno, abajo + relleno, horizontal='left', vertical='bottom')
+
+    def on_touch_down(self, touch):
+        if self.collide_point(*touch.pos) and self.valores:
+            indice = self.elemento_en(*touch.pos)
+            # Tocar de nuevo el mismo elemento (o fuera de todos) quita la selección
+            self.seleccion = -1 if indice is None or indice == self.seleccion else indice
+        return super().on_touch_down(touch)
+
+
+class GraficoTorta(Grafico):
+    """Torta con porcentajes en los sectores y leyenda al costado o debajo"""
+
+    def __init__(self, **kwargs):
+        self._sectores = []
+        self._circulo = (0, 0, 0)
+        self._leyenda = []
+        super().__init__(**kwargs)
+
+    def dibujar(self, x, y, ancho, alto):
+        valores = [max(0, valor) for valor in self.valores]
+        total = sum(valores)
+        self._sectores = []
+        self._leyenda = []
+        if total <= 0:
+            return
+
+        # Leyenda
+        cuadro = dp(12)
+        texturas = [_textura(self.etiqueta(i), 12) for i in range(len(valores))]
+        ancho_leyenda = cuadro + dp(6) + max(textura.width for textura in texturas)
+        alto_fila = max(cuadro, max(textura.height for textura in texturas)) + dp(4)
+        alto_leyenda = alto_fila * len(texturas)
+        separacion = dp(12)
+        if ancho - ancho_leyenda - separacion >= min(alto, dp(140)):
+            lado = min(ancho - ancho_leyenda - separacion, alto)
+            cx = x + (ancho - ancho_leyenda - separacion) / 2
+            cy = y + alto / 2
+            leyenda_x = x + ancho - ancho_leyenda
+            leyenda_y = y + (alto + alto_leyenda) / 2
+        else:
+            lado = min(ancho, alto - alto_leyenda - separacion)
+            cx = x + ancho / 2
+            cy = y + alto_leyenda + separacion + (alto - alto_leyenda - separacion) / 2
+            leyenda_x = x + (ancho - ancho_leyenda) / 2
+            leyenda_y = y + alto_leyenda
+
+        for i, textura in enumerate(texturas):
+            fila = leyenda_y - (i + 1) * alto_fila
+            Color(*self.color(i))
+            Rectangle(pos=(leyenda_x, fila + (alto_fila - cuadro) / 2), size=(cuadro, cuadro))
+            _poner(textura, leyenda_x + cuadro + dp(6), fila + alto_fila / 2, horizontal='left')
+            self._leyenda.append((leyenda_x, fila, leyenda_x + ancho_leyenda, fila + alto_fila))
+
+        # Lugar para separar el sector seleccionado
+        radio = lado / 2 - dp(8)
+        if radio < dp(10):
+            return
+        self._circulo = (cx, cy, radio)
+
+        # Ángulos de Kivy: desde las 12 y en sentido horario
+        angulo = 0
+        for valor in valores:
+            barrido = 360 * valor / total
+            self._sectores.append((angulo, angulo + barrido))
+            angulo += barrido
+
+        for i, (inicio, fin) in enumerate(self._sectores):
+            if fin <= inicio:
+                continue
+            dx, dy = self._desplazamiento(i)
+            Color(*self.color(i))
+            Ellipse(
+                pos=(cx + dx - radio, cy + dy - radio), size=(2 * radio, 2 * radio),
+                angle_start=inicio, angle_end=fin
+            )
+
+        for i, (inicio, fin) in enumerate(self._sectores):
+            if fin - inicio < SECTOR_MINIMO:
+                continue
+            px, py = self._punto(i, radio * 0.62)
+            _poner(_textura(f"{100 * valores[i] / total:.1f}%", 11, (1, 1, 1, 1), negrita=True), px, py)
+
+        if self.seleccion >= 0:
+            i = self.seleccion
+            px, py = self._punto(i, radio)
+            self._aviso(f"{self.etiqueta(i)}: {self.formato(valores[i])} ({100 * valores[i] / total:.1f}%)", px, py)
+
+    def _medio(self, indice):
+        inicio, fin = self._sectores[indice]
+        return math.radians((inicio + fin) / 2)
+
+    def _desplazamiento(self, indice):
+        if indice != self.seleccion:
+            return 0, 0
+        medio = self._medio(indice)
+        return dp(8) * math.sin(medio), dp(8) * math.cos(medio)
+
+    def _punto(self, indice, distancia):
+        """Punto sobre la bisectriz del sector, a esa distancia del centro"""
+        cx, cy, _ = self._circulo
+        dx, dy = self._desplazamiento(indice)
+        medio = self._medio(indice)
+        return cx + dx + distancia * math.sin(medio), cy + dy + distancia * math.cos(medio)
+
+    def elemento_en(self, x, y):
+        for i, (x0, y0, x1, y1) in enumerate(self._leyenda):
+            if x0 <= x <= x1 and y0 <= y <= y1:
+                return i
+        cx, cy, radio = self._circulo
+        if not self._sectores or math.hypot(x - cx, y - cy) > radio + dp(8):
+            return None
+        angulo = math.degrees(math.atan2(x - cx, y - cy)) % 360
+        for i, (inicio, fin) in enumerate(self._sectores):
+            if inicio <= angulo < fin:
+                return i
+        return None
+
+
+class _GraficoEjes(Grafico):
+    """Base de los gráficos con ejes: grilla, marcas del eje y y etiquetas del x"""
+
+    titulo_x = StringProperty('')
+    titulo_y = StringProperty('')
+    formato_eje = ObjectProperty(abreviado)
+
+    def __init__(self, **kwargs):
+        self._area = (0, 0, 0, 0)
+        self._rango = (0, 1)
+        super().__init__(**kwargs)
+        self.bind(titulo_x=self._redibujar, titulo_y=self._redibujar, formato_eje=self._redibujar)
+
+    def _x(self, indice):
+        """Centro del lugar de cada valor, repartidos en el ancho del área"""
+        px, _, pw, _ = self._area
+        return px + (indice + 0.5) * pw / len(self.valores)
+
+    def _y(self, valor):
+        _, py, _, ph = self._area
+        minimo, maximo = self._rango
+        return py + (valor - minimo) / (maximo - minimo) * ph
+
+    def _ejes(self, x, y, ancho, alto, valores_eje):
+        """Dibujar grilla y etiquetas; False si no queda lugar para el área de datos"""
+        texturas_y = [_textura(self.formato_eje(valor), 10, COLOR_SECUNDARIO) for valor in valores_eje]
+        etiquetas_x = [self.etiqueta(i) for i in range(len(self.valores))]
+        # Con series largas se rasteriza solo la etiqueta más larga para medir
+        muestra = _textura(max(etiquetas_x, key=len), 10, COLOR_SECUNDARIO)
+        mas_ancha = muestra.width + dp(6)
+
+        izquierda = max(textura.width for textura in texturas_y) + dp(6)
+        titulo_y = _textura(self.titulo_y, 11, COLOR_SECUNDARIO) if self.titulo_y else None
+        if titulo_y is not None:
+            izquierda += titulo_y.height + dp(4)
+        abajo = muestra.height + dp(4)
+        titulo_x = _textura(self.titulo_x, 11, COLOR_SECUNDARIO) if self.titulo_x else None
+        if titulo_x is not None:
+            abajo += titulo_x.height + dp(2)
+        derecha = max(dp(8), mas_ancha / 2)
+
+        px, py = x + izquierda, y + abajo
+        pw, ph = ancho - izquierda - derecha, alto - abajo - dp(6)
+        if pw < dp(40) or ph < dp(40):
+            return False
+        self._area = (px, py, pw, ph)
+        self._rango = (valores_eje[0], valores_eje[-1])
+
+        for valor, textura in zip(valores_eje, texturas_y):
+            altura = self._y(valor)
+            Color(*COLOR_GRILLA)
+            Line(points=[px, altura, px + pw, altura], width=1)
+            _poner(textura, px - dp(6), altura, horizontal='right')
+
+        if titulo_y is not None:
+            centro_x, centro_y = x + titulo_y.height / 2, py + ph / 2
+            PushMatrix()
+            Rotate(angle=90, origin=(centro_x, centro_y))
+            _poner(titulo_y, centro_x, centro_y)
+            PopMatrix()
+
+        # Una etiqueta solo si no se encima con la anterior dibujada
+        derecha_anterior = -math.inf
+        for i, etiqueta in enumerate(etiquetas_x):
+            centro = self._x(i)
+            if not etiqueta or centro - mas_ancha / 2 < derecha_anterior:
+                continue
+            _poner(_textura(etiqueta, 10, COLOR_SECUNDARIO), centro, py - dp(4), vertical='top')
+            derecha_anterior = centro + mas_ancha / 2
+        if titulo_x is not None:
+            _poner(titulo_x, px + pw / 2, y, vertical='bottom')
+        return True
+
+
+class GraficoBarras(_GraficoEjes):
+    """Barras verticales con el monto arriba (o abajo, si es negativo)"""
+
+    def __init__(self, **kwargs):
+        self._barras = []
+        super().__init__(**kwargs)
+
+    def dibujar(self, x, y, ancho, alto):
+        valores = list(self.valores)
+        minimo, maximo = min(0, min(valores)), max(0, max(valores))
+        # Lugar para los montos encima de las barras
+        margen = (maximo - minimo) * 0.12 or 1
+        valores_eje = marcas(minimo - (margen if minimo < 0 else 0), maximo + (margen if maximo > 0 else 0))
+        self._barras = []
+        if not self._ejes(x, y, ancho, alto, valores_eje):
+            return
+
+        ancho_barra = self._area[2] / len(valores) * 0.6
+        cero = self._y(0)
+        for i, valor in enumerate(valores):
+            tope = self._y(valor)
+            x0, y0 = self._x(i) - ancho_barra / 2, min(cero, tope)
+            barra = (x0, y0, ancho_barra, abs(tope - cero))
+            self._barras.append(barra)
+            seleccionada = i == self.seleccion
+            Color(*self.color(i)[:3], 1 if seleccionada else 0.8)
+            Rectangle(pos=barra[:2], size=barra[2:])
+            Color(0, 0, 0, 1)
+            Line(rectangle=barra, width=dp(1.5) if seleccionada else 1)
+            _poner(
+                _textura(self.formato(abs(valor)), 11, negrita=True),
+                self._x(i), tope + (dp(2) if valor >= 0 else -dp(2)),
+                vertical='bottom' if valor >= 0 else 'top'
+            )
+
+        px, _, pw, _ = self._area
+        Color(0, 0, 0, 1)
+        Line(points=[px, cero, px + pw, cero], width=1)
+
+        if self.seleccion >= 0:
+            x0, y0, ancho_barra, alto_barra = self._barras[self.seleccion]
+            self._aviso(
+                f"{self.etiqueta(self.seleccion)}: {self.formato(valores[self.seleccion])}",
+                x0 + ancho_barra / 2, y0 + alto_barra
+            )
+
+    def elemento_en(self, x, y):
+        _, py, _, ph = self._area
+        if not py <= y <= py + ph:
+            return None
+        # Toda la columna de la barra cuenta, para que las bajas se puedan tocar
+        for i, (x0, _, ancho_barra, _) in enumerate(self._barras):
+            if x0 - dp(4) <= x <= x0 + ancho_barra + dp(4):
+                return i
+        return None
+
+
+class GraficoLineas(_GraficoEjes):
+    """Serie con marcadores y, opcionalmente, la línea del promedio.
+
+    Con posiciones (por ejemplo, números de día) los puntos se ubican en x
+    según su valor, para series reducidas o con días sin registro; si no,
+    quedan a la misma distancia.
+    """
+
+    color_linea = StringProperty('#2196F3')
+    promedio = BooleanProperty(True)
+    posiciones = ListProperty()
+    # Promedio de la serie completa cuando valores es una muestra; None lo calcula
+    valor_promedio = ObjectProperty(None, allownone=True)
+
+    def __init__(self, **kwargs):
+        self._xs = []
+        super().__init__(**kwargs)
+        self.bind(
+            color_linea=self._redibujar, promedio=self._redibujar,
+            posiciones=self._redibujar, valor_promedio=self._redibujar
+        )
+
+    def _x(self, indice):
+        px, _, pw, _ = self._area
+        cantidad = len(self.valores)
+        # Un margen para que los marcadores de los extremos no queden sobre el borde
+        izquierda, ancho = px + dp(8), pw - dp(16)
+        if len(self.posiciones) == cantidad and cantidad > 1:
+            primera, ultima = self.posiciones[0], self.posiciones[-1]
+            if ultima > primera:
+                return izquierda + (self.posiciones[indice] - primera) * ancho / (ultima - primera)
+        if cantidad == 1:
+            return px + pw / 2
+        return izquierda + indice * ancho / (cantidad - 1)
+
+    def dibujar(self, x, y, ancho, alto):
+        valores = [float(valor) for valor in self.valores]
+        minimo, maximo = min(valores), max(valores)
+        margen = (maximo - minimo) * 0.08 or max(abs(maximo) * 0.1, 1)
+        if not self._ejes(x, y, ancho, alto, marcas(minimo - margen, maximo + margen)):
+            return
+        px, py, pw, ph = self._area
+        self._xs = [self._x(i) for i in range(len(valores))]
+        puntos = []
+        for posicion, valor in zip(self._xs, valores):
+            puntos.extend((posicion, self._y(valor)))
+
+        if self.promedio:
+            promedio = self.valor_promedio
+            if promedio is None:
+                promedio = sum(valores) / len(valores)
+            Color(*COLOR_PROMEDIO)
+            _linea_punteada(px, px + pw, self._y(promedio), dp(1.5))
+            # Leyenda arriba a la derecha del área de datos
+            textura = _textura(f"Promedio: {self.formato(promedio)}", 11)
+            derecha, arriba = px + pw - dp(6), py + ph - dp(6)
+            Color(1, 1, 1, 0.85)
+            Rectangle(
+                pos=(derecha - textura.width - dp(30), arriba - textura.height - dp(4)),
+                size=(textura.width + dp(32), textura.height + dp(6))
+            )
+            Color(*COLOR_PROMEDIO)
+            _linea_punteada(
+                derecha - textura.width - dp(26), derecha - textura.width - dp(6),
+                arriba - textura.height / 2 - dp(1), dp(1.5), trazo=dp(6), hueco=dp(3)
+            )
+            _poner(textura, derecha, arriba - dp(1), horizontal='right', vertical='top')
+
+        color = get_color_from_hex(self.color_linea)
+        Color(*color)
+        if len(valores) > 1:
+            Line(points=puntos, width=dp(1.5))
+        radio = dp(3)
+        if pw / len(valores) >= dp(SEPARACION_MARCADORES):
+            for i in range(len(valores)):
+                Ellipse(pos=(puntos[2 * i] - radio, puntos[2 * i + 1] - radio), size=(2 * radio, 2 * radio))
+
+        if self.seleccion >= 0:
+            i = self.seleccion
+            punto_x, punto_y = puntos[2 * i], puntos[2 * i + 1]
+            Color(*COLOR_GRILLA)
+            Line(points=[punto_x, py, punto_x, py + ph], width=1)
+            Color(*color)
+            Ellipse(pos=(punto_x - 2 * radio, punto_y - 2 * radio), size=(4 * radio, 4 * radio))
+            Color(1, 1, 1, 1)
+            Ellipse(pos=(punto_x - radio, punto_y - radio), size=(2 * radio, 2 * radio))
+            self._aviso(f"{self.etiqueta(i)}: {self.formato(valores[i])}", punto_x, punto_y + radio)
+
+    def elemento_en(self, x, y):
+        px, py, pw, ph = self._area
+        if not self._xs or not (px <= x <= px + pw and py <= y <= py + ph):
+            return None
+        # El punto más cercano en x: toda la altura del gráfico sirve para elegirlo
+        indice = bisect_left(self._xs, x)
+        if indice == len(self._xs) or (indice > 0 and x - self._xs[indice - 1] < self._xs[indice] - x):
+            indice -= 1
+        return indice
@@ -0,0 +1,298 @@
+"""
+Importación masiva de gastos e ingresos desde CSV
+Lee el archivo en lotes según un perfil de columnas, valida cada fila e
+inserta con executemany en una transacción por lote. Se puede usar desde
+las pantallas o por línea de comandos:
+
+    python importador.py extracto.csv --perfil banco --tabla auto
+"""
+
+import argparse
+import csv
+import json
+import os
+from datetime import datetime
+
+import database
+import eventos
+import migrations
+
+# Filas por transacción
+TAMANO_LOTE = 5000
+
+# Errores de validación que se guardan en detalle (el resto solo se cuenta)
+MAX_ERRORES = 100
+
+# Perfiles de columnas. 'columnas' asocia cada campo con el encabezado del CSV;
+# el monto sale de 'monto' o de 'credito' menos 'debito'. Con 'con_signo' el
+# signo distingue débitos de créditos aunque se elija una tabla de destino.
+PERFILES = {
+    # CSV propio: fecha ISO y punto decimal
+    'generico': {
+        'delimitador': ',',
+        'codificacion': 'utf-8-sig',
+        'formato_fecha': '%Y-%m-%d',
+        'separador_decimal': '.',
+        'separador_miles': '',
+        'columnas': {
+            'fecha': 'fecha',
+            'concepto': 'concepto',
+            'monto': 'monto',
+            'categoria': 'categoria',
+            'descripcion': 'descripcion',
+        },
+        'categoria': 'otros',
+        'con_signo': False,
+    },
+    # Extracto bancario: débitos con signo negativo y números con formato local
+    'banco': {
+        'delimitador': ';',
+        'codificacion': 'latin-1',
+        'formato_fecha': '%d/%m/%Y',
+        'separador_decimal': ',',
+        'separador_miles': '.',
+        'columnas': {
+            'fecha': 'Fecha',
+            'concepto': 'Concepto',
+            'monto': 'Importe',
+            'descripcion': 'Referencia',
+        },
+        'categoria': 'otros',
+        'con_signo': True,
+    },
+    # Extracto bancario con columnas separadas de débito y crédito
+    'banco_debito_credito': {
+        'delimitador': ';',
+        'codificacion': 'latin-1',
+        'formato_fecha': '%d/%m/%Y',
+        'separador_decimal': ',',
+        'separador_miles': '.',
+        'columnas': {
+            'fecha': 'Fecha',
+            'concepto': 'Concepto',
+            'debito': 'Débito',
+            'credito': 'Crédito',
+            'descripcion': 'Referencia',
+        },
+        'categoria': 'otros',
+        'con_signo': True,
+    },
+}
+
+# Destinos posibles: 'auto' manda los montos negativos a gastos y el resto a ingresos
+TABLAS_DESTINO = ('gastos', 'ingresos', 'auto')
+
+
+def cargar_perfil(perfil):
+    """Obtener un perfil por nombre, desde un archivo JSON o ya armado como dict"""
+    if isinstance(perfil, dict):
+        return perfil
+    if perfil in PERFILES:
+        return PERFILES[perfil]
+    if os.path.exists(perfil):
+        with open(perfil, encoding='utf-8') as archivo:
+            return {**PERFILES['generico'], **json.load(archivo)}
+    raise ValueError(f"Perfil de importación desconocido: {perfil}")
+
+
+class _Conversor:
+    """Validación y conversión de las filas de un CSV según el perfil"""
+
+    def __init__(self, perfil, encabezado, formato):
+        self.perfil = perfil
+        self.formato = formato
+        self.formato_fecha = perfil['formato_fecha']
+        self.separador_decimal = perfil['separador_decimal']
+        self.separador_miles = perfil['separador_miles']
+        self.categoria = perfil['categoria']
+        self.con_signo = perfil.get('con_signo', False)
+        # Las fechas se repiten mucho en un extracto: se convierten una sola vez
+        self._fechas = {}
+
+        posiciones = {nombre.strip(): i for i, nombre in enumerate(encabezado)}
+        self.indices = {}
+        faltantes = []
+        for campo, columna in perfil['columnas'].items():
+            if columna in posiciones:
+                self.indices[campo] = posiciones[columna]
+            elif campo in ('fecha', 'concepto', 'monto', 'debito', 'credito'):
+                faltantes.append(columna)
+        if 'monto' not in self.indices and not ('debito' in self.indices or 'credito' in self.indices):
+            faltantes.append(perfil['columnas'].get('monto', 'monto'))
+        if faltantes:
+            raise ValueError(f"Faltan columnas en el CSV: {', '.join(sorted(set(faltantes)))}")
+
+    def _campo(self, fila, campo):
+        indice = self.indices.get(campo)
+        if indice is None or indice >= len(fila):
+            return ''
+        return fila[indice].strip()
+
+    def _numero(self, texto):
+        if not texto:
+            return 0.0
+        if self.separador_miles:
+            texto = texto.replace(self.separador_miles, '')
+        if self.separador_decimal != '.':
+            texto = texto.replace(self.separador_decimal, '.')
+        return float(texto.replace('$', '').replace(' ', ''))
+
+    def _fecha(self, texto):
+        fecha = self._fechas.get(texto)
+        if fecha is None:
+            fecha = self.formato.fecha_a_db(datetime.strptime(texto, self.formato_fecha))
+            self._fechas[texto] = fecha
+        return fecha
+
+    def convertir(self, fila):
+        """(categoria, concepto, monto con signo, fecha almacenable, descripcion).
+        Lanza ValueError si la fila es inválida."""
+        concepto = self._campo(fila, 'concepto')
+        if not concepto:
+            raise ValueError("Concepto vacío")
+
+        try:
+            fecha = self._fecha(self._campo(fila, 'fecha'))
+        except ValueError:
+            raise ValueError(f"Fecha inválida: '{self._campo(fila, 'fecha')}'") from None
+
+        try:
+            if 'monto' in self.indices:
+                monto = self._numero(self._campo(fila, 'monto'))
+            else:
+                monto = self._numero(self._campo(fila, 'credito')) - self._numero(self._campo(fila, 'debito'))
+        except ValueError:
+            raise ValueError("Monto inválido") from None
+        if monto == 0:
+            raise ValueError("Monto cero")
+
+        categoria = self._campo(fila, 'categoria').lower() or self.categoria
+        return categoria, concepto, monto, fecha, self._campo(fila, 'descripcion')
+
+    def destino(self, monto, tabla):
+        """Tabla de la fila. Con una tabla elegida, un monto negativo no puede
+        ser un ingreso y, en los perfiles con signo, uno positivo no puede ser
+        un gasto: la fila se rechaza en lugar de guardar su valor absoluto."""
+        segun_signo = 'gastos' if monto < 0 else 'ingresos'
+        if tabla == 'auto':
+            return segun_signo
+        if segun_signo != tabla and (monto < 0 or self.con_signo):
+            if monto < 0:
+                raise ValueError("Monto negativo (débito) en una importación de ingresos")
+            raise ValueError("Monto positivo (crédito) en una importación de gastos")
+        return tabla
+
+
+def importar_csv(ruta, perfil='generico', tabla='auto', db=None,
+                 tamano_lote=TAMANO_LOTE, on_progress=None):
+    """Importar un CSV a gastos y/o ingresos.
+
+    on_progress(lineas, fraccion) se llama después de cada lote con las
+    líneas leídas y la fracción del archivo procesada. Cada lote se confirma
+    por separado: si el proceso se interrumpe, los lotes previos quedan.
+    Devuelve un dict con las filas importadas por tabla, las líneas leídas,
+    la cantidad de errores y el detalle de los primeros MAX_ERRORES. La
+    base ya tiene que estar migrada (la app lo hace al iniciar, main() acá).
+    """
+    if tabla not in TABLAS_DESTINO:
+        raise ValueError(f"Tabla de destino inválida: {tabla}")
+    perfil = cargar_perfil(perfil)
+    db = db or database.get_db()
+    formato = db.formato
+
+    resultado = {'gastos': 0, 'ingresos': 0, 'lineas': 0, 'cantidad_errores': 0, 'errores': []}
+    tamano_archivo = os.path.getsize(ruta) or 1
+
+    with open(ruta, newline='', encoding=perfil['codificacion']) as archivo:
+        lector = csv.reader(archivo, delimiter=perfil['delimitador'])
+        encabezado = next(lector, None)
+        if encabezado is None:
+            return resultado
+        conversor = _Conversor(perfil, encabezado, formato)
+
+        lotes = {'gastos': [], 'ingresos': []}
+        for linea, fila in enumerate(lector, start=2):
+            if not any(fila):
+                continue
+            resultado['lineas'] += 1
+            try:
+                categoria, concepto, monto, fecha, descripcion = conversor.convertir(fila)
+                destino = conversor.destino(monto, tabla)
+            except ValueError as error:
+                resultado['cantidad_errores'] += 1
+                if len(resultado['errores']) < MAX_ERRORES:
+                    resultado['errores'].append((linea, str(error)))
+                continue
+
+            lotes[destino].append((
+                categoria,
+                concepto,
+                formato.monto_a_db(abs(monto)),
+                fecha,
+                descripcion,
+            ))
+
+            if len(lotes['gastos']) + len(lotes['ingresos']) >= tamano_lote:
+                _guardar_lote(db, lotes, resultado)
+                if on_progress:
+                    on_progress(resultado['lineas'], min(archivo.buffer.tell() / tamano_archivo, 1.0))
+
+        _guardar_lote(db, lotes, resultado)
+        if on_progress:
+            on_progress(resultado['lineas'], 1.0)
+
+    return resultado
+
+
+def _guardar_lote(db, lotes, resultado):
+    """Insertar las filas acumuladas en una sola transacción y vaciar los lotes"""
+    if not any(lotes.values()):
+        return
+    with db.transaction() as conn:
+        for tabla, filas in lotes.items():
+            if not filas:
+                continue
+            # Resumen e índice de búsqueda se actualizan en bloque y no fila por fila
+            with migrations.insercion_masiva(conn, tabla):
+                conn.executemany(f'''
+                    INSERT INTO {tabla} (categoria, concepto, monto, fecha, descripcion)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', filas)
+            db.notificar(tabla, eventos.MASIVA)
+    for tabla, filas in lotes.items():
+        resultado[tabla] += len(filas)
+        filas.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importar gastos e ingresos desde un CSV")
+    parser.add_argument('archivo', help="Archivo CSV a importar")
+    parser.add_argument('--perfil', default='generico',
+                        help=f"Perfil de columnas ({', '.join(PERFILES)}) o archivo JSON")
+    parser.add_argument('--tabla', default='auto', choices=TABLAS_DESTINO,
+                        help="Destino; 'auto' usa el signo del monto")
+    parser.add_argument('--db', default=database.DB_NAME, help="Base de datos")
+    args = parser.parse_args()
+
+    def mostrar_progreso(lineas, fraccion):
+        print(f"\r   {lineas:,} líneas ({fraccion:.0%})", end='', flush=True)
+
+    db = database.get_db(args.db)
+    db.ensure_schema()
+
+    print(f"📥 Importando {args.archivo}...")
+    resultado = importar_csv(
+        args.archivo, args.perfil, args.tabla,
+        db=db, on_progress=mostrar_progreso
+    )
+    print()
+    print("✅ Importación terminada:")
+    print(f"   - Gastos: {resultado['gastos']}")
+    print(f"   - Ingresos: {resultado['ingresos']}")
+    print(f"   - Filas con errores: {resultado['cantidad_errores']}")
+    for linea, error in resultado['errores'][:10]:
+        print(f"     línea {linea}: {error}")
+
+
+if __name__ == '__main__':
+    main()
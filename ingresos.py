@@ -2,29 +2,31 @@
 Módulo de gestión de ingresos con comparativa de gastos
 """
 
-import matplotlib
+import os
+from datetime import datetime
+
+from kivy.clock import Clock
 from kivy.metrics import dp
 from kivy.uix.boxlayout import BoxLayout
-from kivy.uix.scrollview import ScrollView
-from kivy.uix.widget import Widget
 from kivymd.uix.button import MDFlatButton, MDRaisedButton
 from kivymd.uix.card import MDCard
 from kivymd.uix.dialog import MDDialog
+from kivymd.uix.filemanager import MDFileManager
 from kivymd.uix.label import MDLabel
-from kivymd.uix.list import MDList, TwoLineListItem
-from kivymd.uix.menu import MDDropdownMenu
 from kivymd.uix.screen import MDScreen
-from kivymd.uix.textfield import MDTextField
 from kivymd.uix.toolbar import MDTopAppBar
 
-matplotlib.use('Agg')
-from datetime import datetime
-
-import matplotlib.pyplot as plt
-from kivy.clock import Clock
-
 import database
-from matplotlib_wrapper import MatplotlibWidget
+import db_worker
+import eventos
+import formularios
+import graficos
+import importador
+import listas
+from matplotlib_wrapper import crear_grafico
+
+# Categorías de los movimientos: valor guardado y texto del menú
+CATEGORIAS = [('agro', "Agro"), ('ganadería', "Ganadería"), ('otros', "Otros")]
 
 
 class IngresosScreen(MDScreen):
@@ -34,9 +36,9 @@ class IngresosScreen(MDScreen):
         super().__init__(**kwargs)
         self.name = 'ingresos'
         self.dialog = None
-        self.categoria_menu = None
-        self.selected_categoria = 'agro'
         self.graph_canvas = None
+        self.file_manager = None
+        self.import_path = None
         
         layout = BoxLayout(orientation='vertical')
         
@@ -49,8 +51,7 @@ class IngresosScreen(MDScreen):
         )
         layout.add_widget(toolbar)
         
-        # ScrollView principal
-        scroll = ScrollView()
+        # Encabezado que se desplaza junto con la lista
         self.main_content = BoxLayout(
             orientation='vertical',
             padding=dp(10),
@@ -68,6 +69,15 @@ class IngresosScreen(MDScreen):
         )
         self.main_content.add_widget(btn_add)
         
+        # Botón importar CSV
+        btn_import = MDFlatButton(
+            text="Importar CSV",
+            size_hint=(1, None),
+            height=dp(40),
+            on_press=self.show_import_dialog
+        )
+        self.main_content.add_widget(btn_import)
+        
         # Card para el gráfico comparativo
         self.graph_card = MDCard(
             orientation='vertical',
@@ -80,7 +90,7 @@ class IngresosScreen(MDScreen):
         
         # Título de la lista
         titulo_lista = MDLabel(
-            text="Últimos Ingresos Registrados",
+            text="Ingresos Registrados",
             halign='left',
             font_style='H6',
             size_hint_y=None,
@@ -88,70 +98,97 @@ class IngresosScreen(MDScreen):
         )
         self.main_content.add_widget(titulo_lista)
         
-        # Lista de ingresos
-        self.ingresos_list = MDList()
-        self.main_content.add_widget(self.ingresos_list)
+        # Lista de ingresos: solo se crean los widgets de las filas visibles
+        self.ingresos_list = listas.ListaVirtual(encabezado=self.main_content)
         
-        scroll.add_widget(self.main_content)
-        layout.add_widget(scroll)
+        # Scroll infinito: las páginas se piden al acercarse al final de la lista
+        self.paginador = listas.ListaPaginada(
+            self.ingresos_list, self.load_page, self.row_data,
+            clave='ingresos',
+            texto_vacio="No hay ingresos registrados",
+            texto_cargando="Cargando ingresos...",
+            tabla='ingresos'
+        )
+        layout.add_widget(self.ingresos_list)
         self.add_widget(layout)
         
         # Cargar datos al iniciar
         Clock.schedule_once(lambda dt: self.load_data(), 0.5)
+        
+        # La lista se actualiza sola; el gráfico, al confirmarse cambios
+        self.grafico_desactualizado = False
+        eventos.suscribir(('gastos', 'ingresos'), self.on_cambios)
+        
+        # El formulario de alta se arma una vez, en un momento ocioso
+        self.formulario = formularios.Formulario(
+            "Agregar Ingreso",
+            [
+                formularios.Texto('concepto', "Concepto", obligatorio=True),
+                formularios.Texto('monto', "Monto", filtro='float', obligatorio=True),
+                formularios.Opciones('categoria', "Categoría", CATEGORIAS),
+                formularios.Texto('descripcion', "Descripción"),
+            ],
+            self.save_ingreso
+        )
+        self.formulario.preparar()
     
     def go_back(self):
         self.manager.current = 'dashboard'
     
+    def on_cambios(self, cambios):
+        """Redibujar el gráfico; si la pantalla no está visible, al volver"""
+        if self.manager is not None and self.manager.current == self.name:
+            self.load_comparison_graph()
+        else:
+            self.grafico_desactualizado = True
+    
+    def on_enter(self, *args):
+        if self.grafico_desactualizado:
+            self.grafico_desactualizado = False
+            self.load_comparison_graph()
+    
     def load_data(self):
         """Cargar ingresos y gráfico"""
         self.load_ingresos()
         self.load_comparison_graph()
     
     def load_ingresos(self):
-        """Cargar lista de ingresos"""
-        self.ingresos_list.clear_widgets()
-        
-        db = database.DatabaseManager()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM ingresos 
-            ORDER BY fecha DESC
-            LIMIT 20
-        ''')
-        
-        ingresos = cursor.fetchall()
-        
-        for ingreso in ingresos:
-            fecha_obj = datetime.strptime(ingreso['fecha'], '%Y-%m-%d')
-            item = TwoLineListItem(
-                text=f"{ingreso['concepto']} - ${ingreso['monto']:,.0f}",
-                secondary_text=f"{ingreso['categoria'].title()} | {fecha_obj.strftime('%d/%m/%Y')}"
-            )
-            self.ingresos_list.add_widget(item)
-        
-        if not ingresos:
-            self.ingresos_list.add_widget(TwoLineListItem(text="No hay ingresos registrados"))
+        """Cargar la lista de ingresos desde la primera página"""
+        self.paginador.recargar()
+    
+    def load_page(self, despues_de=None, antes_de=None, limite=database.TAMANO_PAGINA, ids=None):
+        """Página de ingresos (se ejecuta en segundo plano)"""
+        return database.get_db().get_movimientos_pagina(
+            'ingresos', despues_de=despues_de, antes_de=antes_de, limite=limite, ids=ids
+        )
+    
+    def row_data(self, ingreso):
+        """Datos de la fila de un ingreso en la lista"""
+        fecha_obj = datetime.strptime(ingreso['fecha'], '%Y-%m-%d')
+        return listas.fila(
+            'TwoLineListItem',
+            text=f"{ingreso['concepto']} - ${ingreso['monto']:,.0f}",
+            secondary_text=f"{ingreso['categoria'].title()} | {fecha_obj.strftime('%d/%m/%Y')}"
+        )
     
     def load_comparison_graph(self):
-        """Cargar gráfico comparativo ingresos vs gastos"""
-        db = database.DatabaseManager()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        # Total ingresos
-        cursor.execute('SELECT SUM(monto) FROM ingresos')
-        total_ingresos = cursor.fetchone()[0] or 0
-        
-        # Total gastos
-        cursor.execute('SELECT SUM(monto) FROM gastos')
-        total_gastos = cursor.fetchone()[0] or 0
-        
-        # Limpiar card anterior
-        self.graph_card.clear_widgets()
+        """Leer los totales de ingresos y gastos en segundo plano"""
+        if not self.graph_card.children:
+            self.graph_card.add_widget(MDLabel(text="Cargando gráfico...", halign='center'))
+        db_worker.run_async(self.leer_totales, on_result=self.show_comparison_graph, clave='totales_ingresos')
+    
+    @staticmethod
+    def leer_totales():
+        """Totales de ingresos y gastos (desde el resumen mensual)"""
+        db = database.get_db()
+        return db.get_total('ingresos'), db.get_total('gastos')
+    
+    def show_comparison_graph(self, totales):
+        """Dibujar (o actualizar) las barras ingresos / gastos / balance"""
+        total_ingresos, total_gastos = totales
         
         if total_ingresos == 0 and total_gastos == 0:
+            self.graph_card.clear_widgets()
             label = MDLabel(
                 text="No hay datos financieros para mostrar",
                 halign='center',
@@ -160,9 +197,38 @@ class IngresosScreen(MDScreen):
             self.graph_card.add_widget(label)
             return
         
-        # Crear gráfico comparativo
-        plt.close('all')
-        fig = plt.figure(figsize=(6, 4), facecolor='white')
+        balance = total_ingresos - total_gastos
+        colores = ['#4CAF50', '#F44336', '#2196F3' if balance >= 0 else '#FF9800']
+        if graficos.reutilizable(self.graph_canvas, graficos.GraficoBarras, self.graph_card):
+            # Se redibujan las barras existentes, sin crear widgets
+            self.graph_canvas.colores = colores
+            self.graph_canvas.actualizar(['Ingresos', 'Gastos', 'Balance'],
+                                         [total_ingresos, total_gastos, balance])
+            return
+        
+        # Limpiar card anterior
+        self.graph_card.clear_widgets()
+        if graficos.NATIVOS:
+            self.graph_canvas = graficos.GraficoBarras(
+                titulo='Comparación Financiera',
+                titulo_y='Monto ($)',
+                etiquetas=['Ingresos', 'Gastos', 'Balance'],
+                valores=[total_ingresos, total_gastos, balance],
+                colores=colores,
+                formato=graficos.pesos
+            )
+        else:
+            # Con los mismos totales se reutiliza la imagen ya dibujada
+            self.graph_canvas = crear_grafico(
+                'comparacion_financiera', (total_ingresos, total_gastos), self.draw_comparison_graph,
+                clave='grafico_ingresos'
+            )
+        self.graph_card.add_widget(self.graph_canvas)
+    
+    @staticmethod
+    def draw_comparison_graph(fig, datos):
+        """Barras de ingresos, gastos y balance"""
+        total_ingresos, total_gastos = datos
         ax = fig.add_subplot(111)
         categorias = ['Ingresos', 'Gastos', 'Balance']
         valores = [total_ingresos, total_gastos, total_ingresos - total_gastos]
@@ -183,100 +249,88 @@ class IngresosScreen(MDScreen):
                     fontsize=9, fontweight='bold')
         
         fig.tight_layout()
-        
-        # Agregar widget al card
-        self.graph_canvas = MatplotlibWidget(fig)
-        self.graph_card.add_widget(self.graph_canvas)
     
     def show_add_dialog(self, *args):
         """Mostrar diálogo para agregar ingreso"""
-        content = BoxLayout(orientation='vertical', spacing=dp(10), size_hint_y=None)
-        content.bind(minimum_height=content.setter('height'))
-        content.add_widget(Widget(size_hint_y=None, height=dp(20)))
-        
-        self.concepto_field = MDTextField(hint_text="Concepto", size_hint_y=None, height=dp(50))
-        self.monto_field = MDTextField(hint_text="Monto", input_filter='float', size_hint_y=None, height=dp(50))
-        self.descripcion_field = MDTextField(hint_text="Descripción", size_hint_y=None, height=dp(50))
-        
-        self.categoria_button = MDRaisedButton(
-            text="Categoría: Agro",
-            size_hint=(1, None),
-            height=dp(50),
-            on_press=self.show_categoria_menu
+        self.formulario.abrir()
+    
+    def save_ingreso(self, valores):
+        """Guardar ingreso"""
+        db = database.get_db()
+        db.encolar(
+            db.insertar_movimiento,
+            'ingresos',
+            valores['categoria'],
+            valores['concepto'],
+            valores['monto'],
+            datetime.now(),
+            valores['descripcion']
         )
-        
-        content.add_widget(self.concepto_field)
-        content.add_widget(self.monto_field)
-        content.add_widget(self.categoria_button)
-        content.add_widget(self.descripcion_field)
+    
+    def show_import_dialog(self, *args):
+        """Elegir un CSV de ingresos para importar"""
+        if not self.file_manager:
+            self.file_manager = MDFileManager(
+                exit_manager=lambda *args: self.file_manager.close(),
+                select_path=self.select_import_file,
+                ext=['.csv']
+            )
+        self.file_manager.show(os.path.expanduser('~'))
+    
+    def select_import_file(self, ruta):
+        """Elegir el perfil de columnas del archivo seleccionado"""
+        self.file_manager.close()
+        self.import_path = ruta
+        
+        botones = [MDFlatButton(text="CANCELAR", on_press=lambda x: self.dialog.dismiss())]
+        for perfil in importador.PERFILES:
+            botones.append(MDRaisedButton(
+                text=perfil.upper(),
+                on_press=lambda x, p=perfil: self.start_import(p)
+            ))
         
         self.dialog = MDDialog(
-            title="Agregar Ingreso",
-            type="custom",
-            content_cls=content,
-            buttons=[
-                MDFlatButton(text="CANCELAR", on_press=lambda x: self.dialog.dismiss()),
-                MDRaisedButton(text="GUARDAR", on_press=self.save_ingreso),
-            ],
+            title="Importar Ingresos",
+            text=f"{os.path.basename(ruta)}\nPerfil de columnas:",
+            buttons=botones,
         )
         self.dialog.open()
     
-    def show_categoria_menu(self, button):
-        """Mostrar menú de categorías"""
-        menu_items = [
-            {
-                "text": "Agro",
-                "viewclass": "OneLineListItem",
-                "on_release": lambda x="agro": self.select_categoria(x)
-            },
-            {
-                "text": "Ganadería",
-                "viewclass": "OneLineListItem",
-                "on_release": lambda x="ganadería": self.select_categoria(x)
-            },
-            {
-                "text": "Otros",
-                "viewclass": "OneLineListItem",
-                "on_release": lambda x="otros": self.select_categoria(x)
-            },
-        ]
+    def start_import(self, perfil):
+        """Importar en segundo plano mostrando el avance"""
+        self.dialog.dismiss()
+        self.dialog = MDDialog(title="Importando ingresos...", text="Leyendo archivo...", auto_dismiss=False)
+        self.dialog.open()
         
-        self.categoria_menu = MDDropdownMenu(
-            caller=button,
-            items=menu_items,
-            width_mult=4,
+        def progreso(lineas, fraccion):
+            texto = f"{lineas:,} líneas ({fraccion:.0%})"
+            Clock.schedule_once(lambda dt: setattr(self.dialog, 'text', texto))
+        
+        db_worker.run_async(
+            importador.importar_csv, self.import_path, perfil, 'ingresos',
+            on_progress=progreso,
+            on_result=self.import_finished,
+            on_error=self.import_failed
         )
-        self.categoria_menu.open()
     
-    def select_categoria(self, categoria):
-        """Seleccionar categoría"""
-        self.selected_categoria = categoria
-        self.categoria_button.text = f"Categoría: {categoria.title()}"
-        if self.categoria_menu:
-            self.categoria_menu.dismiss()
+    def import_finished(self, resultado):
+        """Informar el resultado de la importación"""
+        self.dialog.dismiss()
+        texto = f"{resultado['ingresos']:,} ingresos importados"
+        if resultado['cantidad_errores']:
+            texto += f"\n{resultado['cantidad_errores']:,} filas con errores"
+            for linea, error in resultado['errores'][:5]:
+                texto += f"\n  línea {linea}: {error}"
+        self.show_import_message("Importación terminada", texto)
     
-    def save_ingreso(self, *args):
-        """Guardar ingreso"""
-        if not self.concepto_field.text or not self.monto_field.text:
-            return
-        
-        db = database.DatabaseManager()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO ingresos (categoria, concepto, monto, fecha, descripcion)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (
-            self.selected_categoria,
-            self.concepto_field.text,
-            float(self.monto_field.text),
-            datetime.now().strftime('%Y-%m-%d'),
-            self.descripcion_field.text
-        ))
-        
-        conn.commit()
+    def import_failed(self, error):
         self.dialog.dismiss()
-        
-        # Recargar datos y gráfico
-        self.load_data()
\ No newline at end of file
+        self.show_import_message("No se pudo importar", str(error))
+    
+    def show_import_message(self, titulo, texto):
+        self.dialog = MDDialog(
+            title=titulo,
+            text=texto,
+            buttons=[MDFlatButton(text="ACEPTAR", on_press=lambda x: self.dialog.dismiss())],
+        )
+        self.dialog.open()
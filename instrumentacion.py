@@ -0,0 +1,326 @@
+"""
+Instrumentación de las consultas SQL
+Las conexiones del pool usan un cursor que mide cada ejecución (incluida la
+lectura de filas) y acumula, por sentencia normalizada, llamadas, tiempo
+total, percentiles y filas devueltas. Las sentencias que superan el umbral
+van a un log rotativo junto con su EXPLAIN QUERY PLAN.
+
+Se activa con la variable de entorno AGROMANAGER_SQL_STATS=1 (o con
+configurar(activa=True) antes de abrir las conexiones).
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import re
+import sqlite3
+import threading
+from collections import deque
+from time import perf_counter
+
+ACTIVA = os.environ.get('AGROMANAGER_SQL_STATS', '0') == '1'
+
+# Tiempo a partir del cual una sentencia se registra como lenta
+UMBRAL_LENTO_MS = 100
+
+ARCHIVO_LENTAS = 'agromanager_lento.log'
+ARCHIVO_ESTADISTICAS = 'agromanager_sql.json'
+
+# Latencias guardadas por sentencia para calcular percentiles (las más recientes)
+MUESTRAS_POR_SENTENCIA = 512
+
+# Sentencias sin plan de ejecución útil
+_SIN_PLAN = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE', 'PRAGMA',
+             'CREATE', 'DROP', 'ALTER', 'EXPLAIN')
+
+_lock = threading.Lock()
+_lock_planes = threading.Lock()
+_estadisticas = {}
+_normalizadas = {}
+_conexiones_plan = {}
+_logger_lentas = None
+
+
+def configurar(umbral_ms=None, archivo_lentas=None, activa=None):
+    """Cambiar umbral, archivo del log de lentas o activar/desactivar la medición"""
+    global UMBRAL_LENTO_MS, ARCHIVO_LENTAS, ACTIVA, _logger_lentas
+    if umbral_ms is not None:
+        UMBRAL_LENTO_MS = umbral_ms
+    if archivo_lentas is not None:
+        ARCHIVO_LENTAS = archivo_lentas
+        _logger_lentas = None
+    if activa is not None:
+        ACTIVA = activa
+
+
+def normalizar(sql):
+    """Sentencia sin literales ni espacios repetidos, para agrupar ejecuciones"""
+    normalizada = _normalizadas.get(sql)
+    if normalizada is None:
+        normalizada = re.sub(r"'(?:[^']|'')*'", '?', sql)
+        normalizada = re.sub(r'\b\d+(?:\.\d+)?\b', '?', normalizada)
+        normalizada = ' '.join(normalizada.split())
+        normalizada = re.sub(r'\(\s*\?(?:\s*,\s*\?)+\s*\)', '(?, ...)', normalizada)
+        if len(_normalizadas) < 10000:
+            _normalizadas[sql] = normalizada
+    return normalizada
+
+
+def registrar(conexion, sql, parametros, segundos, filas):
+    """Acumular una ejecución y dejarla en el log si fue lenta"""
+    clave = normalizar(sql)
+    milisegundos = segundos * 1000
+    with _lock:
+        datos = _estadisticas.get(clave)
+        if datos is None:
+            datos = _estadisticas[clave] = {
+                'llamadas': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0,
+                'filas': 0,
+                'muestras': deque(maxlen=MUESTRAS_POR_SENTENCIA),
+            }
+        datos['llamadas'] += 1
+        datos['total_ms'] += milisegundos
+        datos['max_ms'] = max(datos['max_ms'], milisegundos)
+        datos['filas'] += filas
+        datos['muestras'].append(milisegundos)
+
+    if milisegundos >= UMBRAL_LENTO_MS:
+        _registrar_lenta(conexion, sql, parametros, milisegundos, filas)
+
+
+def _registrar_lenta(conexion, sql, parametros, milisegundos, filas):
+    plan = _plan(getattr(conexion, 'ruta', None), sql, parametros)
+    sentencia = ' '.join(sql.split())
+    texto = f'{milisegundos:.1f} ms | {filas} filas | {sentencia}'
+    if parametros:
+        texto += f' | parámetros: {repr(parametros)[:200]}'
+    for linea in plan:
+        texto += f'\n    {linea}'
+    _get_logger_lentas().warning(texto)
+
+
+def _get_logger_lentas():
+    global _logger_lentas
+    if _logger_lentas is None:
+        logger = logging.getLogger('agromanager.sql_lento')
+        logger.propagate = False
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            handler.close()
+        handler = logging.handlers.RotatingFileHandler(
+            ARCHIVO_LENTAS, maxBytes=1024 * 1024, backupCount=3, encoding='utf-8'
+        )
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        logger.addHandler(handler)
+        _logger_lentas = logger
+    return _logger_lentas
+
+
+def _plan(ruta, sql, parametros):
+    """EXPLAIN QUERY PLAN en una conexión aparte (la original puede estar en uso)"""
+    if not ruta or ruta == ':memory:' or sql.lstrip().upper().startswith(_SIN_PLAN):
+        return []
+    if isinstance(parametros, list):
+        # executemany: alcanza con el plan del primer juego de parámetros
+        parametros = parametros[0] if parametros else ()
+    try:
+        with _lock_planes:
+            conexion = _conexiones_plan.get(ruta)
+            if conexion is None:
+                conexion = _conexiones_plan[ruta] = sqlite3.connect(ruta, check_same_thread=False)
+            filas = conexion.execute('EXPLAIN QUERY PLAN ' + sql, parametros or ()).fetchall()
+    except (sqlite3.Error, ValueError) as error:
+        return [f'(sin plan: {error})']
+    return [fila[3] for fila in filas]
+
+
+class CursorInstrumentado(sqlite3.Cursor):
+    """Cursor que mide cada ejecución hasta leer la última fila"""
+
+    _medicion = None
+
+    def _empezar(self, sql, parametros, metodo):
+        self._terminar()
+        inicio = perf_counter()
+        try:
+            metodo(sql, parametros)
+        except BaseException:
+            self._medicion = [sql, parametros, perf_counter() - inicio, 0]
+            self._terminar()
+            raise
+        if self.description is None:
+            # Sin filas para leer: se cuentan las filas modificadas y la medición termina acá
+            self._medicion = [sql, parametros, perf_counter() - inicio, max(self.rowcount, 0)]
+            self._terminar()
+        else:
+            self._medicion = [sql, parametros, perf_counter() - inicio, 0]
+        return self
+
+    def execute(self, sql, parametros=()):
+        return self._empezar(sql, parametros, super().execute)
+
+    def executemany(self, sql, parametros):
+        if not isinstance(parametros, (list, tuple)):
+            parametros = list(parametros)
+        return self._empezar(sql, parametros, super().executemany)
+
+    def _leer(self, metodo, *args):
+        inicio = perf_counter()
+        resultado = metodo(*args)
+        if self._medicion is not None:
+            self._medicion[2] += perf_counter() - inicio
+        return resultado
+
+    def fetchone(self):
+        fila = self._leer(super().fetchone)
+        if fila is None:
+            self._terminar()
+        elif self._medicion is not None:
+            self._medicion[3] += 1
+        return fila
+
+    def fetchmany(self, size=None):
+        filas = self._leer(super().fetchmany, size or self.arraysize)
+        if self._medicion is not None:
+            self._medicion[3] += len(filas)
+        if len(filas) < (size or self.arraysize):
+            self._terminar()
+        return filas
+
+    def fetchall(self):
+        filas = self._leer(super().fetchall)
+        if self._medicion is not None:
+            self._medicion[3] += len(filas)
+        self._terminar()
+        return filas
+
+    def __next__(self):
+        try:
+            fila = self._leer(super().__next__)
+        except StopIteration:
+            self._terminar()
+            raise
+        if self._medicion is not None:
+            self._medicion[3] += 1
+        return fila
+
+    def close(self):
+        self._terminar()
+        super().close()
+
+    def __del__(self):
+        # Cursores descartados sin leer todas las filas (p. ej. fetchone()[0])
+        try:
+            self._terminar()
+        except Exception:
+            pass
+
+    def _terminar(self):
+        medicion, self._medicion = self._medicion, None
+        if medicion is not None:
+            sql, parametros, segundos, filas = medicion
+            registrar(self.connection, sql, parametros, segundos, filas)
+
+
+class ConexionInstrumentada(sqlite3.Connection):
+    """Conexión cuyos cursores miden las sentencias; ruta se usa para los planes"""
+
+    ruta = None
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or CursorInstrumentado)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return self.cursor().executemany(sql, parametros)
+
+    def commit(self):
+        inicio = perf_counter()
+        super().commit()
+        registrar(self, 'COMMIT', (), perf_counter() - inicio, 0)
+
+
+def estadisticas():
+    """Copia de las estadísticas acumuladas en este proceso"""
+    with _lock:
+        return {
+            sql: {**datos, 'muestras': list(datos['muestras'])}
+            for sql, datos in _estadisticas.items()
+        }
+
+
+def reiniciar():
+    """Descartar las estadísticas acumuladas"""
+    with _lock:
+        _estadisticas.clear()
+
+
+def guardar(ruta=None):
+    """Sumar las estadísticas de este proceso a las guardadas en disco"""
+    actuales = estadisticas()
+    if not actuales:
+        return
+    ruta = ruta or ARCHIVO_ESTADISTICAS
+    guardadas = cargar(ruta)
+    for sql, datos in actuales.items():
+        previo = guardadas.get(sql)
+        if previo is None:
+            guardadas[sql] = datos
+            continue
+        previo['llamadas'] += datos['llamadas']
+        previo['total_ms'] += datos['total_ms']
+        previo['max_ms'] = max(previo['max_ms'], datos['max_ms'])
+        previo['filas'] += datos['filas']
+        previo['muestras'] = (previo['muestras'] + datos['muestras'])[-MUESTRAS_POR_SENTENCIA:]
+    # Archivo temporal y reemplazo: un cierre a mitad de escritura no deja el JSON truncado
+    temporal = f'{ruta}.tmp'
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        json.dump(guardadas, archivo, ensure_ascii=False)
+    os.replace(temporal, ruta)
+    reiniciar()
+
+
+def cargar(ruta=None):
+    """Estadísticas guardadas en disco (vacío si no hay archivo o está dañado)"""
+    ruta = ruta or ARCHIVO_ESTADISTICAS
+    try:
+        with open(ruta, encoding='utf-8') as archivo:
+            datos = json.load(archivo)
+    except (OSError, ValueError):
+        return {}
+    return datos if isinstance(datos, dict) else {}
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) por el método del rango más cercano"""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados) + 0.5) - 1))
+    return ordenados[indice]
+
+
+def reporte(datos=None, orden='total_ms', limite=20):
+    """Sentencias ordenadas por tiempo total (u otra métrica), con percentiles"""
+    if datos is None:
+        datos = estadisticas()
+    filas = []
+    for sql, valores in datos.items():
+        filas.append({
+            'sql': sql,
+            'llamadas': valores['llamadas'],
+            'total_ms': valores['total_ms'],
+            'promedio_ms': valores['total_ms'] / valores['llamadas'],
+            'p50_ms': percentil(valores['muestras'], 50),
+            'p95_ms': percentil(valores['muestras'], 95),
+            'p99_ms': percentil(valores['muestras'], 99),
+            'max_ms': valores['max_ms'],
+            'filas': valores['filas'],
+        })
+    filas.sort(key=lambda fila: fila[orden], reverse=True)
+    return filas[:limite]
@@ -0,0 +1,535 @@
+"""
+Listas virtualizadas con paginación por cursor y scroll infinito
+ListaVirtual es un RecycleView: solo existen los widgets de las filas
+visibles y se reutilizan al desplazarse. Cada fila es un dict con la clase
+del item y sus propiedades, así que una lista con decenas de miles de filas
+cargadas tiene los mismos widgets que una de diez.
+"""
+
+from kivy.clock import Clock
+from kivy.factory import Factory
+from kivy.logger import Logger
+from kivy.metrics import dp
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
+
+import db_worker
+import eventos
+
+# Distancia a un extremo de la lista a partir de la cual se pide otra página
+UMBRAL_CARGA = dp(300)
+
+# Páginas que una lista paginada conserva en memoria
+PAGINAS_EN_MEMORIA = 5
+
+# Alto de cada tipo de item de KivyMD y propiedades que hay que reiniciar al
+# reutilizar uno (un item reciclado conserva lo que no se le vuelve a asignar)
+ITEMS = {
+    'OneLineListItem': (dp(48), {}),
+    'TwoLineListItem': (dp(72), {'secondary_text': ''}),
+    'ThreeLineListItem': (dp(88), {'secondary_text': '', 'tertiary_text': ''}),
+}
+
+
+def _sin_accion(*args):
+    pass
+
+
+def fila(viewclass, fila_id=None, **propiedades):
+    """Dict de data para un item de lista de KivyMD ('TwoLineListItem'...).
+
+    Las filas de una misma lista con la misma clase deben indicar las mismas
+    propiedades (por ejemplo text_color en todas o en ninguna).
+    """
+    alto, reinicio = ITEMS[viewclass]
+    return {
+        'viewclass': viewclass,
+        'fila_id': fila_id,
+        'tamano': (None, alto),
+        'on_release': _sin_accion,
+        **reinicio,
+        **propiedades,
+    }
+
+
+def mensaje(texto):
+    """Fila sin acción para avisos ("Cargando...", "No hay registros")"""
+    return fila('OneLineListItem', text=texto)
+
+
+def clave_fila(datos):
+    """Identidad de una fila al reconciliar: su fila_id o, en los avisos, el texto"""
+    if datos.get('fila_id') is not None:
+        return datos['fila_id']
+    return (datos.get('viewclass'), datos.get('text'))
+
+
+def _iguales(actual, nueva):
+    """Mismas propiedades visibles; las acciones (funciones) no cuentan"""
+    if actual.keys() != nueva.keys():
+        return False
+    return all(callable(valor) or valor == nueva[clave] for clave, valor in actual.items())
+
+
+class EncabezadoLista(RecycleDataViewBehavior, BoxLayout):
+    """Fila que muestra un widget fijo (botones, gráfico, métricas) arriba de la lista"""
+
+    def refresh_view_attrs(self, rv, index, data):
+        contenido = data['contenido']
+        # El encabezado pudo quedar en otra vista reciclada: se lo trae a esta
+        if contenido.parent is not self:
+            self.clear_widgets()
+            if contenido.parent is not None:
+                contenido.parent.remove_widget(contenido)
+            self.add_widget(contenido)
+
+
+Factory.register('EncabezadoLista', cls=EncabezadoLista)
+
+
+class ListaVirtual(RecycleView):
+    """RecycleView con filas de items de KivyMD y un encabezado opcional.
+
+    El encabezado es un widget con alto fijo (o atado a su minimum_height)
+    que se desplaza junto con las filas, como el contenido que antes iba en
+    el mismo ScrollView que la lista.
+    """
+
+    def __init__(self, encabezado=None, **kwargs):
+        kwargs.setdefault('key_viewclass', 'viewclass')
+        super().__init__(**kwargs)
+        self.contenedor = RecycleBoxLayout(
+            orientation='vertical',
+            size_hint_y=None,
+            default_size=(None, ITEMS['TwoLineListItem'][0]),
+            default_size_hint=(1, None),
+            key_size='tamano'
+        )
+        self.contenedor.bind(minimum_height=self.contenedor.setter('height'))
+        self.add_widget(self.contenedor)
+
+        self.encabezado = encabezado
+        self._inicio = 0
+        if encabezado is not None:
+            self._inicio = 1
+            encabezado.bind(height=self._on_encabezado)
+        self.mostrar([])
+
+    def _fila_encabezado(self):
+        return {
+            'viewclass': 'EncabezadoLista',
+            'fila_id': None,
+            'contenido': self.encabezado,
+            'tamano': (None, self.encabezado.height),
+        }
+
+    def _on_encabezado(self, *args):
+        self.data[0] = self._fila_encabezado()
+
+    @property
+    def filas(self):
+        """Filas de la lista, sin el encabezado"""
+        return self.data[self._inicio:]
+
+    def mostrar(self, filas):
+        """Reemplazar todas las filas"""
+        encabezado = [self._fila_encabezado()] if self.encabezado is not None else []
+        self.data = encabezado + list(filas)
+
+    def agregar(self, filas):
+        self.insertar(len(self.filas), filas)
+
+    def _alto(self, filas):
+        return sum(datos['tamano'][1] for datos in filas)
+
+    def _mantener_vista(self, indice, cambio):
+        """Corregir scroll_y antes de sumar (cambio > 0) o quitar alto en el
+        índice indice de data, para que las filas a la vista no se muevan"""
+        alto = self._alto(self.data)
+        desplazable = max(alto - self.height, 0)
+        # Píxeles de contenido debajo de la vista
+        debajo = self.scroll_y * desplazable
+        if self._alto(self.data[:indice]) >= desplazable - debajo:
+            # El cambio queda debajo del borde superior de la vista
+            debajo += cambio
+        nuevo = max(alto + cambio - self.height, 0)
+        if nuevo:
+            self.scroll_y = min(max(debajo / nuevo, 0), 1)
+
+    def insertar(self, posicion, filas):
+        """Insertar filas a partir de la posición dada (sin contar el encabezado)"""
+        indice = self._inicio + posicion
+        self._mantener_vista(indice, self._alto(filas))
+        self.data[indice:indice] = filas
+
+    def quitar_filas(self, posicion, cantidad):
+        """Quitar cantidad filas a partir de la posición dada (sin contar el encabezado)"""
+        indice = self._inicio + posicion
+        self._mantener_vista(indice, -self._alto(self.data[indice:indice + cantidad]))
+        del self.data[indice:indice + cantidad]
+
+    def reconciliar(self, filas):
+        """Pasar a las filas dadas tocando solo las que cambiaron.
+
+        Las filas se identifican con clave_fila: las que ya no están se
+        quitan, las nuevas se insertan en su posición y las que cambiaron se
+        reemplazan. Las iguales quedan como están y su widget no se vuelve a
+        cargar. Devuelve la cantidad de filas quitadas, insertadas o
+        reemplazadas.
+        """
+        data = self.data
+        inicio = self._inicio
+        filas = list(filas)
+        claves = {clave_fila(datos) for datos in filas}
+        tocadas = 0
+
+        # Bajas, desde el final para no correr los índices pendientes
+        for indice in range(len(data) - 1, inicio - 1, -1):
+            if clave_fila(data[indice]) not in claves:
+                del data[indice]
+                tocadas += 1
+        pendientes = {clave_fila(datos) for datos in data[inicio:]}
+
+        for posicion, nueva in enumerate(filas):
+            indice = inicio + posicion
+            clave = clave_fila(nueva)
+            if indice < len(data) and clave_fila(data[indice]) == clave:
+                pendientes.discard(clave)
+                if _iguales(data[indice], nueva):
+                    # Solo cambian las acciones: se guardan sin redibujar
+                    data[indice].update(nueva)
+                else:
+                    data[indice] = nueva
+                    tocadas += 1
+                continue
+            if clave in pendientes:
+                # La fila se movió: se quita de su lugar anterior
+                pendientes.discard(clave)
+                for anterior in range(indice + 1, len(data)):
+                    if clave_fila(data[anterior]) == clave:
+                        del data[anterior]
+                        break
+            data.insert(indice, nueva)
+            tocadas += 1
+
+        # Sobrantes (claves repetidas en las filas anteriores)
+        sobrantes = len(data) - inicio - len(filas)
+        if sobrantes > 0:
+            del data[inicio + len(filas):]
+            tocadas += sobrantes
+        return tocadas
+
+    def indice(self, fila_id):
+        for indice in range(self._inicio, len(self.data)):
+            if self.data[indice].get('fila_id') == fila_id:
+                return indice
+        return None
+
+    def quitar(self, fila_id):
+        indice = self.indice(fila_id)
+        if indice is not None:
+            self.quitar_filas(indice - self._inicio, 1)
+
+    def reemplazar(self, fila_id, datos):
+        indice = self.indice(fila_id)
+        if indice is None:
+            return
+        if _iguales(self.data[indice], datos):
+            # Solo cambian las acciones: se guardan sin redibujar
+            self.data[indice].update(datos)
+        else:
+            self.data[indice] = datos
+
+    def distancia_al_final(self):
+        """Píxeles de contenido que quedan debajo de la vista"""
+        desplazable = max(self.contenedor.height - self.height, 0)
+        return desplazable * self.scroll_y
+
+    def distancia_al_principio(self):
+        """Píxeles de filas (sin el encabezado) que quedan arriba de la vista"""
+        desplazable = max(self.contenedor.height - self.height, 0)
+        encabezado = self.encabezado.height if self.encabezado is not None else 0
+        return desplazable * (1 - self.scroll_y) - encabezado
+
+
+class ListaPaginada:
+    """Conecta una ListaVirtual con una consulta paginada.
+
+    cargar_pagina(despues_de=None, antes_de=None, ids=None) corre en segundo
+    plano y devuelve un dict con 'filas', 'anterior', 'siguiente',
+    'cursores' y 'descendente' (ver DatabaseManager._paginar). adaptar(fila)
+    devuelve el dict de data de cada fila (ver fila()).
+
+    En memoria quedan a lo sumo paginas páginas seguidas: al acercarse al
+    final se pide la siguiente y se descarta la del principio, y al volver
+    hacia arriba se pide la anterior con antes_de y se descarta la del
+    final. Así la memoria no crece con lo que se desplaza.
+
+    Con tabla, la lista se suscribe a los cambios de esa tabla: las bajas
+    quitan su fila y las altas y modificaciones leen solo esas filas
+    (cargar_pagina(ids=...)) y las ubican según su cursor, si caen dentro
+    de las páginas en memoria. Las importaciones recargan desde la primera
+    página.
+
+    Es la reconciliación por clave de estas listas: cada fila se quita o se
+    reemplaza por su id en data (ListaVirtual.quitar/reemplazar), así que
+    cobrar un cheque o corregir un gasto toca un solo item y la lista no se
+    vuelve a armar. reconciliar() queda para las listas sin paginar.
+    """
+
+    def __init__(self, vista, cargar_pagina, adaptar, clave,
+                 texto_vacio="No hay registros", texto_cargando="Cargando...",
+                 texto_error="No se pudo cargar. Tocar para reintentar",
+                 tabla=None, paginas=PAGINAS_EN_MEMORIA):
+        self.vista = vista
+        self.cargar_pagina = cargar_pagina
+        self.adaptar = adaptar
+        self.clave = clave
+        self.texto_vacio = texto_vacio
+        self.texto_cargando = texto_cargando
+        self.texto_error = texto_error
+        self.paginas = max(paginas, 3)
+
+        # Ids de cada página en memoria, en el orden de la lista, y cursor de cada fila
+        self._paginas = []
+        self._cursores = {}
+        # Límites de lo que está en memoria: las filas anteriores a _anterior y
+        # posteriores a _siguiente se piden al acercarse (None: no hay más)
+        self._anterior = None
+        self._siguiente = None
+        self._descendente = False
+        # Ids con cambios que se leen al terminar la lectura en curso
+        self._pedidos = set()
+        self._cargada = False
+        self._cargando = False
+        self._generacion = 0
+
+        vista.bind(scroll_y=self._on_scroll, height=self._on_scroll)
+        vista.contenedor.bind(height=self._on_scroll)
+        if tabla is not None:
+            eventos.suscribir(tabla, self._on_cambios)
+
+    def recargar(self):
+        """Volver a la primera página descartando todo lo cargado"""
+        self._generacion += 1
+        self._paginas = []
+        self._cursores.clear()
+        self._anterior = self._siguiente = None
+        self._pedidos.clear()
+        self._cargada = False
+        self.vista.mostrar([mensaje(self.texto_cargando)])
+        self._pedir()
+
+    def refrescar(self):
+        """Volver a leer las filas en memoria y aplicar solo las diferencias"""
+        if self._cargada:
+            self._releer(self._cursores)
+
+    def _pedir(self, despues_de=None, antes_de=None):
+        """Pedir una página al worker de base de datos"""
+        self._cargando = True
+        generacion = self._generacion
+
+        db_worker.run_async(
+            self.cargar_pagina,
+            despues_de=despues_de,
+            antes_de=antes_de,
+            on_result=lambda pagina: self._recibir(pagina, generacion, antes_de is not None),
+            on_error=lambda error: self._fallo(error, generacion),
+            clave=self.clave
+        )
+
+    def _releer(self, ids):
+        """Leer solo esas filas (altas, cambios o bajas) y ubicarlas en la lista"""
+        self._pedidos.update(ids)
+        if self._cargando:
+            # Se leen al llegar la lectura en curso, que pudo ser anterior al cambio
+            return
+        pedidos, self._pedidos = self._pedidos, set()
+        self._cargando = True
+        generacion = self._generacion
+
+        db_worker.run_async(
+            self.cargar_pagina,
+            ids=sorted(pedidos),
+            on_result=lambda pagina: self._ubicar(pedidos, pagina, generacion),
+            on_error=lambda error: self._fallo(error, generacion),
+            clave=self.clave
+        )
+
+    def _fallo(self, error, generacion):
+        Logger.error(f'AgroManager: no se pudo cargar la lista {self.clave}: {error}')
+        if generacion != self._generacion:
+            return
+        self._cargando = False
+        if not self._cargada:
+            # Sin la primera página el aviso de carga no se iría nunca: se
+            # reemplaza por una fila que vuelve a pedirla
+            self.vista.mostrar([fila('OneLineListItem', text=self.texto_error, on_release=self._reintentar)])
+
+    def _reintentar(self, *args):
+        self.recargar()
+
+    def _datos(self, fila):
+        datos = self.adaptar(fila)
+        datos['fila_id'] = fila['id']
+        return datos
+
+    def _antes(self, cursor, otro):
+        """cursor va antes que otro en el orden de la lista"""
+        return cursor > otro if self._descendente else cursor < otro
+
+    def _recibir(self, pagina, generacion, hacia_atras=False):
+        """Agregar la página recibida en su extremo y descartar la del otro si sobra"""
+        if generacion != self._generacion:
+            return
+        self._cargando = False
+        self._descendente = pagina['descendente']
+
+        # Una fila que ya llegó por un cambio mientras se leía la página no se repite
+        nuevas = [
+            (fila, cursor) for fila, cursor in zip(pagina['filas'], pagina['cursores'])
+            if fila['id'] not in self._cursores
+        ]
+        ids = [fila['id'] for fila, _ in nuevas]
+        filas = [self._datos(fila) for fila, _ in nuevas]
+        self._cursores.update((fila['id'], cursor) for fila, cursor in nuevas)
+
+        if not self._cargada:
+            self._cargada = True
+            self._anterior, self._siguiente = pagina['anterior'], pagina['siguiente']
+            self._paginas = [ids] if ids else []
+            self.vista.mostrar(filas or [mensaje(self.texto_vacio)])
+        elif hacia_atras:
+            self._anterior = pagina['anterior']
+            if ids:
+                self._paginas.insert(0, ids)
+                self.vista.insertar(0, filas)
+            if len(self._paginas) > self.paginas:
+                self._descartar(-1)
+        else:
+            self._siguiente = pagina['siguiente']
+            if ids:
+                self._paginas.append(ids)
+                self.vista.agregar(filas)
+            if len(self._paginas) > self.paginas:
+                self._descartar(0)
+        self._despues_de_leer()
+
+    def _descartar(self, extremo):
+        """Sacar de memoria la página del principio (0) o del final (-1)"""
+        ids = self._paginas.pop(extremo)
+        for fila_id in ids:
+            del self._cursores[fila_id]
+        if extremo == 0:
+            self.vista.quitar_filas(0, len(ids))
+            # Lo anterior a la primera fila que queda se vuelve a pedir con antes_de
+            self._anterior = self._cursores[self._paginas[0][0]]
+        else:
+            self.vista.quitar_filas(len(self.vista.filas) - len(ids), len(ids))
+            self._siguiente = self._cursores[self._paginas[-1][-1]]
+
+    def _ubicar(self, pedidos, pagina, generacion):
+        """Aplicar las filas releídas: las que no volvieron ya no pertenecen a la lista"""
+        if generacion != self._generacion:
+            return
+        self._cargando = False
+        self._descendente = pagina['descendente']
+
+        vueltas = {fila['id'] for fila in pagina['filas']}
+        for fila_id in pedidos - vueltas:
+            self._quitar_fila(fila_id)
+        for fila, cursor in zip(pagina['filas'], pagina['cursores']):
+            datos = self._datos(fila)
+            actual = self._cursores.get(fila['id'])
+            if actual == cursor:
+                # Misma posición: se reemplaza solo si cambió algo visible
+                self.vista.reemplazar(fila['id'], datos)
+                continue
+            if actual is not None:
+                self._quitar_fila(fila['id'])
+            if self._en_memoria(cursor):
+                self._insertar(fila['id'], cursor, datos)
+        self._despues_de_leer()
+
+    def _en_memoria(self, cursor):
+        """La posición cae entre los límites de las páginas en memoria"""
+        if self._anterior is not None and self._antes(cursor, self._anterior):
+            return False
+        return self._siguiente is None or not self._antes(self._siguiente, cursor)
+
+    def _insertar(self, fila_id, cursor, datos):
+        if not self._cursores:
+            # La lista mostraba el aviso de vacía
+            self.vista.mostrar([])
+            self._paginas = []
+        self._cursores[fila_id] = cursor
+        posicion = 0
+        for pagina in self._paginas:
+            for indice, otro in enumerate(pagina):
+                if self._antes(cursor, self._cursores[otro]):
+                    pagina.insert(indice, fila_id)
+                    self.vista.insertar(posicion + indice, [datos])
+                    return
+            posicion += len(pagina)
+        if not self._paginas:
+            self._paginas.append([])
+        self._paginas[-1].append(fila_id)
+        self.vista.insertar(posicion, [datos])
+
+    def _quitar_fila(self, fila_id):
+        if self._cursores.pop(fila_id, None) is None:
+            return
+        for pagina in self._paginas:
+            if fila_id in pagina:
+                pagina.remove(fila_id)
+                if not pagina:
+                    self._paginas.remove(pagina)
+                break
+        self.vista.quitar(fila_id)
+
+    def _despues_de_leer(self):
+        if self._cargada and not self._cursores:
+            if self._anterior is not None or self._siguiente is not None:
+                # Se quitaron todas las filas en memoria pero quedan otras
+                self.recargar()
+                return
+            if not self.vista.filas:
+                self.vista.mostrar([mensaje(self.texto_vacio)])
+        if self._pedidos and not self._cargando:
+            self._releer(())
+            return
+        # El alto se recalcula en el próximo frame; si la lista todavía no
+        # llena la pantalla se sigue pidiendo
+        Clock.schedule_once(self._on_scroll)
+
+    def _on_cambios(self, cambios):
+        """Aplicar a la lista los cambios confirmados en su tabla"""
+        if not self._cargada or any(cambio.op == eventos.MASIVA for cambio in cambios):
+            # Cargando la primera página o un lote importado que puede
+            # cambiar cualquier parte de la lista: se vuelve a consultar
+            self.recargar()
+            return
+        bajas = eventos.ids(cambios, eventos.ELIMINAR)
+        cambiados = eventos.ids(cambios, eventos.INSERTAR) | eventos.ids(cambios, eventos.ACTUALIZAR)
+        if self._cargando:
+            # La lectura en curso pudo ver la tabla antes de estos cambios
+            self._pedidos |= bajas | cambiados
+            return
+        for fila_id in bajas:
+            self._quitar_fila(fila_id)
+        if cambiados:
+            self._releer(cambiados)
+        else:
+            self._despues_de_leer()
+
+    def _on_scroll(self, *args):
+        """Pedir la página siguiente o la anterior al acercarse a un extremo"""
+        if self._cargando or not self._cargada:
+            return
+        if self._siguiente is not None and self.vista.distancia_al_final() <= UMBRAL_CARGA:
+            self._pedir(despues_de=self._siguiente)
+        elif self._anterior is not None and self.vista.distancia_al_principio() <= UMBRAL_CARGA:
+            self._pedir(antes_de=self._anterior)
@@ -5,6 +5,10 @@ Autor: Sistema AgroManager
 Versión: 1.0
 """
 
+import importlib
+import os
+
+from kivy.clock import Clock
 from kivy.metrics import dp
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.gridlayout import GridLayout
@@ -17,15 +21,37 @@ from kivymd.uix.screen import MDScreen
 from kivymd.uix.screenmanager import MDScreenManager
 from kivymd.uix.toolbar import MDTopAppBar
 
-import cheques
 import database
-import gastos
-import ingresos
-import margenes
-import mercado
-import proveedores
-import superficie
-import tambo
+import db_worker
+import eventos
+import matplotlib_wrapper
+import proyeccion
+import vencimientos
+
+# Pantallas que se construyen recién la primera vez que se abren: nombre -> 'modulo.Clase'
+PANTALLAS = {
+    'cheques': 'cheques.ChequesScreen',
+    'proveedores': 'proveedores.ProveedoresScreen',
+    'gastos': 'gastos.GastosScreen',
+    'ingresos': 'ingresos.IngresosScreen',
+    'margenes': 'margenes.MargenesScreen',
+    'superficie': 'superficie.SuperficieScreen',
+    'mercado': 'mercado.MercadoScreen',
+    'tambo': 'tambo.TamboScreen',
+    'flujo': 'flujo.FlujoScreen',
+    'busqueda': 'busqueda.BusquedaScreen',
+}
+
+# Pantallas que se preparan en frames ociosos después de mostrar el dashboard.
+# Mercado no se incluye: al construirse consulta la API de cotizaciones.
+PRECALENTAR = ('gastos', 'ingresos', 'cheques', 'proveedores', 'tambo',
+               'superficie', 'margenes', 'busqueda', 'flujo')
+
+# Un frame que tardó más que esto se considera ocupado y se posterga el precalentado
+FRAME_OCIOSO = 1 / 30
+
+# Espera entre pantallas precalentadas (segundos)
+INTERVALO_PRECALENTADO = 0.1
 
 
 class DashboardCard(MDCard):
@@ -63,7 +89,7 @@ class DashboardCard(MDCard):
         )
         
         # Valor
-        value_lbl = MDLabel(
+        self.value_lbl = value_lbl = MDLabel(
             text=str(value),
             halign='center',
             theme_text_color="Custom",
@@ -75,6 +101,10 @@ class DashboardCard(MDCard):
         self.add_widget(icon_btn)
         self.add_widget(title_lbl)
         self.add_widget(value_lbl)
+    
+    def set_value(self, value):
+        """Actualizar el valor mostrado"""
+        self.value_lbl.text = str(value)
 
 
 class DashboardScreen(MDScreen):
@@ -89,7 +119,8 @@ class DashboardScreen(MDScreen):
         toolbar = MDTopAppBar(
             title="AgroManager - Dashboard",
             elevation=3,
-            md_bg_color=(0.2, 0.6, 0.8, 1)
+            md_bg_color=(0.2, 0.6, 0.8, 1),
+            right_action_items=[["magnify", lambda x: self.navigate_to('busqueda')]]
         )
         layout.add_widget(toolbar)
         
@@ -121,15 +152,13 @@ class DashboardScreen(MDScreen):
             height=dp(150)
         )
         
-        # Cargar datos del dashboard
-        db = database.DatabaseManager()
-        cheques_proximos = db.get_cheques_proximos()
-        total_gastos = db.get_total_gastos_mes()
-        total_ingresos = db.get_total_ingresos_mes()
+        # Cargar datos del dashboard (una sola consulta, cacheada)
+        self._kpis = database.get_db().get_dashboard_kpis()
+        valores = self.format_kpis(self._kpis)
         
         card1 = DashboardCard(
             "Cheques Próximos",
-            len(cheques_proximos),
+            valores['cheques_proximos'],
             "bank-check",
             "cheques"
         )
@@ -137,7 +166,7 @@ class DashboardScreen(MDScreen):
         
         card2 = DashboardCard(
             "Gastos del Mes",
-            f"${total_gastos:,.0f}",
+            valores['gastos_mes'],
             "cash-minus",
             "gastos"
         )
@@ -157,7 +186,7 @@ class DashboardScreen(MDScreen):
         
         card3 = DashboardCard(
             "Ingresos del Mes",
-            f"${total_ingresos:,.0f}",
+            valores['ingresos_mes'],
             "cash-plus",
             "ingresos"
         )
@@ -165,7 +194,7 @@ class DashboardScreen(MDScreen):
         
         card4 = DashboardCard(
             "Proveedores",
-            db.get_total_proveedores(),
+            valores['proveedores'],
             "account-group",
             "proveedores"
         )
@@ -185,7 +214,7 @@ class DashboardScreen(MDScreen):
         
         card5 = DashboardCard(
             "Superficie",
-            f"{db.get_superficie_total()} ha",
+            valores['superficie'],
             "nature",
             "superficie"
         )
@@ -231,16 +260,146 @@ class DashboardScreen(MDScreen):
         grid4.add_widget(card8)
         content.add_widget(grid4)
         
+        # Grid de tarjetas - Fila 5
+        grid5 = GridLayout(
+            cols=2,
+            spacing=dp(15),
+            size_hint_y=None,
+            height=dp(150)
+        )
+        
+        # El saldo mínimo lo completa el proyectador cuando termina de calcular
+        self.flujo_card = card9 = DashboardCard(
+            f"Saldo Mínimo {proyeccion.HORIZONTE} días",
+            "...",
+            "finance",
+            "flujo"
+        )
+        card9.bind(on_press=lambda x: self.navigate_to('flujo'))
+        
+        grid5.add_widget(card9)
+        content.add_widget(grid5)
+        
         scroll.add_widget(content)
         layout.add_widget(scroll)
         
         self.add_widget(layout)
+        
+        self.kpi_cards = {
+            'cheques_proximos': card1,
+            'gastos_mes': card2,
+            'ingresos_mes': card3,
+            'proveedores': card4,
+            'superficie': card5,
+        }
+        eventos.suscribir(
+            ('gastos', 'ingresos', 'proveedores', 'superficie'),
+            self.on_cambios
+        )
+        
+        # El conteo de cheques próximos lo lleva el programador de vencimientos:
+        # cambia con cada alta, cobro o baja y al cruzar un umbral, sin consultas
+        self.programador = vencimientos.get_programador()
+        self.programador.bind(
+            proximos=self.show_cheques_proximos,
+            cargado=self.show_cheques_proximos
+        )
+        
+        # Proyección de fondos: un cambio en un cheque se aplica sin recalcularla
+        self.proyectador = proyeccion.get_proyectador()
+        self.proyectador.bind(version=self.show_flujo)
+    
+    @staticmethod
+    def format_kpis(kpis):
+        """Texto de cada tarjeta a partir de los KPIs"""
+        return {
+            'cheques_proximos': kpis['cheques_proximos'],
+            'gastos_mes': f"${kpis['gastos_mes']:,.0f}",
+            'ingresos_mes': f"${kpis['ingresos_mes']:,.0f}",
+            'proveedores': kpis['proveedores'],
+            'superficie': f"{kpis['superficie']} ha",
+        }
+    
+    def on_enter(self, *args):
+        """Al volver al dashboard, refrescar las tarjetas si cambiaron los datos"""
+        self.refresh_kpis()
+    
+    def on_cambios(self, cambios):
+        # El caché de KPIs ya quedó invalidado por el commit
+        self.refresh_kpis()
+    
+    def refresh_kpis(self):
+        db_worker.run_async(
+            database.get_db().get_dashboard_kpis,
+            on_result=self.show_kpis,
+            clave='dashboard'
+        )
+    
+    def show_kpis(self, kpis):
+        # Misma instantánea en caché: no hay nada que redibujar
+        if kpis is self._kpis:
+            return
+        self._kpis = kpis
+        for clave, valor in self.format_kpis(kpis).items():
+            if clave == 'cheques_proximos' and self.programador.cargado:
+                continue
+            self.kpi_cards[clave].set_value(valor)
+    
+    def show_cheques_proximos(self, *args):
+        if self.programador.cargado:
+            self.kpi_cards['cheques_proximos'].set_value(self.programador.proximos)
+    
+    def show_flujo(self, *args):
+        _, minimo = self.proyectador.proyeccion.minimo()
+        self.flujo_card.set_value(f"${minimo:,.0f}")
     
     def navigate_to(self, screen_name):
         """Navegar a una pantalla específica"""
         self.manager.current = screen_name
 
 
+class GestorPantallas(MDScreenManager):
+    """ScreenManager que construye cada pantalla registrada la primera vez
+    que se navega hacia ella"""
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._fabricas = {}
+        self._pendientes = []
+    
+    def registrar(self, nombre, ruta):
+        """Registrar una pantalla perezosa ('modulo.Clase')"""
+        self._fabricas[nombre] = ruta
+    
+    def construir(self, nombre):
+        """Obtener la pantalla, importándola y creándola si hace falta"""
+        if self.has_screen(nombre):
+            return self.get_screen(nombre)
+        modulo, clase = self._fabricas[nombre].rsplit('.', 1)
+        pantalla = getattr(importlib.import_module(modulo), clase)()
+        self.add_widget(pantalla)
+        return pantalla
+    
+    def on_current(self, instance, value):
+        if value in self._fabricas and not self.has_screen(value):
+            self.construir(value)
+        super().on_current(instance, value)
+    
+    def precalentar(self, nombres):
+        """Construir pantallas de a una, solo en frames ociosos"""
+        self._pendientes = [nombre for nombre in nombres if nombre in self._fabricas]
+        Clock.schedule_once(self._precalentar_siguiente, INTERVALO_PRECALENTADO)
+    
+    def _precalentar_siguiente(self, dt):
+        while self._pendientes and self.has_screen(self._pendientes[0]):
+            self._pendientes.pop(0)
+        if not self._pendientes:
+            return
+        # Con la interfaz ocupada (animación, scroll) se vuelve a intentar después
+        if Clock.frametime <= FRAME_OCIOSO:
+            self.construir(self._pendientes.pop(0))
+        Clock.schedule_once(self._precalentar_siguiente, INTERVALO_PRECALENTADO)
+
+
 class AgroManagerApp(MDApp):
     """Aplicación principal"""
     def build(self):
@@ -248,24 +407,39 @@ class AgroManagerApp(MDApp):
         self.theme_cls.theme_style = "Light"
         
         # Inicializar base de datos
-        db = database.DatabaseManager()
-        db.init_db()
+        database.get_db().init_db()
         
-        # Screen Manager
-        sm = MDScreenManager()
+        # Los gráficos ya dibujados se reutilizan también entre ejecuciones
+        matplotlib_wrapper.cache.configurar(carpeta=os.path.join(self.user_data_dir, 'graficos'))
         
-        # Agregar pantallas
+        # Screen Manager: solo el dashboard se construye al iniciar
+        sm = GestorPantallas()
         sm.add_widget(DashboardScreen())
-        sm.add_widget(cheques.ChequesScreen())
-        sm.add_widget(proveedores.ProveedoresScreen())
-        sm.add_widget(gastos.GastosScreen())
-        sm.add_widget(ingresos.IngresosScreen())
-        sm.add_widget(margenes.MargenesScreen())
-        sm.add_widget(superficie.SuperficieScreen())
-        sm.add_widget(mercado.MercadoScreen())
-        sm.add_widget(tambo.TamboScreen())
+        for nombre, ruta in PANTALLAS.items():
+            sm.registrar(nombre, ruta)
         
         return sm
+    
+    def on_start(self):
+        """Preparar el resto de las pantallas una vez dibujado el dashboard"""
+        Clock.schedule_once(lambda dt: self.root.precalentar(PRECALENTAR), 1)
+        vencimientos.get_programador().iniciar()
+        proyeccion.get_proyectador().iniciar()
+    
+    def on_resume(self):
+        """Con la aplicación en pausa el reloj no avanza: revisar vencimientos y proyección"""
+        vencimientos.get_programador().revisar()
+        proyeccion.get_proyectador().revisar()
+        if self.root.has_screen('cheques'):
+            self.root.get_screen('cheques').revisar_dia()
+    
+    def on_stop(self):
+        """Detener gráficos y consultas de fondo y cerrar las conexiones al salir"""
+        vencimientos.get_programador().detener()
+        proyeccion.get_proyectador().detener()
+        matplotlib_wrapper.shutdown()
+        db_worker.shutdown()
+        database.close_all()
 
 
 if __name__ == '__main__':
@@ -7,17 +7,18 @@ from datetime import datetime
 from kivy.metrics import dp
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.scrollview import ScrollView
-from kivy.uix.widget import Widget
-from kivymd.uix.button import MDFlatButton, MDRaisedButton
+from kivymd.uix.button import MDRaisedButton
 from kivymd.uix.card import MDCard
 from kivymd.uix.dialog import MDDialog
 from kivymd.uix.label import MDLabel
 from kivymd.uix.list import MDList, ThreeLineListItem
 from kivymd.uix.screen import MDScreen
-from kivymd.uix.textfield import MDTextField
 from kivymd.uix.toolbar import MDTopAppBar
 
 import database
+import db_worker
+import eventos
+import formularios
 
 
 class MargenCard(MDCard):
@@ -32,7 +33,7 @@ class MargenCard(MDCard):
         self.elevation = 2
         self.md_bg_color = color
         
-        titulo_lbl = MDLabel(
+        self.titulo_lbl = titulo_lbl = MDLabel(
             text=titulo,
             halign='left',
             theme_text_color="Custom",
@@ -40,7 +41,7 @@ class MargenCard(MDCard):
             font_style='Caption'
         )
         
-        valor_lbl = MDLabel(
+        self.valor_lbl = valor_lbl = MDLabel(
             text=valor,
             halign='left',
             theme_text_color="Custom",
@@ -51,6 +52,13 @@ class MargenCard(MDCard):
         
         self.add_widget(titulo_lbl)
         self.add_widget(valor_lbl)
+    
+    def set_value(self, valor, titulo=None):
+        """Cambiar el valor (y opcionalmente el título) sin recrear la tarjeta"""
+        if self.valor_lbl.text != valor:
+            self.valor_lbl.text = valor
+        if titulo is not None and self.titulo_lbl.text != titulo:
+            self.titulo_lbl.text = titulo
 
 
 class MargenesScreen(MDScreen):
@@ -81,62 +89,17 @@ class MargenesScreen(MDScreen):
         )
         content.bind(minimum_height=content.setter('height'))
         
-        # Resumen de indicadores
-        db = database.DatabaseManager()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        # Calcular totales
-        cursor.execute('SELECT SUM(monto) FROM ingresos')
-        total_ingresos = cursor.fetchone()[0] or 0
-        
-        cursor.execute('SELECT SUM(monto) FROM gastos')
-        total_gastos = cursor.fetchone()[0] or 0
-        
-        margen_total = total_ingresos - total_gastos
-        porcentaje_margen = (margen_total / total_ingresos * 100) if total_ingresos > 0 else 0
-        
-        # Tarjetas de resumen
-        card1 = MargenCard(
-            "Ingresos Totales",
-            f"${total_ingresos:,.0f}",
-            (0.2, 0.7, 0.3, 1)
-        )
-        content.add_widget(card1)
-        
-        card2 = MargenCard(
-            "Gastos Totales",
-            f"${total_gastos:,.0f}",
-            (0.9, 0.3, 0.3, 1)
-        )
-        content.add_widget(card2)
-        
-        card3 = MargenCard(
-            "Margen Neto",
-            f"${margen_total:,.0f}",
-            (0.2, 0.5, 0.8, 1)
-        )
-        content.add_widget(card3)
-        
-        card4 = MargenCard(
-            "Rentabilidad",
-            f"{porcentaje_margen:.1f}%",
-            (0.6, 0.4, 0.8, 1)
-        )
-        content.add_widget(card4)
-        
-        # Cálculo por hectárea
-        cursor.execute('SELECT SUM(hectareas) FROM superficie')
-        total_hectareas = cursor.fetchone()[0] or 1
-        
-        margen_por_ha = margen_total / total_hectareas if total_hectareas > 0 else 0
-        
-        card5 = MargenCard(
-            f"Margen por Hectárea ({total_hectareas:.0f} ha)",
-            f"${margen_por_ha:,.0f}/ha",
-            (0.3, 0.6, 0.7, 1)
-        )
-        content.add_widget(card5)
+        # Tarjetas de resumen; los valores llegan cuando termina la lectura
+        self.cards = {
+            'ingresos': MargenCard("Ingresos Totales", "...", (0.2, 0.7, 0.3, 1)),
+            'gastos': MargenCard("Gastos Totales", "...", (0.9, 0.3, 0.3, 1)),
+            'margen': MargenCard("Margen Neto", "...", (0.2, 0.5, 0.8, 1)),
+            'rentabilidad': MargenCard("Rentabilidad", "...", (0.6, 0.4, 0.8, 1)),
+            # Cálculo por hectárea
+            'por_hectarea': MargenCard("Margen por Hectárea", "...", (0.3, 0.6, 0.7, 1)),
+        }
+        for card in self.cards.values():
+            content.add_widget(card)
         
         # Botón para calcular margen personalizado
         btn_calcular = MDRaisedButton(
@@ -157,138 +120,120 @@ class MargenesScreen(MDScreen):
         )
         content.add_widget(titulo_cat)
         
-        # Ingresos por categoría
-        cursor.execute('''
-            SELECT categoria, SUM(monto) as total
-            FROM ingresos
-            GROUP BY categoria
-        ''')
-        ingresos_cat = cursor.fetchall()
-        
-        # Gastos por categoría
-        cursor.execute('''
-            SELECT categoria, SUM(monto) as total
-            FROM gastos
-            GROUP BY categoria
-        ''')
-        gastos_cat = cursor.fetchall()
-        
-        # Crear diccionarios para cálculo
-        ing_dict = {row['categoria']: row['total'] for row in ingresos_cat}
-        gas_dict = {row['categoria']: row['total'] for row in gastos_cat}
-        
-        # Mostrar análisis por categoría
-        categorias = set(list(ing_dict.keys()) + list(gas_dict.keys()))
-        
+        # Una fila por categoría, que se actualiza cuando cambian sus totales
         self.analisis_list = MDList()
-        for cat in categorias:
-            ing = ing_dict.get(cat, 0)
-            gas = gas_dict.get(cat, 0)
-            margen = ing - gas
-            
-            item = ThreeLineListItem(
-                text=f"{cat.title()}",
-                secondary_text=f"Ingresos: ${ing:,.0f} | Gastos: ${gas:,.0f}",
-                tertiary_text=f"Margen: ${margen:,.0f}"
-            )
-            self.analisis_list.add_widget(item)
+        self.categoria_items = {}
+        # Resumen de indicadores (leído del resumen mensual en segundo plano)
+        self.on_cambios(())
         
         content.add_widget(self.analisis_list)
         
         scroll.add_widget(content)
         layout.add_widget(scroll)
         self.add_widget(layout)
+        
+        # Los totales se recalculan cuando se confirman gastos, ingresos o cultivos
+        eventos.suscribir(('gastos', 'ingresos', 'superficie'), self.on_cambios)
+        
+        # La calculadora y el diálogo del resultado se arman una sola vez
+        self.calculadora = formularios.Formulario(
+            "Calcular Margen",
+            [
+                formularios.Texto('producto', "Producto/Cultivo", obligatorio=True),
+                formularios.Texto('cantidad', "Cantidad (ha/kg/unidades)", filtro='float', obligatorio=True),
+                formularios.Texto('costo', "Costo Total", filtro='float', obligatorio=True),
+                formularios.Texto('ingreso', "Ingreso Total", filtro='float', obligatorio=True),
+            ],
+            self.calculate_margin,
+            texto_aceptar="CALCULAR",
+            espacio=dp(30)
+        )
+        self.calculadora.preparar()
+        self.result_dialog = None
     
     def go_back(self):
         self.manager.current = 'dashboard'
     
+    @staticmethod
+    def calcular_resumen():
+        """Totales, márgenes y detalle por categoría (desde el resumen mensual)"""
+        db = database.get_db()
+        ingresos_cat = db.get_resumen_por_categoria('ingresos')
+        gastos_cat = db.get_resumen_por_categoria('gastos')
+        
+        total_ingresos = sum(row['total'] for row in ingresos_cat)
+        total_gastos = sum(row['total'] for row in gastos_cat)
+        total_hectareas = db.get_superficie_total() or 1
+        margen_total = total_ingresos - total_gastos
+        
+        ing_dict = {row['categoria']: row['total'] for row in ingresos_cat}
+        gas_dict = {row['categoria']: row['total'] for row in gastos_cat}
+        return {
+            'ingresos': total_ingresos,
+            'gastos': total_gastos,
+            'margen': margen_total,
+            'rentabilidad': (margen_total / total_ingresos * 100) if total_ingresos > 0 else 0,
+            'hectareas': total_hectareas,
+            'por_hectarea': margen_total / total_hectareas if total_hectareas > 0 else 0,
+            'categorias': {
+                cat: (ing_dict.get(cat, 0), gas_dict.get(cat, 0))
+                for cat in set(ing_dict) | set(gas_dict)
+            },
+        }
+    
+    def on_cambios(self, cambios):
+        """Recalcular los totales en segundo plano"""
+        db_worker.run_async(self.calcular_resumen, on_result=self.show_resumen, clave='margenes')
+    
+    def show_resumen(self, resumen):
+        """Actualizar solo las tarjetas y filas cuyos valores cambiaron"""
+        self.cards['ingresos'].set_value(f"${resumen['ingresos']:,.0f}")
+        self.cards['gastos'].set_value(f"${resumen['gastos']:,.0f}")
+        self.cards['margen'].set_value(f"${resumen['margen']:,.0f}")
+        self.cards['rentabilidad'].set_value(f"{resumen['rentabilidad']:.1f}%")
+        self.cards['por_hectarea'].set_value(
+            f"${resumen['por_hectarea']:,.0f}/ha",
+            titulo=f"Margen por Hectárea ({resumen['hectareas']:.0f} ha)"
+        )
+        
+        for cat, (ing, gas) in resumen['categorias'].items():
+            secundario = f"Ingresos: ${ing:,.0f} | Gastos: ${gas:,.0f}"
+            terciario = f"Margen: ${ing - gas:,.0f}"
+            item = self.categoria_items.get(cat)
+            if item is None:
+                item = self.categoria_items[cat] = ThreeLineListItem(text=f"{cat.title()}")
+                self.analisis_list.add_widget(item)
+            if item.secondary_text != secundario:
+                item.secondary_text = secundario
+                item.tertiary_text = terciario
+        for cat in set(self.categoria_items) - set(resumen['categorias']):
+            self.analisis_list.remove_widget(self.categoria_items.pop(cat))
+    
     def show_margin_calculator(self, *args):
         """Mostrar calculadora de margen personalizada"""
-        content = BoxLayout(orientation='vertical', spacing=dp(10), size_hint_y=None)
-        content.bind(minimum_height=content.setter('height'))
-        content.add_widget(Widget(size_hint_y=None, height=dp(30)))
-
-        
-        self.producto_field = MDTextField(
-            hint_text="Producto/Cultivo",
-            size_hint_y=None,
-            height=dp(50)
-        )
-        
-        self.cantidad_field = MDTextField(
-            hint_text="Cantidad (ha/kg/unidades)",
-            input_filter='float',
-            size_hint_y=None,
-            height=dp(50)
-        )
-        
-        self.costo_field = MDTextField(
-            hint_text="Costo Total",
-            input_filter='float',
-            size_hint_y=None,
-            height=dp(50)
-        )
-        
-        self.ingreso_field = MDTextField(
-            hint_text="Ingreso Total",
-            input_filter='float',
-            size_hint_y=None,
-            height=dp(50)
-        )
-        
-        content.add_widget(self.producto_field)
-        content.add_widget(self.cantidad_field)
-        content.add_widget(self.costo_field)
-        content.add_widget(self.ingreso_field)
-        
-        self.calc_dialog = MDDialog(
-            title="Calcular Margen",
-            type="custom",
-            content_cls=content,
-            buttons=[
-                MDFlatButton(text="CANCELAR", on_press=lambda x: self.calc_dialog.dismiss()),
-                MDRaisedButton(text="CALCULAR", on_press=self.calculate_margin),
-            ],
-        )
-        self.calc_dialog.open()
+        self.calculadora.abrir()
     
-    def calculate_margin(self, *args):
+    def calculate_margin(self, valores):
         """Calcular y guardar margen"""
-        if not all([
-            self.producto_field.text,
-            self.cantidad_field.text,
-            self.costo_field.text,
-            self.ingreso_field.text
-        ]):
-            return
-        
-        cantidad = float(self.cantidad_field.text)
-        costo = float(self.costo_field.text)
-        ingreso = float(self.ingreso_field.text)
+        cantidad = valores['cantidad']
+        costo = valores['costo']
+        ingreso = valores['ingreso']
         margen = ingreso - costo
         
-        db = database.DatabaseManager()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO margenes (tipo, cultivo_producto, hectareas_cantidad, costo_total, ingreso_total, margen, fecha)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
+        db = database.get_db()
+        db.encolar(
+            db.insertar_margen,
             'personalizado',
-            self.producto_field.text,
+            valores['producto'],
             cantidad,
             costo,
             ingreso,
-            margen,
-            datetime.now().strftime('%Y-%m-%d')
-        ))
-        
-        conn.commit()
+            datetime.now()
+        )
         
         # Mostrar resultado
         resultado = f"""
-Producto: {self.producto_field.text}
+Producto: {valores['producto']}
 Cantidad: {cantidad}
 Costo Total: ${costo:,.0f}
 Ingreso Total: ${ingreso:,.0f}
@@ -296,13 +241,14 @@ Margen: ${margen:,.0f}
 Margen Unitario: ${margen/cantidad:,.2f}
         """
         
-        result_dialog = MDDialog(
-            title="Resultado del Cálculo",
-            text=resultado,
-            buttons=[
-                MDRaisedButton(text="OK", on_press=lambda x: result_dialog.dismiss())
-            ],
-        )
-        
-        self.calc_dialog.dismiss()
-        result_dialog.open()
\ No newline at end of file
+        if self.result_dialog is None:
+            self.result_dialog = MDDialog(
+                title="Resultado del Cálculo",
+                text=resultado,
+                buttons=[
+                    MDRaisedButton(text="OK", on_press=lambda x: self.result_dialog.dismiss())
+                ],
+            )
+        else:
+            self.result_dialog.text = resultado
+        self.result_dialog.open()
\ No newline at end of file
@@ -1,34 +1,417 @@
 """
 Wrapper simple para matplotlib que funciona con Kivy
 Alternativa a kivy-garden.matplotlib
+Matplotlib se importa recién al crear el primer gráfico (ver diferido.py)
 """
 
-import matplotlib
+import hashlib
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from kivy.clock import Clock
 from kivy.core.image import Image as CoreImage
+from kivy.graphics.texture import Texture
+from kivy.metrics import Metrics
+from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.image import Image
+from kivymd.uix.label import MDLabel
 
-matplotlib.use('Agg')
-from io import BytesIO
+import db_worker
+import diferido
+
+
+def _usar_agg():
+    """Elegir el backend Agg antes de importar pyplot"""
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+plt = diferido.importar('matplotlib.pyplot', antes=_usar_agg)
+
+# API orientada a objetos, sin pyplot, para dibujar fuera del hilo principal
+_figure = diferido.importar('matplotlib.figure', antes=_usar_agg)
+_backend_agg = diferido.importar('matplotlib.backends.backend_agg', antes=_usar_agg)
+
+# Resolución de los gráficos con densidad 1; se multiplica por la de la pantalla
+DPI = 100
+
+# Espera tras el último cambio de tamaño antes de redibujar (al rotar llegan varios)
+ESPERA_REDIMENSION = 0.3
+
+# Por debajo de este tamaño (en píxeles) el widget todavía no está acomodado
+TAMANO_MINIMO = 32
+
+# Imágenes (píxeles RGBA) que se mantienen en memoria
+MAX_IMAGENES = 16
+
+# Imágenes que se mantienen en disco (si la caché en disco está activada)
+MAX_ARCHIVOS = 64
+
+# Compresión de los píxeles en disco: los gráficos son mayormente fondo
+# blanco y con el nivel 1 se comprimen mucho sin pasar por PNG
+NIVEL_COMPRESION = 1
+_CABECERA = struct.Struct('<4sII')
+_MARCA = b'RGBA'
+
+# Cambiar al modificar cómo se dibuja un gráfico, para descartar las imágenes viejas
+VERSION_GRAFICOS = 2
+
+
+def dpi_pantalla():
+    """DPI para que el texto de los gráficos tenga el mismo tamaño físico en cualquier pantalla"""
+    return DPI * Metrics.density
+
+
+def tamano_pixeles(widget):
+    """(ancho, alto) enteros del widget, o None si todavía no tiene tamaño útil"""
+    ancho, alto = int(widget.width), int(widget.height)
+    if ancho < TAMANO_MINIMO or alto < TAMANO_MINIMO:
+        return None
+    return ancho, alto
 
 
 class MatplotlibWidget(Image):
-    """Widget simple que muestra un gráfico de matplotlib"""
-    
-    def __init__(self, figure, **kwargs):
+    """Imagen de un gráfico ya rasterizado.
+
+    Conserva su propia textura: un gráfico nuevo (de la caché o recién
+    dibujado) con el mismo tamaño y formato se copia sobre ella con
+    blit_buffer en lugar de crear otra.
+    """
+
+    def __init__(self, **kwargs):
+        # Mientras se espera el redibujo la imagen anterior se escala
+        kwargs.setdefault('allow_stretch', True)
         super().__init__(**kwargs)
-        self.figure = figure
-        self.draw()
-    
-    def draw(self):
-        """Renderizar el gráfico como imagen"""
-        # Guardar el gráfico en un buffer
-        buf = BytesIO()
-        self.figure.savefig(buf, format='png', dpi=100, bbox_inches='tight')
-        buf.seek(0)
-        
-        # Cargar como textura de Kivy
-        core_image = CoreImage(buf, ext='png')
-        self.texture = core_image.texture
-        
-        # Cerrar buffer
-        buf.close()
\ No newline at end of file
+
+    def mostrar(self, ancho, alto, pixeles):
+        textura = self.texture
+        if textura is not None and textura.size == (ancho, alto) and textura.colorfmt == 'rgba':
+            cargar_pixeles(textura, pixeles)
+            self.canvas.ask_update()
+        else:
+            self.texture = textura_rgba(ancho, alto, pixeles)
+
+
+class GraficoWidget(BoxLayout):
+    """Gráfico dibujado en segundo plano al tamaño real del widget.
+
+    Muestra un aviso hasta tener la primera imagen. Si después cambia de
+    tamaño (rotación, ventana) se pide otra, una sola vez cuando el tamaño
+    deja de cambiar; mientras tanto se escala la anterior.
+    """
+
+    def __init__(self, tipo, datos, dibujar, clave=None, **kwargs):
+        super().__init__(**kwargs)
+        self.tipo = tipo
+        self.datos = datos
+        self.dibujar = dibujar
+        self.clave = clave
+        self.imagen = None
+        # Tamaño del último pedido, para no repetirlo
+        self._tamano = None
+        self.add_widget(MDLabel(
+            text="Generando gráfico...",
+            halign='center',
+            theme_text_color='Secondary'
+        ))
+        # El primero se pide apenas el widget esté acomodado, los demás con espera
+        self._primero = Clock.create_trigger(self.renderizar)
+        self._redimensionar = Clock.create_trigger(self.renderizar, ESPERA_REDIMENSION)
+        self.bind(size=self._on_size)
+        self._primero()
+
+    def _on_size(self, *args):
+        if self._tamano is None:
+            self._primero()
+        else:
+            self._redimensionar()
+
+    def renderizar(self, *args):
+        """Pedir la imagen para el tamaño actual (de la caché o dibujándola)"""
+        tamano = tamano_pixeles(self)
+        if tamano is None or tamano == self._tamano:
+            return
+        self._tamano = tamano
+        dpi = dpi_pantalla()
+        clave_cache = clave_grafico(self.tipo, self.datos, tamano, dpi)
+        imagen = cache.imagen(clave_cache)
+        if imagen is not None:
+            _nueva_generacion(self.clave)
+            self.mostrar(*imagen)
+            return
+
+        vigente = _nueva_generacion(self.clave)
+
+        def listo(resultado):
+            # Un acierto de la caché posterior no cancela el dibujo en curso:
+            # su imagen vieja no debe reemplazar a la que ya se muestra
+            if resultado is not None and vigente():
+                self.mostrar(*resultado)
+
+        figsize = (tamano[0] / dpi, tamano[1] / dpi)
+        db_worker.run_async(
+            _renderizar, self.dibujar, self.datos, figsize, dpi, vigente, clave_cache,
+            on_result=listo,
+            clave=self.clave,
+            executor=_get_executor()
+        )
+
+    def mostrar(self, ancho, alto, pixeles):
+        if self.imagen is None:
+            self.clear_widgets()
+            self.imagen = MatplotlibWidget()
+            self.add_widget(self.imagen)
+        self.imagen.mostrar(ancho, alto, pixeles)
+
+
+def rasterizar(figure):
+    """(ancho, alto, píxeles RGBA) de una figura, sin copiar el buffer de Agg"""
+    canvas = figure.canvas
+    if not hasattr(canvas, 'buffer_rgba'):
+        canvas = _backend_agg.FigureCanvasAgg(figure)
+    canvas.draw()
+    ancho, alto = canvas.get_width_height(physical=True)
+    # Vista de una dimensión sobre la memoria del renderer
+    return ancho, alto, memoryview(canvas.buffer_rgba()).cast('B')
+
+
+def textura_rgba(ancho, alto, pixeles):
+    """Textura nueva con píxeles RGBA (fila superior primero, como Agg)"""
+    textura = Texture.create(size=(ancho, alto), colorfmt='rgba')
+    # Agg empieza por la fila de arriba y OpenGL por la de abajo
+    textura.flip_vertical()
+    cargar_pixeles(textura, pixeles)
+    return textura
+
+
+def cargar_pixeles(textura, pixeles):
+    textura.blit_buffer(pixeles, colorfmt='rgba', bufferfmt='ubyte')
+
+
+def figura_a_png(figure):
+    """Imagen PNG de una figura (camino anterior, se mantiene para comparar)"""
+    buf = BytesIO()
+    figure.savefig(buf, format='png', dpi=figure.dpi, bbox_inches='tight')
+    return buf.getvalue()
+
+
+def textura_png(png):
+    """Textura de Kivy a partir de los bytes de un PNG"""
+    buf = BytesIO(png)
+    try:
+        return CoreImage(buf, ext='png').texture
+    finally:
+        buf.close()
+
+
+def comprimir(ancho, alto, pixeles):
+    """Píxeles RGBA en el formato de la caché en disco"""
+    return _CABECERA.pack(_MARCA, ancho, alto) + zlib.compress(pixeles, NIVEL_COMPRESION)
+
+
+def descomprimir(datos):
+    """(ancho, alto, píxeles) guardados con comprimir(), o None si el archivo no es válido"""
+    if len(datos) < _CABECERA.size:
+        return None
+    marca, ancho, alto = _CABECERA.unpack_from(datos)
+    if marca != _MARCA:
+        return None
+    try:
+        pixeles = zlib.decompress(memoryview(datos)[_CABECERA.size:])
+    except zlib.error:
+        return None
+    if len(pixeles) != ancho * alto * 4:
+        return None
+    return ancho, alto, pixeles
+
+
+def clave_grafico(tipo, datos, tamano, dpi):
+    """Hash del tipo de gráfico, sus datos, tamaño en píxeles y resolución"""
+    contenido = repr((VERSION_GRAFICOS, tipo, datos, tuple(tamano), dpi))
+    return hashlib.sha1(contenido.encode('utf-8')).hexdigest()
+
+
+class CacheGraficos:
+    """Imágenes de gráficos ya dibujados, por contenido.
+
+    En memoria se guarda un LRU de píxeles RGBA, que cada widget copia a su
+    propia textura; opcionalmente, también se escriben comprimidos en una
+    carpeta para reutilizarlos entre ejecuciones.
+    """
+
+    def __init__(self, max_imagenes=MAX_IMAGENES, carpeta=None, max_archivos=MAX_ARCHIVOS):
+        self.max_imagenes = max_imagenes
+        self.carpeta = carpeta
+        self.max_archivos = max_archivos
+        self._imagenes = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def configurar(self, carpeta=None, max_imagenes=None):
+        """Activar la caché en disco y/o cambiar el tamaño del LRU"""
+        if carpeta is not None:
+            os.makedirs(carpeta, exist_ok=True)
+            self.carpeta = carpeta
+        if max_imagenes is not None:
+            self.max_imagenes = max_imagenes
+            self._recortar()
+
+    def imagen(self, clave):
+        """(ancho, alto, píxeles) guardados (en memoria o en disco) o None"""
+        with self._lock:
+            imagen = self._imagenes.get(clave)
+            if imagen is not None:
+                self._imagenes.move_to_end(clave)
+                self.aciertos += 1
+                return imagen
+
+        imagen = self._leer(clave)
+        with self._lock:
+            if imagen is None:
+                self.fallos += 1
+                return None
+            self.aciertos += 1
+        self._agregar(clave, imagen)
+        return imagen
+
+    def guardar(self, clave, ancho, alto, pixeles):
+        """Guardar una copia de un gráfico recién rasterizado y devolverla"""
+        imagen = (ancho, alto, bytes(pixeles))
+        self._agregar(clave, imagen)
+        if self.carpeta:
+            self._escribir(clave, comprimir(*imagen))
+        return imagen
+
+    def vaciar(self):
+        with self._lock:
+            self._imagenes.clear()
+
+    def _agregar(self, clave, imagen):
+        with self._lock:
+            self._imagenes[clave] = imagen
+            self._imagenes.move_to_end(clave)
+        self._recortar()
+
+    def _recortar(self):
+        with self._lock:
+            while len(self._imagenes) > self.max_imagenes:
+                self._imagenes.popitem(last=False)
+
+    def _ruta(self, clave):
+        return os.path.join(self.carpeta, f'{clave}.rgba')
+
+    def _leer(self, clave):
+        if not self.carpeta:
+            return None
+        try:
+            with open(self._ruta(clave), 'rb') as archivo:
+                imagen = descomprimir(archivo.read())
+        except OSError:
+            return None
+        if imagen is None:
+            return None
+        # Marca de uso para conservar los más recientes al podar
+        try:
+            os.utime(self._ruta(clave))
+        except OSError:
+            pass
+        return imagen
+
+    def _escribir(self, clave, datos):
+        try:
+            temporal = self._ruta(clave) + '.tmp'
+            with open(temporal, 'wb') as archivo:
+                archivo.write(datos)
+            os.replace(temporal, self._ruta(clave))
+            self._podar()
+        except OSError:
+            # La caché en disco es opcional: sin espacio o permisos se sigue sin ella
+            pass
+
+    def _podar(self):
+        archivos = [
+            os.path.join(self.carpeta, nombre)
+            for nombre in os.listdir(self.carpeta) if nombre.endswith('.rgba')
+        ]
+        if len(archivos) <= self.max_archivos:
+            return
+        archivos.sort(key=os.path.getmtime)
+        for ruta in archivos[:len(archivos) - self.max_archivos]:
+            os.remove(ruta)
+
+
+cache = CacheGraficos()
+
+
+# Matplotlib no es seguro entre hilos: todos los gráficos se dibujan en uno solo
+_executor = None
+_lock_executor = threading.Lock()
+
+# Último pedido por clave, para abandonar los dibujos reemplazados
+_generaciones = {}
+
+
+def _get_executor():
+    global _executor
+    with _lock_executor:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='agromanager-graficos')
+        return _executor
+
+
+def _nueva_generacion(clave):
+    """Función que indica si el pedido sigue siendo el último de su clave"""
+    if clave is None:
+        return lambda: True
+    with _lock_executor:
+        generacion = _generaciones.get(clave, 0) + 1
+        _generaciones[clave] = generacion
+    return lambda: _generaciones.get(clave) == generacion
+
+
+def _renderizar(dibujar, datos, figsize, dpi, vigente, clave_cache):
+    """Armar y rasterizar la figura (en el hilo de gráficos).
+
+    Devuelve (ancho, alto, píxeles) ya guardados en la caché, así la copia
+    del buffer de Agg y la escritura en disco no ocupan el hilo principal.
+    None si se abandonó.
+    """
+    if not vigente():
+        return None
+    fig = _figure.Figure(figsize=figsize, dpi=dpi, facecolor='white')
+    _backend_agg.FigureCanvasAgg(fig)
+    dibujar(fig, datos)
+    # Armar la figura es lo más caro después de rasterizar: se vuelve a comprobar
+    if not vigente():
+        return None
+    return cache.guardar(clave_cache, *rasterizar(fig))
+
+
+def crear_grafico(tipo, datos, dibujar, clave=None, **kwargs):
+    """Widget con el gráfico que dibujar(fig, datos) arma.
+
+    La figura toma el tamaño en píxeles del widget y la densidad de la
+    pantalla. Si ya se dibujó un gráfico del mismo tipo, con los mismos
+    datos, tamaño y resolución, se reutiliza su textura sin pasar por
+    matplotlib. Si no, la figura se arma y rasteriza en segundo plano y
+    mientras tanto se ve un aviso. Un pedido nuevo con la misma clave
+    abandona al anterior. datos debe contener solo valores simples
+    (números, textos, listas, tuplas) y dibujar no debe usar pyplot. kwargs
+    va al widget (size_hint, height...).
+    """
+    return GraficoWidget(tipo, datos, dibujar, clave=clave, **kwargs)
+
+
+def shutdown():
+    """Detener el hilo de gráficos descartando los pendientes"""
+    global _executor
+    with _lock_executor:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
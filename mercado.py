@@ -3,8 +3,6 @@ Módulo de consulta de precios de mercado
 Obtiene valores actualizados de dólar, soja, carne, etc.
 """
 
-
-import requests
 from kivy.clock import Clock
 from kivy.metrics import dp
 from kivy.uix.boxlayout import BoxLayout
@@ -15,6 +13,11 @@ from kivymd.uix.label import MDLabel
 from kivymd.uix.screen import MDScreen
 from kivymd.uix.toolbar import MDTopAppBar
 
+import diferido
+
+# requests se importa recién en la primera consulta de precios
+requests = diferido.importar('requests')
+
 
 class PriceCard(MDCard):
     """Tarjeta para mostrar precio"""
@@ -0,0 +1,485 @@
+"""
+Migraciones versionadas del esquema SQLite
+Cada migración se aplica una única vez y la versión queda en PRAGMA user_version
+"""
+
+import re
+import sqlite3
+from contextlib import contextmanager
+
+MIGRACIONES = []
+
+
+def migracion(version, descripcion):
+    """Registrar una función como migración del esquema"""
+    def decorador(funcion):
+        MIGRACIONES.append((version, descripcion, funcion))
+        MIGRACIONES.sort(key=lambda m: m[0])
+        return funcion
+    return decorador
+
+
+def get_version(conn):
+    """Versión de esquema registrada en la base"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def aplicar_migraciones(db):
+    """Aplicar en orden las migraciones pendientes, cada una en su transacción"""
+    aplicadas = []
+    for version, descripcion, funcion in MIGRACIONES:
+        with db.transaction() as conn:
+            if version <= get_version(conn):
+                continue
+            funcion(conn)
+            # user_version se escribe en la cabecera dentro de la misma transacción
+            conn.execute(f'PRAGMA user_version = {int(version)}')
+        aplicadas.append((version, descripcion))
+    return aplicadas
+
+
+@migracion(1, 'Índices para listados y dashboard')
+def _indices_iniciales(conn):
+    indices = (
+        'CREATE INDEX IF NOT EXISTS idx_cheques_estado_vencimiento ON cheques(estado, fecha_vencimiento)',
+        'CREATE INDEX IF NOT EXISTS idx_gastos_fecha ON gastos(fecha)',
+        'CREATE INDEX IF NOT EXISTS idx_gastos_categoria_monto ON gastos(categoria, monto)',
+        'CREATE INDEX IF NOT EXISTS idx_ingresos_fecha ON ingresos(fecha)',
+        'CREATE INDEX IF NOT EXISTS idx_ingresos_categoria_monto ON ingresos(categoria, monto)',
+        'CREATE INDEX IF NOT EXISTS idx_tambo_fecha ON tambo(fecha)',
+        'CREATE INDEX IF NOT EXISTS idx_proveedores_nombre ON proveedores(nombre)',
+        'CREATE INDEX IF NOT EXISTS idx_facturas_proveedor ON facturas(proveedor_id, fecha)',
+    )
+    for sql in indices:
+        conn.execute(sql)
+
+
+# Tablas de movimientos resumidas por mes y categoría en resumen_mensual
+TABLAS_RESUMEN = ('gastos', 'ingresos')
+
+
+def expr_mes(columna):
+    """Expresión SQL 'YYYY-MM' para fechas en texto o en número de día"""
+    return (
+        f"CASE typeof({columna}) WHEN 'integer' "
+        f"THEN strftime('%Y-%m', {columna} * 86400, 'unixepoch') "
+        f"ELSE substr({columna}, 1, 7) END"
+    )
+
+
+def _triggers_resumen(tabla, mes_new='substr(NEW.fecha, 1, 7)', mes_old='substr(OLD.fecha, 1, 7)'):
+    """SQL de los triggers que mantienen resumen_mensual para una tabla"""
+    sumar = f'''
+        INSERT INTO resumen_mensual (tabla, mes, categoria, cantidad, total, total_cuadrados)
+        VALUES ('{tabla}', {mes_new}, NEW.categoria, 1, NEW.monto, NEW.monto * NEW.monto)
+        ON CONFLICT (tabla, mes, categoria) DO UPDATE SET
+            cantidad = cantidad + 1,
+            total = total + excluded.total,
+            total_cuadrados = total_cuadrados + excluded.total_cuadrados;
+    '''
+    restar = f'''
+        UPDATE resumen_mensual SET
+            cantidad = cantidad - 1,
+            total = total - OLD.monto,
+            total_cuadrados = total_cuadrados - OLD.monto * OLD.monto
+        WHERE tabla = '{tabla}' AND mes = {mes_old} AND categoria = OLD.categoria;
+        DELETE FROM resumen_mensual
+        WHERE tabla = '{tabla}' AND mes = {mes_old} AND categoria = OLD.categoria
+            AND cantidad <= 0;
+    '''
+    return (
+        f'CREATE TRIGGER IF NOT EXISTS trg_{tabla}_resumen_ai AFTER INSERT ON {tabla} BEGIN {sumar} END',
+        f'CREATE TRIGGER IF NOT EXISTS trg_{tabla}_resumen_ad AFTER DELETE ON {tabla} BEGIN {restar} END',
+        f'CREATE TRIGGER IF NOT EXISTS trg_{tabla}_resumen_au AFTER UPDATE OF categoria, monto, fecha '
+        f'ON {tabla} BEGIN {restar} {sumar} END',
+    )
+
+
+@migracion(2, 'Resumen mensual de gastos e ingresos mantenido por triggers')
+def _resumen_mensual(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS resumen_mensual (
+            tabla TEXT NOT NULL,
+            mes TEXT NOT NULL,
+            categoria TEXT NOT NULL,
+            cantidad INTEGER NOT NULL DEFAULT 0,
+            total REAL NOT NULL DEFAULT 0,
+            total_cuadrados REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (tabla, mes, categoria)
+        ) WITHOUT ROWID
+    ''')
+    for tabla in TABLAS_RESUMEN:
+        for sql in _triggers_resumen(tabla):
+            conn.execute(sql)
+    # Cargar el resumen con los movimientos existentes
+    _recalcular_resumen(conn)
+
+
+def _recalcular_resumen(conn):
+    """Reconstruir resumen_mensual desde los movimientos"""
+    conn.execute('DELETE FROM resumen_mensual')
+    for tabla in TABLAS_RESUMEN:
+        _sumar_resumen(conn, tabla)
+
+
+def _sumar_resumen(conn, tabla, desde_id=0):
+    """Agregar al resumen los movimientos con id mayor a desde_id.
+
+    Con montos en centavos la suma de cuadrados es entera y exacta; si un
+    grupo supera el rango de INTEGER se vuelve a sumar en REAL.
+    """
+    try:
+        _insertar_resumen(conn, tabla, desde_id, 'SUM(monto * monto)')
+    except sqlite3.OperationalError as e:
+        if 'overflow' not in str(e):
+            raise
+        _insertar_resumen(conn, tabla, desde_id, 'SUM(CAST(monto AS REAL) * monto)')
+
+
+def _insertar_resumen(conn, tabla, desde_id, suma_cuadrados):
+    conn.execute(f'''
+        INSERT INTO resumen_mensual (tabla, mes, categoria, cantidad, total, total_cuadrados)
+        SELECT '{tabla}', {expr_mes('fecha')} AS mes, categoria,
+               COUNT(*), SUM(monto), {suma_cuadrados}
+        FROM {tabla}
+        WHERE id > ?
+        GROUP BY mes, categoria
+        ON CONFLICT (tabla, mes, categoria) DO UPDATE SET
+            cantidad = cantidad + excluded.cantidad,
+            total = total + excluded.total,
+            total_cuadrados = total_cuadrados + excluded.total_cuadrados
+    ''', (desde_id,))
+
+
+@migracion(3, 'Configuración y triggers de resumen independientes del formato de fecha')
+def _configuracion(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS configuracion (
+            clave TEXT PRIMARY KEY,
+            valor TEXT
+        )
+    ''')
+    conn.execute(
+        "INSERT OR IGNORE INTO configuracion (clave, valor) VALUES ('almacenamiento', 'texto')"
+    )
+    # Los triggers calculan el mes tanto para 'YYYY-MM-DD' como para número de día
+    for tabla in TABLAS_RESUMEN:
+        for sufijo in ('ai', 'ad', 'au'):
+            conn.execute(f'DROP TRIGGER IF EXISTS trg_{tabla}_resumen_{sufijo}')
+        for sql in _triggers_resumen(tabla, expr_mes('NEW.fecha'), expr_mes('OLD.fecha')):
+            conn.execute(sql)
+
+
+# Búsqueda global: un único índice FTS5 con una fila por registro de cada tabla.
+# El rowid es id * FACTOR_BUSQUEDA + código de tabla, así los triggers
+# actualizan y borran por rowid. Título y detalle son plantillas sobre {fila}.
+FACTOR_BUSQUEDA = 8
+
+TABLAS_BUSQUEDA = {
+    'gastos': (1, '{fila}.concepto', '{fila}.descripcion'),
+    'ingresos': (2, '{fila}.concepto', '{fila}.descripcion'),
+    'proveedores': (3, '{fila}.nombre', "coalesce({fila}.rubro, '') || ' ' || coalesce({fila}.cuit, '')"),
+    'tambo': (4, 'NULL', '{fila}.observaciones'),
+    'facturas': (5, '{fila}.numero', '{fila}.descripcion'),
+}
+
+
+def _triggers_busqueda(tabla):
+    """SQL de los triggers que mantienen el índice de búsqueda para una tabla"""
+    codigo, titulo, detalle = TABLAS_BUSQUEDA[tabla]
+    columnas = ', '.join(sorted({
+        columna
+        for plantilla in (titulo, detalle)
+        for columna in re.findall(r'\{fila\}\.(\w+)', plantilla)
+    }))
+    agregar = f'''
+        INSERT INTO busqueda (rowid, titulo, detalle, tabla)
+        VALUES (NEW.id * {FACTOR_BUSQUEDA} + {codigo}, {titulo.format(fila='NEW')},
+                {detalle.format(fila='NEW')}, '{tabla}');
+    '''
+    quitar = f'''
+        DELETE FROM busqueda WHERE rowid = OLD.id * {FACTOR_BUSQUEDA} + {codigo};
+    '''
+    return (
+        f'CREATE TRIGGER IF NOT EXISTS trg_{tabla}_busqueda_ai AFTER INSERT ON {tabla} BEGIN {agregar} END',
+        f'CREATE TRIGGER IF NOT EXISTS trg_{tabla}_busqueda_ad AFTER DELETE ON {tabla} BEGIN {quitar} END',
+        f'CREATE TRIGGER IF NOT EXISTS trg_{tabla}_busqueda_au AFTER UPDATE OF {columnas} '
+        f'ON {tabla} BEGIN {quitar} {agregar} END',
+    )
+
+
+@migracion(4, 'Índice FTS5 para la búsqueda global')
+def _busqueda(conn):
+    # prefix='2 3' indexa los prefijos cortos para que 'gas*' no recorra todo el vocabulario
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS busqueda USING fts5(
+            titulo, detalle, tabla UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    ''')
+    for tabla in TABLAS_BUSQUEDA:
+        for sql in _triggers_busqueda(tabla):
+            conn.execute(sql)
+        _indexar_busqueda(conn, tabla)
+    conn.execute("INSERT INTO busqueda (busqueda) VALUES ('optimize')")
+
+
+def _indexar_busqueda(conn, tabla, desde_id=0):
+    """Agregar al índice de búsqueda los registros con id mayor a desde_id"""
+    codigo, titulo, detalle = TABLAS_BUSQUEDA[tabla]
+    conn.execute(f'''
+        INSERT INTO busqueda (rowid, titulo, detalle, tabla)
+        SELECT id * {FACTOR_BUSQUEDA} + {codigo}, {titulo.format(fila=tabla)},
+               {detalle.format(fila=tabla)}, '{tabla}'
+        FROM {tabla}
+        WHERE id > ?
+    ''', (desde_id,))
+
+
+@migracion(5, 'Resumen mensual con totales INTEGER')
+def _resumen_entero(conn):
+    # Con afinidad INTEGER los centavos del formato compacto se acumulan sin
+    # pasar por REAL; los montos con decimales del formato texto siguen en REAL
+    conn.execute('DROP TABLE IF EXISTS resumen_mensual')
+    conn.execute('''
+        CREATE TABLE resumen_mensual (
+            tabla TEXT NOT NULL,
+            mes TEXT NOT NULL,
+            categoria TEXT NOT NULL,
+            cantidad INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0,
+            total_cuadrados INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (tabla, mes, categoria)
+        ) WITHOUT ROWID
+    ''')
+    _recalcular_resumen(conn)
+
+
+# Tablas que mantiene la aplicación y no son datos del usuario (la búsqueda
+# incluye las tablas internas de FTS5: busqueda_data, busqueda_idx, ...)
+TABLAS_INTERNAS = ('resumen_mensual', 'configuracion', 'busqueda')
+
+
+def es_tabla_interna(nombre):
+    """True para las tablas de SQLite, del resumen, la configuración y la búsqueda"""
+    return (nombre.startswith('sqlite_') or nombre in TABLAS_INTERNAS
+            or nombre.startswith('busqueda_'))
+
+
+@contextmanager
+def insercion_masiva(conn, tabla):
+    """Suspender los triggers de alta de una tabla durante una carga masiva.
+
+    Al salir se aplica en bloque su efecto (resumen mensual e índice de
+    búsqueda) sobre las filas nuevas y se restauran los triggers. Debe
+    usarse dentro de una transacción: ante un error el rollback deja los
+    triggers como estaban.
+    """
+    desde_id = conn.execute(f'SELECT COALESCE(MAX(id), 0) FROM {tabla}').fetchone()[0]
+    triggers = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ? "
+        "AND name IN (?, ?)",
+        (tabla, f'trg_{tabla}_resumen_ai', f'trg_{tabla}_busqueda_ai')
+    ).fetchall()
+    for nombre, _sql in triggers:
+        conn.execute(f'DROP TRIGGER {nombre}')
+
+    yield conn
+
+    if tabla in TABLAS_RESUMEN:
+        _sumar_resumen(conn, tabla, desde_id)
+    if tabla in TABLAS_BUSQUEDA:
+        _indexar_busqueda(conn, tabla, desde_id)
+    for _nombre, sql in triggers:
+        conn.execute(sql)
+
+
+# Formato compacto (opcional): montos en centavos y fechas en días desde 1970-01-01.
+# Columnas de monto y de fecha que se convierten en cada tabla.
+COLUMNAS_COMPACTAS = {
+    'cheques': (('monto',), ('fecha_vencimiento',)),
+    'facturas': (('monto',), ('fecha',)),
+    'gastos': (('monto',), ('fecha',)),
+    'ingresos': (('monto',), ('fecha',)),
+    'tambo': ((), ('fecha',)),
+}
+
+# julianday('1970-01-01')
+_JULIANO_EPOCA = 2440587.5
+
+
+def get_formato(conn):
+    """Formato de almacenamiento registrado ('texto' o 'compacto')"""
+    fila = conn.execute(
+        "SELECT valor FROM configuracion WHERE clave = 'almacenamiento'"
+    ).fetchone()
+    return fila[0] if fila else 'texto'
+
+
+def convertir_a_compacto(db):
+    """Convertir en el lugar montos a centavos INTEGER y fechas a número de día INTEGER.
+
+    Cada tabla se reconstruye con sus índices y triggers; todo ocurre en una
+    única transacción, así que ante un dato inválido la base queda intacta.
+    Devuelve False si la base ya estaba convertida.
+    """
+    with db.transaction() as conn:
+        if get_formato(conn) == 'compacto':
+            return False
+        for tabla, (montos, fechas) in COLUMNAS_COMPACTAS.items():
+            _reconstruir_compacta(conn, tabla, montos, fechas)
+        _recalcular_resumen(conn)
+        conn.execute(
+            "UPDATE configuracion SET valor = 'compacto' WHERE clave = 'almacenamiento'"
+        )
+    return True
+
+
+def _reconstruir_compacta(conn, tabla, montos, fechas):
+    """Recrear una tabla con columnas INTEGER para montos y fechas"""
+    objetos = [fila[0] for fila in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') "
+        "AND sql IS NOT NULL",
+        (tabla,)
+    )]
+
+    definiciones = []
+    columnas = []
+    expresiones = []
+    for _cid, nombre, tipo, notnull, default, pk in conn.execute(f'PRAGMA table_info({tabla})'):
+        columnas.append(nombre)
+        if pk:
+            definiciones.append(f'{nombre} INTEGER PRIMARY KEY AUTOINCREMENT')
+            expresiones.append(nombre)
+            continue
+        if nombre in montos:
+            tipo = 'INTEGER'
+            expresiones.append(f'CAST(round({nombre} * 100) AS INTEGER)')
+        elif nombre in fechas:
+            tipo = 'INTEGER'
+            expresiones.append(f'CAST(julianday({nombre}) - {_JULIANO_EPOCA} AS INTEGER)')
+        else:
+            expresiones.append(nombre)
+        definicion = f'{nombre} {tipo}'
+        if notnull:
+            definicion += ' NOT NULL'
+        if default is not None:
+            definicion += f' DEFAULT {default}'
+        definiciones.append(definicion)
+
+    for fk in conn.execute(f'PRAGMA foreign_key_list({tabla})'):
+        definiciones.append(f'FOREIGN KEY ({fk[3]}) REFERENCES {fk[2]}({fk[4]})')
+
+    nueva = f'{tabla}_compacta'
+    conn.execute(f'CREATE TABLE {nueva} ({", ".join(definiciones)})')
+    conn.execute(
+        f'INSERT INTO {nueva} ({", ".join(columnas)}) '
+        f'SELECT {", ".join(expresiones)} FROM {tabla}'
+    )
+    conn.execute(f'DROP TABLE {tabla}')
+    conn.execute(f'ALTER TABLE {nueva} RENAME TO {tabla}')
+    for sql in objetos:
+        conn.execute(sql)
+
+
+# Consultas críticas y el índice que deberían usar según EXPLAIN QUERY PLAN
+CONSULTAS_INDEXADAS = (
+    (
+        'Cheques próximos a vencer',
+        "SELECT * FROM cheques WHERE estado = 'pendiente' AND fecha_vencimiento <= ? ORDER BY fecha_vencimiento",
+        ('9999-12-31',),
+        'idx_cheques_estado_vencimiento',
+    ),
+    (
+        'Cheques próximos (conteo del dashboard)',
+        "SELECT COUNT(*) FROM cheques WHERE estado = 'pendiente' AND fecha_vencimiento <= ?",
+        ('9999-12-31',),
+        'idx_cheques_estado_vencimiento',
+    ),
+    (
+        'Gastos por rango de fechas',
+        'SELECT COALESCE(SUM(monto), 0) FROM gastos WHERE fecha >= ? AND fecha < ?',
+        ('2024-01-01', '2024-02-01'),
+        'idx_gastos_fecha',
+    ),
+    (
+        'Página de gastos (cursor)',
+        'SELECT * FROM gastos WHERE (fecha, id) < (?, ?) ORDER BY fecha DESC, id DESC LIMIT 21',
+        ('2024-01-01', 0),
+        'idx_gastos_fecha',
+    ),
+    (
+        'Gastos por categoría',
+        'SELECT categoria, SUM(monto) FROM gastos GROUP BY categoria',
+        (),
+        'idx_gastos_categoria_monto',
+    ),
+    (
+        'Ingresos por rango de fechas',
+        'SELECT COALESCE(SUM(monto), 0) FROM ingresos WHERE fecha >= ? AND fecha < ?',
+        ('2024-01-01', '2024-02-01'),
+        'idx_ingresos_fecha',
+    ),
+    (
+        'Ingresos por categoría',
+        'SELECT categoria, SUM(monto) FROM ingresos GROUP BY categoria',
+        (),
+        'idx_ingresos_categoria_monto',
+    ),
+    (
+        'Total mensual (resumen)',
+        'SELECT COALESCE(SUM(total), 0) FROM resumen_mensual WHERE tabla = ? AND mes = ?',
+        ('gastos', '2024-01'),
+        'PRIMARY KEY',
+    ),
+    (
+        'Página de cheques pendientes (cursor)',
+        "SELECT * FROM cheques WHERE estado = 'pendiente' AND (fecha_vencimiento, id) > (?, ?) "
+        'ORDER BY fecha_vencimiento, id LIMIT 21',
+        ('2024-01-01', 0),
+        'idx_cheques_estado_vencimiento',
+    ),
+    (
+        'Cheques pendientes (avisos de vencimiento)',
+        "SELECT id, numero, banco, monto, fecha_vencimiento FROM cheques "
+        "WHERE estado = 'pendiente' ORDER BY fecha_vencimiento",
+        (),
+        'idx_cheques_estado_vencimiento',
+    ),
+    (
+        'Gastos por día (proyección de fondos)',
+        'SELECT fecha, SUM(monto) AS monto FROM gastos WHERE fecha > ? AND fecha <= ? GROUP BY fecha ORDER BY fecha',
+        ('2024-01-01', '2024-06-30'),
+        'idx_gastos_fecha',
+    ),
+    (
+        'Historial de tambo',
+        'SELECT * FROM tambo ORDER BY fecha DESC LIMIT 10',
+        (),
+        'idx_tambo_fecha',
+    ),
+    (
+        'Serie de tambo por rango',
+        'SELECT fecha, SUM(litros_producidos) AS litros_producidos FROM tambo '
+        'WHERE litros_producidos IS NOT NULL AND fecha >= ? AND fecha <= ? GROUP BY fecha ORDER BY fecha',
+        ('2024-01-01', '2024-12-31'),
+        'idx_tambo_fecha',
+    ),
+    (
+        'Proveedores por nombre',
+        'SELECT * FROM proveedores WHERE (nombre, id) > (?, ?) ORDER BY nombre, id LIMIT 21',
+        ('', 0),
+        'idx_proveedores_nombre',
+    ),
+)
+
+
+def verificar_indices(conn):
+    """Comprobar con EXPLAIN QUERY PLAN que las consultas críticas usan su índice"""
+    resultados = []
+    for descripcion, sql, params, indice in CONSULTAS_INDEXADAS:
+        plan = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+        usa_indice = any(indice in detalle for detalle in plan)
+        resultados.append((descripcion, indice, usa_indice, plan))
+    return resultados
@@ -4,16 +4,13 @@ Módulo de gestión de proveedores y facturas
 
 from kivy.metrics import dp
 from kivy.uix.boxlayout import BoxLayout
-from kivy.uix.scrollview import ScrollView
-from kivy.uix.widget import Widget
-from kivymd.uix.button import MDFlatButton, MDRaisedButton
-from kivymd.uix.dialog import MDDialog
-from kivymd.uix.list import MDList, ThreeLineListItem
+from kivymd.uix.button import MDRaisedButton
 from kivymd.uix.screen import MDScreen
-from kivymd.uix.textfield import MDTextField
 from kivymd.uix.toolbar import MDTopAppBar
 
 import database
+import formularios
+import listas
 
 
 class ProveedoresScreen(MDScreen):
@@ -22,7 +19,6 @@ class ProveedoresScreen(MDScreen):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.name = 'proveedores'
-        self.dialog = None
         
         layout = BoxLayout(orientation='vertical')
         
@@ -48,96 +44,75 @@ class ProveedoresScreen(MDScreen):
         )
         content.add_widget(btn_add)
         
-        # Lista de proveedores
-        self.proveedores_list = MDList()
-        scroll = ScrollView()
-        scroll.add_widget(self.proveedores_list)
-        content.add_widget(scroll)
+        # Lista de proveedores: solo se crean los widgets de las filas visibles
+        self.proveedores_list = listas.ListaVirtual()
+        content.add_widget(self.proveedores_list)
+        
+        # Scroll infinito: las páginas se piden al acercarse al final de la lista
+        self.paginador = listas.ListaPaginada(
+            self.proveedores_list, self.load_page, self.row_data,
+            clave='proveedores',
+            texto_vacio="No hay proveedores registrados",
+            texto_cargando="Cargando proveedores...",
+            tabla='proveedores'
+        )
         
         layout.add_widget(content)
         self.add_widget(layout)
         
         self.load_proveedores()
+        
+        # El formulario de alta se arma una vez, en un momento ocioso
+        self.formulario = formularios.Formulario(
+            "Agregar Proveedor",
+            [
+                formularios.Texto('nombre', "Nombre", obligatorio=True),
+                formularios.Texto('rubro', "Rubro"),
+                formularios.Texto('cuit', "CUIT"),
+                formularios.Texto('telefono', "Teléfono"),
+                formularios.Texto('email', "Email"),
+                formularios.Texto('direccion', "Dirección"),
+            ],
+            self.save_proveedor,
+            espacio=dp(70)
+        )
+        self.formulario.preparar()
     
     def go_back(self):
         self.manager.current = 'dashboard'
     
     def load_proveedores(self):
-        """Cargar lista de proveedores"""
-        self.proveedores_list.clear_widgets()
-        
-        db = database.DatabaseManager()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM proveedores ORDER BY nombre')
-        proveedores = cursor.fetchall()
-        
-        for prov in proveedores:
-            item = ThreeLineListItem(
-                text=prov['nombre'],
-                secondary_text=f"Rubro: {prov['rubro'] or 'N/A'}",
-                tertiary_text=f"CUIT: {prov['cuit'] or 'N/A'} | Tel: {prov['telefono'] or 'N/A'}"
-            )
-            self.proveedores_list.add_widget(item)
-        
-        if not proveedores:
-            self.proveedores_list.add_widget(
-                ThreeLineListItem(text="No hay proveedores registrados")
-            )
+        """Cargar la lista de proveedores desde la primera página"""
+        self.paginador.recargar()
+    
+    def load_page(self, despues_de=None, antes_de=None, limite=database.TAMANO_PAGINA, ids=None):
+        """Página de proveedores (se ejecuta en segundo plano)"""
+        return database.get_db().get_proveedores_pagina(
+            despues_de=despues_de, antes_de=antes_de, limite=limite, ids=ids
+        )
+    
+    def row_data(self, prov):
+        """Datos de la fila de un proveedor en la lista"""
+        return listas.fila(
+            'ThreeLineListItem',
+            text=prov['nombre'],
+            secondary_text=f"Rubro: {prov['rubro'] or 'N/A'}",
+            tertiary_text=f"CUIT: {prov['cuit'] or 'N/A'} | Tel: {prov['telefono'] or 'N/A'}"
+        )
     
     def show_add_dialog(self, *args):
         """Mostrar diálogo para agregar proveedor"""
-        content = BoxLayout(orientation='vertical', spacing=dp(10), size_hint_y=None)
-        content.bind(minimum_height=content.setter('height'))
-        content.add_widget(Widget(size_hint_y=None, height=dp(70)))
-        
-        self.nombre_field = MDTextField(hint_text="Nombre", size_hint_y=None, height=dp(50))
-        self.rubro_field = MDTextField(hint_text="Rubro", size_hint_y=None, height=dp(50))
-        self.cuit_field = MDTextField(hint_text="CUIT", size_hint_y=None, height=dp(50))
-        self.telefono_field = MDTextField(hint_text="Teléfono", size_hint_y=None, height=dp(50))
-        self.email_field = MDTextField(hint_text="Email", size_hint_y=None, height=dp(50))
-        self.direccion_field = MDTextField(hint_text="Dirección", size_hint_y=None, height=dp(50))
-        
-        content.add_widget(self.nombre_field)
-        content.add_widget(self.rubro_field)
-        content.add_widget(self.cuit_field)
-        content.add_widget(self.telefono_field)
-        content.add_widget(self.email_field)
-        content.add_widget(self.direccion_field)
-        
-        self.dialog = MDDialog(
-            title="Agregar Proveedor",
-            type="custom",
-            content_cls=content,
-            buttons=[
-                MDFlatButton(text="CANCELAR", on_press=lambda x: self.dialog.dismiss()),
-                MDRaisedButton(text="GUARDAR", on_press=self.save_proveedor),
-            ],
-        )
-        self.dialog.open()
+        self.formulario.abrir()
     
-    def save_proveedor(self, *args):
+    def save_proveedor(self, valores):
         """Guardar proveedor"""
-        if not self.nombre_field.text:
-            return
-        
-        db = database.DatabaseManager()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO proveedores (nombre, rubro, cuit, telefono, email, direccion)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
-            self.nombre_field.text,
-            self.rubro_field.text,
-            self.cuit_field.text,
-            self.telefono_field.text,
-            self.email_field.text,
-            self.direccion_field.text
-        ))
-        
-        conn.commit()
-        self.dialog.dismiss()
-        self.load_proveedores()
\ No newline at end of file
+        db = database.get_db()
+        db.encolar(
+            db.insertar_proveedor,
+            valores['nombre'],
+            valores['rubro'],
+            valores['cuit'],
+            valores['telefono'],
+            valores['email'],
+            valores['direccion']
+        )
@@ -0,0 +1,288 @@
+"""
+Proyección de fondos
+Saldo esperado para cada uno de los próximos días a partir del saldo actual,
+los cheques pendientes (por fecha de vencimiento), los ingresos y gastos ya
+cargados con fecha futura y el perfil histórico de gastos por día del mes.
+Los movimientos de cada día se arman con numpy (bincount) y el saldo es su
+suma acumulada (cumsum), sin recorrer los días en Python. Cuando cambia un
+cheque solo se suma o resta su monto desde su día en adelante.
+
+    proyectador = proyeccion.get_proyectador()
+    proyectador.bind(version=...)
+    proyectador.iniciar()
+"""
+
+from datetime import date, datetime, time, timedelta
+
+from kivy.clock import Clock
+from kivy.event import EventDispatcher
+from kivy.logger import Logger
+from kivy.properties import BooleanProperty, NumericProperty
+
+import database
+import db_worker
+import diferido
+import eventos
+
+# numpy tarda en importarse y la primera proyección se calcula en segundo plano
+np = diferido.importar('numpy')
+
+# Días proyectados, contando hoy
+HORIZONTE = 180
+
+# Días de gastos pasados con los que se arma el perfil por día del mes
+DIAS_HISTORIA = 180
+
+# Días promedio de un mes, para llevar el historial a meses
+DIAS_MES = 365.25 / 12
+
+
+def _dias(fechas):
+    """Array datetime64[D] a partir de fechas 'YYYY-MM-DD'"""
+    return np.array(fechas, dtype='datetime64[D]')
+
+
+def _dia_del_mes(dias):
+    """Día del mes (0 a 30) de cada elemento de un array datetime64[D]"""
+    return (dias - dias.astype('datetime64[M]')).astype(int)
+
+
+def por_dia(filas, hoy, horizonte=HORIZONTE, columna='fecha'):
+    """Montos sumados por día del horizonte (índice 0 = hoy).
+
+    Las fechas anteriores a hoy caen en el día 0 y las posteriores al
+    horizonte se ignoran.
+    """
+    montos_por_dia = np.zeros(horizonte)
+    if not filas:
+        return montos_por_dia
+    indices = np.maximum((_dias([fila[columna] for fila in filas]) - np.datetime64(hoy, 'D')).astype(int), 0)
+    montos = np.array([fila['monto'] for fila in filas], dtype=float)
+    dentro = indices < horizonte
+    montos_por_dia += np.bincount(indices[dentro], weights=montos[dentro], minlength=horizonte)
+    return montos_por_dia
+
+
+def perfil_gastos(filas, hoy, horizonte=HORIZONTE, dias_historia=DIAS_HISTORIA):
+    """Gasto esperado por día según lo gastado cada día del mes en el historial.
+
+    El perfil empieza mañana: lo gastado hoy ya está en el saldo.
+    """
+    gastos = np.zeros(horizonte)
+    if not filas:
+        return gastos
+    dias = _dias([fila['fecha'] for fila in filas])
+    montos = np.array([fila['monto'] for fila in filas], dtype=float)
+    # Con poco historial se promedia sobre los meses que realmente abarca
+    abarcados = min(dias_historia, int((np.datetime64(hoy, 'D') - dias.min()).astype(int)) + 1)
+    meses = max(abarcados / DIAS_MES, 1)
+    perfil = np.bincount(_dia_del_mes(dias), weights=montos, minlength=31) / meses
+    futuros = np.datetime64(hoy, 'D') + np.arange(1, horizonte)
+    gastos[1:] = perfil[_dia_del_mes(futuros)]
+    return gastos
+
+
+class Proyeccion:
+    """Saldo proyectado día por día desde hoy.
+
+    saldos[i] es el saldo esperado al terminar el día hoy + i; entradas y
+    salidas, lo que se espera que entre y salga ese día. Los cheques
+    pendientes se guardan por id para sacarlos, moverlos o darlos por
+    cobrados sin rehacer la serie.
+    """
+
+    def __init__(self, datos, hoy=None, horizonte=HORIZONTE, dias_historia=DIAS_HISTORIA):
+        self.hoy = hoy or date.today()
+        self.horizonte = horizonte
+        self.saldo_inicial = datos['saldo']
+        self.cheques = por_dia(datos['cheques'], self.hoy, horizonte, columna='fecha_vencimiento')
+        self.ingresos = por_dia(datos['ingresos'], self.hoy, horizonte)
+        self.salidas = (por_dia(datos['gastos'], self.hoy, horizonte)
+                        + perfil_gastos(datos['historial'], self.hoy, horizonte, dias_historia))
+        self.saldos = self.saldo_inicial + np.cumsum(self.cheques + self.ingresos - self.salidas)
+        # id -> (día, monto) de cada cheque pendiente, también los que vencen después del horizonte
+        self._cheques = {
+            cheque['id']: (self._dia(cheque['fecha_vencimiento']), cheque['monto'])
+            for cheque in datos['cheques']
+        }
+
+    @property
+    def entradas(self):
+        return self.cheques + self.ingresos
+
+    def _dia(self, fecha):
+        return max((datetime.strptime(fecha, '%Y-%m-%d').date() - self.hoy).days, 0)
+
+    def _sumar(self, dia, monto):
+        """El saldo de ese día y de todos los siguientes cambia en monto"""
+        if dia < self.horizonte:
+            self.cheques[dia] += monto
+            self.saldos[dia:] += monto
+
+    def quitar_cheque(self, cheque_id):
+        """Sacar un cheque pendiente (eliminado); False si no estaba"""
+        anterior = self._cheques.pop(cheque_id, None)
+        if anterior is None:
+            return False
+        dia, monto = anterior
+        self._sumar(dia, -monto)
+        return True
+
+    def poner_cheque(self, cheque):
+        """Aplicar el estado actual de un cheque: alta, modificación o cobro"""
+        estaba = cheque['id'] in self._cheques
+        self.quitar_cheque(cheque['id'])
+        if cheque['estado'] == 'pendiente':
+            dia = self._dia(cheque['fecha_vencimiento'])
+            self._cheques[cheque['id']] = (dia, cheque['monto'])
+            self._sumar(dia, cheque['monto'])
+        elif estaba:
+            # Cobrado: el monto ya está en el banco desde hoy
+            self.saldo_inicial += cheque['monto']
+            self.saldos += cheque['monto']
+
+    def fecha(self, dia):
+        return self.hoy + timedelta(days=dia)
+
+    def minimo(self):
+        """(fecha, saldo) del menor saldo proyectado"""
+        dia = int(np.argmin(self.saldos))
+        return self.fecha(dia), float(self.saldos[dia])
+
+    def final(self):
+        """(fecha, saldo) al terminar el horizonte"""
+        return self.fecha(self.horizonte - 1), float(self.saldos[-1])
+
+
+def calcular(hoy=None, horizonte=HORIZONTE, dias_historia=DIAS_HISTORIA):
+    """Leer los datos y armar la proyección (se ejecuta en segundo plano)"""
+    hoy = hoy or date.today()
+    datos = database.get_db().get_datos_proyeccion(hoy, horizonte, dias_historia)
+    return Proyeccion(datos, hoy, horizonte, dias_historia)
+
+
+class Proyectador(EventDispatcher):
+    """Proyección compartida por el dashboard y la pantalla de flujo de fondos.
+
+    version aumenta cada vez que cambia la proyección. Un cambio en un
+    cheque se aplica sobre la proyección existente; uno en gastos o ingresos
+    (que mueve el saldo actual y el perfil de gastos) la vuelve a calcular.
+    """
+
+    version = NumericProperty(0)
+    # False hasta tener la primera proyección
+    cargado = BooleanProperty(False)
+
+    def __init__(self, horizonte=HORIZONTE, **kwargs):
+        super().__init__(**kwargs)
+        self.horizonte = horizonte
+        self.proyeccion = None
+        self._despertador = None
+        self._suscripcion = None
+        self._generacion = 0
+        self._recargando = False
+        # Ids de cheques con cambios cuya lectura todavía no llegó
+        self._pedidos = set()
+
+    def iniciar(self):
+        """Calcular la proyección y seguir los cambios de sus datos"""
+        if self._suscripcion is None:
+            self._suscripcion = eventos.suscribir(('cheques', 'gastos', 'ingresos'), self._on_cambios)
+        self.recargar()
+
+    def detener(self):
+        if self._despertador is not None:
+            self._despertador.cancel()
+            self._despertador = None
+        if self._suscripcion is not None:
+            eventos.desuscribir(self._suscripcion)
+            self._suscripcion = None
+
+    def recargar(self):
+        """Calcular la proyección completa desde hoy"""
+        self._generacion += 1
+        self._recargando = True
+        self._pedidos.clear()
+        generacion = self._generacion
+        db_worker.run_async(
+            calcular, date.today(), self.horizonte,
+            on_result=lambda proyeccion: self._cargar(proyeccion, generacion),
+            on_error=self._fallo,
+            clave='proyeccion'
+        )
+
+    def _fallo(self, error):
+        Logger.error(f'AgroManager: no se pudo calcular la proyección de fondos: {error}')
+
+    def _cargar(self, proyeccion, generacion):
+        if generacion != self._generacion:
+            return
+        self._recargando = False
+        self.proyeccion = proyeccion
+        self.cargado = True
+        self.version += 1
+        self._programar()
+
+    def _on_cambios(self, cambios):
+        """Aplicar los cambios de cheques sin recalcular; el resto recalcula"""
+        if (not self.cargado or self._recargando
+                or self.proyeccion.hoy != date.today()
+                or any(cambio.tabla != 'cheques' or cambio.op == eventos.MASIVA for cambio in cambios)):
+            self.recargar()
+            return
+
+        quitados = [self.proyeccion.quitar_cheque(cheque_id)
+                    for cheque_id in eventos.ids(cambios, eventos.ELIMINAR)]
+        if any(quitados):
+            self.version += 1
+
+        # Altas, modificaciones y cobros: se leen solo esos cheques. Con una
+        # lectura en curso se pide otra con todos los ids, que la reemplaza
+        nuevos = eventos.ids(cambios, eventos.INSERTAR) | eventos.ids(cambios, eventos.ACTUALIZAR)
+        if nuevos or self._pedidos:
+            self._pedidos |= nuevos
+            pedidos = set(self._pedidos)
+            generacion = self._generacion
+            db_worker.run_async(
+                database.get_db().get_cheques_por_id, sorted(pedidos),
+                on_result=lambda cheques: self._actualizar(pedidos, cheques, generacion),
+                on_error=self._fallo,
+                clave='proyeccion_cambios'
+            )
+
+    def _actualizar(self, pedidos, cheques, generacion):
+        if generacion != self._generacion:
+            return
+        self._pedidos -= pedidos
+        # Los que no volvieron se eliminaron mientras se leían
+        for cheque_id in pedidos - {cheque['id'] for cheque in cheques}:
+            self.proyeccion.quitar_cheque(cheque_id)
+        for cheque in cheques:
+            self.proyeccion.poner_cheque(cheque)
+        self.version += 1
+
+    def _programar(self):
+        """Recalcular al empezar el día siguiente"""
+        if self._despertador is not None:
+            self._despertador.cancel()
+        manana = datetime.combine(date.today() + timedelta(days=1), time())
+        self._despertador = Clock.schedule_once(self.revisar, (manana - datetime.now()).total_seconds())
+
+    def revisar(self, *args):
+        """Recalcular si cambió el día (también al volver de una pausa)"""
+        self._despertador = None
+        if self.cargado and self.proyeccion.hoy != date.today():
+            self.recargar()
+        elif self.cargado:
+            self._programar()
+
+
+_proyectador = None
+
+
+def get_proyectador():
+    """Proyectador compartido por el dashboard y la pantalla de flujo de fondos"""
+    global _proyectador
+    if _proyectador is None:
+        _proyectador = Proyectador()
+    return _proyectador
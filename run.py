@@ -13,6 +13,7 @@ def check_dependencies():
         'kivy': 'Kivy',
         'kivymd': 'KivyMD',
         'matplotlib': 'Matplotlib',
+        'numpy': 'NumPy',
         'requests': 'Requests',
         'sqlite3': 'SQLite3'
     }
@@ -48,6 +49,20 @@ def check_files():
     required_files = [
         'main.py',
         'database.py',
+        'migrations.py',
+        'db_worker.py',
+        'listas.py',
+        'formularios.py',
+        'vencimientos.py',
+        'proyeccion.py',
+        'busqueda.py',
+        'importador.py',
+        'instrumentacion.py',
+        'diferido.py',
+        'eventos.py',
+        'graficos.py',
+        'series.py',
+        'matplotlib_wrapper.py',
         'cheques.py',
         'proveedores.py',
         'gastos.py',
@@ -55,7 +70,8 @@ def check_files():
         'margenes.py',
         'superficie.py',
         'mercado.py',
-        'tambo.py'
+        'tambo.py',
+        'flujo.py'
     ]
     
     print("Verificando archivos del proyecto...")
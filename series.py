@@ -0,0 +1,50 @@
+"""
+Reducción de series temporales para graficar
+Largest-Triangle-Three-Buckets (LTTB): elige, en cada tramo de la serie, el
+punto que forma el triángulo más grande con el elegido antes y el promedio
+del tramo siguiente. Con unos cientos de puntos se conserva la forma de
+miles, incluidos picos y caídas.
+
+    indices = series.lttb(dias, litros, 400)
+"""
+
+
+def lttb(xs, ys, umbral):
+    """Índices (crecientes) de los puntos a conservar; xs debe estar ordenado.
+
+    Siempre se conservan el primero y el último. Si la serie tiene umbral
+    puntos o menos se devuelven todos.
+    """
+    cantidad = len(xs)
+    if umbral >= cantidad or umbral < 3:
+        return list(range(cantidad))
+
+    indices = [0]
+    # Los extremos quedan fuera de los tramos
+    tramo = (cantidad - 2) / (umbral - 2)
+    anterior = 0
+    for i in range(umbral - 2):
+        inicio = int(i * tramo) + 1
+        fin = int((i + 1) * tramo) + 1
+
+        # Promedio del tramo siguiente (en el último, el punto final)
+        inicio_siguiente = fin
+        fin_siguiente = min(int((i + 2) * tramo) + 1, cantidad)
+        largo = fin_siguiente - inicio_siguiente
+        promedio_x = sum(xs[inicio_siguiente:fin_siguiente]) / largo
+        promedio_y = sum(ys[inicio_siguiente:fin_siguiente]) / largo
+
+        ax, ay = xs[anterior], ys[anterior]
+        mayor = -1
+        elegido = inicio
+        for j in range(inicio, fin):
+            # Doble del área: el factor 1/2 no cambia cuál es la mayor
+            area = abs((ax - promedio_x) * (ys[j] - ay) - (ax - xs[j]) * (promedio_y - ay))
+            if area > mayor:
+                mayor = area
+                elegido = j
+        indices.append(elegido)
+        anterior = elegido
+
+    indices.append(cantidad - 1)
+    return indices
@@ -2,26 +2,24 @@
 Módulo de gestión de superficie y stock ganadero
 """
 
-import matplotlib
+from kivy.clock import Clock
 from kivy.metrics import dp
 from kivy.uix.boxlayout import BoxLayout
-from kivy.uix.scrollview import ScrollView
-from kivy.uix.widget import Widget
-from kivymd.uix.button import MDFlatButton, MDRaisedButton
+from kivymd.uix.button import MDRaisedButton
 from kivymd.uix.card import MDCard
-from kivymd.uix.dialog import MDDialog
 from kivymd.uix.label import MDLabel
-from kivymd.uix.list import MDList, ThreeLineListItem
 from kivymd.uix.screen import MDScreen
-from kivymd.uix.textfield import MDTextField
 from kivymd.uix.toolbar import MDTopAppBar
 
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-from kivy.clock import Clock
-
 import database
-from matplotlib_wrapper import MatplotlibWidget
+import db_worker
+import eventos
+import formularios
+import graficos
+import listas
+from matplotlib_wrapper import crear_grafico
+
+COLORES_CULTIVOS = ['#66BB6A', '#FFA726', '#42A5F5', '#AB47BC', '#26C6DA']
 
 
 class SuperficieScreen(MDScreen):
@@ -43,8 +41,7 @@ class SuperficieScreen(MDScreen):
         )
         layout.add_widget(toolbar)
         
-        # ScrollView principal
-        scroll = ScrollView()
+        # Encabezado que se desplaza junto con la lista
         self.main_content = BoxLayout(
             orientation='vertical',
             padding=dp(10),
@@ -82,82 +79,102 @@ class SuperficieScreen(MDScreen):
         )
         self.main_content.add_widget(titulo_lista)
         
-        # Lista de cultivos
-        self.superficie_list = MDList()
-        self.main_content.add_widget(self.superficie_list)
-        
-        scroll.add_widget(self.main_content)
-        layout.add_widget(scroll)
+        # Lista de cultivos: solo se crean los widgets de las filas visibles
+        self.superficie_list = listas.ListaVirtual(encabezado=self.main_content)
+        layout.add_widget(self.superficie_list)
         self.add_widget(layout)
         
         # Cargar datos al iniciar
         Clock.schedule_once(lambda dt: self.load_data(), 0.5)
+        
+        self.datos_desactualizados = False
+        eventos.suscribir('superficie', self.on_cambios)
+        
+        # El formulario de alta se arma una vez, en un momento ocioso
+        self.formulario = formularios.Formulario(
+            "Agregar Cultivo",
+            [
+                formularios.Texto('cultivo', "Cultivo (ej: Soja, Maíz, Trigo)", obligatorio=True),
+                formularios.Texto('hectareas', "Hectáreas", filtro='float', obligatorio=True),
+                formularios.Texto('fecha_siembra', "Fecha de siembra (YYYY-MM-DD)"),
+                formularios.Texto('fecha_cosecha', "Fecha de cosecha (YYYY-MM-DD)"),
+            ],
+            self.save_cultivo,
+            espacio=dp(30)
+        )
+        self.formulario.preparar()
     
     def go_back(self):
         self.manager.current = 'dashboard'
     
+    def on_cambios(self, cambios):
+        """Recargar lista y gráfico; si la pantalla no está visible, al volver"""
+        if self.manager is not None and self.manager.current == self.name:
+            self.load_data()
+        else:
+            self.datos_desactualizados = True
+    
+    def on_enter(self, *args):
+        if self.datos_desactualizados:
+            self.datos_desactualizados = False
+            self.load_data()
+    
     def load_data(self):
-        """Cargar superficie y gráfico"""
+        """Cargar superficie y gráfico (ambos salen de la misma lectura)"""
         self.load_superficie()
-        self.load_distribution_graph()
     
     def load_superficie(self):
-        """Cargar lista de cultivos y superficie"""
-        self.superficie_list.clear_widgets()
-        
-        db = database.DatabaseManager()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        # Total de hectáreas
-        cursor.execute('SELECT SUM(hectareas) FROM superficie')
-        total_ha = cursor.fetchone()[0] or 0
-        
-        # Cultivos
-        cursor.execute('SELECT * FROM superficie ORDER BY hectareas DESC')
-        cultivos = cursor.fetchall()
+        """Cargar lista de cultivos y superficie en segundo plano"""
+        # Al recargar se muestran los datos anteriores hasta que lleguen los nuevos
+        if not self.superficie_list.filas:
+            self.superficie_list.mostrar([listas.mensaje("Cargando superficie...")])
+        
+        db_worker.run_async(
+            database.get_db().get_superficie,
+            on_result=self.show_superficie,
+            clave='superficie'
+        )
+    
+    def show_superficie(self, datos):
+        """Mostrar lista de cultivos y stock ganadero"""
+        filas = []
+        total_ha = datos['total']
+        cultivos = datos['cultivos']
+        ganado = datos['ganado']
         
         for cultivo in cultivos:
             porcentaje = (cultivo['hectareas'] / total_ha * 100) if total_ha > 0 else 0
             
-            item = ThreeLineListItem(
+            filas.append(listas.fila(
+                'ThreeLineListItem',
+                fila_id=('superficie', cultivo['id']),
                 text=f"{cultivo['cultivo']} - {cultivo['hectareas']:.1f} ha",
                 secondary_text=f"Porcentaje: {porcentaje:.1f}%",
                 tertiary_text=f"Siembra: {cultivo['fecha_siembra'] or 'N/A'} | Cosecha: {cultivo['fecha_cosecha'] or 'N/A'}"
-            )
-            self.superficie_list.add_widget(item)
+            ))
         
         if not cultivos:
-            self.superficie_list.add_widget(
-                ThreeLineListItem(text="No hay cultivos registrados")
-            )
+            filas.append(listas.mensaje("No hay cultivos registrados"))
         
         # Agregar información de ganado
-        cursor.execute('SELECT * FROM ganado')
-        ganado = cursor.fetchall()
-        
         if ganado:
             for animal in ganado:
-                item = ThreeLineListItem(
+                filas.append(listas.fila(
+                    'ThreeLineListItem',
+                    fila_id=('ganado', animal['id']),
                     text=f"{animal['tipo']} - {animal['cantidad']} cabezas",
                     secondary_text=f"Categoría: {animal['categoria'] or 'N/A'}",
                     tertiary_text=f"Registro: {animal['fecha_registro']}"
-                )
-                self.superficie_list.add_widget(item)
-    
-    def load_distribution_graph(self):
-        """Cargar gráfico de distribución de cultivos"""
-        db = database.DatabaseManager()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT cultivo, hectareas FROM superficie')
-        datos = cursor.fetchall()
-        
-        # Limpiar card anterior
-        self.graph_card.clear_widgets()
+                ))
         
+        # Un cultivo nuevo cambia los porcentajes: se reemplazan esas filas, no la lista
+        self.superficie_list.reconciliar(filas)
+        self.show_distribution_graph(cultivos)
+    
+    def show_distribution_graph(self, datos):
+        """Dibujar (o actualizar) la torta de superficie por cultivo"""
         if not datos:
+            self.graph_card.clear_widgets()
             label = MDLabel(
                 text="No hay cultivos para mostrar",
                 halign='center',
@@ -169,13 +186,36 @@ class SuperficieScreen(MDScreen):
         cultivos = [d['cultivo'] for d in datos]
         hectareas = [d['hectareas'] for d in datos]
         
-        # Crear gráfico de torta
-        plt.close('all')
-        fig = plt.figure(figsize=(6, 4), facecolor='white')
+        if graficos.reutilizable(self.graph_canvas, graficos.GraficoTorta, self.graph_card):
+            # Se redibuja la torta existente, sin crear widgets
+            self.graph_canvas.actualizar(cultivos, hectareas)
+            return
+        
+        # Limpiar card anterior
+        self.graph_card.clear_widgets()
+        if graficos.NATIVOS:
+            self.graph_canvas = graficos.GraficoTorta(
+                titulo='Distribución de Superficie por Cultivo',
+                etiquetas=cultivos,
+                valores=hectareas,
+                colores=COLORES_CULTIVOS,
+                formato=lambda valor: f"{valor:,.1f} ha"
+            )
+        else:
+            # Con la misma distribución se reutiliza la imagen ya dibujada
+            self.graph_canvas = crear_grafico(
+                'superficie_por_cultivo', (cultivos, hectareas), self.draw_distribution_graph,
+                clave='grafico_superficie'
+            )
+        self.graph_card.add_widget(self.graph_canvas)
+    
+    @staticmethod
+    def draw_distribution_graph(fig, datos):
+        """Torta de superficie por cultivo"""
+        cultivos, hectareas = datos
         ax = fig.add_subplot(111)
-        colors = ['#66BB6A', '#FFA726', '#42A5F5', '#AB47BC', '#26C6DA']
         wedges, texts, autotexts = ax.pie(hectareas, labels=cultivos, autopct='%1.1f%%', 
-                                           startangle=90, colors=colors[:len(cultivos)])
+                                           startangle=90, colors=COLORES_CULTIVOS[:len(cultivos)])
         ax.set_title('Distribución de Superficie por Cultivo', fontsize=12, fontweight='bold', pad=10)
         
         # Hacer el texto más legible
@@ -187,79 +227,18 @@ class SuperficieScreen(MDScreen):
             autotext.set_fontweight('bold')
         
         fig.tight_layout()
-        
-        # Agregar widget al card
-        self.graph_canvas = MatplotlibWidget(fig)
-        self.graph_card.add_widget(self.graph_canvas)
     
     def show_add_cultivo_dialog(self, *args):
         """Mostrar diálogo para agregar cultivo"""
-        content = BoxLayout(orientation='vertical', spacing=dp(10), size_hint_y=None)
-        content.bind(minimum_height=content.setter('height'))
-        content.add_widget(Widget(size_hint_y=None, height=dp(30)))
-        
-        self.cultivo_field = MDTextField(
-            hint_text="Cultivo (ej: Soja, Maíz, Trigo)",
-            size_hint_y=None,
-            height=dp(50)
-        )
-        
-        self.hectareas_field = MDTextField(
-            hint_text="Hectáreas",
-            input_filter='float',
-            size_hint_y=None,
-            height=dp(50)
-        )
-        
-        self.fecha_siembra_field = MDTextField(
-            hint_text="Fecha de siembra (YYYY-MM-DD)",
-            size_hint_y=None,
-            height=dp(50)
-        )
-        
-        self.fecha_cosecha_field = MDTextField(
-            hint_text="Fecha de cosecha (YYYY-MM-DD)",
-            size_hint_y=None,
-            height=dp(50)
-        )
-        
-        content.add_widget(self.cultivo_field)
-        content.add_widget(self.hectareas_field)
-        content.add_widget(self.fecha_siembra_field)
-        content.add_widget(self.fecha_cosecha_field)
-        
-        self.dialog = MDDialog(
-            title="Agregar Cultivo",
-            type="custom",
-            content_cls=content,
-            buttons=[
-                MDFlatButton(text="CANCELAR", on_press=lambda x: self.dialog.dismiss()),
-                MDRaisedButton(text="GUARDAR", on_press=self.save_cultivo),
-            ],
-        )
-        self.dialog.open()
+        self.formulario.abrir()
     
-    def save_cultivo(self, *args):
+    def save_cultivo(self, valores):
         """Guardar cultivo"""
-        if not self.cultivo_field.text or not self.hectareas_field.text:
-            return
-        
-        db = database.DatabaseManager()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO superficie (cultivo, hectareas, fecha_siembra, fecha_cosecha)
-            VALUES (?, ?, ?, ?)
-        ''', (
-            self.cultivo_field.text,
-            float(self.hectareas_field.text),
-            self.fecha_siembra_field.text or None,
-            self.fecha_cosecha_field.text or None
-        ))
-        
-        conn.commit()
-        self.dialog.dismiss()
-        
-        # Recargar datos y gráfico
-        self.load_data()
\ No newline at end of file
+        db = database.get_db()
+        db.encolar(
+            db.insertar_cultivo,
+            valores['cultivo'],
+            valores['hectareas'],
+            valores['fecha_siembra'] or None,
+            valores['fecha_cosecha'] or None
+        )
@@ -3,27 +3,55 @@ Módulo de gestión de producción tambera
 Métricas de preñez, parición, destete, lactancia y producción
 """
 
-import matplotlib
+from datetime import date, datetime, timedelta
+
+from kivy.core.window import Window
 from kivy.metrics import dp
 from kivy.uix.boxlayout import BoxLayout
-from kivy.uix.scrollview import ScrollView
-from kivy.uix.widget import Widget
 from kivymd.uix.button import MDFlatButton, MDRaisedButton
 from kivymd.uix.card import MDCard
 from kivymd.uix.dialog import MDDialog
 from kivymd.uix.label import MDLabel
-from kivymd.uix.list import MDList, ThreeLineListItem
 from kivymd.uix.screen import MDScreen
-from kivymd.uix.textfield import MDTextField
 from kivymd.uix.toolbar import MDTopAppBar
 
-matplotlib.use('Agg')
-from datetime import datetime
+import database
+import db_worker
+import eventos
+import formularios
+import graficos
+import listas
+from matplotlib_wrapper import crear_grafico
 
-import matplotlib.pyplot as plt
+# Períodos del gráfico de evolución
+RANGOS = ('30 días', 'Temporada', 'Año', 'Todo')
+DIAS_RANGO = {'30 días': 30, 'Año': 365}
 
-import database
-from matplotlib_wrapper import MatplotlibWidget
+# La temporada lechera empieza el 1° de julio
+MES_TEMPORADA = 7
+
+# Ancho en píxeles del gráfico por cada punto de la serie reducida
+PIXELES_POR_PUNTO = dp(2)
+
+# Tarjetas del último registro: campo, título, formato del valor, unidad y color
+METRICAS = (
+    ('litros_producidos', "Producción Diaria", '{:.0f}', "litros", (0.2, 0.7, 0.4, 1)),
+    ('porcentaje_prenez', "% Preñez", '{:.1f}', "%", (0.3, 0.6, 0.9, 1)),
+    ('porcentaje_paricion', "% Parición", '{:.1f}', "%", (0.9, 0.5, 0.2, 1)),
+    ('porcentaje_destete', "% Destete", '{:.1f}', "%", (0.6, 0.3, 0.8, 1)),
+    ('vacas_lactancia', "Vacas en Lactancia", '{}', "cabezas", (0.2, 0.5, 0.7, 1)),
+)
+
+
+def desde_rango(rango, hoy=None):
+    """Primera fecha de un período del gráfico de evolución (None: desde el principio)"""
+    hoy = hoy or date.today()
+    if rango == 'Temporada':
+        anio = hoy.year if hoy.month >= MES_TEMPORADA else hoy.year - 1
+        return date(anio, MES_TEMPORADA, 1)
+    if rango == 'Todo':
+        return None
+    return hoy - timedelta(days=DIAS_RANGO[rango] - 1)
 
 
 class TamboMetricCard(MDCard):
@@ -46,7 +74,7 @@ class TamboMetricCard(MDCard):
             font_style='Caption'
         )
         
-        valor_lbl = MDLabel(
+        self.valor_lbl = valor_lbl = MDLabel(
             text=str(valor),
             halign='center',
             theme_text_color="Custom",
@@ -86,8 +114,7 @@ class TamboScreen(MDScreen):
         )
         layout.add_widget(toolbar)
         
-        # ScrollView
-        scroll = ScrollView()
+        # Encabezado que se desplaza junto con el historial
         self.content = BoxLayout(
             orientation='vertical',
             padding=dp(15),
@@ -124,6 +151,8 @@ class TamboScreen(MDScreen):
         self.metrics_container.bind(minimum_height=self.metrics_container.setter('height'))
         
         self.content.add_widget(self.metrics_container)
+        # Tarjetas por campo; se arman una vez y después solo cambia el valor
+        self.metric_cards = {}
         
         # Historial
         titulo_historial = MDLabel(
@@ -135,250 +164,231 @@ class TamboScreen(MDScreen):
         )
         self.content.add_widget(titulo_historial)
         
-        self.historial_list = MDList()
-        self.content.add_widget(self.historial_list)
-        
-        scroll.add_widget(self.content)
-        layout.add_widget(scroll)
+        # Historial: solo se crean los widgets de las filas visibles
+        self.historial_list = listas.ListaVirtual(encabezado=self.content)
+        layout.add_widget(self.historial_list)
         self.add_widget(layout)
         
         self.load_tambo_data()
+        
+        self.datos_desactualizados = False
+        eventos.suscribir('tambo', self.on_cambios)
+        
+        # El formulario de alta se arma una vez, en un momento ocioso
+        self.formulario = formularios.Formulario(
+            "Registrar Producción Diaria",
+            [
+                formularios.Texto('litros', "Litros producidos", filtro='float', obligatorio=True),
+                formularios.Texto('prenez', "% Preñez", filtro='float'),
+                formularios.Texto('paricion', "% Parición", filtro='float'),
+                formularios.Texto('destete', "% Destete", filtro='float'),
+                formularios.Texto('vacas', "Vacas en lactancia", filtro='int'),
+                formularios.Texto('observaciones', "Observaciones"),
+            ],
+            self.save_registro,
+            espacio=dp(70)
+        )
+        self.formulario.preparar()
     
     def go_back(self):
         self.manager.current = 'dashboard'
     
+    def on_cambios(self, cambios):
+        """Recargar métricas e historial; si la pantalla no está visible, al volver"""
+        if self.manager is not None and self.manager.current == self.name:
+            self.load_tambo_data()
+        else:
+            self.datos_desactualizados = True
+    
+    def on_enter(self, *args):
+        if self.datos_desactualizados:
+            self.datos_desactualizados = False
+            self.load_tambo_data()
+    
     def load_tambo_data(self):
-        """Cargar datos del tambo"""
-        self.metrics_container.clear_widgets()
-        self.historial_list.clear_widgets()
-        
-        db = database.DatabaseManager()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        # Obtener último registro
-        cursor.execute('SELECT * FROM tambo ORDER BY fecha DESC LIMIT 1')
-        ultimo = cursor.fetchone()
+        """Cargar datos del tambo en segundo plano"""
+        # Al recargar se muestran los datos anteriores hasta que lleguen los nuevos
+        if not self.historial_list.filas:
+            self.historial_list.mostrar([listas.mensaje("Cargando registros...")])
+        
+        db_worker.run_async(
+            database.get_db().get_registros_tambo, 10,
+            on_result=self.show_tambo_data,
+            clave='tambo'
+        )
+    
+    def show_tambo_data(self, registros):
+        """Mostrar métricas del último registro e historial"""
+        ultimo = registros[0] if registros else None
         
         if ultimo:
-            # Grid de métricas
-            from kivy.uix.gridlayout import GridLayout
-            
-            grid1 = GridLayout(cols=2, spacing=dp(10), size_hint_y=None, height=dp(130))
-            
-            card1 = TamboMetricCard(
-                "Producción Diaria",
-                f"{ultimo['litros_producidos']:.0f}",
-                "litros",
-                (0.2, 0.7, 0.4, 1)
-            )
-            
-            card2 = TamboMetricCard(
-                "% Preñez",
-                f"{ultimo['porcentaje_prenez']:.1f}",
-                "%",
-                (0.3, 0.6, 0.9, 1)
-            )
-            
-            grid1.add_widget(card1)
-            grid1.add_widget(card2)
-            self.metrics_container.add_widget(grid1)
-            
-            grid2 = GridLayout(cols=2, spacing=dp(10), size_hint_y=None, height=dp(130))
-            
-            card3 = TamboMetricCard(
-                "% Parición",
-                f"{ultimo['porcentaje_paricion']:.1f}",
-                "%",
-                (0.9, 0.5, 0.2, 1)
-            )
-            
-            card4 = TamboMetricCard(
-                "% Destete",
-                f"{ultimo['porcentaje_destete']:.1f}",
-                "%",
-                (0.6, 0.3, 0.8, 1)
-            )
-            
-            grid2.add_widget(card3)
-            grid2.add_widget(card4)
-            self.metrics_container.add_widget(grid2)
-            
-            # Vacas en lactancia
-            card5 = TamboMetricCard(
-                "Vacas en Lactancia",
-                f"{ultimo['vacas_lactancia']}",
-                "cabezas",
-                (0.2, 0.5, 0.7, 1)
-            )
-            card5.size_hint = (1, None)
-            card5.height = dp(130)
-            self.metrics_container.add_widget(card5)
+            if not self.metric_cards:
+                self.build_metrics()
+            for campo, titulo, formato, unidad, color in METRICAS:
+                self.metric_cards[campo].valor_lbl.text = formato.format(ultimo[campo])
+        elif self.metric_cards:
+            self.metrics_container.clear_widgets()
+            self.metric_cards = {}
         
         # Cargar historial
-        cursor.execute('SELECT * FROM tambo ORDER BY fecha DESC LIMIT 10')
-        registros = cursor.fetchall()
-        
+        filas = []
         for reg in registros:
             fecha_obj = datetime.strptime(reg['fecha'], '%Y-%m-%d')
-            item = ThreeLineListItem(
+            filas.append(listas.fila(
+                'ThreeLineListItem',
+                fila_id=reg['id'],
                 text=f"Producción: {reg['litros_producidos']:.0f} litros",
                 secondary_text=f"Fecha: {fecha_obj.strftime('%d/%m/%Y')} | Vacas lactancia: {reg['vacas_lactancia']}",
                 tertiary_text=f"Preñez: {reg['porcentaje_prenez']:.1f}% | Parición: {reg['porcentaje_paricion']:.1f}%"
-            )
-            self.historial_list.add_widget(item)
+            ))
         
         if not registros:
-            self.historial_list.add_widget(
-                ThreeLineListItem(text="No hay registros de tambo")
-            )
+            filas.append(listas.mensaje("No hay registros de tambo"))
+        # Un registro nuevo inserta una fila y quita la más vieja; el resto no se toca
+        self.historial_list.reconciliar(filas)
+    
+    def build_metrics(self):
+        """Armar las tarjetas de métricas (sin valores)"""
+        from kivy.uix.gridlayout import GridLayout
+        
+        self.metrics_container.clear_widgets()
+        self.metric_cards = {
+            campo: TamboMetricCard(titulo, "", unidad, color)
+            for campo, titulo, formato, unidad, color in METRICAS
+        }
+        tarjetas = list(self.metric_cards.values())
+        
+        # Grids de a dos tarjetas
+        for par in (tarjetas[0:2], tarjetas[2:4]):
+            grid = GridLayout(cols=2, spacing=dp(10), size_hint_y=None, height=dp(130))
+            for card in par:
+                grid.add_widget(card)
+            self.metrics_container.add_widget(grid)
+        
+        # Vacas en lactancia
+        card5 = tarjetas[4]
+        card5.size_hint = (1, None)
+        card5.height = dp(130)
+        self.metrics_container.add_widget(card5)
     
     def show_add_dialog(self, *args):
         """Mostrar diálogo para registrar día"""
-        content = BoxLayout(orientation='vertical', spacing=dp(10), size_hint_y=None)
-        content.bind(minimum_height=content.setter('height'))
-        content.add_widget(Widget(size_hint_y=None, height=dp(70)))
-        
-        self.litros_field = MDTextField(
-            hint_text="Litros producidos",
-            input_filter='float',
-            size_hint_y=None,
-            height=dp(50)
-        )
-        
-        self.prenez_field = MDTextField(
-            hint_text="% Preñez",
-            input_filter='float',
-            size_hint_y=None,
-            height=dp(50)
-        )
-        
-        self.paricion_field = MDTextField(
-            hint_text="% Parición",
-            input_filter='float',
-            size_hint_y=None,
-            height=dp(50)
-        )
-        
-        self.destete_field = MDTextField(
-            hint_text="% Destete",
-            input_filter='float',
-            size_hint_y=None,
-            height=dp(50)
-        )
-        
-        self.vacas_field = MDTextField(
-            hint_text="Vacas en lactancia",
-            input_filter='int',
-            size_hint_y=None,
-            height=dp(50)
+        self.formulario.abrir()
+    
+    def save_registro(self, valores):
+        """Guardar registro de tambo"""
+        db = database.get_db()
+        db.encolar(
+            db.insertar_registro_tambo,
+            datetime.now(),
+            valores['litros'],
+            valores['prenez'] or 0,
+            valores['paricion'] or 0,
+            valores['destete'] or 0,
+            valores['vacas'] or 0,
+            valores['observaciones']
         )
+    
+    def show_evolution_graph(self, *args):
+        """Mostrar gráfico de evolución de producción con selector de período"""
+        content = BoxLayout(orientation='vertical', spacing=dp(8), size_hint_y=None, height=dp(410))
         
-        self.observaciones_field = MDTextField(
-            hint_text="Observaciones",
-            size_hint_y=None,
-            height=dp(50)
-        )
+        rangos_box = BoxLayout(size_hint_y=None, height=dp(40), spacing=dp(6))
+        self.rango_buttons = {}
+        for rango in RANGOS:
+            boton = MDFlatButton(text=rango, on_press=lambda x, r=rango: self.load_evolution(r))
+            self.rango_buttons[rango] = boton
+            rangos_box.add_widget(boton)
+        content.add_widget(rangos_box)
         
-        content.add_widget(self.litros_field)
-        content.add_widget(self.prenez_field)
-        content.add_widget(self.paricion_field)
-        content.add_widget(self.destete_field)
-        content.add_widget(self.vacas_field)
-        content.add_widget(self.observaciones_field)
+        self.evolution_box = BoxLayout()
+        content.add_widget(self.evolution_box)
+        self.load_evolution(RANGOS[0])
         
-        self.dialog = MDDialog(
-            title="Registrar Producción Diaria",
+        graph_dialog = MDDialog(
+            title="Evolución de Producción",
             type="custom",
             content_cls=content,
+            size_hint=(0.95, 0.85),
             buttons=[
-                MDFlatButton(text="CANCELAR", on_press=lambda x: self.dialog.dismiss()),
-                MDRaisedButton(text="GUARDAR", on_press=self.save_registro),
+                MDFlatButton(text="CERRAR", on_press=lambda x: graph_dialog.dismiss())
             ],
         )
-        self.dialog.open()
+        graph_dialog.open()
     
-    def save_registro(self, *args):
-        """Guardar registro de tambo"""
-        if not self.litros_field.text:
-            return
-        
-        db = database.DatabaseManager()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO tambo (fecha, litros_producidos, porcentaje_prenez, 
-                             porcentaje_paricion, porcentaje_destete, 
-                             vacas_lactancia, observaciones)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            datetime.now().strftime('%Y-%m-%d'),
-            float(self.litros_field.text),
-            float(self.prenez_field.text) if self.prenez_field.text else 0,
-            float(self.paricion_field.text) if self.paricion_field.text else 0,
-            float(self.destete_field.text) if self.destete_field.text else 0,
-            int(self.vacas_field.text) if self.vacas_field.text else 0,
-            self.observaciones_field.text
-        ))
-        
-        conn.commit()
-        self.dialog.dismiss()
-        self.load_tambo_data()
+    def load_evolution(self, rango):
+        """Pedir la serie del período, reducida al ancho del gráfico"""
+        for nombre, boton in self.rango_buttons.items():
+            boton.md_bg_color = (0.2, 0.6, 0.8, 0.2) if nombre == rango else (0, 0, 0, 0)
+        
+        # Antes de abrir el diálogo la caja tiene el ancho por defecto (100): se usa el de la ventana
+        ancho = self.evolution_box.width if self.evolution_box.width > 100 else Window.width * 0.9
+        db_worker.run_async(
+            database.get_db().get_serie_tambo, desde_rango(rango), None, int(ancho / PIXELES_POR_PUNTO),
+            on_result=self.show_evolution,
+            clave='tambo_evolucion'
+        )
     
-    def show_evolution_graph(self, *args):
-        """Mostrar gráfico de evolución de producción"""
-        db = database.DatabaseManager()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT fecha, litros_producidos 
-            FROM tambo 
-            ORDER BY fecha DESC 
-            LIMIT 30
-        ''')
-        
-        datos = cursor.fetchall()
-        
+    def show_evolution(self, serie):
+        """Dibujar la serie con el promedio de todos los registros del período"""
+        self.evolution_box.clear_widgets()
+        datos = serie['filas']
         if not datos:
+            self.evolution_box.add_widget(MDLabel(
+                text="No hay registros en este período",
+                halign='center',
+                theme_text_color='Secondary'
+            ))
             return
         
-        # Invertir para mostrar cronológicamente
-        datos = list(reversed(datos))
-        
-        fechas = [datetime.strptime(d['fecha'], '%Y-%m-%d').strftime('%d/%m') for d in datos]
+        dias = [datetime.strptime(d['fecha'], '%Y-%m-%d') for d in datos]
+        # Con más de un año se agrega el año a las fechas
+        formato_fecha = '%d/%m' if dias[0].year == dias[-1].year else '%d/%m/%y'
+        fechas = [dia.strftime(formato_fecha) for dia in dias]
         litros = [d['litros_producidos'] for d in datos]
         
-        # Crear gráfico
-        plt.close('all')
-        fig = plt.figure(figsize=(8, 5), facecolor='white')
+        if graficos.NATIVOS:
+            canvas = graficos.GraficoLineas(
+                titulo='Evolución de Producción de Leche',
+                titulo_x='Fecha',
+                titulo_y='Litros',
+                etiquetas=fechas,
+                valores=litros,
+                posiciones=[dia.toordinal() for dia in dias],
+                valor_promedio=serie['promedio'],
+                formato=lambda valor: f"{valor:,.0f} L"
+            )
+        else:
+            # Con los mismos registros se reutiliza la imagen ya dibujada
+            canvas = crear_grafico(
+                'evolucion_tambo', (fechas, litros, serie['promedio']), self.draw_evolution_graph,
+                clave='grafico_tambo'
+            )
+        self.evolution_box.add_widget(canvas)
+    
+    @staticmethod
+    def draw_evolution_graph(fig, datos):
+        """Litros por fecha con la línea de promedio"""
+        from matplotlib.ticker import MaxNLocator
+        
+        fechas, litros, promedio = datos
         ax = fig.add_subplot(111)
-        ax.plot(fechas, litros, marker='o', linewidth=2, markersize=6, color='blue')
+        # Con series largas los marcadores taparían la línea
+        marcador = 'o' if len(litros) <= 60 else None
+        ax.plot(fechas, litros, marker=marcador, linewidth=2, markersize=6, color='blue')
+        ax.xaxis.set_major_locator(MaxNLocator(12))
         ax.set_title('Evolución de Producción de Leche', fontsize=12, fontweight='bold')
         ax.set_xlabel('Fecha', fontsize=10)
         ax.set_ylabel('Litros', fontsize=10)
         ax.grid(True, alpha=0.3)
         
         # Rotar etiquetas de fecha
-        plt.setp(ax.xaxis.get_majorticklabels(), rotation=45, ha='right')
+        for etiqueta in ax.xaxis.get_majorticklabels():
+            etiqueta.set_rotation(45)
+            etiqueta.set_ha('right')
         
         # Agregar línea de promedio
-        promedio = sum(litros) / len(litros)
         ax.axhline(y=promedio, color='red', linestyle='--', label=f'Promedio: {promedio:.0f}L', linewidth=2)
         ax.legend()
         
         fig.tight_layout()
-        
-        canvas = MatplotlibWidget(fig)
-        
-        graph_dialog = MDDialog(
-            title="Evolución de Producción",
-            type="custom",
-            content_cls=canvas,
-            size_hint=(0.95, 0.85),
-            buttons=[
-                MDFlatButton(text="CERRAR", on_press=lambda x: graph_dialog.dismiss())
-            ],
-        )
-        graph_dialog.open()
\ No newline at end of file
@@ -0,0 +1,48 @@
+"""
+Fixtures de los tests: bases SQLite temporales con el esquema migrado
+"""
+
+import random
+from datetime import date, timedelta
+
+import pytest
+
+import database
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Base nueva en formato texto (el original)"""
+    manager = database.DatabaseManager(str(tmp_path / 'agromanager.db'))
+    manager.ensure_schema()
+    yield manager
+    manager.close()
+
+
+@pytest.fixture(params=['texto', 'compacto'])
+def db_formatos(request, db):
+    """La misma base en cada formato de almacenamiento"""
+    if request.param == 'compacto':
+        db.convertir_a_compacto()
+    return db
+
+
+def cargar_movimientos(db, tabla, cantidad, semilla=1):
+    """Movimientos con fechas repetidas y montos con centavos; devuelve sus ids"""
+    azar = random.Random(semilla)
+    ids = []
+    for _ in range(cantidad):
+        ids.append(db.insertar_movimiento(
+            tabla,
+            azar.choice(['agro', 'ganadería', 'otros']),
+            azar.choice(['Gasoil', 'Semillas', 'Fletes']),
+            round(azar.uniform(1, 500000), 2),
+            date(2024, 1, 1) + timedelta(days=azar.randrange(120)),
+        ))
+    return ids
+
+
+@pytest.fixture
+def movimientos():
+    """cargar_movimientos(db, tabla, cantidad) para los tests que lo necesitan"""
+    return cargar_movimientos
@@ -0,0 +1,29 @@
+"""
+Búsqueda global con el índice FTS5
+"""
+
+import database
+
+
+def test_busqueda_por_prefijo_y_sin_acentos(db):
+    db.insertar_movimiento('gastos', 'agro', 'Gasoil para tractor', 1000, '2024-01-10', 'Estación de servicio')
+    db.insertar_proveedor('Agroquímicos del Sur', rubro='Fitosanitarios', cuit='30-12345678-9')
+
+    encontrados = db.buscar('gaso')
+    marcado = f'{database.MARCA_INICIO}Gasoil{database.MARCA_FIN} para tractor'
+    assert [(r['tabla'], r['titulo']) for r in encontrados] == [('gastos', marcado)]
+    assert [r['tabla'] for r in db.buscar('estacion')] == ['gastos']
+    assert [r['tabla'] for r in db.buscar('agroquimicos')] == ['proveedores']
+    assert db.buscar('   ') == []
+
+
+def test_busqueda_sigue_cambios_y_bajas(db):
+    gasto_id = db.insertar_movimiento('gastos', 'agro', 'Gasoil', 1000, '2024-01-10')
+    with db.transaction() as conn:
+        conn.execute("UPDATE gastos SET concepto = 'Semillas de maíz' WHERE id = ?", (gasto_id,))
+    assert db.buscar('gasoil') == []
+    assert [r['id'] for r in db.buscar('semi')] == [gasto_id]
+
+    with db.transaction() as conn:
+        conn.execute('DELETE FROM gastos WHERE id = ?', (gasto_id,))
+    assert db.buscar('semi') == []
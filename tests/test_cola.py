@@ -0,0 +1,113 @@
+"""
+Cola de escritura: commit agrupado, un SAVEPOINT por escritura y commits durables
+"""
+
+import threading
+
+import pytest
+
+import database
+import eventos
+
+
+def _nombres(db):
+    with db.reader() as conn:
+        return sorted(fila[0] for fila in conn.execute('SELECT nombre FROM proveedores'))
+
+
+@pytest.fixture
+def lotes(monkeypatch):
+    """Tamaño de cada lote que ejecuta la cola"""
+    tamanos = []
+    ejecutar = database.ColaEscritura._ejecutar
+
+    def registrar(cola, lote):
+        tamanos.append(len(lote))
+        return ejecutar(cola, lote)
+
+    monkeypatch.setattr(database.ColaEscritura, '_ejecutar', registrar)
+    return tamanos
+
+
+def test_escrituras_seguidas_comparten_commit(db, lotes):
+    liberar = threading.Event()
+    db.encolar(liberar.wait, 5)
+    # Mientras la primera espera, las demás se acumulan para el lote siguiente
+    futures = [db.encolar(db.insertar_proveedor, f'Proveedor {i}') for i in range(10)]
+    liberar.set()
+
+    # Las lecturas ven lo encolado antes de ellas
+    assert len(_nombres(db)) == 10
+    assert all(future.done() for future in futures)
+    assert sum(lotes) == 11 and len(lotes) <= 2
+
+
+@pytest.fixture
+def publicados():
+    """Cambios publicados en proveedores, entregados en el hilo de la cola"""
+    recibidos = []
+
+    def recibir(cambios):
+        recibidos.extend(cambios)
+
+    suscripcion = eventos.suscribir('proveedores', recibir, principal=False)
+    yield recibidos
+    eventos.desuscribir(suscripcion)
+
+
+def test_una_escritura_fallida_no_deshace_las_otras(db, publicados):
+    def falla():
+        db.insertar_proveedor('Deshecho')
+        raise ValueError('dato inválido')
+
+    liberar = threading.Event()
+    db.encolar(liberar.wait, 5)
+    primera = db.encolar(db.insertar_proveedor, 'Acopio Norte')
+    fallida = db.encolar(falla)
+    ultima = db.encolar(db.insertar_proveedor, 'Semillera Sur')
+    liberar.set()
+
+    assert _nombres(db) == ['Acopio Norte', 'Semillera Sur']
+    with pytest.raises(ValueError):
+        fallida.result()
+    # Los cambios de la escritura deshecha no se publican
+    assert eventos.ids(publicados, eventos.INSERTAR) == {primera.result(), ultima.result()}
+
+
+def test_durable_espera_el_commit_con_fsync(db):
+    def leer_synchronous():
+        return db.get_connection().execute('PRAGMA synchronous').fetchone()[0]
+
+    # FULL (2) durante el lote durable y de vuelta a NORMAL (1) después
+    assert db.encolar(leer_synchronous, durable=True) == 2
+    assert leer_synchronous() == 1
+    assert db.encolar(db.insertar_proveedor, 'Acopio Norte', durable=True) is not None
+
+
+def test_durable_desde_la_cola_falla_enseguida(db):
+    def anidada():
+        return db.encolar(db.insertar_proveedor, 'Anidado', durable=True)
+
+    with pytest.raises(RuntimeError):
+        db.encolar(anidada).result(timeout=5)
+    # La cola sigue atendiendo
+    db.encolar(db.insertar_proveedor, 'Acopio Norte').result(timeout=5)
+    assert _nombres(db) == ['Acopio Norte']
+
+
+def test_falla_del_lote_no_detiene_la_cola(db, monkeypatch):
+    writer = db.pool.writer
+
+    def sin_conexion():
+        raise OSError('sin espacio en disco')
+
+    monkeypatch.setattr(db.pool, 'writer', sin_conexion)
+    perdida = db.encolar(db.insertar_proveedor, 'Acopio Norte')
+    with pytest.raises(OSError):
+        perdida.result(timeout=5)
+    # esperar() no queda bloqueado por el lote fallido
+    db.pool.cola.esperar()
+
+    monkeypatch.setattr(db.pool, 'writer', writer)
+    db.encolar(db.insertar_proveedor, 'Semillera Sur').result(timeout=5)
+    assert _nombres(db) == ['Semillera Sur']
@@ -0,0 +1,89 @@
+"""
+Consultas en segundo plano: el resultado vuelve por el reloj de Kivy
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip('kivy')
+
+import db_worker  # noqa: E402
+
+
+class RelojDePrueba:
+    """Guarda lo programado para ejecutarlo cuando el test lo pida"""
+
+    def __init__(self):
+        self.pendientes = []
+        self.lock = threading.Lock()
+
+    def schedule_once(self, callback, tiempo=0):
+        with self.lock:
+            self.pendientes.append(callback)
+
+    def avanzar(self):
+        with self.lock:
+            pendientes, self.pendientes = self.pendientes, []
+        for callback in pendientes:
+            callback(0)
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = RelojDePrueba()
+    monkeypatch.setattr(db_worker, 'Clock', reloj)
+    return reloj
+
+
+@pytest.fixture
+def executor():
+    executor = ThreadPoolExecutor(max_workers=1)
+    yield executor
+    executor.shutdown(wait=True)
+
+
+def test_resultado_se_entrega_en_el_hilo_principal(reloj, executor):
+    recibidos = []
+    db_worker.run_async(lambda a, b: a + b, 2, 3, on_result=recibidos.append, executor=executor).result()
+
+    # Hasta que corre el reloj no se toca la interfaz
+    assert recibidos == []
+    reloj.avanzar()
+    assert recibidos == [5]
+
+
+def test_error_va_a_on_error(reloj, executor):
+    errores = []
+
+    def falla():
+        raise ValueError('consulta rota')
+
+    future = db_worker.run_async(falla, on_result=pytest.fail, on_error=errores.append, executor=executor)
+    future.exception()
+    reloj.avanzar()
+
+    assert [str(error) for error in errores] == ['consulta rota']
+
+
+def test_trabajo_reemplazado_no_se_entrega(reloj, executor):
+    empezado = threading.Event()
+    liberar = threading.Event()
+    recibidos = []
+
+    def lento():
+        empezado.set()
+        liberar.wait(5)
+        return 'viejo'
+
+    primero = db_worker.run_async(lento, on_result=recibidos.append, clave='prueba', executor=executor)
+    empezado.wait(5)
+    # El segundo espera en la cola: el primero ya empezó y no se puede cancelar
+    segundo = db_worker.run_async(lambda: 'nuevo', on_result=recibidos.append, clave='prueba', executor=executor)
+    liberar.set()
+    primero.result()
+    segundo.result()
+    reloj.avanzar()
+
+    assert recibidos == ['nuevo']
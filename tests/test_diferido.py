@@ -0,0 +1,53 @@
+"""
+Importación diferida: el módulo real se importa en el primer acceso
+"""
+
+import sys
+import threading
+
+import pytest
+
+import diferido
+
+
+@pytest.fixture
+def pesado(tmp_path, monkeypatch):
+    """Nombre de un módulo de prueba todavía sin importar"""
+    (tmp_path / 'modulo_pesado.py').write_text('VALOR = 42\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield 'modulo_pesado'
+    sys.modules.pop('modulo_pesado', None)
+
+
+def test_importa_recien_al_usarlo(pesado):
+    llamadas = []
+    modulo = diferido.importar(pesado, antes=lambda: llamadas.append(pesado in sys.modules))
+
+    assert pesado not in sys.modules
+    assert not diferido.cargado(modulo)
+
+    assert modulo.VALOR == 42
+    assert diferido.cargado(modulo)
+    # antes() corre una sola vez, antes de la importación real
+    assert modulo.VALOR == 42
+    assert llamadas == [False]
+
+
+def test_modulo_ya_importado_se_devuelve_tal_cual(pesado):
+    real = __import__(pesado)
+    assert diferido.importar(pesado) is real
+    assert diferido.cargado(real)
+
+
+def test_primer_acceso_concurrente_importa_una_vez(pesado):
+    importaciones = []
+    modulo = diferido.importar(pesado, antes=lambda: importaciones.append(1))
+    valores = []
+    hilos = [threading.Thread(target=lambda: valores.append(modulo.VALOR)) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert valores == [42] * 8
+    assert importaciones == [1]
@@ -0,0 +1,104 @@
+"""
+Bus de cambios: entrega por tabla, después del commit y sin escrituras deshechas
+"""
+
+import gc
+import sqlite3
+
+import pytest
+
+import eventos
+
+
+@pytest.fixture
+def suscribir():
+    """eventos.suscribir con entrega inmediata, desuscribiendo al terminar"""
+    suscripciones = []
+
+    def suscribir(tablas, callback):
+        suscripciones.append(eventos.suscribir(tablas, callback, principal=False))
+        return suscripciones[-1]
+
+    yield suscribir
+    for suscripcion in suscripciones:
+        eventos.desuscribir(suscripcion)
+
+
+def test_entrega_solo_las_tablas_suscritas(suscribir):
+    gastos, ambas = [], []
+    suscribir('gastos', gastos.append)
+    suscribir(('gastos', 'ingresos'), ambas.append)
+
+    eventos.publicar([
+        eventos.Cambio('gastos', eventos.INSERTAR, 1),
+        eventos.Cambio('ingresos', eventos.ELIMINAR, 2),
+        eventos.Cambio('cheques', eventos.ACTUALIZAR, 3),
+    ])
+
+    assert gastos == [[eventos.Cambio('gastos', eventos.INSERTAR, 1)]]
+    assert [cambio.tabla for cambio in ambas[0]] == ['gastos', 'ingresos']
+
+
+def test_ids_por_operacion():
+    cambios = [
+        eventos.Cambio('gastos', eventos.INSERTAR, 1),
+        eventos.Cambio('gastos', eventos.ACTUALIZAR, 1),
+        eventos.Cambio('gastos', eventos.ELIMINAR, 2),
+        eventos.Cambio('gastos', eventos.MASIVA, None),
+    ]
+    assert eventos.ids(cambios) == {1, 2}
+    assert eventos.ids(cambios, eventos.ELIMINAR) == {2}
+    assert eventos.ids(cambios, eventos.MASIVA) == set()
+
+
+def test_desuscribir_y_suscriptor_con_errores(suscribir):
+    recibidos = []
+
+    def falla(cambios):
+        raise RuntimeError('pantalla rota')
+
+    suscribir('gastos', falla)
+    suscripcion = suscribir('gastos', recibidos.append)
+
+    # El error de un suscriptor no impide la entrega a los demás
+    eventos.publicar([eventos.Cambio('gastos', eventos.INSERTAR, 1)])
+    eventos.desuscribir(suscripcion)
+    eventos.publicar([eventos.Cambio('gastos', eventos.INSERTAR, 2)])
+
+    assert eventos.ids(recibidos[0]) == {1}
+    assert len(recibidos) == 1
+
+
+def test_pantalla_descartada_no_queda_suscrita(suscribir):
+    class Pantalla:
+        def __init__(self):
+            self.recibidos = []
+
+        def on_cambios(self, cambios):
+            self.recibidos.append(cambios)
+
+    pantalla = Pantalla()
+    suscripcion = suscribir('gastos', pantalla.on_cambios)
+    del pantalla
+    gc.collect()
+
+    assert suscripcion.callback is None
+    eventos.publicar([eventos.Cambio('gastos', eventos.INSERTAR, 1)])
+    assert suscripcion not in eventos.bus._suscripciones
+
+
+def test_se_publica_recien_con_el_commit(db, suscribir):
+    recibidos = []
+    suscribir('proveedores', recibidos.append)
+
+    with db.transaction():
+        proveedor_id = db.insertar_proveedor('Acopio Norte')
+        assert recibidos == []
+    assert eventos.ids(recibidos[0], eventos.INSERTAR) == {proveedor_id}
+
+    # Una transacción deshecha no publica nada
+    with pytest.raises(sqlite3.IntegrityError):
+        with db.transaction() as conn:
+            db.insertar_proveedor('Semillera Sur')
+            conn.execute('INSERT INTO proveedores (nombre) VALUES (NULL)')
+    assert len(recibidos) == 1
@@ -0,0 +1,70 @@
+"""
+Formato compacto: centavos y números de día, ida y vuelta y exportación
+"""
+
+import csv
+from datetime import date
+
+import migrations
+from utils import ExportUtils
+
+
+def _resumen(db, tabla):
+    with db.reader() as conn:
+        filas = conn.execute(
+            'SELECT mes, categoria, cantidad, total FROM resumen_mensual WHERE tabla = ?', (tabla,)
+        ).fetchall()
+    return {(fila['mes'], fila['categoria']): (fila['cantidad'], fila['total']) for fila in filas}
+
+
+def test_resumen_compacto_es_exacto(db, movimientos):
+    movimientos(db, 'ingresos', 200)
+    db.convertir_a_compacto()
+    with db.reader() as conn:
+        tipos = {fila[0] for fila in conn.execute('SELECT typeof(total) FROM resumen_mensual')}
+        centavos = conn.execute('SELECT SUM(monto) FROM ingresos').fetchone()[0]
+    assert tipos == {'integer'}
+    assert sum(total for _cantidad, total in _resumen(db, 'ingresos').values()) == centavos
+
+
+def test_formato_compacto_ida_y_vuelta(db):
+    gasto_id = db.insertar_movimiento('gastos', 'agro', 'Gasoil', 1234.56, date(2024, 2, 29), 'Tractor')
+    db.insertar_movimiento('gastos', 'otros', 'Peaje', 0.1, date(1999, 12, 31))
+    cheque_id = db.insertar_cheque('000123', 'Banco Nación', 750000.05, date(2030, 1, 15))
+    gastos = db.get_movimientos_pagina('gastos')['filas']
+    cheques = db.get_cheques_pendientes_pagina()['filas']
+
+    assert db.convertir_a_compacto() is True
+    assert db.convertir_a_compacto() is False
+    assert db.formato.nombre == 'compacto'
+
+    with db.reader() as conn:
+        fila = conn.execute('SELECT typeof(monto), typeof(fecha), monto FROM gastos WHERE id = ?', (gasto_id,)).fetchone()
+    assert tuple(fila) == ('integer', 'integer', 123456)
+
+    assert [dict(fila) for fila in db.get_movimientos_pagina('gastos')['filas']] == [dict(fila) for fila in gastos]
+    compactos = db.get_cheques_pendientes_pagina()['filas']
+    assert [(c['id'], c['monto'], c['fecha_vencimiento']) for c in compactos] == \
+        [(c['id'], c['monto'], c['fecha_vencimiento']) for c in cheques]
+    assert compactos[0]['id'] == cheque_id
+
+    # Las altas posteriores se guardan en el formato nuevo
+    nuevo = db.insertar_movimiento('gastos', 'agro', 'Fletes', 99.99, '2024-03-01')
+    fila = db.get_movimientos_pagina('gastos', ids=[nuevo])['filas'][0]
+    assert (fila['monto'], fila['fecha']) == (99.99, '2024-03-01')
+
+
+def test_exportacion_omite_tablas_internas_y_decodifica(db, tmp_path):
+    db.insertar_movimiento('gastos', 'agro', 'Gasoil', 1234.56, '2024-02-29')
+    db.convertir_a_compacto()
+
+    tablas = db.get_tablas_exportables()
+    assert 'gastos' in tablas
+    assert not [tabla for tabla in tablas if migrations.es_tabla_interna(tabla)]
+    assert 'busqueda_data' not in tablas and 'resumen_mensual' not in tablas
+
+    archivos = ExportUtils.export_to_csv(db.db_name, str(tmp_path / 'exports'))
+    (gastos,) = [archivo for archivo in archivos if '/gastos_' in archivo]
+    with open(gastos, encoding='utf-8') as archivo:
+        fila = next(csv.DictReader(archivo))
+    assert (fila['monto'], fila['fecha']) == ('1234.56', '2024-02-29')
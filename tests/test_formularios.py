@@ -0,0 +1,160 @@
+"""
+Formularios reutilizables: se arman una vez, se reinician al abrir y se
+preparan en frames ociosos
+"""
+
+import pytest
+
+pytest.importorskip('kivy')
+
+from kivy.uix.widget import Widget  # noqa: E402
+
+import formularios  # noqa: E402
+
+
+# Los widgets de KivyMD necesitan una MDApp corriendo: se usan sustitutos
+class CampoTexto(Widget):
+    def __init__(self, hint_text='', input_filter=None, **kwargs):
+        super().__init__(**kwargs)
+        self.text = ''
+        self.error = False
+
+
+class Boton(Widget):
+    __events__ = ('on_press',)
+
+    def __init__(self, text='', on_press=None, **kwargs):
+        super().__init__(**kwargs)
+        self.text = text
+        if on_press is not None:
+            self.bind(on_press=on_press)
+
+    def on_press(self):
+        pass
+
+
+class Dialogo:
+    creados = 0
+
+    def __init__(self, **kwargs):
+        Dialogo.creados += 1
+        self.abierto = False
+
+    def open(self):
+        self.abierto = True
+
+    def dismiss(self):
+        self.abierto = False
+
+
+class Menu:
+    def __init__(self, caller, items, **kwargs):
+        caller.menu = self
+        self.items = items
+
+    def open(self):
+        pass
+
+    def dismiss(self):
+        pass
+
+
+class RelojDePrueba:
+    def __init__(self):
+        self.frametime = 0
+        self.programados = []
+
+    def schedule_once(self, callback, tiempo=0):
+        self.programados.append(callback)
+
+
+@pytest.fixture(autouse=True)
+def widgets(monkeypatch):
+    monkeypatch.setattr(formularios, 'MDTextField', CampoTexto)
+    monkeypatch.setattr(formularios, 'MDRaisedButton', Boton)
+    monkeypatch.setattr(formularios, 'MDFlatButton', Boton)
+    monkeypatch.setattr(formularios, 'MDDialog', Dialogo)
+    monkeypatch.setattr(formularios, 'MDDropdownMenu', Menu)
+    monkeypatch.setattr(formularios, '_pendientes', [])
+    monkeypatch.setattr(Dialogo, 'creados', 0)
+
+
+def _formulario(al_aceptar=None):
+    return formularios.Formulario(
+        "Agregar Gasto",
+        [
+            formularios.Texto('concepto', "Concepto", obligatorio=True),
+            formularios.Texto('monto', "Monto", filtro='float', obligatorio=True),
+            formularios.Opciones('categoria', "Categoría", [('agro', "Agro"), ('otros', "Otros")]),
+            formularios.Texto('descripcion', "Descripción"),
+        ],
+        al_aceptar or (lambda valores: None)
+    )
+
+
+def test_se_arma_una_vez_y_se_reinicia_al_abrir():
+    formulario = _formulario()
+    formulario.abrir()
+    dialogo, concepto = formulario.dialog, formulario.widgets['concepto']
+
+    concepto.text = 'Gasoil'
+    formulario.widgets['categoria'].menu.items[1]['on_release']()
+    formulario.dialog.dismiss()
+    formulario.abrir()
+
+    assert formulario.dialog is dialogo and formulario.widgets['concepto'] is concepto
+    assert Dialogo.creados == 1
+    assert concepto.text == ''
+    assert formulario.widgets['categoria'].valor == 'agro'
+
+
+def test_abrir_con_valores():
+    formulario = _formulario()
+    formulario.abrir(concepto='Semillas', monto=1500.5, categoria='otros')
+
+    assert formulario.valores() == {
+        'concepto': 'Semillas', 'monto': 1500.5, 'categoria': 'otros', 'descripcion': '',
+    }
+    assert formulario.widgets['categoria'].text == 'Categoría: Otros'
+
+
+def test_obligatorios_y_numeros_invalidos_se_marcan():
+    aceptados = []
+    formulario = _formulario(aceptados.append)
+    formulario.abrir()
+    formulario.widgets['monto'].text = '12,5'
+
+    formulario.aceptar()
+
+    assert aceptados == [] and formulario.dialog.abierto
+    assert formulario.widgets['concepto'].error and formulario.widgets['monto'].error
+    assert not formulario.widgets['descripcion'].error
+
+    formulario.widgets['concepto'].text = ' Gasoil '
+    formulario.widgets['monto'].text = '12.5'
+    formulario.aceptar()
+
+    assert aceptados == [{'concepto': 'Gasoil', 'monto': 12.5, 'categoria': 'agro', 'descripcion': ''}]
+    assert not formulario.dialog.abierto
+
+
+def test_preparar_espera_frames_ociosos(monkeypatch):
+    reloj = RelojDePrueba()
+    monkeypatch.setattr(formularios, 'Clock', reloj)
+    primero, segundo = _formulario(), _formulario()
+
+    primero.preparar()
+    segundo.preparar()
+    primero.preparar()
+    assert len(reloj.programados) == 1
+
+    # Con la interfaz ocupada no se arma nada y se vuelve a intentar
+    reloj.frametime = 0.1
+    reloj.programados.pop()(0)
+    assert primero.dialog is None and len(reloj.programados) == 1
+
+    reloj.frametime = 0.01
+    reloj.programados.pop()(0)
+    assert primero.dialog is not None and segundo.dialog is None
+    reloj.programados.pop()(0)
+    assert segundo.dialog is not None and reloj.programados == []
@@ -0,0 +1,40 @@
+"""
+Gráficos nativos: escalas de los ejes, formatos y posiciones por defecto
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('kivy')
+
+import graficos  # noqa: E402
+
+
+def test_marcas_redondas_que_cubren_el_rango():
+    assert graficos.marcas(0, 97) == [0, 20, 40, 60, 80, 100]
+    assert graficos.marcas(-1200, 3400) == [-2000, -1000, 0, 1000, 2000, 3000, 4000]
+    # Sin rango (un solo valor) igual se arma un eje
+    assert graficos.marcas(5, 5) == [5, 5.2, 5.4, 5.6, 5.8, 6]
+
+
+def test_formatos():
+    assert graficos.pesos(1234567.8) == '$1,234,568'
+    assert graficos.abreviado(1500000) == '1.5M'
+    assert graficos.abreviado(-250000) == '-250k'
+    assert graficos.abreviado(12) == '12'
+
+
+def test_reutilizable_solo_en_el_mismo_contenedor():
+    contenedor = object()
+    grafico = SimpleNamespace(parent=contenedor)
+    assert not graficos.reutilizable(grafico, SimpleNamespace, object())
+    assert graficos.reutilizable(grafico, SimpleNamespace, contenedor)
+    assert not graficos.reutilizable(None, SimpleNamespace, contenedor)
+
+
+def test_posiciones_por_defecto_de_los_ejes():
+    # Cuatro valores en 100 px a partir de x=10: el centro de cada lugar
+    ejes = SimpleNamespace(_area=(10, 0, 100, 50), valores=[3, 1, 4, 1])
+    assert [graficos._GraficoEjes._x(ejes, i) for i in range(4)] == [22.5, 47.5, 72.5, 97.5]
+    assert graficos.GraficoBarras._x is graficos._GraficoEjes._x
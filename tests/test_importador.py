@@ -0,0 +1,127 @@
+"""
+Importación de CSV: filas válidas, errores por línea y resumen en bloque
+"""
+
+import pytest
+
+import importador
+
+
+def _csv(tmp_path, texto, nombre='extracto.csv', codificacion='utf-8'):
+    ruta = tmp_path / nombre
+    ruta.write_text(texto, encoding=codificacion)
+    return str(ruta)
+
+
+def test_informa_cada_error_con_su_linea(db, tmp_path):
+    ruta = _csv(tmp_path, (
+        'fecha,concepto,monto,categoria\n'
+        '2024-01-10,Venta de trigo,150000.50,agro\n'
+        '2024-01-11,Gasoil,-32000,\n'
+        '10/01/2024,Fecha mal,100,\n'
+        '2024-01-12,,100,\n'
+        '2024-01-13,Monto mal,abc,\n'
+        '\n'
+        '2024-01-14,Sin monto,0,\n'
+        '2024-01-15,Fletes,-1500.25,Otros\n'
+    ))
+
+    resultado = importador.importar_csv(ruta, db=db)
+
+    assert (resultado['ingresos'], resultado['gastos']) == (1, 2)
+    assert resultado['lineas'] == 7
+    assert resultado['cantidad_errores'] == 4
+    assert resultado['errores'] == [
+        (4, "Fecha inválida: '10/01/2024'"),
+        (5, 'Concepto vacío'),
+        (6, 'Monto inválido'),
+        (8, 'Monto cero'),
+    ]
+    filas = db.get_movimientos_pagina('gastos')['filas']
+    assert {(fila['concepto'], fila['monto'], fila['categoria']) for fila in filas} == {
+        ('Gasoil', 32000.0, 'otros'),
+        ('Fletes', 1500.25, 'otros'),
+    }
+
+
+def test_limita_el_detalle_de_errores(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(importador, 'MAX_ERRORES', 3)
+    ruta = _csv(tmp_path, 'fecha,concepto,monto\n' + '2024-01-10,Malo,x\n' * 10)
+
+    resultado = importador.importar_csv(ruta, db=db)
+
+    assert resultado['cantidad_errores'] == 10
+    assert [linea for linea, _error in resultado['errores']] == [2, 3, 4]
+
+
+def test_faltan_columnas(db, tmp_path):
+    ruta = _csv(tmp_path, 'fecha,detalle,importe\n2024-01-10,Gasoil,100\n')
+    with pytest.raises(ValueError, match='Faltan columnas'):
+        importador.importar_csv(ruta, db=db)
+
+
+def test_perfil_banco_y_resumen_en_lotes(db, tmp_path):
+    filas = ''.join(f'{dia:02d}/03/2024;Débito {dia};-1.234,{dia:02d};R{dia}\n' for dia in range(1, 29))
+    ruta = _csv(tmp_path, 'Fecha;Concepto;Importe;Referencia\n' + filas, codificacion='latin-1')
+
+    resultado = importador.importar_csv(ruta, perfil='banco', tabla='gastos', db=db, tamano_lote=5)
+
+    assert resultado['gastos'] == 28 and resultado['cantidad_errores'] == 0
+    with db.reader() as conn:
+        resumen = conn.execute(
+            "SELECT cantidad, total FROM resumen_mensual WHERE tabla = 'gastos' AND mes = '2024-03'"
+        ).fetchone()
+        triggers = {fila[0] for fila in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    assert resumen['cantidad'] == 28
+    assert resumen['total'] == pytest.approx(sum(1234 + dia / 100 for dia in range(1, 29)))
+    # La carga masiva deja los triggers como estaban
+    assert {'trg_gastos_resumen_ai', 'trg_gastos_busqueda_ai'} <= triggers
+    assert [r['id'] for r in db.buscar('debito 7')] != []
+
+
+def test_tabla_de_destino_invalida(db, tmp_path):
+    ruta = _csv(tmp_path, 'fecha,concepto,monto\n')
+    with pytest.raises(ValueError):
+        importador.importar_csv(ruta, tabla='cheques', db=db)
+
+
+def test_auto_reparte_por_signo(db, tmp_path):
+    ruta = _csv(tmp_path, (
+        'Fecha;Concepto;Débito;Crédito;Referencia\n'
+        '01/03/2024;Gasoil;12.500,00;;R1\n'
+        '02/03/2024;Venta de novillos;;830.000,50;R2\n'
+        '03/03/2024;Comisión;150,75;;R3\n'
+    ), codificacion='latin-1')
+
+    resultado = importador.importar_csv(ruta, perfil='banco_debito_credito', db=db)
+
+    assert (resultado['gastos'], resultado['ingresos']) == (2, 1)
+    gastos = db.get_movimientos_pagina('gastos')['filas']
+    ingresos = db.get_movimientos_pagina('ingresos')['filas']
+    assert sorted(fila['monto'] for fila in gastos) == [150.75, 12500.0]
+    assert [fila['monto'] for fila in ingresos] == [830000.5]
+
+
+def test_tabla_elegida_rechaza_el_signo_contrario(db, tmp_path):
+    # Un crédito del extracto no se guarda como gasto con su valor absoluto
+    ruta = _csv(tmp_path, (
+        'Fecha;Concepto;Importe;Referencia\n'
+        '01/03/2024;Gasoil;-12.500,00;R1\n'
+        '02/03/2024;Transferencia recibida;40.000,00;R2\n'
+    ), codificacion='latin-1')
+
+    resultado = importador.importar_csv(ruta, perfil='banco', tabla='gastos', db=db)
+
+    assert (resultado['gastos'], resultado['ingresos']) == (1, 0)
+    assert resultado['errores'] == [(3, 'Monto positivo (crédito) en una importación de gastos')]
+
+
+def test_planilla_propia_con_tabla_elegida(db, tmp_path):
+    # Sin signo en el perfil los gastos pueden venir en positivo, pero un
+    # ingreso negativo sigue siendo un error
+    ruta = _csv(tmp_path, 'fecha,concepto,monto\n2024-01-10,Semillas,1500\n2024-01-11,Fletes,-300\n')
+    assert importador.importar_csv(ruta, tabla='gastos', db=db)['gastos'] == 2
+
+    resultado = importador.importar_csv(ruta, tabla='ingresos', db=db)
+    assert resultado['ingresos'] == 1
+    assert resultado['errores'] == [(3, 'Monto negativo (débito) en una importación de ingresos')]
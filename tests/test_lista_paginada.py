@@ -0,0 +1,154 @@
+"""
+ListaPaginada: primera página, errores de lectura, reintento y cambios por id
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+pytest.importorskip('kivy')
+
+import eventos  # noqa: E402
+import listas  # noqa: E402
+
+
+class VistaDePrueba:
+    """Lo que ListaPaginada usa de una ListaVirtual, sin widgets"""
+
+    def __init__(self):
+        self.filas = []
+        self.contenedor = self
+        self.recargas = 0
+        self.tocadas = []
+
+    def bind(self, **eventos):
+        pass
+
+    def mostrar(self, filas):
+        self.recargas += 1
+        self.filas = list(filas)
+
+    def agregar(self, filas):
+        self.filas.extend(filas)
+
+    def _indice(self, fila_id):
+        return [datos['fila_id'] for datos in self.filas].index(fila_id)
+
+    def reemplazar(self, fila_id, datos):
+        self.tocadas.append(('reemplazo', fila_id))
+        self.filas[self._indice(fila_id)] = datos
+
+    def quitar(self, fila_id):
+        self.tocadas.append(('baja', fila_id))
+        del self.filas[self._indice(fila_id)]
+
+    def distancia_al_final(self):
+        return listas.UMBRAL_CARGA * 10
+
+    distancia_al_principio = distancia_al_final
+
+
+class RelojQuieto:
+    def schedule_once(self, callback, tiempo=0):
+        pass
+
+
+def _sincronico(funcion, *args, on_result=None, on_error=None, clave=None, **kwargs):
+    try:
+        resultado = funcion(*args, **kwargs)
+    except Exception as error:
+        on_error(error)
+    else:
+        on_result(resultado)
+
+
+@pytest.fixture(autouse=True)
+def sin_hilos(monkeypatch):
+    monkeypatch.setattr(listas.db_worker, 'run_async', _sincronico)
+    monkeypatch.setattr(listas, 'Clock', RelojQuieto())
+
+
+def _paginador(db, cargar_pagina=None, texto=lambda fila: fila['concepto']):
+    return listas.ListaPaginada(
+        VistaDePrueba(),
+        cargar_pagina or (lambda **kwargs: db.get_movimientos_pagina('gastos', limite=10, **kwargs)),
+        lambda fila: listas.fila('OneLineListItem', text=texto(fila)),
+        'prueba'
+    )
+
+
+def test_primera_pagina_reemplaza_el_aviso(db, movimientos):
+    movimientos(db, 'gastos', 25)
+    paginador = _paginador(db)
+
+    paginador.recargar()
+
+    assert len(paginador.vista.filas) == 10
+    assert all(datos['fila_id'] is not None for datos in paginador.vista.filas)
+
+
+def test_error_en_la_primera_pagina_ofrece_reintentar(db, movimientos):
+    movimientos(db, 'gastos', 5)
+    intentos = []
+
+    def cargar_pagina(**kwargs):
+        intentos.append(kwargs)
+        if len(intentos) == 1:
+            raise OSError('disco no disponible')
+        return db.get_movimientos_pagina('gastos', limite=10, **kwargs)
+
+    paginador = _paginador(db, cargar_pagina)
+    paginador.recargar()
+
+    # El "Cargando..." no queda para siempre: se muestra el error
+    [aviso] = paginador.vista.filas
+    assert aviso['text'] == paginador.texto_error
+    assert not paginador._cargando
+
+    aviso['on_release'](None)
+    assert len(intentos) == 2
+    assert len(paginador.vista.filas) == 5
+
+
+def test_error_de_una_lectura_reemplazada_no_pisa_la_lista(db, movimientos):
+    movimientos(db, 'gastos', 5)
+    paginador = _paginador(db)
+    paginador.recargar()
+    filas = paginador.vista.filas
+
+    paginador._fallo(OSError('lectura vieja'), paginador._generacion - 1)
+
+    assert paginador.vista.filas is filas
+
+
+def test_modificacion_reemplaza_solo_su_fila(db, movimientos):
+    ids = movimientos(db, 'gastos', 25)
+    paginador = _paginador(db)
+    paginador.recargar()
+    fila_id = paginador.vista.filas[3]['fila_id']
+    assert fila_id in ids
+    recargas = paginador.vista.recargas
+
+    with db.transaction() as conn:
+        conn.execute("UPDATE gastos SET concepto = 'Gasoil (corregido)' WHERE id = ?", (fila_id,))
+    paginador._on_cambios([eventos.Cambio('gastos', eventos.ACTUALIZAR, fila_id)])
+
+    # Una fila de data reemplazada: el RecycleView vuelve a cargar una sola vista
+    assert paginador.vista.tocadas == [('reemplazo', fila_id)]
+    assert paginador.vista.recargas == recargas
+    assert paginador.vista.filas[3]['text'] == 'Gasoil (corregido)'
+
+
+def test_cheque_cobrado_sale_sin_recargar_la_lista(db):
+    hoy = date.today()
+    ids = [db.insertar_cheque(str(i), 'Banco Nación', 1000 * i, hoy + timedelta(days=i)) for i in range(1, 6)]
+    paginador = _paginador(db, db.get_cheques_pendientes_pagina, texto=lambda fila: fila['numero'])
+    paginador.recargar()
+    recargas = paginador.vista.recargas
+
+    db.actualizar_estado_cheque(ids[2], 'cobrado')
+    paginador._on_cambios([eventos.Cambio('cheques', eventos.ACTUALIZAR, ids[2])])
+
+    assert paginador.vista.tocadas == [('baja', ids[2])]
+    assert paginador.vista.recargas == recargas
+    assert [datos['fila_id'] for datos in paginador.vista.filas] == [ids[0], ids[1], ids[3], ids[4]]
@@ -0,0 +1,114 @@
+"""
+Listas virtualizadas: filas como dicts de data y reconciliación por clave
+"""
+
+import pytest
+
+pytest.importorskip('kivy')
+
+import listas  # noqa: E402
+
+
+def test_fila_reinicia_lo_que_un_item_reciclado_conservaria():
+    datos = listas.fila('ThreeLineListItem', fila_id=7, text='Gasoil')
+
+    assert datos['viewclass'] == 'ThreeLineListItem'
+    assert datos['fila_id'] == 7
+    assert datos['tamano'] == (None, listas.ITEMS['ThreeLineListItem'][0])
+    # Un item reutilizado no muestra el texto secundario de otra fila
+    assert datos['secondary_text'] == '' and datos['tertiary_text'] == ''
+    assert callable(datos['on_release'])
+
+    assert listas.fila('TwoLineListItem', secondary_text='Agro')['secondary_text'] == 'Agro'
+
+
+def test_clave_de_filas_y_avisos():
+    assert listas.clave_fila(listas.fila('OneLineListItem', fila_id=('cheque', 3), text='x')) == ('cheque', 3)
+    # Los avisos no tienen id: se identifican por su texto
+    assert listas.clave_fila(listas.mensaje('Cargando...')) == ('OneLineListItem', 'Cargando...')
+
+
+def test_filas_iguales_salvo_acciones():
+    uno = listas.fila('OneLineListItem', fila_id=1, text='Gasoil', on_release=lambda: 1)
+    otro = listas.fila('OneLineListItem', fila_id=1, text='Gasoil', on_release=lambda: 2)
+
+    assert listas._iguales(uno, otro)
+    assert not listas._iguales(uno, {**otro, 'text': 'Fletes'})
+    assert not listas._iguales(uno, listas.fila('TwoLineListItem', fila_id=1, text='Gasoil'))
+
+
+class Data(list):
+    """data de un RecycleView que registra qué índices se tocaron"""
+
+    def __init__(self, filas):
+        super().__init__(filas)
+        self.tocados = []
+
+    def __setitem__(self, indice, valor):
+        self.tocados.append(('reemplazo', indice))
+        super().__setitem__(indice, valor)
+
+    def __delitem__(self, indice):
+        self.tocados.append(('baja', indice))
+        super().__delitem__(indice)
+
+    def insert(self, indice, valor):
+        self.tocados.append(('alta', indice))
+        super().insert(indice, valor)
+
+
+class VistaDePrueba:
+    """Los métodos de ListaVirtual que solo usan data, sin RecycleView"""
+
+    _inicio = 0
+    reconciliar = listas.ListaVirtual.reconciliar
+    indice = listas.ListaVirtual.indice
+    reemplazar = listas.ListaVirtual.reemplazar
+
+    def __init__(self, filas):
+        self.data = Data(filas)
+
+
+def _fila(fila_id, texto):
+    return listas.fila('TwoLineListItem', fila_id=fila_id, text=texto, secondary_text='pendiente')
+
+
+def test_reconciliar_toca_solo_lo_que_cambio():
+    vista = VistaDePrueba([_fila(i, f'Cheque {i}') for i in range(1, 6)])
+    originales = list(vista.data)
+
+    nuevas = [_fila(i, f'Cheque {i}') for i in (1, 2, 6, 3, 5)]
+    nuevas[3]['secondary_text'] = 'cobrado'
+    tocadas = vista.reconciliar(nuevas)
+
+    assert [datos['fila_id'] for datos in vista.data] == [1, 2, 6, 3, 5]
+    assert vista.data[3]['secondary_text'] == 'cobrado'
+    # Baja del 4, alta del 6 y cambio del 3; las demás filas son los mismos dicts
+    assert tocadas == 3
+    assert sorted(vista.data.tocados) == [('alta', 2), ('baja', 3), ('reemplazo', 3)]
+    assert vista.data[0] is originales[0] and vista.data[4] is originales[4]
+
+
+def test_reconciliar_sin_cambios_no_toca_nada():
+    vista = VistaDePrueba([_fila(i, f'Cheque {i}') for i in range(1, 4)])
+    assert vista.reconciliar([_fila(i, f'Cheque {i}') for i in range(1, 4)]) == 0
+    assert vista.data.tocados == []
+
+
+def test_reconciliar_fila_movida():
+    vista = VistaDePrueba([_fila(i, f'Cheque {i}') for i in range(1, 5)])
+    vista.reconciliar([_fila(i, f'Cheque {i}') for i in (3, 1, 2, 4)])
+    assert [datos['fila_id'] for datos in vista.data] == [3, 1, 2, 4]
+
+
+def test_reemplazar_por_id():
+    vista = VistaDePrueba([_fila(i, f'Cheque {i}') for i in range(1, 4)])
+
+    # Solo cambia la acción: se guarda sin reemplazar el item
+    accion = lambda *args: None  # noqa: E731
+    vista.reemplazar(2, {**_fila(2, 'Cheque 2'), 'on_release': accion})
+    assert vista.data.tocados == [] and vista.data[1]['on_release'] is accion
+
+    vista.reemplazar(2, {**_fila(2, 'Cheque 2'), 'secondary_text': 'cobrado'})
+    vista.reemplazar(99, _fila(99, 'No está'))
+    assert vista.data.tocados == [('reemplazo', 1)]
@@ -0,0 +1,167 @@
+"""
+Gráficos de matplotlib en Kivy: texturas reutilizadas y caché por contenido
+"""
+
+import pytest
+
+pytest.importorskip('kivy')
+
+from kivy.uix.widget import Widget  # noqa: E402
+
+import matplotlib_wrapper  # noqa: E402
+
+
+def _pixeles(ancho, alto, valor=255):
+    return bytes([valor]) * (ancho * alto * 4)
+
+
+class TexturaDePrueba:
+    """Texture sin contexto OpenGL: registra las creadas y lo copiado"""
+
+    creadas = []
+
+    def __init__(self, size, colorfmt):
+        self.size = size
+        self.colorfmt = colorfmt
+        self.copias = []
+
+    @classmethod
+    def create(cls, size, colorfmt='rgb'):
+        cls.creadas.append(cls(tuple(size), colorfmt))
+        return cls.creadas[-1]
+
+    def flip_vertical(self):
+        pass
+
+    def blit_buffer(self, pixeles, colorfmt, bufferfmt):
+        self.copias.append(bytes(pixeles))
+
+
+@pytest.fixture
+def texturas(monkeypatch):
+    monkeypatch.setattr(TexturaDePrueba, 'creadas', [])
+    monkeypatch.setattr(matplotlib_wrapper, 'Texture', TexturaDePrueba)
+    return TexturaDePrueba.creadas
+
+
+def test_mismo_tamano_se_copia_sobre_la_textura(texturas):
+    imagen = matplotlib_wrapper.MatplotlibWidget()
+
+    imagen.mostrar(40, 30, _pixeles(40, 30))
+    textura = imagen.texture
+    imagen.mostrar(40, 30, _pixeles(40, 30, 0))
+    assert imagen.texture is textura
+    assert len(texturas) == 1
+    assert textura.copias == [_pixeles(40, 30), _pixeles(40, 30, 0)]
+
+    # Otro tamaño (rotación) necesita otra textura
+    imagen.mostrar(30, 40, _pixeles(30, 40))
+    assert imagen.texture is not textura
+    assert len(texturas) == 2
+
+
+def test_clave_depende_de_datos_tamano_y_resolucion():
+    clave = matplotlib_wrapper.clave_grafico
+    base = clave('torta', (['Agro'], [10.0]), (400, 300), 100)
+
+    assert base == clave('torta', (['Agro'], [10.0]), (400, 300), 100)
+    assert base != clave('torta', (['Agro'], [11.0]), (400, 300), 100)
+    assert base != clave('torta', (['Agro'], [10.0]), (300, 400), 100)
+    assert base != clave('torta', (['Agro'], [10.0]), (400, 300), 300)
+
+
+def test_lru_en_memoria():
+    cache = matplotlib_wrapper.CacheGraficos(max_imagenes=2)
+    for clave in 'abc':
+        cache.guardar(clave, 2, 2, _pixeles(2, 2))
+
+    assert cache.imagen('a') is None
+    assert cache.imagen('b') is not None
+    # 'b' se usó recién: al agregar otra sale 'c'
+    cache.guardar('d', 2, 2, _pixeles(2, 2))
+    assert cache.imagen('c') is None
+    assert (cache.aciertos, cache.fallos) == (1, 2)
+
+
+def test_guarda_una_copia_de_los_pixeles():
+    cache = matplotlib_wrapper.CacheGraficos()
+    buffer = bytearray(_pixeles(2, 2))
+
+    cache.guardar('a', 2, 2, memoryview(buffer))
+    # Agg reutiliza su buffer en el próximo dibujo
+    buffer[:] = _pixeles(2, 2, 0)
+
+    assert cache.imagen('a') == (2, 2, _pixeles(2, 2))
+
+
+def test_disco_entre_ejecuciones(tmp_path):
+    carpeta = str(tmp_path / 'graficos')
+    anterior = matplotlib_wrapper.CacheGraficos()
+    anterior.configurar(carpeta=carpeta)
+    anterior.guardar('a', 3, 2, _pixeles(3, 2, 7))
+
+    nueva = matplotlib_wrapper.CacheGraficos(carpeta=carpeta)
+    assert nueva.imagen('a') == (3, 2, _pixeles(3, 2, 7))
+    assert nueva.aciertos == 1
+
+
+def test_disco_descarta_archivos_invalidos_y_poda(tmp_path):
+    cache = matplotlib_wrapper.CacheGraficos(carpeta=str(tmp_path), max_archivos=3)
+    for clave in 'abcde':
+        cache.guardar(clave, 2, 2, _pixeles(2, 2))
+    assert len(list(tmp_path.glob('*.rgba'))) == 3
+
+    (tmp_path / 'roto.rgba').write_bytes(b'RGBA' + b'\0' * 20)
+    cache.vaciar()
+    assert cache.imagen('roto') is None
+    assert matplotlib_wrapper.descomprimir(b'PNG') is None
+
+
+def test_comprimir_ida_y_vuelta():
+    pixeles = bytes(range(256)) * 3
+    datos = matplotlib_wrapper.comprimir(16, 12, pixeles)
+    assert matplotlib_wrapper.descomprimir(datos) == (16, 12, pixeles)
+    # Un tamaño que no coincide con los píxeles no se acepta
+    assert matplotlib_wrapper.descomprimir(matplotlib_wrapper.comprimir(16, 13, pixeles)) is None
+
+
+def test_pedido_nuevo_deja_viejo_al_anterior():
+    primero = matplotlib_wrapper._nueva_generacion('prueba_generaciones')
+    assert primero()
+    segundo = matplotlib_wrapper._nueva_generacion('prueba_generaciones')
+    assert not primero() and segundo()
+    # Sin clave los pedidos no se reemplazan entre sí
+    assert matplotlib_wrapper._nueva_generacion(None)()
+
+
+def test_dibujo_abandonado_no_pasa_por_matplotlib():
+    dibujados = []
+    resultado = matplotlib_wrapper._renderizar(
+        lambda fig, datos: dibujados.append(datos), (1, 2), (4, 3), 100, lambda: False, 'clave'
+    )
+    assert resultado is None and dibujados == []
+    assert matplotlib_wrapper.cache.imagen('clave') is None
+
+
+def test_acierto_de_cache_se_muestra_sin_dibujar(monkeypatch, texturas):
+    # El aviso de KivyMD necesita una MDApp corriendo
+    monkeypatch.setattr(matplotlib_wrapper, 'MDLabel', lambda **kwargs: Widget())
+    monkeypatch.setattr(matplotlib_wrapper, 'cache', matplotlib_wrapper.CacheGraficos())
+    pedidos = []
+    monkeypatch.setattr(matplotlib_wrapper.db_worker, 'run_async', lambda *args, **kwargs: pedidos.append(args))
+    grafico = matplotlib_wrapper.GraficoWidget('torta', ([1, 2],), lambda fig, datos: None, clave='prueba_cache')
+    grafico.width, grafico.height = 200, 100
+
+    grafico.renderizar()
+    assert len(pedidos) == 1 and grafico.imagen is None
+
+    # Con la imagen ya en caché, otro widget igual no pide dibujarla
+    dpi = matplotlib_wrapper.dpi_pantalla()
+    clave = matplotlib_wrapper.clave_grafico('torta', ([1, 2],), (200, 100), dpi)
+    matplotlib_wrapper.cache.guardar(clave, 200, 100, _pixeles(200, 100))
+    otro = matplotlib_wrapper.GraficoWidget('torta', ([1, 2],), lambda fig, datos: None, clave='prueba_cache')
+    otro.width, otro.height = 200, 100
+    otro.renderizar()
+    assert len(pedidos) == 1
+    assert otro.imagen.texture.size == (200, 100)
+    assert len(texturas) == 1
@@ -0,0 +1,55 @@
+"""
+Migraciones versionadas e índices de las consultas críticas
+"""
+
+import database
+import migrations
+
+
+def test_esquema_en_la_ultima_version(db):
+    with db.reader() as conn:
+        assert migrations.get_version(conn) == migrations.MIGRACIONES[-1][0]
+
+
+def test_migraciones_se_aplican_una_sola_vez(db):
+    assert migrations.aplicar_migraciones(db) == []
+    db.ensure_schema()
+    with db.reader() as conn:
+        assert migrations.get_version(conn) == migrations.MIGRACIONES[-1][0]
+
+
+def test_migra_una_base_sin_versionar(tmp_path):
+    # Base creada por una versión anterior: tablas con datos y user_version 0
+    ruta = str(tmp_path / 'vieja.db')
+    db = database.DatabaseManager(ruta)
+    try:
+        with db.transaction() as conn:
+            conn.execute('''
+                CREATE TABLE gastos (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    categoria TEXT NOT NULL,
+                    concepto TEXT NOT NULL,
+                    monto REAL NOT NULL,
+                    fecha TEXT NOT NULL,
+                    descripcion TEXT
+                )
+            ''')
+            conn.execute(
+                "INSERT INTO gastos (categoria, concepto, monto, fecha) VALUES ('agro', 'Semillas', 1500.5, '2024-03-10')"
+            )
+        db.ensure_schema()
+        with db.reader() as conn:
+            fila = conn.execute(
+                "SELECT cantidad, total FROM resumen_mensual WHERE tabla = 'gastos' AND mes = '2024-03'"
+            ).fetchone()
+        assert tuple(fila) == (1, 1500.5)
+    finally:
+        db.close()
+
+
+def test_consultas_criticas_usan_su_indice(db_formatos):
+    with db_formatos.reader() as conn:
+        resultados = migrations.verificar_indices(conn)
+    assert len(resultados) == len(migrations.CONSULTAS_INDEXADAS)
+    sin_indice = [(descripcion, plan) for descripcion, _indice, usa, plan in resultados if not usa]
+    assert sin_indice == []
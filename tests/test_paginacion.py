@@ -0,0 +1,55 @@
+"""
+Paginación por cursor (keyset) hacia adelante, hacia atrás y por ids
+"""
+
+
+def _orden_esperado(db, tabla):
+    with db.reader() as conn:
+        return [fila[0] for fila in conn.execute(f'SELECT id FROM {tabla} ORDER BY fecha DESC, id DESC')]
+
+
+def test_paginacion_hacia_adelante(db_formatos, movimientos):
+    db = db_formatos
+    movimientos(db, 'gastos', 95)
+
+    vistos = []
+    pagina = db.get_movimientos_pagina('gastos', limite=10)
+    assert pagina['anterior'] is None
+    while True:
+        vistos.extend(fila['id'] for fila in pagina['filas'])
+        assert len(pagina['cursores']) == len(pagina['filas'])
+        if pagina['siguiente'] is None:
+            break
+        pagina = db.get_movimientos_pagina('gastos', despues_de=pagina['siguiente'], limite=10)
+
+    assert vistos == _orden_esperado(db, 'gastos')
+    assert len(pagina['filas']) == 5
+
+
+def test_paginacion_hacia_atras(db_formatos, movimientos):
+    db = db_formatos
+    movimientos(db, 'gastos', 95)
+    esperado = _orden_esperado(db, 'gastos')
+
+    # Ir hasta la última página y volver al principio con antes_de
+    pagina = db.get_movimientos_pagina('gastos', limite=10)
+    while pagina['siguiente'] is not None:
+        pagina = db.get_movimientos_pagina('gastos', despues_de=pagina['siguiente'], limite=10)
+    vistos = [fila['id'] for fila in pagina['filas']]
+    while pagina['anterior'] is not None:
+        pagina = db.get_movimientos_pagina('gastos', antes_de=pagina['anterior'], limite=10)
+        vistos = [fila['id'] for fila in pagina['filas']] + vistos
+
+    assert vistos == esperado
+    # La primera página, leída hacia atrás, es la del principio de la lista
+    assert [fila['id'] for fila in pagina['filas']] == esperado[:len(pagina['filas'])]
+
+
+def test_paginacion_por_ids_conserva_el_orden(db, movimientos):
+    movimientos(db, 'gastos', 30)
+    esperado = _orden_esperado(db, 'gastos')
+    pedidos = esperado[3:20:4]
+
+    pagina = db.get_movimientos_pagina('gastos', ids=reversed(pedidos))
+    assert [fila['id'] for fila in pagina['filas']] == pedidos
+    assert pagina['anterior'] is None and pagina['siguiente'] is None
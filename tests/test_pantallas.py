@@ -0,0 +1,115 @@
+"""
+Pantallas perezosas: se importan y construyen recién al abrirlas o en
+frames ociosos
+"""
+
+import os
+import sys
+
+import pytest
+
+pytest.importorskip('kivymd')
+
+import main  # noqa: E402
+
+
+class GestorDePrueba:
+    """La lógica de GestorPantallas sobre un registro simple: el
+    MDScreenManager real necesita una MDApp corriendo"""
+
+    registrar = main.GestorPantallas.registrar
+    construir = main.GestorPantallas.construir
+    precalentar = main.GestorPantallas.precalentar
+    _precalentar_siguiente = main.GestorPantallas._precalentar_siguiente
+
+    def __init__(self):
+        self._fabricas = {}
+        self._pendientes = []
+        self.pantallas = {}
+
+    def has_screen(self, nombre):
+        return nombre in self.pantallas
+
+    def get_screen(self, nombre):
+        return self.pantallas[nombre]
+
+    def add_widget(self, pantalla):
+        self.pantallas[pantalla.name] = pantalla
+
+
+class RelojDePrueba:
+    def __init__(self):
+        self.frametime = 0
+        self.programados = []
+
+    def schedule_once(self, callback, tiempo=0):
+        self.programados.append(callback)
+
+    def avanzar(self):
+        self.programados.pop(0)(0)
+
+
+@pytest.fixture
+def pantallas(tmp_path, monkeypatch):
+    """Módulo de pantallas de prueba todavía sin importar"""
+    (tmp_path / 'pantallas_prueba.py').write_text(
+        'creadas = []\n'
+        '\n'
+        'class Gastos:\n'
+        '    name = "gastos"\n'
+        '\n'
+        '    def __init__(self):\n'
+        '        creadas.append(self.name)\n'
+        '\n'
+        'class Cheques(Gastos):\n'
+        '    name = "cheques"\n'
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    gestor = GestorDePrueba()
+    gestor.registrar('gastos', 'pantallas_prueba.Gastos')
+    gestor.registrar('cheques', 'pantallas_prueba.Cheques')
+    yield gestor
+    sys.modules.pop('pantallas_prueba', None)
+
+
+def test_registrar_no_importa_la_pantalla(pantallas):
+    assert 'pantallas_prueba' not in sys.modules
+    assert pantallas.pantallas == {}
+
+
+def test_construir_una_sola_vez(pantallas):
+    gastos = pantallas.construir('gastos')
+
+    assert pantallas.construir('gastos') is gastos
+    assert sys.modules['pantallas_prueba'].creadas == ['gastos']
+
+
+def test_precalentar_de_a_una_en_frames_ociosos(pantallas, monkeypatch):
+    reloj = RelojDePrueba()
+    monkeypatch.setattr(main, 'Clock', reloj)
+    pantallas.construir('cheques')
+
+    # Las ya construidas y las no registradas se saltean
+    pantallas.precalentar(['mercado', 'cheques', 'gastos'])
+    assert pantallas._pendientes == ['cheques', 'gastos']
+
+    reloj.frametime = main.FRAME_OCIOSO * 2
+    reloj.avanzar()
+    assert not pantallas.has_screen('gastos')
+
+    reloj.frametime = 0
+    reloj.avanzar()
+    assert pantallas.has_screen('gastos')
+    assert sys.modules['pantallas_prueba'].creadas == ['cheques', 'gastos']
+
+    reloj.avanzar()
+    assert reloj.programados == []
+
+
+def test_todas_las_rutas_existen():
+    carpeta = os.path.dirname(main.__file__)
+    for ruta in main.PANTALLAS.values():
+        modulo, clase = ruta.rsplit('.', 1)
+        with open(os.path.join(carpeta, f'{modulo}.py'), encoding='utf-8') as archivo:
+            assert f'class {clase}(' in archivo.read()
+    assert set(main.PRECALENTAR) <= set(main.PANTALLAS)
@@ -0,0 +1,78 @@
+"""
+Pool de conexiones: una conexión de escritura compartida y lectores reutilizados
+"""
+
+import sqlite3
+import threading
+
+import pytest
+
+import database
+
+
+def test_managers_de_una_base_comparten_el_pool(db):
+    otro = database.DatabaseManager(db.db_name)
+    assert otro.pool is db.pool
+    assert otro.get_connection() is db.get_connection()
+
+
+def test_get_db_es_unico_por_base(tmp_path):
+    ruta = str(tmp_path / 'compartida.db')
+    try:
+        assert database.get_db(ruta) is database.get_db(ruta)
+    finally:
+        database.get_db(ruta).close()
+
+
+def test_conexiones_en_wal(db):
+    with db.reader() as conn:
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert conn is not db.get_connection()
+
+
+def test_transaccion_confirma_o_deshace(db):
+    with db.transaction() as conn:
+        conn.execute("INSERT INTO proveedores (nombre) VALUES ('Acopio Norte')")
+
+    with pytest.raises(sqlite3.IntegrityError):
+        with db.transaction() as conn:
+            conn.execute("INSERT INTO proveedores (nombre) VALUES ('Semillera Sur')")
+            conn.execute('INSERT INTO proveedores (nombre) VALUES (NULL)')
+
+    with db.reader() as conn:
+        nombres = [fila[0] for fila in conn.execute('SELECT nombre FROM proveedores')]
+    assert nombres == ['Acopio Norte']
+
+
+def test_transaccion_anidada_usa_la_externa(db):
+    with pytest.raises(RuntimeError):
+        with db.transaction() as conn:
+            conn.execute("INSERT INTO proveedores (nombre) VALUES ('Acopio Norte')")
+            with db.transaction() as interna:
+                assert interna is conn
+            raise RuntimeError('falla después del bloque interno')
+
+    with db.reader() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM proveedores').fetchone()[0] == 0
+
+
+def test_lectores_reutilizados_entre_hilos(db):
+    db.insertar_proveedor('Acopio Norte')
+    errores = []
+
+    def leer():
+        try:
+            for _ in range(50):
+                with db.reader() as conn:
+                    assert conn.execute('SELECT COUNT(*) FROM proveedores').fetchone()[0] == 1
+        except Exception as error:
+            errores.append(error)
+
+    hilos = [threading.Thread(target=leer) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert errores == []
+    assert len(db.pool._todos_lectores) <= db.pool.max_lectores
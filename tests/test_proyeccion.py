@@ -0,0 +1,138 @@
+"""
+Proyección de fondos: saldo acumulado por día y cambios incrementales de cheques
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('kivy')
+
+import proyeccion  # noqa: E402
+
+HOY = date(2024, 5, 10)
+
+
+def _fecha(dias):
+    return (HOY + timedelta(days=dias)).strftime('%Y-%m-%d')
+
+
+def _datos(**datos):
+    return {'saldo': 1000.0, 'cheques': [], 'ingresos': [], 'gastos': [], 'historial': [], **datos}
+
+
+def _saldos_esperados(datos, horizonte):
+    """Saldo al final de cada día sumando los movimientos uno por uno"""
+    saldos = []
+    saldo = datos['saldo']
+    for dia in range(horizonte):
+        fecha = _fecha(dia)
+        saldo += sum(c['monto'] for c in datos['cheques'] if max(c['fecha_vencimiento'], _fecha(0)) == fecha)
+        saldo += sum(i['monto'] for i in datos['ingresos'] if max(i['fecha'], _fecha(0)) == fecha)
+        saldo -= sum(g['monto'] for g in datos['gastos'] if max(g['fecha'], _fecha(0)) == fecha)
+        saldos.append(saldo)
+    return saldos
+
+
+def test_saldo_acumulado_por_dia():
+    datos = _datos(
+        cheques=[
+            {'id': 1, 'monto': 500.0, 'fecha_vencimiento': _fecha(3)},
+            # Vencido sin cobrar: se espera para hoy
+            {'id': 2, 'monto': 50.0, 'fecha_vencimiento': _fecha(-4)},
+            # Después del horizonte: no mueve el saldo
+            {'id': 3, 'monto': 9999.0, 'fecha_vencimiento': _fecha(40)},
+        ],
+        ingresos=[{'fecha': _fecha(5), 'monto': 200.0}],
+        gastos=[{'fecha': _fecha(2), 'monto': 300.0}, {'fecha': _fecha(29), 'monto': 100.0}],
+    )
+
+    resultado = proyeccion.Proyeccion(datos, HOY, horizonte=30)
+
+    assert resultado.saldos.tolist() == pytest.approx(_saldos_esperados(datos, 30))
+    assert resultado.saldos[0] == pytest.approx(1050.0)
+    assert resultado.minimo() == (HOY + timedelta(days=2), pytest.approx(750.0))
+    assert resultado.final() == (HOY + timedelta(days=29), pytest.approx(1350.0))
+
+
+def test_perfil_de_gastos_empieza_manana():
+    # 61 días de historia (desde el 11 de marzo) con 100 por día
+    historial = [{'fecha': _fecha(-dia), 'monto': 100.0} for dia in range(61)]
+    resultado = proyeccion.Proyeccion(_datos(historial=historial), HOY, horizonte=10, dias_historia=61)
+
+    assert resultado.salidas[0] == 0
+    assert resultado.saldos[0] == pytest.approx(1000.0)
+    # Del 11 al 19 de mayo: cada día del mes aparece dos veces (marzo y abril)
+    # en los 61 días, que son dos meses
+    esperado = 2 * 100.0 / (61 / proyeccion.DIAS_MES)
+    assert resultado.salidas[1:].tolist() == pytest.approx([esperado] * 9)
+    assert resultado.saldos[-1] == pytest.approx(1000.0 - 9 * esperado)
+
+
+def test_cambios_de_cheques_igual_a_recalcular():
+    cheques = [{'id': i, 'monto': 100.0 * i, 'fecha_vencimiento': _fecha(i * 3)} for i in range(1, 8)]
+    datos = _datos(cheques=cheques, gastos=[{'fecha': _fecha(4), 'monto': 250.0}])
+    resultado = proyeccion.Proyeccion(datos, HOY, horizonte=30)
+
+    # Baja, postergación, alta y cobro aplicados sobre la serie existente
+    assert resultado.quitar_cheque(2) is True
+    assert resultado.quitar_cheque(99) is False
+    resultado.poner_cheque({'id': 3, 'monto': 300.0, 'fecha_vencimiento': _fecha(25), 'estado': 'pendiente'})
+    resultado.poner_cheque({'id': 8, 'monto': 80.0, 'fecha_vencimiento': _fecha(1), 'estado': 'pendiente'})
+    resultado.poner_cheque({'id': 5, 'monto': 500.0, 'fecha_vencimiento': _fecha(15), 'estado': 'cobrado'})
+
+    pendientes = [c for c in cheques if c['id'] not in (2, 3, 5)] + [
+        {'id': 3, 'monto': 300.0, 'fecha_vencimiento': _fecha(25)},
+        {'id': 8, 'monto': 80.0, 'fecha_vencimiento': _fecha(1)},
+    ]
+    esperado = proyeccion.Proyeccion(
+        _datos(saldo=1500.0, cheques=pendientes, gastos=datos['gastos']), HOY, horizonte=30
+    )
+    assert resultado.saldo_inicial == pytest.approx(1500.0)
+    assert resultado.saldos.tolist() == pytest.approx(esperado.saldos.tolist())
+    assert resultado.cheques.tolist() == pytest.approx(esperado.cheques.tolist())
+
+
+def test_datos_de_la_base(db):
+    db.insertar_movimiento('ingresos', 'agro', 'Venta de trigo', 5000, HOY - timedelta(days=10))
+    db.insertar_movimiento('gastos', 'otros', 'Gasoil', 1200, HOY - timedelta(days=3))
+    db.insertar_movimiento('gastos', 'otros', 'Arriendo', 800, HOY + timedelta(days=6))
+    cobrado = db.insertar_cheque('1', 'Banco Nación', 700, HOY - timedelta(days=1))
+    db.actualizar_estado_cheque(cobrado, 'cobrado')
+    db.insertar_cheque('2', 'Banco Nación', 300, HOY + timedelta(days=4))
+
+    datos = db.get_datos_proyeccion(HOY, 30, 30)
+    assert datos['saldo'] == pytest.approx(5000 - 1200 + 700)
+
+    assert [c['monto'] for c in datos['cheques']] == [300]
+    assert [g['fecha'] for g in datos['historial']] == [_fecha(-3)]
+
+    # Sin el perfil de gastos el saldo solo cambia con los movimientos conocidos
+    resultado = proyeccion.Proyeccion({**datos, 'historial': []}, HOY, horizonte=30, dias_historia=30)
+    saldos = resultado.saldos
+    assert saldos[0] == pytest.approx(4500)
+    assert saldos[4] - saldos[3] == pytest.approx(300)
+    assert saldos[6] - saldos[5] == pytest.approx(-800)
+    assert saldos[-1] == pytest.approx(4500 + 300 - 800)
+
+
+def test_cobrar_un_cheque_no_lo_cuenta_dos_veces(db):
+    db.insertar_movimiento('ingresos', 'agro', 'Venta de trigo', 5000, HOY - timedelta(days=10))
+    cheque = db.insertar_cheque('1', 'Banco Nación', 700, HOY + timedelta(days=2))
+
+    antes = db.get_datos_proyeccion(HOY, 30, 30)
+    assert antes['saldo'] == pytest.approx(5000)
+    assert [c['monto'] for c in antes['cheques']] == [700]
+
+    # Cobrar solo cambia el estado: no aparece un ingreso y el monto pasa al saldo
+    db.actualizar_estado_cheque(cheque, 'cobrado')
+    despues = db.get_datos_proyeccion(HOY, 30, 30)
+    assert db.get_total('ingresos') == pytest.approx(5000)
+    assert despues['saldo'] == pytest.approx(5700)
+    assert despues['cheques'] == []
+
+    # El saldo al final del horizonte es el mismo antes y después de cobrar
+    final_antes = proyeccion.Proyeccion({**antes, 'historial': []}, HOY, horizonte=30).final()[1]
+    final_despues = proyeccion.Proyeccion({**despues, 'historial': []}, HOY, horizonte=30).final()[1]
+    assert final_antes == pytest.approx(final_despues) == pytest.approx(5700)
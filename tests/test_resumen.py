@@ -0,0 +1,70 @@
+"""
+Resumen mensual mantenido por triggers, comparado con SUM() sobre los movimientos
+"""
+
+import statistics
+
+import pytest
+
+import migrations
+
+
+def _resumen(db, tabla):
+    with db.reader() as conn:
+        filas = conn.execute(
+            'SELECT mes, categoria, cantidad, total FROM resumen_mensual WHERE tabla = ?', (tabla,)
+        ).fetchall()
+    return {(fila['mes'], fila['categoria']): (fila['cantidad'], fila['total']) for fila in filas}
+
+
+def _agrupado(db, tabla):
+    """Lo mismo que el resumen, calculado con SUM() sobre los movimientos"""
+    with db.reader() as conn:
+        filas = conn.execute(f'''
+            SELECT {migrations.expr_mes('fecha')} AS mes, categoria, COUNT(*) AS cantidad, SUM(monto) AS total
+            FROM {tabla}
+            GROUP BY mes, categoria
+        ''').fetchall()
+    return {(fila['mes'], fila['categoria']): (fila['cantidad'], fila['total']) for fila in filas}
+
+
+def _iguales(resumen, agrupado):
+    assert resumen.keys() == agrupado.keys()
+    for clave, (cantidad, total) in agrupado.items():
+        assert resumen[clave][0] == cantidad
+        assert resumen[clave][1] == pytest.approx(total)
+
+
+def test_resumen_sigue_altas_cambios_y_bajas(db_formatos, movimientos):
+    db = db_formatos
+    ids = movimientos(db, 'gastos', 300)
+    _iguales(_resumen(db, 'gastos'), _agrupado(db, 'gastos'))
+
+    with db.transaction() as conn:
+        for gasto_id in ids[:40]:
+            conn.execute("UPDATE gastos SET categoria = 'otros', monto = monto * 2 WHERE id = ?", (gasto_id,))
+        for gasto_id in ids[40:60]:
+            conn.execute(
+                'UPDATE gastos SET fecha = (SELECT fecha FROM gastos WHERE id = ?) WHERE id = ?',
+                (ids[-1], gasto_id)
+            )
+        conn.execute(f'DELETE FROM gastos WHERE id IN ({", ".join("?" * 50)})', ids[100:150])
+    _iguales(_resumen(db, 'gastos'), _agrupado(db, 'gastos'))
+
+    with db.transaction() as conn:
+        conn.execute('DELETE FROM gastos')
+    assert _resumen(db, 'gastos') == {}
+
+
+def test_resumen_por_categoria_coincide_con_los_movimientos(db_formatos, movimientos):
+    db = db_formatos
+    movimientos(db, 'gastos', 150)
+    with db.reader() as conn:
+        filas = db.formato.decodificar(conn.execute('SELECT categoria, monto FROM gastos').fetchall(), montos=('monto',))
+
+    for fila in db.get_resumen_por_categoria('gastos'):
+        montos = [otra['monto'] for otra in filas if otra['categoria'] == fila['categoria']]
+        assert fila['cantidad'] == len(montos)
+        assert fila['total'] == pytest.approx(sum(montos))
+        assert fila['promedio'] == pytest.approx(statistics.fmean(montos))
+        assert fila['desvio'] == pytest.approx(statistics.pstdev(montos), rel=1e-6)
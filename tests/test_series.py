@@ -0,0 +1,72 @@
+"""
+Reducción de series con LTTB y serie de producción del tambo
+"""
+
+import math
+from datetime import date, timedelta
+
+import series
+
+
+def test_serie_corta_se_devuelve_entera():
+    xs = list(range(10))
+    assert series.lttb(xs, xs, 10) == list(range(10))
+    assert series.lttb(xs, xs, 50) == list(range(10))
+    assert series.lttb(xs, xs, 2) == list(range(10))
+    assert series.lttb([], [], 5) == []
+
+
+def test_conserva_extremos_y_cantidad():
+    xs = list(range(1000))
+    ys = [math.sin(x / 20) for x in xs]
+
+    indices = series.lttb(xs, ys, 100)
+
+    assert len(indices) == 100
+    assert indices[0] == 0 and indices[-1] == 999
+    assert indices == sorted(set(indices))
+
+
+def test_conserva_picos_y_caidas():
+    xs = list(range(5000))
+    ys = [100.0] * 5000
+    ys[1234] = 900.0
+    ys[3210] = -500.0
+
+    indices = series.lttb(xs, ys, 50)
+
+    assert 1234 in indices
+    assert 3210 in indices
+
+
+def test_fechas_no_equiespaciadas():
+    # Días con huecos (sin registros): xs ordenado pero no consecutivo
+    xs = [dia * 3 + (dia % 7) for dia in range(600)]
+    ys = [float(dia % 30) for dia in range(600)]
+
+    indices = series.lttb(xs, ys, 60)
+
+    assert len(indices) == 60
+    assert all(a < b for a, b in zip(indices, indices[1:]))
+
+
+def test_serie_tambo_reducida_conserva_totales(db_formatos):
+    db = db_formatos
+    inicio = date(2023, 1, 1)
+    for dia in range(400):
+        litros = 9000.0 if dia == 250 else 4000.0 + dia % 50
+        db.insertar_registro_tambo(inicio + timedelta(days=dia), litros)
+    # Dos registros el mismo día se suman
+    db.insertar_registro_tambo(inicio, 500.0)
+
+    completa = db.get_serie_tambo()
+    reducida = db.get_serie_tambo(puntos=60)
+
+    assert completa['registros'] == reducida['registros'] == 400
+    assert reducida['promedio'] == completa['promedio']
+    assert completa['filas'][0]['litros_producidos'] == 4500.0
+    assert len(reducida['filas']) == 60
+    assert (inicio + timedelta(days=250)).isoformat() in [fila['fecha'] for fila in reducida['filas']]
+
+    tramo = db.get_serie_tambo(desde=date(2023, 3, 1), hasta=date(2023, 3, 31))
+    assert tramo['registros'] == 31
@@ -0,0 +1,94 @@
+"""
+Montículos de vencimientos: próximo cruce de umbral con altas, cobros y bajas
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+pytest.importorskip('kivy')
+
+import vencimientos  # noqa: E402
+
+
+def _cheque(cheque_id, dias):
+    return {
+        'id': cheque_id,
+        'numero': f'{cheque_id:06d}',
+        'banco': 'Banco Nación',
+        'monto': 1000.0 * cheque_id,
+        'fecha_vencimiento': (date.today() + timedelta(days=dias)).strftime('%Y-%m-%d'),
+    }
+
+
+@pytest.fixture
+def programador():
+    programador = vencimientos.Programador(dias_aviso=7)
+    yield programador
+    programador.detener()
+
+
+def _cargar(programador, cheques):
+    programador._cargar(cheques, programador._generacion)
+
+
+def test_etapas():
+    hoy = date(2024, 5, 10)
+    assert vencimientos.etapa(date(2024, 5, 9), hoy) == vencimientos.VENCIDO
+    assert vencimientos.etapa(date(2024, 5, 10), hoy) == vencimientos.PROXIMO
+    assert vencimientos.etapa(date(2024, 5, 17), hoy) == vencimientos.PROXIMO
+    assert vencimientos.etapa(date(2024, 5, 18), hoy) == vencimientos.TRANQUILO
+
+
+def test_sin_pendientes_no_hay_cruce(programador):
+    _cargar(programador, [])
+    assert programador.proximo_cruce() is None
+
+
+def test_proximo_cruce_es_el_primer_umbral(programador):
+    hoy = date.today()
+    _cargar(programador, [_cheque(1, 30), _cheque(2, 6), _cheque(3, -2), _cheque(4, 12)])
+
+    # El cheque 4 entra en la ventana de aviso antes de que venza el 2
+    assert programador.proximo_cruce() == hoy + timedelta(days=12 - 7)
+    # Próximos: el que vence en 6 días y el vencido
+    assert programador.proximos == 2
+
+
+def test_vencimiento_de_un_proximo(programador):
+    hoy = date.today()
+    _cargar(programador, [_cheque(1, 20), _cheque(2, 2)])
+    # Vence al terminar el día de su vencimiento
+    assert programador.proximo_cruce() == hoy + timedelta(days=3)
+
+
+def test_cruce_ignora_cheques_quitados_o_movidos(programador):
+    hoy = date.today()
+    _cargar(programador, [_cheque(1, 10), _cheque(2, 15), _cheque(3, 40)])
+    assert programador.proximo_cruce() == hoy + timedelta(days=3)
+
+    # Cobrado: su entrada queda descartada en el montículo
+    programador._quitar(1)
+    assert programador.proximo_cruce() == hoy + timedelta(days=8)
+
+    # Postergado: la entrada vieja ya no corresponde a su fecha
+    programador._quitar(2)
+    programador._agregar(_cheque(2, 60), hoy)
+    assert programador.proximo_cruce() == hoy + timedelta(days=33)
+
+
+def test_compactar_no_cuenta_vencidos_como_descartados(programador, monkeypatch):
+    monkeypatch.setattr(vencimientos, 'MAXIMO_DESCARTADAS', 2)
+    _cargar(programador, [_cheque(i, -i) for i in range(1, 10)] + [_cheque(20, 30)])
+    por_avisar = programador._por_avisar
+
+    # Nueve vencidos fuera de los montículos y ninguna entrada vieja: no se rearma
+    programador._compactar()
+    assert programador._por_avisar is por_avisar
+
+    for cheque_id in (21, 22, 23):
+        programador._agregar(_cheque(cheque_id, 50), date.today())
+        programador._quitar(cheque_id)
+    programador._compactar()
+    assert programador._por_avisar is not por_avisar
+    assert programador._por_avisar == [(date.today() + timedelta(days=30), 20)]
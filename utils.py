@@ -8,6 +8,10 @@ import os
 import sqlite3
 from datetime import datetime
 
+import database
+import instrumentacion
+import migrations
+
 
 class ExportUtils:
     """Utilidades para exportar datos"""
@@ -20,24 +24,20 @@ class ExportUtils:
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
         
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        # Obtener lista de tablas
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tablas = [row[0] for row in cursor.fetchall()]
+        # Los montos y fechas se exportan en pesos y 'YYYY-MM-DD' también en
+        # formato compacto; las tablas internas no se exportan
+        db = database.DatabaseManager(db_path)
+        tablas = db.get_tablas_exportables()
         
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         archivos_creados = []
         
         for tabla in tablas:
-            cursor.execute(f"SELECT * FROM {tabla}")
-            rows = cursor.fetchall()
+            rows = db.get_filas_exportables(tabla)
             
             if rows:
                 # Obtener nombres de columnas
-                columnas = rows[0].keys()
+                columnas = list(dict(rows[0]).keys())
                 
                 # Crear archivo CSV
                 filename = f"{output_dir}/{tabla}_{timestamp}.csv"
@@ -51,7 +51,6 @@ class ExportUtils:
                 archivos_creados.append(filename)
                 print(f"✅ Exportado: {filename}")
         
-        conn.close()
         return archivos_creados
     
     @staticmethod
@@ -64,9 +63,20 @@ class ExportUtils:
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         backup_file = f"{backup_dir}/agromanager_backup_{timestamp}.db"
         
+        if not os.path.exists(db_path):
+            print(f"❌ Error al crear backup: no existe {db_path}")
+            return None
+        
         try:
-            import shutil
-            shutil.copy2(db_path, backup_file)
+            # Con WAL las transacciones confirmadas pueden estar todavía en el
+            # -wal: la API de backup de SQLite copia lo que ve una conexión del pool
+            db = database.DatabaseManager(db_path)
+            destino = sqlite3.connect(backup_file)
+            try:
+                with db.reader() as conn:
+                    conn.backup(destino)
+            finally:
+                destino.close()
             print(f"✅ Backup creado: {backup_file}")
             return backup_file
         except Exception as e:
@@ -77,40 +87,15 @@ class ExportUtils:
     def generate_financial_report(db_path='agromanager.db'):
         """Generar reporte financiero resumido"""
         
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        # Resumen de ingresos
-        cursor.execute('''
-            SELECT 
-                categoria,
-                COUNT(*) as cantidad,
-                SUM(monto) as total,
-                AVG(monto) as promedio
-            FROM ingresos
-            GROUP BY categoria
-        ''')
-        ingresos = cursor.fetchall()
-        
-        # Resumen de gastos
-        cursor.execute('''
-            SELECT 
-                categoria,
-                COUNT(*) as cantidad,
-                SUM(monto) as total,
-                AVG(monto) as promedio
-            FROM gastos
-            GROUP BY categoria
-        ''')
-        gastos = cursor.fetchall()
-        
-        # Totales
-        cursor.execute('SELECT SUM(monto) FROM ingresos')
-        total_ingresos = cursor.fetchone()[0] or 0
-        
-        cursor.execute('SELECT SUM(monto) FROM gastos')
-        total_gastos = cursor.fetchone()[0] or 0
+        # Los totales salen del resumen mensual, sin recorrer los movimientos
+        db = database.DatabaseManager(db_path)
+        db.ensure_schema()
+        
+        ingresos = db.get_resumen_por_categoria('ingresos')
+        gastos = db.get_resumen_por_categoria('gastos')
+        
+        total_ingresos = sum(ing['total'] for ing in ingresos)
+        total_gastos = sum(gasto['total'] for gasto in gastos)
         
         balance = total_ingresos - total_gastos
         
@@ -147,8 +132,6 @@ class ExportUtils:
         report.append(f"  Rentabilidad:    {rentabilidad:>15.2f}%")
         report.append("=" * 60)
         
-        conn.close()
-        
         # Guardar reporte
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         report_file = f"reportes/reporte_financiero_{timestamp}.txt"
@@ -173,25 +156,26 @@ class DataCleaner:
         """Eliminar registros antiguos (más de X días)"""
         from datetime import timedelta
         
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        fecha_limite = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
-        
-        # Eliminar gastos antiguos
-        cursor.execute('DELETE FROM gastos WHERE fecha < ?', (fecha_limite,))
-        gastos_deleted = cursor.rowcount
+        db = database.DatabaseManager(db_path)
+        db.ensure_schema()
         
-        # Eliminar ingresos antiguos
-        cursor.execute('DELETE FROM ingresos WHERE fecha < ?', (fecha_limite,))
-        ingresos_deleted = cursor.rowcount
+        # La fecha límite se expresa en el formato de almacenamiento de la base
+        fecha_limite = db.formato.fecha_a_db(datetime.now() - timedelta(days=days))
         
-        # Eliminar registros de tambo antiguos
-        cursor.execute('DELETE FROM tambo WHERE fecha < ?', (fecha_limite,))
-        tambo_deleted = cursor.rowcount
-        
-        conn.commit()
-        conn.close()
+        with db.transaction() as conn:
+            cursor = conn.cursor()
+            
+            # Eliminar gastos antiguos
+            cursor.execute('DELETE FROM gastos WHERE fecha < ?', (fecha_limite,))
+            gastos_deleted = cursor.rowcount
+            
+            # Eliminar ingresos antiguos
+            cursor.execute('DELETE FROM ingresos WHERE fecha < ?', (fecha_limite,))
+            ingresos_deleted = cursor.rowcount
+            
+            # Eliminar registros de tambo antiguos
+            cursor.execute('DELETE FROM tambo WHERE fecha < ?', (fecha_limite,))
+            tambo_deleted = cursor.rowcount
         
         print("✅ Eliminados:")
         print(f"   - Gastos: {gastos_deleted}")
@@ -201,6 +185,85 @@ class DataCleaner:
         return gastos_deleted + ingresos_deleted + tambo_deleted
 
 
+class DatabaseUtils:
+    """Utilidades de mantenimiento del esquema"""
+    
+    @staticmethod
+    def check_indexes(db_path='agromanager.db'):
+        """Aplicar migraciones pendientes y verificar el uso de índices"""
+        db = database.DatabaseManager(db_path)
+        db.ensure_schema()
+        
+        with db.reader() as conn:
+            print(f"Versión de esquema: {migrations.get_version(conn)}")
+            resultados = migrations.verificar_indices(conn)
+        
+        for descripcion, indice, usa_indice, plan in resultados:
+            marca = '✅' if usa_indice else '❌'
+            print(f"{marca} {descripcion:<28} -> {indice}")
+            for detalle in plan:
+                print(f"     {detalle}")
+        
+        return all(r[2] for r in resultados)
+    
+    @staticmethod
+    def compact_storage(db_path='agromanager.db'):
+        """Convertir montos a centavos y fechas a número de día (en el lugar)"""
+        db = database.DatabaseManager(db_path)
+        db.ensure_schema()
+        
+        if db.convertir_a_compacto():
+            print("✅ Base convertida al formato compacto")
+            return True
+        
+        print("La base ya usa el formato compacto")
+        return False
+
+    
+    @staticmethod
+    def sql_report(limite=15, orden='total_ms'):
+        """Sentencias SQL más costosas registradas por la aplicación"""
+        datos = instrumentacion.cargar()
+        if not datos:
+            print("Todavía no hay estadísticas: se guardan al cerrar la aplicación")
+            return []
+        
+        filas = instrumentacion.reporte(datos, orden=orden, limite=limite)
+        _print_sql_report(filas)
+        print(f"\nConsultas lentas (> {instrumentacion.UMBRAL_LENTO_MS} ms): {instrumentacion.ARCHIVO_LENTAS}")
+        return filas
+    
+    @staticmethod
+    def profile_dashboard(db_path='agromanager.db', repeticiones=50):
+        """Medir las consultas que hace el dashboard al abrirse"""
+        # La medición es opcional en la aplicación; acá es el objetivo
+        instrumentacion.configurar(activa=True)
+        db = database.DatabaseManager(db_path)
+        db.ensure_schema()
+        # Guardar lo medido hasta ahora para que el reporte muestre solo el dashboard
+        instrumentacion.guardar()
+        
+        # La primera apertura hace la consulta; las siguientes, sin cambios en
+        # los datos, solo verifican PRAGMA data_version
+        for _ in range(repeticiones):
+            db.get_dashboard_kpis()
+        
+        print(f"Consultas del dashboard ({repeticiones} aperturas):")
+        filas = instrumentacion.reporte(orden='total_ms')
+        _print_sql_report(filas)
+        return filas
+
+
+def _print_sql_report(filas):
+    """Imprimir el reporte de sentencias como tabla"""
+    print(f"{'Llamadas':>8} {'Total ms':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'Filas':>8}  Sentencia")
+    for fila in filas:
+        print(
+            f"{fila['llamadas']:>8} {fila['total_ms']:>10.1f} {fila['p50_ms']:>8.2f} "
+            f"{fila['p95_ms']:>8.2f} {fila['p99_ms']:>8.2f} {fila['filas']:>8}  {fila['sql'][:80]}"
+        )
+
+
 # Función de prueba
 if __name__ == '__main__':
     print("=== Utilidades AgroManager ===\n")
@@ -209,7 +272,11 @@ if __name__ == '__main__':
     print("2. Crear backup")
     print("3. Generar reporte financiero")
     print("4. Limpiar registros antiguos")
-    print("5. Salir")
+    print("5. Verificar índices")
+    print("6. Convertir a formato compacto (centavos y número de día)")
+    print("7. Reporte de consultas SQL")
+    print("8. Medir consultas del dashboard")
+    print("9. Salir")
     
     opcion = input("\nSelecciona una opción: ")
     
@@ -235,5 +302,21 @@ if __name__ == '__main__':
         else:
             print("Operación cancelada")
     
+    elif opcion == '5':
+        DatabaseUtils.check_indexes()
+    
+    elif opcion == '6':
+        confirmar = input("⚠️  Se recomienda crear un backup antes. ¿Continuar? (s/N): ")
+        if confirmar.lower() == 's':
+            DatabaseUtils.compact_storage()
+        else:
+            print("Operación cancelada")
+    
+    elif opcion == '7':
+        DatabaseUtils.sql_report()
+    
+    elif opcion == '8':
+        DatabaseUtils.profile_dashboard()
+    
     else:
         print("Saliendo...")
\ No newline at end of file
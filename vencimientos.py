@@ -0,0 +1,317 @@
+"""
+Avisos de vencimiento de cheques
+Los cheques pendientes se guardan en montículos (heapq) ordenados por fecha
+de vencimiento: uno con los que todavía no entraron en la ventana de aviso
+y otro con los que ya están dentro pero no vencieron. El programador se
+despierta solo cuando el primero de alguno cruza su umbral (entra en la
+ventana o vence) y se entera de las altas, cobros y bajas por el bus de
+eventos, sin volver a recorrer la tabla.
+
+    programador = vencimientos.get_programador()
+    programador.bind(proximos=...)
+    programador.iniciar()
+"""
+
+import heapq
+from datetime import date, datetime, time, timedelta
+
+from kivy.clock import Clock
+from kivy.event import EventDispatcher
+from kivy.logger import Logger
+from kivy.properties import BooleanProperty, NumericProperty
+
+import database
+import db_worker
+import eventos
+
+# Días antes del vencimiento en que un cheque pasa a "próximo"
+DIAS_AVISO = 7
+
+# Etapas de un cheque pendiente
+TRANQUILO = 'tranquilo'
+PROXIMO = 'proximo'
+VENCIDO = 'vencido'
+
+# Con más entradas viejas que esto (por cheques cobrados o modificados) se
+# rearman los montículos
+MAXIMO_DESCARTADAS = 256
+
+
+def _fecha(valor):
+    if isinstance(valor, date):
+        return valor
+    return datetime.strptime(valor, '%Y-%m-%d').date()
+
+
+def dias_restantes(fecha_vencimiento, hoy=None):
+    """Días hasta el vencimiento (negativo si ya venció)"""
+    return (_fecha(fecha_vencimiento) - (hoy or date.today())).days
+
+
+def etapa(fecha_vencimiento, hoy=None, dias_aviso=DIAS_AVISO):
+    """Etapa de un cheque pendiente: VENCIDO, PROXIMO o TRANQUILO"""
+    dias = dias_restantes(fecha_vencimiento, hoy)
+    if dias < 0:
+        return VENCIDO
+    if dias <= dias_aviso:
+        return PROXIMO
+    return TRANQUILO
+
+
+def avisar(titulo, texto):
+    """Mostrar un aviso en la aplicación y, si plyer está instalado, en el escritorio"""
+    from kivymd.uix.snackbar import Snackbar
+
+    Snackbar(text=f"{titulo}: {texto}").open()
+    try:
+        from plyer import notification
+        notification.notify(title=titulo, message=texto, app_name='AgroManager')
+    except Exception:
+        # plyer es opcional y no todas las plataformas tienen notificaciones
+        pass
+
+
+class Programador(EventDispatcher):
+    """Etapa de cada cheque pendiente y conteo de próximos para el dashboard.
+
+    proximos es la cantidad de cheques pendientes que vencen dentro de
+    dias_aviso días o ya vencieron (lo mismo que cuenta get_dashboard_kpis).
+    Al cruzar un umbral se emite on_aviso(etapa, cheques) con los cheques
+    que acaban de pasar a PROXIMO o a VENCIDO.
+    """
+
+    proximos = NumericProperty(0)
+    # False hasta recibir la primera carga de cheques pendientes
+    cargado = BooleanProperty(False)
+
+    __events__ = ('on_aviso',)
+
+    def __init__(self, dias_aviso=DIAS_AVISO, **kwargs):
+        super().__init__(**kwargs)
+        self.dias_aviso = dias_aviso
+        # id -> (fecha de vencimiento, cheque) de los pendientes
+        self._cheques = {}
+        self._etapas = {}
+        # (fecha de vencimiento, id); las entradas de cheques cobrados,
+        # eliminados o modificados se descartan al llegar al tope
+        self._por_avisar = []
+        self._por_vencer = []
+        self._despertador = None
+        self._suscripcion = None
+        self._generacion = 0
+        self._recargando = False
+        # Ids con cambios cuya lectura todavía no llegó
+        self._pedidos = set()
+
+    def iniciar(self):
+        """Cargar los cheques pendientes y seguir sus cambios"""
+        if self._suscripcion is None:
+            self._suscripcion = eventos.suscribir('cheques', self._on_cambios)
+        self.recargar()
+
+    def detener(self):
+        if self._despertador is not None:
+            self._despertador.cancel()
+            self._despertador = None
+        if self._suscripcion is not None:
+            eventos.desuscribir(self._suscripcion)
+            self._suscripcion = None
+
+    def recargar(self):
+        """Leer todos los cheques pendientes (al iniciar o después de una importación)"""
+        self._generacion += 1
+        self._recargando = True
+        self._pedidos.clear()
+        generacion = self._generacion
+        db_worker.run_async(
+            database.get_db().get_cheques_pendientes,
+            on_result=lambda cheques: self._cargar(cheques, generacion),
+            on_error=self._fallo,
+            clave='vencimientos'
+        )
+
+    def _fallo(self, error):
+        Logger.error(f'AgroManager: no se pudieron leer los vencimientos: {error}')
+
+    def _cargar(self, cheques, generacion):
+        if generacion != self._generacion:
+            return
+        self._recargando = False
+        self._cheques.clear()
+        self._etapas.clear()
+        self._por_avisar = []
+        self._por_vencer = []
+        hoy = date.today()
+        for cheque in cheques:
+            self._agregar(cheque, hoy)
+        self.proximos = sum(1 for valor in self._etapas.values() if valor != TRANQUILO)
+        self.cargado = True
+        self._programar()
+
+    def _agregar(self, cheque, hoy):
+        fecha = _fecha(cheque['fecha_vencimiento'])
+        valor = etapa(fecha, hoy, self.dias_aviso)
+        self._cheques[cheque['id']] = (fecha, cheque)
+        self._etapas[cheque['id']] = valor
+        if valor == TRANQUILO:
+            heapq.heappush(self._por_avisar, (fecha, cheque['id']))
+        elif valor == PROXIMO:
+            heapq.heappush(self._por_vencer, (fecha, cheque['id']))
+        return valor
+
+    def _quitar(self, cheque_id):
+        """Quitar un cheque; su entrada en el montículo queda como descartada"""
+        self._cheques.pop(cheque_id, None)
+        return self._etapas.pop(cheque_id, None)
+
+    def _vigente(self, fecha, cheque_id, valor):
+        """La entrada del montículo corresponde al cheque tal como está ahora"""
+        return (self._etapas.get(cheque_id) == valor
+                and self._cheques[cheque_id][0] == fecha)
+
+    def _on_cambios(self, cambios):
+        """Aplicar altas, cobros y bajas de cheques sin releer la tabla"""
+        if (not self.cargado or self._recargando
+                or any(cambio.op == eventos.MASIVA for cambio in cambios)):
+            # Una lectura completa en curso pudo ser anterior a estos cambios
+            self.recargar()
+            return
+
+        conteo = 0
+        for cheque_id in eventos.ids(cambios, eventos.ELIMINAR):
+            if self._quitar(cheque_id) not in (None, TRANQUILO):
+                conteo -= 1
+        self.proximos += conteo
+
+        # Altas y modificaciones: se leen solo esos cheques (si siguen pendientes).
+        # Con una lectura en curso se pide otra con todos los ids: reemplaza a
+        # la anterior, que pudo leer un cheque antes de que se eliminara
+        nuevos = eventos.ids(cambios, eventos.INSERTAR) | eventos.ids(cambios, eventos.ACTUALIZAR)
+        if nuevos or self._pedidos:
+            self._pedidos |= nuevos
+            pedidos = set(self._pedidos)
+            generacion = self._generacion
+            db_worker.run_async(
+                database.get_db().get_cheques_pendientes, sorted(pedidos),
+                on_result=lambda cheques: self._actualizar(pedidos, cheques, generacion),
+                on_error=self._fallo,
+                clave='vencimientos_cambios'
+            )
+        else:
+            self._programar()
+
+    def _actualizar(self, pedidos, cheques, generacion):
+        if generacion != self._generacion:
+            return
+        self._pedidos -= pedidos
+        conteo = 0
+        for cheque_id in pedidos:
+            if self._quitar(cheque_id) not in (None, TRANQUILO):
+                conteo -= 1
+        hoy = date.today()
+        for cheque in cheques:
+            if self._agregar(cheque, hoy) != TRANQUILO:
+                conteo += 1
+        self.proximos += conteo
+        self._compactar()
+        self._programar()
+
+    def _compactar(self):
+        """Rearmar los montículos si acumularon muchas entradas descartadas"""
+        # Los vencidos no están en ningún montículo
+        vigentes = sum(1 for valor in self._etapas.values() if valor != VENCIDO)
+        descartadas = len(self._por_avisar) + len(self._por_vencer) - vigentes
+        if descartadas <= MAXIMO_DESCARTADAS:
+            return
+        self._por_avisar = [(self._cheques[i][0], i) for i, valor in self._etapas.items() if valor == TRANQUILO]
+        self._por_vencer = [(self._cheques[i][0], i) for i, valor in self._etapas.items() if valor == PROXIMO]
+        heapq.heapify(self._por_avisar)
+        heapq.heapify(self._por_vencer)
+
+    def _limpiar(self, monticulo, valor):
+        """Sacar del tope las entradas descartadas"""
+        while monticulo and not self._vigente(monticulo[0][0], monticulo[0][1], valor):
+            heapq.heappop(monticulo)
+
+    def proximo_cruce(self):
+        """Fecha en que el primer cheque cruza un umbral (None si no hay pendientes)"""
+        self._limpiar(self._por_avisar, TRANQUILO)
+        self._limpiar(self._por_vencer, PROXIMO)
+        fechas = []
+        if self._por_avisar:
+            fechas.append(self._por_avisar[0][0] - timedelta(days=self.dias_aviso))
+        if self._por_vencer:
+            # Vence al terminar el día del vencimiento
+            fechas.append(self._por_vencer[0][0] + timedelta(days=1))
+        return min(fechas) if fechas else None
+
+    def _programar(self):
+        """Dormir hasta el próximo cruce de umbral"""
+        if self._despertador is not None:
+            self._despertador.cancel()
+            self._despertador = None
+        cruce = self.proximo_cruce()
+        if cruce is None:
+            return
+        espera = (datetime.combine(cruce, time()) - datetime.now()).total_seconds()
+        self._despertador = Clock.schedule_once(self.revisar, max(espera, 0))
+
+    def revisar(self, *args):
+        """Avanzar los cheques que cruzaron su umbral (también al volver de una pausa)"""
+        self._despertador = None
+        if not self.cargado:
+            return
+        hoy = date.today()
+        nuevos_proximos = []
+        vencidos = []
+
+        limite_aviso = hoy + timedelta(days=self.dias_aviso)
+        while self._por_avisar and self._por_avisar[0][0] <= limite_aviso:
+            fecha, cheque_id = heapq.heappop(self._por_avisar)
+            if not self._vigente(fecha, cheque_id, TRANQUILO):
+                continue
+            self.proximos += 1
+            if fecha < hoy:
+                # Cruzó los dos umbrales mientras la aplicación no corría
+                self._etapas[cheque_id] = VENCIDO
+                vencidos.append(self._cheques[cheque_id][1])
+            else:
+                self._etapas[cheque_id] = PROXIMO
+                heapq.heappush(self._por_vencer, (fecha, cheque_id))
+                nuevos_proximos.append(self._cheques[cheque_id][1])
+
+        while self._por_vencer and self._por_vencer[0][0] < hoy:
+            fecha, cheque_id = heapq.heappop(self._por_vencer)
+            if not self._vigente(fecha, cheque_id, PROXIMO):
+                continue
+            self._etapas[cheque_id] = VENCIDO
+            vencidos.append(self._cheques[cheque_id][1])
+
+        if nuevos_proximos:
+            self.dispatch('on_aviso', PROXIMO, nuevos_proximos)
+        if vencidos:
+            self.dispatch('on_aviso', VENCIDO, vencidos)
+        self._programar()
+
+    def on_aviso(self, valor, cheques):
+        """Aviso por defecto: un mensaje por grupo de cheques"""
+        if len(cheques) == 1:
+            cheque = cheques[0]
+            detalle = f"Ch. {cheque['numero']} - {cheque['banco']} - ${cheque['monto']:,.0f}"
+        else:
+            detalle = f"{len(cheques)} cheques por ${sum(c['monto'] for c in cheques):,.0f}"
+        if valor == VENCIDO:
+            avisar("Cheques vencidos", detalle)
+        else:
+            avisar(f"Vencen en {self.dias_aviso} días o menos", detalle)
+
+
+_programador = None
+
+
+def get_programador():
+    """Programador compartido por el dashboard y la pantalla de cheques"""
+    global _programador
+    if _programador is None:
+        _programador = Programador()
+    return _programador